@@ -26,6 +26,8 @@ from pg_backup_api.run import (
     recovery_operation,
     config_switch_operation,
     config_update_operation,
+    pipeline_operation,
+    migrate_layout,
 )
 
 
@@ -37,7 +39,9 @@ def main() -> None:
 
     * Starting the REST API server -- ``pg-backup-api server``;
     * Checking the REST API server status -- ``pg-backup-api status``;
-    * Running a ``barman recover`` operation -- ``pg-backup-api recovery``.
+    * Running a ``barman recover`` operation -- ``pg-backup-api recovery``;
+    * Moving operation files to another layout --
+      ``pg-backup-api migrate-layout``.
     """
     p = argparse.ArgumentParser(
         epilog="Postgres Backup API by EnterpriseDB (www.enterprisedb.com)"
@@ -111,8 +115,52 @@ def main() -> None:
         required=True,
         help="ID of the operation in the 'pg-backup-api'.",
     )
+    p_ops.add_argument(
+        "--merge-operation-id",
+        action="append",
+        default=[],
+        help="ID of another config-update operation to be run along with it. "
+        "Can be given several times.",
+    )
     p_ops.set_defaults(func=config_update_operation)
 
+    p_ops = subparsers.add_parser(
+        "pipeline",
+        description="Perform the steps of a pipeline through the "
+        "'pg-backup-api'. Can only be run if a pipeline operation has been "
+        "previously registered.",
+    )
+    p_ops.add_argument(
+        "--server-name",
+        required=True,
+        help="Name of the Barman server related to the pipeline.",
+    )
+    p_ops.add_argument(
+        "--operation-id",
+        required=True,
+        help="ID of the operation in the 'pg-backup-api'.",
+    )
+    p_ops.set_defaults(func=pipeline_operation)
+
+    p_migrate = subparsers.add_parser(
+        "migrate-layout",
+        description="Move files of existing operations to the given layout. "
+        "Should be run after changing 'PG_BACKUP_API_OPERATIONS_LAYOUT'.",
+    )
+    p_migrate.add_argument(
+        "--server-name",
+        help="Name of the Barman server whose operations should be moved. "
+        "If not given, move operations of the Barman instance and of all "
+        "Barman servers.",
+    )
+    p_migrate.add_argument(
+        "--layout",
+        choices=["flat", "sharded"],
+        default="sharded",
+        help="Layout the files should be moved to.",
+    )
+    p_migrate.set_defaults(func=migrate_layout)
+
     args = p.parse_args()
     if hasattr(args, "func") is False:
         p.print_help()
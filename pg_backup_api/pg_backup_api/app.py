@@ -17,20 +17,25 @@
 # along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
 
 """
-Used when running pg-backup-api REST API server as an WSGI application.
+Used when running pg-backup-api REST API server as an WSGI or ASGI application.
 
-Load Barman configuration, set up logging for WSGI, and set up a JSON console
-output writer.
+Load Barman configuration, set up logging for WSGI, set up a JSON console
+output writer, start delivering events to the webhook, if any, and start
+reconciling orphaned operations.
 
 .. note::
     This is designed for production usage, while the ``pg-backup-api serve``
     command is designed for development usage.
 
 :var application: the Flask application instance.
+:var asgi_application: ASGI application serving the same routes as
+    :data:`application`, see :class:`AsgiApplication`.
 """
 from barman import output
 
-from pg_backup_api.run import app
+from pg_backup_api.asgi import AsgiApplication
+from pg_backup_api.reconciler import start_reconciler
+from pg_backup_api.run import app, start_event_delivery
 from pg_backup_api.utils import (
     load_barman_config,
     setup_logging_for_wsgi_server,
@@ -39,4 +44,7 @@ from pg_backup_api.utils import (
 load_barman_config()
 setup_logging_for_wsgi_server()
 output.set_output_writer(output.AVAILABLE_WRITERS["json"]())
+start_event_delivery()
+start_reconciler()
 application = app
+asgi_application = AsgiApplication(app)
@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Serve the pg-backup-api REST API as an ASGI application.
+
+Every request is handled by the Flask routes, run in a bounded thread pool, so
+both the WSGI and the ASGI variants share the same routes and validation.
+
+Requests which may block for a long time are handled in the event loop
+instead, so idle ones do not hold a thread:
+
+* ``GET`` of the status of an operation with ``wait``: the status is fetched
+  without waiting, and if the operation is still in progress its output file
+  is awaited through :meth:`FileWatcher.async_wait_for_file`, then the status
+  is fetched again;
+* ``GET /events`` with ``wait``: the event logs are awaited to change through
+  :meth:`FileWatcher.async_wait_for_change`, and only then are new events
+  fetched without waiting, resuming from the cursor of the last event sent.
+
+:var DEFAULT_WORKERS: default size of the thread pool.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import re
+import sys
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
+from urllib.parse import parse_qsl, urlencode
+
+from pg_backup_api import json_backend
+from pg_backup_api.server_operation import OperationServer, get_events_files
+from pg_backup_api.utils import get_setting, load_barman_config, parse_wait
+from pg_backup_api.watcher import get_file_signature, get_watcher
+
+if TYPE_CHECKING:  # pragma: no cover
+    import flask.app
+
+DEFAULT_WORKERS = 32
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+Headers = List[Tuple[bytes, bytes]]
+
+_OPERATION_PATH = re.compile(
+    r"^(?:/servers/(?P<server_name>[^/]+))?/operations/(?P<op_id>[^/:]+)$"
+)
+
+
+class AsgiApplication:
+    """
+    ASGI application serving a Flask application.
+
+    :ivar wsgi_app: the Flask application which handles the requests.
+    :ivar pool: the thread pool the Flask application is run in.
+    """
+
+    def __init__(
+        self, wsgi_app: "flask.app.Flask", max_workers: Optional[int] = None
+    ) -> None:
+        """
+        Initialize a new instance of :class:`AsgiApplication`.
+
+        :param wsgi_app: the Flask application which handles the requests.
+        :param max_workers: size of the thread pool. If not given, the
+            ``ASGI_WORKERS`` setting, or :data:`DEFAULT_WORKERS`.
+        """
+        if max_workers is None:
+            max_workers = get_setting("ASGI_WORKERS", DEFAULT_WORKERS, int)
+
+        self.wsgi_app = wsgi_app
+        self.pool = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="pg-backup-api-asgi"
+        )
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """
+        Handle an ASGI connection.
+
+        :param scope: the connection scope.
+        :param receive: awaitable to receive events from the client.
+        :param send: awaitable to send events to the client.
+
+        :raises:
+            :exc:`ValueError`: if the scope is neither ``http`` nor
+                ``lifespan``.
+        """
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope '{scope['type']}'")
+
+        body = await self._read_body(receive)
+        query = parse_qsl(scope.get("query_string", b"").decode("latin1"))
+        wait = 0.0
+
+        try:
+            wait = parse_wait(next((v for k, v in query if k == "wait"), None))
+        except ValueError:
+            # Left to the Flask routes, which respond with the error
+            pass
+
+        environ = self._get_environ(scope, body)
+        match = _OPERATION_PATH.match(scope["path"])
+        long_poll = wait > 0 and scope["method"] == "GET"
+
+        if long_poll and match is not None:
+            await self._wait_operation(
+                environ, query, match.groupdict(), wait, receive, send
+            )
+        elif long_poll and scope["path"] == "/events":
+            await self._stream_events(environ, query, wait, receive, send)
+        else:
+            await self._send(send, *await self._call(environ))
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        """
+        Handle the lifespan events of the ASGI server.
+
+        The thread pool is shut down when the server shuts down.
+
+        :param receive: awaitable to receive lifespan events.
+        :param send: awaitable to acknowledge lifespan events.
+        """
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        """
+        Read the whole body of the request.
+
+        :param receive: awaitable to receive events from the client.
+        :return: the body of the request.
+        """
+        body = b""
+
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+
+            if not message.get("more_body", False):
+                return body
+
+    @staticmethod
+    def _get_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+        """
+        Get the WSGI environment of a request.
+
+        :param scope: the connection scope of the request.
+        :param body: the body of the request.
+        :return: the WSGI environment.
+        """
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ: Dict[str, Any] = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "")
+            .encode("utf8")
+            .decode("latin1"),
+            "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+
+        for name, value in scope.get("headers", []):
+            key = name.decode("latin1").upper().replace("-", "_")
+
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                key = f"HTTP_{key}"
+
+            if key in environ:
+                environ[key] += "," + value.decode("latin1")
+            else:
+                environ[key] = value.decode("latin1")
+
+        # The body was read as a whole, even if it was sent in chunks
+        environ["CONTENT_LENGTH"] = str(len(body))
+        return environ
+
+    def _call_wsgi(
+        self, environ: Dict[str, Any]
+    ) -> Tuple[int, Headers, bytes]:
+        """
+        Handle a request through the Flask application.
+
+        .. note::
+            Runs in the thread pool.
+
+        :param environ: the WSGI environment of the request.
+        :return: a tuple consisting of:
+
+            * status code of the response;
+            * headers of the response;
+            * body of the response.
+        """
+        chunks: List[bytes] = []
+        response: Dict[str, Any] = {}
+
+        def start_response(
+            status: str, headers: List[Tuple[str, str]], exc_info: Any = None
+        ) -> Callable[[bytes], None]:
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (k.lower().encode("latin1"), v.encode("latin1"))
+                for k, v in headers
+            ]
+            return chunks.append
+
+        result = self.wsgi_app(environ, start_response)
+
+        try:
+            chunks.extend(result)
+        finally:
+            close = getattr(result, "close", None)
+
+            if close is not None:
+                close()
+
+        return response["status"], response["headers"], b"".join(chunks)
+
+    async def _call(
+        self,
+        environ: Dict[str, Any],
+        query: Optional[List[Tuple[str, str]]] = None,
+    ) -> Tuple[int, Headers, bytes]:
+        """
+        Handle a request through the Flask application, in the thread pool.
+
+        :param environ: the WSGI environment of the request.
+        :param query: if given, replaces the query string arguments of the
+            request.
+        :return: see :meth:`_call_wsgi`.
+        """
+        if query is not None:
+            environ = dict(environ, QUERY_STRING=urlencode(query))
+
+        environ["wsgi.input"].seek(0)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, self._call_wsgi, environ)
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run *func* in the thread pool.
+
+        :param func: the function to be run.
+        :param args: positional arguments of *func*.
+        :return: what *func* returns.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, func, *args)
+
+    @staticmethod
+    async def _send(
+        send: Send,
+        status: int,
+        headers: Headers,
+        body: bytes,
+        more_body: bool = False,
+    ) -> None:
+        """
+        Send a response to the client.
+
+        :param send: awaitable to send events to the client.
+        :param status: status code of the response.
+        :param headers: headers of the response.
+        :param body: body of the response.
+        :param more_body: if more body will be sent later on.
+        """
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers,
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": body,
+                "more_body": more_body,
+            }
+        )
+
+    @staticmethod
+    def _get_output_file_path(server_name: Optional[str], op_id: str) -> str:
+        """
+        Get the path of the output file of an operation.
+
+        :param server_name: name of the Barman server of the operation, if
+            it's a server operation, ``None`` if it's an instance operation.
+        :param op_id: ID of the operation.
+        :return: path of the output file.
+        """
+        return OperationServer(server_name).get_output_file_path(op_id)
+
+    @staticmethod
+    def _get_events_signatures() -> Dict[str, Optional[Tuple[int, int]]]:
+        """
+        Get the signature of the event logs of all Barman servers and instance.
+
+        :return: signature of each event log, keyed by path, see
+            :func:`get_file_signature`.
+        """
+        load_barman_config()
+        return {
+            path: get_file_signature(path)
+            for path in get_events_files().values()
+        }
+
+    @staticmethod
+    def _get_signatures(
+        paths: List[str],
+    ) -> Dict[str, Optional[Tuple[int, int]]]:
+        """
+        Get the signature of each of *paths*.
+
+        :param paths: paths to the files.
+        :return: signature of each file, keyed by path, see
+            :func:`get_file_signature`.
+        """
+        return {path: get_file_signature(path) for path in paths}
+
+    async def _wait_operation(
+        self,
+        environ: Dict[str, Any],
+        query: List[Tuple[str, str]],
+        args: Dict[str, Optional[str]],
+        wait: float,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        """
+        Respond with the status of an operation once it finishes.
+
+        See :func:`_operation_id_get` for the Flask route.
+
+        :param environ: the WSGI environment of the request.
+        :param query: query string arguments of the request.
+        :param args: ``server_name`` and ``op_id`` from the request path.
+        :param wait: maximum number of seconds to wait for.
+        :param receive: awaitable to receive events from the client.
+        :param send: awaitable to send events to the client.
+        """
+        query = [(k, v) for k, v in query if k != "wait"]
+        status, headers, body = await self._call(environ, query)
+
+        in_progress = (
+            status == 200
+            and json_backend.loads(body)["status"] == "IN_PROGRESS"
+        )
+
+        if in_progress:
+            try:
+                path = await self._run(
+                    self._get_output_file_path,
+                    args["server_name"],
+                    args["op_id"],
+                )
+            except Exception:
+                await self._send(send, status, headers, body)
+                return
+
+            waiter = asyncio.ensure_future(
+                get_watcher().async_wait_for_file(path, wait)
+            )
+            disconnect = asyncio.ensure_future(receive())
+
+            try:
+                await asyncio.wait(
+                    (waiter, disconnect), return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                waiter.cancel()
+                disconnect.cancel()
+
+            if disconnect.done():
+                return
+
+            status, headers, body = await self._call(environ, query)
+
+        await self._send(send, status, headers, body)
+
+    async def _stream_events(
+        self,
+        environ: Dict[str, Any],
+        query: List[Tuple[str, str]],
+        wait: float,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        """
+        Stream events as they are logged, for up to *wait* seconds.
+
+        The event logs are awaited to change in the event loop, and the Flask
+        route is only called again once they did. Their signatures are taken
+        before each call, so an event logged meanwhile is not missed. See
+        :func:`events` for the Flask route.
+
+        :param environ: the WSGI environment of the request.
+        :param query: query string arguments of the request.
+        :param wait: maximum number of seconds to keep the stream open for.
+        :param receive: awaitable to receive events from the client.
+        :param send: awaitable to send events to the client.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        query = [(k, v) for k, v in query if k != "wait"]
+
+        try:
+            signatures = await self._run(self._get_events_signatures)
+        except Exception:
+            # Left to the Flask route, which responds without streaming
+            await self._send(send, *await self._call(environ, query))
+            return
+
+        status, headers, body = await self._call(environ, query)
+
+        if status != 200:
+            await self._send(send, status, headers, body)
+            return
+
+        await self._send(send, status, headers, body, more_body=True)
+        disconnect = asyncio.ensure_future(receive())
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+
+                if remaining <= 0:
+                    break
+
+                waiter = asyncio.ensure_future(
+                    get_watcher().async_wait_for_change(signatures, remaining)
+                )
+
+                try:
+                    await asyncio.wait(
+                        (waiter, disconnect),
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    waiter.cancel()
+
+                if disconnect.done():
+                    return
+
+                if not waiter.done() or not waiter.result():
+                    break
+
+                signatures = await self._run(
+                    self._get_signatures, list(signatures)
+                )
+                cursor = self._get_last_cursor(body)
+
+                if cursor is not None:
+                    query = [(k, v) for k, v in query if k != "since"]
+                    query.append(("since", cursor))
+
+                status, _, chunk = await self._call(environ, query)
+
+                if status != 200:
+                    break
+
+                if chunk:
+                    body = chunk
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": True,
+                        }
+                    )
+        finally:
+            disconnect.cancel()
+
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    def _get_last_cursor(body: bytes) -> Optional[str]:
+        """
+        Get the cursor of the last server-sent event in *body*.
+
+        :param body: chunk of a ``text/event-stream`` response.
+        :return: ID of the last event, ``None`` if *body* has no events.
+        """
+        cursor = None
+
+        for line in body.decode().splitlines():
+            if line.startswith("id: "):
+                cursor = line[len("id: "):]
+
+        return cursor
@@ -0,0 +1,758 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Keep Barman servers and their backup catalogs cached across requests.
+
+Creating a :class:`barman.server.Server` builds its backup manager, WAL
+archivers and other helpers, and its backup catalog is read from disk on first
+use. Both are kept by a :class:`ServerPool`:
+
+* servers are reused for as long as the Barman configuration files are not
+  modified;
+* the backup catalog of a server is reused for as long as the directories
+  holding its ``backup.info`` files are not modified, and the ``backup.info``
+  files of unfinished backups are not modified either.
+
+When the backup catalog of a server may have changed, it is updated through a
+:class:`BackupIndex`, which only parses the ``backup.info`` files whose
+modification time has changed since the previous update.
+
+The pool also keeps a :class:`WalIndex` of the ``xlog.db`` file of each
+server, which is used by :func:`check_recovery_target` to reject recoveries
+which cannot succeed before they are started.
+"""
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime
+from glob import glob
+import os
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
+
+import barman
+from barman.infofile import BackupInfo
+from barman.server import Server
+from barman.xlog import (
+    DEFAULT_XLOG_SEG_SIZE,
+    decode_segment_name,
+    format_lsn,
+    generate_segment_names,
+    is_history_file,
+    is_wal_file,
+    parse_lsn,
+    xlog_segments_per_file,
+)
+
+try:
+    from barman.infofile import BackupInfoFactory
+
+    _build_backup_info = BackupInfoFactory.build_backup_info
+except ImportError:  # pragma: no cover
+    # Barman older than 3.14 only has local backup.info files
+    from barman.infofile import LocalBackupInfo as _build_backup_info
+
+if TYPE_CHECKING:  # pragma: no cover
+    from barman.config import Config as BarmanConfig, ServerConfig
+
+# Modification times of files, used to tell whether they have changed.
+_Stamp = Tuple[Tuple[str, Optional[int]], ...]
+
+# Modification times more recent than this many seconds are not trusted, as
+# another change could still happen within the granularity of the filesystem
+# timestamps without changing them.
+_MTIME_GRACE = 1.0
+
+# Fields of backups returned when listing backups.
+_SUMMARY_FIELDS = (
+    "backup_id",
+    "backup_name",
+    "status",
+    "mode",
+    "timeline",
+    "begin_time_iso",
+    "end_time_iso",
+    "begin_wal",
+    "end_wal",
+    "size",
+)
+
+
+def _get_stamp(paths: Iterable[str]) -> _Stamp:
+    """
+    Get the modification time of each one of *paths*.
+
+    :param paths: paths to files or directories.
+    :return: tuples of path and modification time in nanoseconds, or ``None``
+        for paths which do not exist.
+    """
+    stamp = []
+
+    for path in paths:
+        try:
+            stamp.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            stamp.append((path, None))
+
+    return tuple(stamp)
+
+
+def get_config_generation() -> _Stamp:
+    """
+    Get the generation of the Barman configuration.
+
+    The generation changes whenever any of the Barman configuration files is
+    modified, created or removed. That includes the main configuration file,
+    the files in ``configuration_files_directory``, and the
+    ``.barman.auto.conf`` file written by ``barman config-switch`` and
+    ``barman config-update``.
+
+    .. note::
+        The Barman configuration is expected to be already loaded.
+
+    :return: an opaque value, which compares equal as long as the
+        configuration files are not changed.
+    """
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(barman.__config__, BarmanConfig)
+
+    cfg = barman.__config__
+    paths: List[str] = [cfg.config_file]
+    config_dir = cfg.get("barman", "configuration_files_directory")
+
+    if config_dir:
+        config_dir = os.path.expanduser(config_dir)
+        paths.append(config_dir)
+        paths.extend(sorted(glob(os.path.join(config_dir, "*.conf"))))
+
+    paths.append(os.path.join(cfg.barman_home, ".barman.auto.conf"))
+    return _get_stamp(paths)
+
+
+def summarize_backup(backup_info: BackupInfo) -> Dict[str, Any]:
+    """
+    Get the main fields of *backup_info*, as shown when listing backups.
+
+    :param backup_info: information about a backup.
+    :return: a dictionary with the fields :data:`_SUMMARY_FIELDS`.
+    """
+    content = backup_info.to_json()
+    return {field: content.get(field) for field in _SUMMARY_FIELDS}
+
+
+class BackupIndex:
+    """
+    Index of the ``backup.info`` files of a Barman server.
+
+    The index is updated incrementally: on each update only the
+    ``backup.info`` files which are new, or whose modification time has
+    changed, are parsed.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a new instance of :class:`BackupIndex`."""
+        # Indexed ``backup.info`` files. Each one maps to its modification
+        # time -- ``None`` if too recent to be trusted --, the parsed backup
+        # and its summary.
+        self._entries: Dict[
+            str, Tuple[Optional[int], BackupInfo, Dict[str, Any]]
+        ] = {}
+        self.backups: Dict[str, BackupInfo] = {}
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _get_info_files(server: Server) -> List[str]:
+        """
+        Get the paths to the ``backup.info`` files of *server*.
+
+        :param server: the Barman server.
+        :return: paths to the ``backup.info`` files. The ones in the legacy
+            location, under the base backups directory, come first, so the
+            ones in the ``meta`` directory take precedence, as in Barman.
+        """
+        info_files = sorted(
+            glob(
+                os.path.join(
+                    server.config.basebackups_directory, "*", "backup.info"
+                )
+            )
+        )
+        meta_directory = getattr(server, "meta_directory", None)
+
+        if meta_directory:
+            info_files.extend(
+                sorted(glob(os.path.join(meta_directory, "*-backup.info")))
+            )
+
+        return info_files
+
+    def update(self, server: Server) -> int:
+        """
+        Update the index with the ``backup.info`` files of *server*.
+
+        :param server: the Barman server.
+        :return: number of ``backup.info`` files which were parsed.
+        """
+        entries = {}
+        parsed = 0
+        now = time.time()
+
+        for path in self._get_info_files(server):
+            try:
+                mtime: Optional[int] = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            entry = self._entries.get(path)
+
+            if entry is None or entry[0] is None or entry[0] != mtime:
+                backup_info = _build_backup_info(server, path)
+                parsed += 1
+
+                if TYPE_CHECKING:  # pragma: no cover
+                    assert isinstance(mtime, int)
+
+                if now - mtime / 1e9 <= _MTIME_GRACE:
+                    mtime = None
+
+                entry = (mtime, backup_info, summarize_backup(backup_info))
+
+            entries[path] = entry
+
+        self._entries = entries
+        self.backups = {}
+        self.summaries = {}
+
+        for _, backup_info, summary in entries.values():
+            self.backups[backup_info.backup_id] = backup_info
+            self.summaries[backup_info.backup_id] = summary
+
+        return parsed
+
+
+class RecoveryTargetError(ValueError):
+    """Indicate a recovery cannot reach its target with the archived WALs."""
+
+    pass
+
+
+class WalIndex:
+    """
+    Index of the ``xlog.db`` file of a Barman server.
+
+    The names of the archived WAL segments are kept in a sorted list, so the
+    presence of a segment, or the last segment of a timeline, is found through
+    a binary search.
+
+    The index is updated incrementally: on each update only the lines
+    appended to ``xlog.db`` since the previous update are parsed. Barman
+    rewrites ``xlog.db`` in place when WALs are removed, which is detected by
+    a change of its first line, in which case the index is rebuilt.
+
+    :ivar path: path to the ``xlog.db`` file.
+    :ivar names: names of the archived WAL segments, sorted.
+    :ivar newest: archival time of the newest WAL segment of each timeline.
+    :ivar history: timelines whose history file is archived.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize a new instance of :class:`WalIndex`.
+
+        :param path: path to the ``xlog.db`` file.
+        """
+        self.path = path
+        self.names: List[str] = []
+        self.newest: Dict[int, float] = {}
+        self.history: Set[int] = set()
+        self._offset = 0
+        self._head = b""
+
+    def _clear(self) -> None:
+        """Empty the index, so it's rebuilt on the next update."""
+        self.names = []
+        self.newest = {}
+        self.history = set()
+        self._offset = 0
+        self._head = b""
+
+    def _add(self, line: bytes) -> None:
+        """
+        Add the WAL file described by a line of ``xlog.db`` to the index.
+
+        :param line: the line, in the ``name size time ...`` format.
+        """
+        fields = line.split()
+
+        try:
+            name = fields[0].decode()
+            archived = float(fields[2])
+        except (IndexError, UnicodeDecodeError, ValueError):
+            return
+
+        if is_history_file(name):
+            self.history.add(int(name[:8], 16))
+            return
+
+        if not is_wal_file(name):
+            return
+
+        # Segments are archived in order, so they are usually appended
+        if not self.names or self.names[-1] < name:
+            self.names.append(name)
+        elif not self.contains(name):
+            insort(self.names, name)
+
+        timeline = int(name[:8], 16)
+        self.newest[timeline] = max(self.newest.get(timeline, 0), archived)
+
+    def update(self) -> int:
+        """
+        Update the index with the lines appended to ``xlog.db``.
+
+        :return: number of lines which were parsed.
+        """
+        try:
+            with open(self.path, "rb") as fd:
+                head = fd.readline()
+
+                if (
+                    os.fstat(fd.fileno()).st_size < self._offset
+                    or head[: len(self._head)] != self._head
+                ):
+                    self._clear()
+
+                if self._offset:
+                    # The previous update must have stopped after a newline,
+                    # otherwise the file has been rewritten
+                    fd.seek(self._offset - 1)
+
+                    if fd.read(1) != b"\n":
+                        self._clear()
+
+                fd.seek(self._offset)
+                data = fd.read()
+        except FileNotFoundError:
+            self._clear()
+            return 0
+
+        if not self._head and head.endswith(b"\n"):
+            self._head = head
+
+        parsed = 0
+
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+
+            self._offset += len(line)
+            self._add(line)
+            parsed += 1
+
+        return parsed
+
+    def contains(self, name: str) -> bool:
+        """
+        Tell whether the WAL segment *name* is archived.
+
+        :param name: name of a WAL segment.
+        :return: ``True`` if *name* is in the index.
+        """
+        position = bisect_left(self.names, name)
+        return position < len(self.names) and self.names[position] == name
+
+    def last_segment(self, timeline: int) -> Optional[str]:
+        """
+        Get the last archived WAL segment of *timeline*.
+
+        :param timeline: the timeline.
+        :return: name of the WAL segment, or ``None`` if *timeline* has no
+            archived WAL segments.
+        """
+        position = bisect_right(self.names, f"{timeline:08X}\xff")
+
+        if position and self.names[position - 1].startswith(
+            f"{timeline:08X}"
+        ):
+            return self.names[position - 1]
+
+        return None
+
+
+def check_recovery_target(
+    backup_info: BackupInfo,
+    wal_index: WalIndex,
+    target_time: Optional[datetime] = None,
+    target_lsn: Optional[int] = None,
+    target_tli: Optional[Union[int, str]] = None,
+) -> None:
+    """
+    Check that a recovery of *backup_info* can reach its target.
+
+    These are failures which ``barman recover`` would report, or which
+    Postgres would only report once the backup has been copied:
+
+    * the backup must be finished;
+    * the WAL segments needed to make the backup consistent must be archived;
+    * the target timeline must not precede the one of the backup, and must
+      have been archived;
+    * *target_time* and *target_lsn* must be between the end of the backup
+      and the end of the last archived WAL segment of the target timelines.
+
+    :param backup_info: the backup to be recovered.
+    :param wal_index: the up to date WAL index of the server of the backup.
+    :param target_time: the recovery target time, if any.
+    :param target_lsn: the recovery target LSN, if any.
+    :param target_tli: the recovery target timeline, either an integer,
+        ``current``, ``latest`` or ``None`` -- which ``barman recover``
+        treats as ``latest``.
+
+    :raises:
+        :exc:`RecoveryTargetError`: if the recovery cannot reach its target.
+    """
+    backup_id = backup_info.backup_id
+
+    if backup_info.status not in BackupInfo.STATUS_COPY_DONE:
+        raise RecoveryTargetError(
+            f"Backup '{backup_id}' cannot be recovered, its status is "
+            f"{backup_info.status}"
+        )
+
+    segment_size = backup_info.xlog_segment_size or DEFAULT_XLOG_SEG_SIZE
+    version = backup_info.version or 0
+    timeline = backup_info.timeline or 1
+    end_time = backup_info.end_time
+    required: Iterable[str] = ()
+
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(segment_size, int)
+        assert isinstance(version, int)
+        assert isinstance(timeline, int)
+        assert end_time is None or isinstance(end_time, datetime)
+
+    if backup_info.begin_wal and backup_info.end_wal:
+        required = generate_segment_names(
+            backup_info.begin_wal,
+            backup_info.end_wal,
+            version,
+            segment_size,
+        )
+
+    for name in required:
+        if not wal_index.contains(name):
+            raise RecoveryTargetError(
+                f"WAL file '{name}' required by backup '{backup_id}' is not "
+                "archived"
+            )
+
+    timelines = [t for t in wal_index.newest if t >= timeline]
+
+    if target_tli == "current":
+        timelines = [timeline]
+    elif isinstance(target_tli, int):
+        if target_tli < timeline:
+            raise RecoveryTargetError(
+                f"Target timeline {target_tli} precedes the timeline "
+                f"{timeline} of backup '{backup_id}'"
+            )
+
+        if target_tli != timeline and not (
+            target_tli in wal_index.history or target_tli in wal_index.newest
+        ):
+            raise RecoveryTargetError(
+                f"Target timeline {target_tli} is not archived"
+            )
+
+        timelines = [t for t in timelines if t <= target_tli]
+
+    if target_time is not None:
+        if end_time is not None and target_time.timestamp() < (
+            end_time.timestamp()
+        ):
+            raise RecoveryTargetError(
+                f"Target time {target_time} precedes the end time "
+                f"{end_time} of backup '{backup_id}'"
+            )
+
+        newest = max(
+            (wal_index.newest.get(t, 0) for t in timelines), default=0
+        )
+
+        if target_time.timestamp() > newest:
+            raise RecoveryTargetError(
+                f"Target time {target_time} follows the archival time "
+                f"{datetime.fromtimestamp(newest, target_time.tzinfo)} of "
+                "the last archived WAL file"
+            )
+
+    if target_lsn is not None:
+        if version < 100000:
+            raise RecoveryTargetError(
+                "Target LSN requires PostgreSQL 10 or newer"
+            )
+
+        if target_lsn < parse_lsn(backup_info.end_xlog):
+            raise RecoveryTargetError(
+                f"Target LSN {format_lsn(target_lsn)} precedes the end LSN "
+                f"{backup_info.end_xlog} of backup '{backup_id}'"
+            )
+
+        segments_per_file = xlog_segments_per_file(segment_size)
+        end_lsn = 0
+
+        for t in timelines:
+            last = wal_index.last_segment(t)
+
+            if last is not None:
+                _, log, seg = decode_segment_name(last)
+
+                if TYPE_CHECKING:  # pragma: no cover
+                    assert log is not None and seg is not None
+
+                segment = log * segments_per_file + seg
+                end_lsn = max(end_lsn, (segment + 1) * segment_size)
+
+        if target_lsn > end_lsn:
+            raise RecoveryTargetError(
+                f"Target LSN {format_lsn(target_lsn)} follows the end LSN "
+                f"{format_lsn(end_lsn)} of the last archived WAL file"
+            )
+
+
+class ServerPool:
+    """
+    Cache :class:`barman.server.Server` objects per configuration generation,
+    along with the :class:`BackupIndex` and :class:`WalIndex` of each one of
+    them.
+
+    .. note::
+        A server is used by one thread at a time, see :meth:`server`.
+    """
+
+    # Backup statuses which are still expected to change. The backup.info
+    # files of backups in these statuses are checked for changes.
+    _UNFINISHED_STATUSES = tuple(
+        set(BackupInfo.STATUS_ALL) - {BackupInfo.DONE, BackupInfo.FAILED}
+    )
+
+    def __init__(self) -> None:
+        """Initialize a new instance of :class:`ServerPool`."""
+        self._lock = threading.Lock()
+        self._generation: Optional[_Stamp] = None
+        self._servers: Dict[str, Server] = {}
+        self._server_locks: Dict[str, threading.Lock] = {}
+        self._catalog_stamps: Dict[str, _Stamp] = {}
+        self._indexes: Dict[str, BackupIndex] = {}
+        self._wal_indexes: Dict[str, WalIndex] = {}
+
+    def _get_catalog_stamp(self, server: Server) -> _Stamp:
+        """
+        Get the modification times which the backup catalog of *server*
+        depends on.
+
+        :param server: the Barman server.
+        :return: the modification times of the directories which contain the
+            ``backup.info`` files, and of the ``backup.info`` files of the
+            unfinished backups in the cached catalog.
+        """
+        paths: List[str] = [server.config.basebackups_directory]
+        # Only Barman 3.13 and later have a meta directory
+        meta_directory = getattr(server, "meta_directory", None)
+
+        if meta_directory:
+            paths.append(meta_directory)
+
+        backup_cache = server.backup_manager._backup_cache
+
+        if backup_cache:
+            paths.extend(
+                backup.filename
+                for _, backup in sorted(backup_cache.items())
+                if backup.status in self._UNFINISHED_STATUSES
+                and backup.filename
+            )
+
+        return _get_stamp(paths)
+
+    def _refresh_catalog(self, server: Server) -> None:
+        """
+        Reload the backup catalog of *server* if it may be outdated.
+
+        :param server: the Barman server.
+        """
+        name = server.config.name
+        stamp = self._get_catalog_stamp(server)
+
+        if self._catalog_stamps.get(name) == stamp:
+            return
+
+        if getattr(server, "use_backup_cloud_storage", False):
+            # The catalog may come from the cloud, let Barman load it
+            self._indexes.pop(name, None)
+            server.backup_manager._backup_cache = None
+            server.get_available_backups(BackupInfo.STATUS_ALL)
+        else:
+            index = self._indexes.setdefault(name, BackupIndex())
+            index.update(server)
+            server.backup_manager._backup_cache = dict(index.backups)
+
+        stamp = self._get_catalog_stamp(server)
+        newest = max((mtime or 0 for _, mtime in stamp), default=0)
+
+        if time.time() - newest / 1e9 > _MTIME_GRACE:
+            self._catalog_stamps[name] = stamp
+        else:
+            self._catalog_stamps.pop(name, None)
+
+    @contextmanager
+    def server(self, config: "ServerConfig") -> Iterator[Server]:
+        """
+        Get a :class:`barman.server.Server` for *config*, with an up to date
+        backup catalog.
+
+        The server is created on first use, and reused until the Barman
+        configuration changes. It is locked for the duration of the
+        ``with`` block, so concurrent requests do not see its backup catalog
+        while it is being reloaded.
+
+        :param config: configuration of the Barman server.
+        :yield: the Barman server.
+        """
+        generation = get_config_generation()
+
+        with self._lock:
+            if generation != self._generation:
+                self._servers.clear()
+                self._catalog_stamps.clear()
+                self._indexes.clear()
+                self._generation = generation
+
+            server_lock = self._server_locks.setdefault(
+                config.name, threading.Lock()
+            )
+
+        with server_lock:
+            with self._lock:
+                server = self._servers.get(config.name)
+
+            if server is None:
+                server = Server(config)
+
+                with self._lock:
+                    self._servers[config.name] = server
+                    self._catalog_stamps.pop(config.name, None)
+                    self._indexes.pop(config.name, None)
+
+            self._refresh_catalog(server)
+            yield server
+
+    def wal_index(self, server: Server) -> WalIndex:
+        """
+        Get the :class:`WalIndex` of *server*, updated with the WALs archived
+        since the previous call.
+
+        WAL indexes are kept across changes of the Barman configuration, as
+        long as the path to ``xlog.db`` stays the same.
+
+        .. note::
+            Barman 3.13 and later can keep ``xlog.db`` outside of the
+            ``wals_directory``, where older versions always keep it.
+
+        .. note::
+            Should be called within the ``with`` block of :meth:`server`, so
+            the index is updated by one thread at a time.
+
+        :param server: the Barman server.
+        :return: the up to date WAL index.
+        """
+        path = getattr(server, "xlogdb_file_path", None) or os.path.join(
+            server.config.wals_directory, "xlog.db"
+        )
+
+        with self._lock:
+            index = self._wal_indexes.get(server.config.name)
+
+            if index is None or index.path != path:
+                index = WalIndex(path)
+                self._wal_indexes[server.config.name] = index
+
+        index.update()
+        return index
+
+    def list_backups(
+        self,
+        config: "ServerConfig",
+        statuses: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        List the backups of the Barman server of *config*.
+
+        :param config: configuration of the Barman server.
+        :param statuses: if given, only list backups in these statuses.
+        :return: summary of each backup, as given by :func:`summarize_backup`,
+            from the newest to the oldest backup.
+        """
+        with self.server(config) as server:
+            index = self._indexes.get(config.name)
+
+            if index is not None:
+                summaries = list(index.summaries.values())
+            else:
+                summaries = [
+                    summarize_backup(backup_info)
+                    for backup_info in server.get_available_backups(
+                        BackupInfo.STATUS_ALL
+                    ).values()
+                ]
+
+        if statuses is not None:
+            statuses = set(statuses)
+            summaries = [s for s in summaries if s["status"] in statuses]
+
+        return sorted(summaries, key=lambda s: s["backup_id"], reverse=True)
+
+
+_pool: Optional[ServerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_server_pool() -> ServerPool:
+    """
+    Get the pool of Barman servers shared by the REST API endpoints.
+
+    :return: the shared :class:`ServerPool` instance.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ServerPool()
+
+        return _pool
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Log and deliver events about state changes of operations.
+
+Each Barman server, and the Barman instance, has an append-only event log in
+JSON Lines format. Events are appended by the REST API when operations are
+created, and by the runners when operations start and finish.
+
+Readers keep track of their position in the event logs through a cursor,
+which holds the byte offset reached in each one of the event logs. Cursors are
+exchanged with clients as opaque strings.
+
+:var EVENTS_FILE_NAME: name of the event log file of a server or instance.
+:var DEFAULT_BATCH_SIZE: default maximum number of events per webhook call.
+:var DEFAULT_MAX_RETRIES: default number of retries of a failed webhook call.
+"""
+import base64
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from pg_backup_api import json_backend
+from pg_backup_api.utils import get_setting
+from pg_backup_api.watcher import DEFAULT_INTERVAL
+
+log = logging.getLogger(__name__)
+
+EVENTS_FILE_NAME = "events.jsonl"
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_RETRIES = 5
+
+
+def append_event(file_path: str, event: Dict[str, Any]) -> None:
+    """
+    Append *event* to the event log at *file_path*.
+
+    The event is written through a single ``write`` call to a file opened in
+    append mode, so events written concurrently by several processes are not
+    interleaved.
+
+    :param file_path: path to the event log.
+    :param event: the event to be appended.
+    """
+    line = json_backend.dumps(event) + b"\n"
+    fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def read_events(
+    file_path: str, offset: int
+) -> Tuple[List[Tuple[Dict[str, Any], int]], int]:
+    """
+    Read events appended to the event log at *file_path* after *offset*.
+
+    .. note::
+        A trailing line which is not terminated yet is left to be read later,
+        as it may still be being written. If the file is shorter than
+        *offset* it has been recreated, so it is read from the beginning.
+
+    :param file_path: path to the event log.
+    :param offset: byte offset where to start reading from.
+    :return: a tuple consisting of:
+
+        * the events which were read, each one along with the byte offset
+          right after it;
+        * the byte offset where to resume reading from.
+    """
+    try:
+        with open(file_path, "rb") as fd:
+            if os.fstat(fd.fileno()).st_size < offset:
+                offset = 0
+
+            fd.seek(offset)
+            data = fd.read()
+    except FileNotFoundError:
+        return [], 0
+
+    events = []
+
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break
+
+        offset += len(line)
+
+        try:
+            events.append((json_backend.loads(line), offset))
+        except ValueError:
+            log.warning("Skipping malformed event in '%s'", file_path)
+
+    return events, offset
+
+
+def encode_cursor(offsets: Dict[str, int]) -> str:
+    """
+    Encode *offsets* as an opaque cursor string.
+
+    :param offsets: byte offset reached in each event log, keyed by server
+        name -- an empty string for the Barman instance.
+    :return: the cursor string.
+    """
+    data = json.dumps(offsets, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, int]:
+    """
+    Decode a cursor string previously created by :func:`encode_cursor`.
+
+    :param cursor: the cursor string.
+    :return: byte offset reached in each event log, keyed by server name.
+
+    :raises:
+        :exc:`ValueError`: if *cursor* is not a valid cursor.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        offsets = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+    if not isinstance(offsets, dict) or not all(
+        isinstance(offset, int) and offset >= 0 for offset in offsets.values()
+    ):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+    return offsets
+
+
+def iter_new_events(
+    files: Dict[str, str], offsets: Dict[str, int]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield events appended to *files* after *offsets*.
+
+    :param files: path to each event log, keyed by server name.
+    :param offsets: byte offset reached in each event log, keyed by server
+        name. Updated in place as events are yielded, so it always points
+        right after the last yielded event of each log.
+    :yield: events, ordered by event log and then by position in the log.
+    """
+    for key, file_path in sorted(files.items()):
+        events, end = read_events(file_path, offsets.get(key, 0))
+
+        for event, offset in events:
+            offsets[key] = offset
+            yield event
+
+        offsets[key] = end
+
+
+class WebhookDeliverer:
+    """
+    Deliver events of all event logs to a webhook, in the background.
+
+    Events are posted in batches, as ``{"events": [...]}``. Failed calls are
+    retried with exponential backoff. The position reached in the event logs
+    is saved to a file, so delivery resumes from there after a restart.
+
+    :ivar url: URL of the webhook.
+    :ivar get_files: callable returning the path to each event log, keyed by
+        server name. Called on each round, so new servers are picked up.
+    :ivar cursor_file: path to the file where the cursor is saved.
+    :ivar interval: number of seconds between checks for new events.
+    :ivar batch_size: maximum number of events per webhook call.
+    :ivar max_retries: number of retries of a failed webhook call before
+        giving up on the batch.
+    """
+
+    # Base number of seconds to wait before retrying a failed webhook call.
+    # Doubled on each retry.
+    _BACKOFF = 1.0
+    # Number of seconds to wait for the webhook to answer.
+    _TIMEOUT = 10.0
+
+    def __init__(
+        self,
+        url: str,
+        get_files: Callable[[], Dict[str, str]],
+        cursor_file: str,
+        interval: float,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        """
+        Initialize a new instance of :class:`WebhookDeliverer`.
+
+        :param url: URL of the webhook. Must point to a loopback address.
+        :param get_files: callable returning the path to each event log, keyed
+            by server name.
+        :param cursor_file: path to the file where the cursor is saved.
+        :param interval: number of seconds between checks for new events.
+        :param batch_size: maximum number of events per webhook call.
+        :param max_retries: number of retries of a failed webhook call.
+
+        :raises:
+            :exc:`ValueError`: if *url* does not point to a loopback address.
+        """
+        host = urlparse(url).hostname
+
+        if host not in ("localhost", "127.0.0.1", "::1"):
+            raise ValueError(f"Webhook URL '{url}' is not a local URL")
+
+        self.url = url
+        self.get_files = get_files
+        self.cursor_file = cursor_file
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._thread: Optional[threading.Thread] = None
+        self._lock_fd: Optional[int] = None
+
+    def start(self) -> bool:
+        """
+        Start delivering events in a background thread.
+
+        .. note::
+            Only one process delivers events at a time, e.g. when running
+            through a WSGI server with several worker processes. That is
+            ensured through a lock on the cursor file.
+
+        :return: ``True`` if the thread was started, ``False`` if another
+            process is already delivering events.
+        """
+        fd = os.open(f"{self.cursor_file}.lock", os.O_RDWR | os.O_CREAT)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        self._thread = threading.Thread(
+            target=self._run, name="pg-backup-api-webhook", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _load_cursor(self) -> Dict[str, int]:
+        """
+        Load the cursor saved to :attr:`cursor_file`.
+
+        :return: byte offset reached in each event log. Empty if no cursor
+            has been saved yet, or if it's invalid.
+        """
+        try:
+            with open(self.cursor_file) as fd:
+                return decode_cursor(fd.read().strip())
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            log.warning("Ignoring webhook cursor: %s", e)
+            return {}
+
+    def _save_cursor(self, offsets: Dict[str, int]) -> None:
+        """
+        Save *offsets* to :attr:`cursor_file`.
+
+        :param offsets: byte offset reached in each event log.
+        """
+        tmp_path = f"{self.cursor_file}.tmp"
+
+        with open(tmp_path, "w") as fd:
+            fd.write(encode_cursor(offsets))
+
+        os.replace(tmp_path, self.cursor_file)
+
+    def _post(self, events: List[Dict[str, Any]]) -> bool:
+        """
+        Post *events* to the webhook, retrying on failures.
+
+        :param events: events to be posted.
+        :return: ``True`` if the webhook accepted the events, ``False`` if it
+            still failed after :attr:`max_retries` retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._BACKOFF * 2 ** (attempt - 1))
+
+            try:
+                response = requests.post(
+                    self.url, json={"events": events}, timeout=self._TIMEOUT
+                )
+
+                if response.status_code < 300:
+                    return True
+
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+
+            log.warning(
+                "Webhook call failed (attempt %d): %s", attempt + 1, error
+            )
+
+        return False
+
+    def deliver(self, offsets: Dict[str, int]) -> None:
+        """
+        Deliver events appended after *offsets*, in batches.
+
+        :param offsets: byte offset reached in each event log. Updated in
+            place, and saved, after each batch.
+        """
+        batch: List[Dict[str, Any]] = []
+        pending = dict(offsets)
+
+        def flush() -> None:
+            if batch and not self._post(list(batch)):
+                log.error(
+                    "Dropping %d event(s) the webhook did not accept",
+                    len(batch),
+                )
+
+            batch.clear()
+            offsets.update(pending)
+            self._save_cursor(offsets)
+
+        for key, file_path in sorted(self.get_files().items()):
+            events, end = read_events(file_path, offsets.get(key, 0))
+
+            for event, _ in events:
+                batch.append(event)
+
+                if len(batch) >= self.batch_size:
+                    flush()
+
+            pending[key] = end
+
+        if pending != offsets:
+            flush()
+
+    def _run(self) -> None:
+        """Deliver new events on each round, forever."""
+        offsets = self._load_cursor()
+
+        while True:
+            try:
+                self.deliver(offsets)
+            except Exception as e:
+                log.error("Could not deliver events: %s", e)
+
+            time.sleep(self.interval)
+
+
+def start_webhook_deliverer(
+    get_files: Callable[[], Dict[str, str]], cursor_file: str
+) -> Optional[WebhookDeliverer]:
+    """
+    Start delivering events to the webhook, if one is configured.
+
+    The webhook is configured through the ``WEBHOOK_URL`` setting. Batches
+    have at most ``WEBHOOK_BATCH_SIZE`` events, and failed calls are retried
+    ``WEBHOOK_MAX_RETRIES`` times. New events are checked for every
+    ``WAIT_POLL_INTERVAL`` seconds.
+
+    :param get_files: callable returning the path to each event log, keyed by
+        server name.
+    :param cursor_file: path to the file where the cursor is saved.
+    :return: the :class:`WebhookDeliverer` instance, if it was started.
+    """
+    url = get_setting("WEBHOOK_URL", "")
+
+    if not url:
+        return None
+
+    try:
+        deliverer = WebhookDeliverer(
+            url,
+            get_files,
+            cursor_file,
+            get_setting("WAIT_POLL_INTERVAL", DEFAULT_INTERVAL, float),
+            get_setting("WEBHOOK_BATCH_SIZE", DEFAULT_BATCH_SIZE, int),
+            get_setting("WEBHOOK_MAX_RETRIES", DEFAULT_MAX_RETRIES, int),
+        )
+    except ValueError as e:
+        log.error("Not delivering events: %s", e)
+        return None
+
+    return deliverer if deliverer.start() else None
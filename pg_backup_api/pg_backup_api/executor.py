@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Dispatch pg-backup-api operations through a bounded pool of workers.
+
+Each operation is executed by a ``pg-backup-api <command>`` runner process.
+Instead of starting all runners at once, operations are queued and a fixed
+number of worker threads start the runners, waiting for each one to finish
+before picking the next operation.
+
+Whenever a worker is available, it picks the queued operation with the
+highest priority, and the oldest one among those with the same priority. So
+operations waiting for long are not starved by a stream of operations with a
+higher priority, the priority of a queued operation grows by one every
+``aging_interval`` seconds. Some workers can also be reserved for recovery
+operations, so a recovery never waits for routine operations to finish.
+
+Dispatching can be paused while the host is busy -- its load average per CPU
+exceeds ``max_load`` -- or while WAL archiving does not keep up -- more than
+``max_wal_backlog`` WAL files wait to be archived by Barman. Operations which
+are already running are not affected, and queued operations are dispatched
+once the condition clears.
+
+Config update operations can be merged, so a burst of them runs a single
+``barman config-update``. When ``coalesce_window`` is set, a queued config
+update operation waits that many seconds before being dispatched, and then
+takes along the config update operations queued after it, up to
+``coalesce_max`` operations in total.
+
+Only the last config switch operation queued for a Barman server matters, so
+when a config switch operation is queued, those queued before it for the same
+server which did not start yet are taken out of the queue, to be recorded as
+superseded.
+
+.. note::
+    The queue lives in memory of the REST API process. When running through
+    a WSGI server with several worker processes, each one of them has its own
+    executor.
+
+:var DEFAULT_MAX_WORKERS: default number of runners executed concurrently.
+:var DEFAULT_AGING_INTERVAL: default number of seconds after which the
+    priority of a queued operation grows by one.
+:var DEFAULT_RESERVED_RECOVERY_WORKERS: default number of workers which only
+    run recovery operations.
+:var DEFAULT_PAUSE_CHECK_INTERVAL: default number of seconds between checks
+    of the host while dispatching is paused.
+:var DEFAULT_COALESCE_MAX: default maximum number of config update
+    operations merged into a single run.
+"""
+from collections import deque
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import Deque, List, Optional
+
+from pg_backup_api.server_operation import OperationType
+from pg_backup_api.utils import get_setting, get_wal_backlog
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_AGING_INTERVAL = 60.0
+DEFAULT_RESERVED_RECOVERY_WORKERS = 0
+DEFAULT_PAUSE_CHECK_INTERVAL = 10.0
+DEFAULT_COALESCE_MAX = 100
+
+
+class QueuedOperation:
+    """
+    Describe an operation waiting to be dispatched by the executor.
+
+    :ivar server_name: name of the Barman server related to the operation, or
+        ``None`` for an instance operation.
+    :ivar operation_id: ID of the operation.
+    :ivar operation_type: type of the operation.
+    :ivar cmd: command line of the pg-backup-api runner of the operation.
+    :ivar priority: priority of the operation, as recorded in its job file.
+        Operations with a higher priority are dispatched first.
+    :ivar queued_at: value of :func:`time.monotonic` when the operation was
+        queued.
+    :ivar merged: operations taken out of the queue to be run along with this
+        one, by the same runner.
+    """
+
+    def __init__(
+        self,
+        server_name: Optional[str],
+        operation_id: str,
+        operation_type: OperationType,
+        cmd: List[str],
+        priority: int = 0,
+    ) -> None:
+        """
+        Initialize a new instance of :class:`QueuedOperation`.
+
+        :param server_name: name of the Barman server related to the
+            operation, or ``None`` for an instance operation.
+        :param operation_id: ID of the operation.
+        :param operation_type: type of the operation.
+        :param cmd: command line of the pg-backup-api runner of the operation.
+        :param priority: priority of the operation.
+        """
+        self.server_name = server_name
+        self.operation_id = operation_id
+        self.operation_type = operation_type
+        self.cmd = cmd
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.merged: List["QueuedOperation"] = []
+
+
+class OperationExecutor:
+    """
+    Run queued operations through a bounded pool of worker threads.
+
+    :ivar max_workers: maximum number of runners executed concurrently.
+    :ivar aging_interval: number of seconds after which the priority of a
+        queued operation grows by one. ``0`` disables aging.
+    :ivar reserved_recovery_workers: number of workers which only run
+        recovery operations.
+    :ivar max_load: load average per CPU above which dispatching is paused.
+        ``0`` disables the check.
+    :ivar max_wal_backlog: number of WAL files waiting to be archived above
+        which dispatching is paused. ``0`` disables the check.
+    :ivar pause_check_interval: number of seconds between checks of the host
+        to decide whether dispatching is paused.
+    :ivar coalesce_window: number of seconds a config update operation waits
+        for others to be merged with. ``0`` disables merging.
+    :ivar coalesce_max: maximum number of config update operations merged
+        into a single run.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        aging_interval: float = DEFAULT_AGING_INTERVAL,
+        reserved_recovery_workers: int = DEFAULT_RESERVED_RECOVERY_WORKERS,
+        max_load: float = 0.0,
+        max_wal_backlog: int = 0,
+        pause_check_interval: float = DEFAULT_PAUSE_CHECK_INTERVAL,
+        coalesce_window: float = 0.0,
+        coalesce_max: int = DEFAULT_COALESCE_MAX,
+    ) -> None:
+        """
+        Initialize a new instance of :class:`OperationExecutor`.
+
+        :param max_workers: maximum number of runners executed concurrently.
+        :param aging_interval: number of seconds after which the priority of
+            a queued operation grows by one. ``0`` disables aging.
+        :param reserved_recovery_workers: number of workers which only run
+            recovery operations.
+        :param max_load: load average per CPU above which dispatching is
+            paused. ``0`` disables the check.
+        :param max_wal_backlog: number of WAL files waiting to be archived
+            above which dispatching is paused. ``0`` disables the check.
+        :param pause_check_interval: number of seconds between checks of the
+            host to decide whether dispatching is paused.
+        :param coalesce_window: number of seconds a config update operation
+            waits for others to be merged with. ``0`` disables merging.
+        :param coalesce_max: maximum number of config update operations
+            merged into a single run.
+
+        :raises:
+            :exc:`ValueError`: if *max_workers* is not a positive number, or
+                no worker would be left for operations other than recoveries.
+        """
+        if max_workers < 1:
+            raise ValueError("The executor needs at least one worker")
+
+        if not 0 <= reserved_recovery_workers < max_workers:
+            raise ValueError(
+                "The number of workers reserved for recoveries should be "
+                f"between 0 and {max_workers - 1}"
+            )
+
+        self.max_workers = max_workers
+        self.aging_interval = aging_interval
+        self.reserved_recovery_workers = reserved_recovery_workers
+        self.max_load = max_load
+        self.max_wal_backlog = max_wal_backlog
+        self.pause_check_interval = pause_check_interval
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self._queue: Deque[QueuedOperation] = deque()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        # Number of runners currently executed for operations other than
+        # recoveries
+        self._running_others = 0
+        # Whether dispatching is paused, as of the last check of the host, and
+        # value of time.monotonic() when the host is checked again
+        self._paused = False
+        self._pause_checked_until = 0.0
+        # Value of time.monotonic() when the next operation which is held
+        # back to be merged with others may be dispatched, if any
+        self._coalesce_until: Optional[float] = None
+
+    def submit(self, queued_op: QueuedOperation) -> List[QueuedOperation]:
+        """
+        Queue *queued_op* to be dispatched as soon as a worker is available.
+
+        :param queued_op: the operation to be executed.
+        :return: the operations superseded by *queued_op*, which were taken
+            out of the queue and will never be dispatched. Those are the
+            config switch operations for the same Barman server, if
+            *queued_op* is a config switch operation.
+        """
+        superseded = []
+
+        with self._cond:
+            if queued_op.operation_type == OperationType.CONFIG_SWITCH:
+                superseded = [
+                    other
+                    for other in self._queue
+                    if other.operation_type == OperationType.CONFIG_SWITCH
+                    and other.server_name == queued_op.server_name
+                ]
+
+                for other in superseded:
+                    self._queue.remove(other)
+
+            self._queue.append(queued_op)
+            self._start_workers()
+            self._cond.notify_all()
+
+        return superseded
+
+    def discard(self, server_name: Optional[str], operation_id: str) -> bool:
+        """
+        Take an operation out of the queue, so it's never dispatched.
+
+        :param server_name: name of the Barman server related to the
+            operation, or ``None`` for an instance operation.
+        :param operation_id: ID of the operation.
+        :return: ``True`` if the operation was waiting in the queue, ``False``
+            otherwise.
+        """
+        with self._cond:
+            for queued_op in self._queue:
+                if (
+                    queued_op.server_name == server_name
+                    and queued_op.operation_id == operation_id
+                ):
+                    self._queue.remove(queued_op)
+                    return True
+
+        return False
+
+    @property
+    def pending(self) -> List[QueuedOperation]:
+        """Operations which are still waiting for a worker."""
+        with self._cond:
+            return list(self._queue)
+
+    def _start_workers(self) -> None:
+        """
+        Start the worker threads, if not started yet.
+
+        .. note::
+            Should be called while holding the lock of the executor.
+        """
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"pg-backup-api-executor-{len(self._workers)}",
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def get_effective_priority(
+        self, queued_op: QueuedOperation, now: float
+    ) -> float:
+        """
+        Get the priority of *queued_op*, after aging.
+
+        :param queued_op: an operation waiting in the queue.
+        :param now: current value of :func:`time.monotonic`.
+        :return: the priority of *queued_op*, plus one for each
+            :attr:`aging_interval` seconds it has been waiting for.
+        """
+        if self.aging_interval <= 0:
+            return queued_op.priority
+
+        waited = now - queued_op.queued_at
+        return queued_op.priority + waited / self.aging_interval
+
+    def _pick(self) -> Optional[QueuedOperation]:
+        """
+        Choose the next operation to be dispatched.
+
+        .. note::
+            Should be called while holding the lock of the executor.
+
+        :return: the queued operation with the highest effective priority,
+            the oldest one in case of a tie, among those which may use a
+            worker right now. ``None`` if there is no such operation.
+        """
+        others_allowed = (
+            self._running_others
+            < self.max_workers - self.reserved_recovery_workers
+        )
+        now = time.monotonic()
+        best: Optional[QueuedOperation] = None
+        best_priority = 0.0
+        self._coalesce_until = None
+
+        for queued_op in self._queue:
+            if (
+                queued_op.operation_type != OperationType.RECOVERY
+                and not others_allowed
+            ):
+                continue
+
+            if self._is_mergeable(queued_op):
+                ready_at = queued_op.queued_at + self.coalesce_window
+
+                if now < ready_at:
+                    # Still waiting for others to be merged with
+                    if self._coalesce_until is None:
+                        self._coalesce_until = ready_at
+                    continue
+
+            priority = self.get_effective_priority(queued_op, now)
+
+            # The queue is in FIFO order, so the oldest operation wins ties
+            if best is None or priority > best_priority:
+                best = queued_op
+                best_priority = priority
+
+        return best
+
+    def _is_mergeable(self, queued_op: QueuedOperation) -> bool:
+        """
+        Check if *queued_op* may be merged with other queued operations.
+
+        :param queued_op: an operation waiting in the queue.
+        :return: ``True`` if merging is enabled and *queued_op* is a config
+            update operation.
+        """
+        return (
+            self.coalesce_window > 0
+            and queued_op.operation_type == OperationType.CONFIG_UPDATE
+        )
+
+    def _merge(self, queued_op: QueuedOperation) -> None:
+        """
+        Take the operations to be merged with *queued_op* out of the queue.
+
+        They are added to :attr:`QueuedOperation.merged`, in queue order.
+
+        .. note::
+            Should be called while holding the lock of the executor.
+
+        :param queued_op: the operation about to be dispatched.
+        """
+        if not self._is_mergeable(queued_op):
+            return
+
+        for other in list(self._queue):
+            if len(queued_op.merged) + 1 >= self.coalesce_max:
+                break
+
+            if self._is_mergeable(other):
+                self._queue.remove(other)
+                queued_op.merged.append(other)
+
+    def get_pause_reason(self) -> Optional[str]:
+        """
+        Check if dispatching should be paused, given how busy the host is.
+
+        :return: why dispatching should be paused, or ``None`` if operations
+            may be dispatched.
+        """
+        if self.max_load > 0:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+
+            if load > self.max_load:
+                return f"the load average per CPU is {load:.2f}"
+
+        if self.max_wal_backlog > 0:
+            backlog = get_wal_backlog()
+
+            if backlog > self.max_wal_backlog:
+                return f"{backlog} WAL files are waiting to be archived"
+
+        return None
+
+    def _is_paused(self, now: float) -> bool:
+        """
+        Check if dispatching is paused.
+
+        The host is checked through :meth:`get_pause_reason` at most once every
+        :attr:`pause_check_interval` seconds, whether paused or not, however
+        many operations are dispatched, as checking the WAL backlog lists the
+        WAL directories of all the Barman servers.
+
+        .. note::
+            Should be called while holding the lock of the executor.
+
+        :param now: current value of :func:`time.monotonic`.
+        :return: ``True`` if no operation should be dispatched until
+            :attr:`_pause_checked_until`.
+        """
+        if now < self._pause_checked_until:
+            return self._paused
+
+        reason = self.get_pause_reason()
+        self._pause_checked_until = now + self.pause_check_interval
+
+        if reason is None:
+            if self._paused:
+                log.info("Resuming dispatch of operations")
+                self._paused = False
+        elif not self._paused:
+            log.warning("Pausing dispatch of operations, as %s", reason)
+            self._paused = True
+
+        return self._paused
+
+    def _next(self) -> QueuedOperation:
+        """
+        Wait for an operation to be dispatchable, and take it out of the queue.
+
+        :return: the next operation to be dispatched.
+        """
+        with self._cond:
+            while True:
+                queued_op = self._pick()
+
+                if queued_op is None:
+                    timeout = None
+
+                    if self._coalesce_until is not None:
+                        timeout = self._coalesce_until - time.monotonic()
+
+                    self._cond.wait(timeout)
+                    continue
+
+                now = time.monotonic()
+
+                if not self._is_paused(now):
+                    break
+
+                self._cond.wait(self._pause_checked_until - now)
+
+            self._queue.remove(queued_op)
+            self._merge(queued_op)
+
+            if queued_op.operation_type != OperationType.RECOVERY:
+                self._running_others += 1
+
+            return queued_op
+
+    def _release(self, queued_op: QueuedOperation) -> None:
+        """
+        Release the worker used by *queued_op*, once its runner finished.
+
+        :param queued_op: an operation previously returned by :meth:`_next`.
+        """
+        with self._cond:
+            if queued_op.operation_type != OperationType.RECOVERY:
+                self._running_others -= 1
+
+            # Operations held back for reserved workers may go now
+            self._cond.notify_all()
+
+    def _work(self) -> None:
+        """Dispatch queued operations, one at a time, forever."""
+        while True:
+            queued_op = self._next()
+
+            try:
+                self._dispatch(queued_op)
+            finally:
+                self._release(queued_op)
+
+    def _dispatch(self, queued_op: QueuedOperation) -> None:
+        """
+        Run the pg-backup-api runner of *queued_op* and wait for it to finish.
+
+        :param queued_op: the operation to be executed.
+        """
+        cmd = list(queued_op.cmd)
+
+        for merged in queued_op.merged:
+            cmd += ["--merge-operation-id", merged.operation_id]
+
+        try:
+            subprocess.Popen(cmd).wait()
+        except OSError as e:
+            log.error(
+                "Could not run operation '%s': %s", queued_op.operation_id, e
+            )
+
+
+_executor: Optional[OperationExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> OperationExecutor:
+    """
+    Get the executor shared by the REST API endpoints.
+
+    The executor is created on first use, and configured through these
+    settings:
+
+    * ``EXECUTOR_WORKERS``: number of workers, by default
+      :data:`DEFAULT_MAX_WORKERS`;
+    * ``EXECUTOR_AGING_INTERVAL``: by default :data:`DEFAULT_AGING_INTERVAL`;
+    * ``EXECUTOR_RESERVED_RECOVERY_WORKERS``: by default
+      :data:`DEFAULT_RESERVED_RECOVERY_WORKERS`;
+    * ``EXECUTOR_MAX_LOAD``: by default ``0``, disabled;
+    * ``EXECUTOR_MAX_WAL_BACKLOG``: by default ``0``, disabled;
+    * ``EXECUTOR_PAUSE_CHECK_INTERVAL``: by default
+      :data:`DEFAULT_PAUSE_CHECK_INTERVAL`;
+    * ``EXECUTOR_COALESCE_WINDOW``: by default ``0``, disabled;
+    * ``EXECUTOR_COALESCE_MAX``: by default :data:`DEFAULT_COALESCE_MAX`.
+
+    :return: the shared :class:`OperationExecutor` instance.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = OperationExecutor(
+                get_setting("EXECUTOR_WORKERS", DEFAULT_MAX_WORKERS, int),
+                get_setting(
+                    "EXECUTOR_AGING_INTERVAL", DEFAULT_AGING_INTERVAL, float
+                ),
+                get_setting(
+                    "EXECUTOR_RESERVED_RECOVERY_WORKERS",
+                    DEFAULT_RESERVED_RECOVERY_WORKERS,
+                    int,
+                ),
+                get_setting("EXECUTOR_MAX_LOAD", 0.0, float),
+                get_setting("EXECUTOR_MAX_WAL_BACKLOG", 0, int),
+                get_setting(
+                    "EXECUTOR_PAUSE_CHECK_INTERVAL",
+                    DEFAULT_PAUSE_CHECK_INTERVAL,
+                    float,
+                ),
+                get_setting("EXECUTOR_COALESCE_WINDOW", 0.0, float),
+                get_setting(
+                    "EXECUTOR_COALESCE_MAX", DEFAULT_COALESCE_MAX, int
+                ),
+            )
+
+        return _executor
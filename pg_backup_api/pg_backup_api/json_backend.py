@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Encode and decode JSON through the fastest backend available.
+
+``orjson`` is used if it's installed, and the standard library :mod:`json`
+otherwise. Both backends produce compact JSON, and work with :class:`bytes`,
+so files can be written and parsed without decoding them first.
+
+:var BACKEND: name of the backend in use, either ``orjson`` or ``json``.
+:var CHUNK_SIZE: minimum size of the chunks yielded by :func:`iter_dumps`.
+"""
+import json
+from types import ModuleType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Union,
+    TYPE_CHECKING,
+)
+
+orjson: Optional[ModuleType]
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:  # pragma: no cover
+    # Flask older than 2.2 has no JSON providers, and encodes responses by
+    # itself
+    DefaultJSONProvider = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    import flask.app
+
+BACKEND = "json" if orjson is None else "orjson"
+CHUNK_SIZE = 64 * 1024
+
+
+def dumps(
+    obj: Any,
+    sort_keys: bool = False,
+    indent: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> bytes:
+    """
+    Encode *obj* as JSON.
+
+    :param obj: the object to be encoded.
+    :param sort_keys: if the keys of objects should be sorted.
+    :param indent: if the output should be indented by 2 spaces.
+    :param default: called with objects which cannot be encoded otherwise,
+        should return an object which can be encoded.
+    :return: the JSON document, UTF-8 encoded.
+    """
+    if orjson is not None:
+        # Left to *default*, as done by the standard library, so both
+        # backends give the same result
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        option |= orjson.OPT_PASSTHROUGH_DATACLASS
+
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        if indent:
+            option |= orjson.OPT_INDENT_2
+
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # E.g. keys which are not strings, or integers over 64 bits,
+            # which the standard library can still encode
+            pass
+
+    return json.dumps(
+        obj,
+        sort_keys=sort_keys,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+        default=default,
+    ).encode()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode the JSON document *data*.
+
+    :param data: the JSON document.
+    :return: the decoded object.
+
+    :raises:
+        :exc:`ValueError`: if *data* is not a valid JSON document.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def iter_dumps(content: Dict[str, Any], key: str) -> Iterator[bytes]:
+    """
+    Encode *content* as JSON, incrementally.
+
+    The list under *key* is encoded one item at a time, so large listings are
+    sent while they are being encoded, and are never held as a whole in a
+    single string. Keys are sorted, as done for the other responses.
+
+    :param content: the object to be encoded.
+    :param key: key of *content* which holds a list.
+    :yield: chunks of the JSON document, of at least :data:`CHUNK_SIZE`
+        bytes, except for the last one, which ends with a newline.
+    """
+    buffer: List[bytes] = [b"{"]
+    size = 0
+
+    for index, name in enumerate(sorted(content)):
+        buffer.append((b"," if index else b"") + dumps(name) + b":")
+
+        if name != key:
+            buffer.append(dumps(content[name], sort_keys=True))
+            continue
+
+        buffer.append(b"[")
+
+        for item_index, item in enumerate(content[name]):
+            chunk = dumps(item, sort_keys=True)
+            buffer.append(b"," + chunk if item_index else chunk)
+            size += len(chunk)
+
+            if size >= CHUNK_SIZE:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+
+        buffer.append(b"]")
+
+    buffer.append(b"}\n")
+    yield b"".join(buffer)
+
+
+if DefaultJSONProvider is not None:
+
+    class JSONProvider(DefaultJSONProvider):
+        """Flask JSON provider which goes through :func:`dumps`."""
+
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            """
+            Encode *obj* as JSON.
+
+            :param obj: the object to be encoded.
+            :param kwargs: ``sort_keys``, ``indent`` and ``default`` are
+                honored, as given by Flask. Anything else is ignored.
+            :return: the JSON document.
+            """
+            return dumps(
+                obj,
+                sort_keys=kwargs.get("sort_keys", self.sort_keys),
+                indent=bool(kwargs.get("indent")),
+                default=kwargs.get("default", self.default),
+            ).decode()
+
+        def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+            """
+            Decode the JSON document *s*.
+
+            :param s: the JSON document.
+            :param kwargs: ignored.
+            :return: the decoded object.
+            """
+            return loads(s)
+
+
+def init_app(app: "flask.app.Flask") -> None:
+    """
+    Make *app* encode and decode JSON through :func:`dumps` and :func:`loads`.
+
+    .. note::
+        Nothing is done with Flask older than 2.2.
+
+    :param app: the Flask application.
+    """
+    if DefaultJSONProvider is not None:
+        app.json = JSONProvider(app)
@@ -17,39 +17,71 @@
 # along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
 
 """Define the Flask endpoints of the pg-backup-api REST API server."""
+from datetime import datetime
 import json
-import subprocess
-from typing import Any, Dict, Optional, Tuple, Union, TYPE_CHECKING
+import re
+import sys
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
 
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request, stream_with_context
 
 import barman
 from barman import diagnose as barman_diagnose, output
+from barman.infofile import BackupInfo
 from barman.server import Server
 
 from pg_backup_api.utils import (
     load_barman_config,
     get_server_by_name,
+    get_setting,
     parse_backup_id,
+    parse_wait,
 )
 
+from pg_backup_api.backup_catalog import (
+    RecoveryTargetError,
+    check_recovery_target,
+    get_server_pool,
+)
+from pg_backup_api import json_backend
+from pg_backup_api.events import decode_cursor, encode_cursor, iter_new_events
+from pg_backup_api.executor import QueuedOperation, get_executor
 from pg_backup_api.run import app
+from pg_backup_api.watcher import get_watcher
 from pg_backup_api.server_operation import (
+    CANCELLED,
+    SUPERSEDED,
     OperationServer,
     OperationServerConfigError,
+    OperationNotExists,
     OperationType,
     DEFAULT_OP_TYPE,
+    get_events_files,
     RecoveryOperation,
     ConfigSwitchOperation,
     ConfigUpdateOperation,
+    PipelineOperation,
     MalformedContent,
 )
 
 if TYPE_CHECKING:  # pragma: no cover
-    from flask import Request, Response
-    from barman.config import Config as BarmanConfig
+    from flask import Request
+    from barman.config import Config as BarmanConfig, ServerConfig
     from pg_backup_api.server_operation import Operation
 
+# Operation IDs are used as file names, so they may not contain a path
+_OPERATION_ID = re.compile(r"[\w-]+")
+
 
 @app.route("/diagnose", methods=["GET"])
 def diagnose() -> "Response":
@@ -103,7 +135,9 @@ def diagnose() -> "Response":
         )  # pyright: ignore [reportCallIssue]
 
     # new outputs are appended, so grab the last one
-    stored_output = json.loads(output._writer.json_output["_INFO"][-1])
+    stored_output = json_backend.loads(
+        output._writer.json_output["_INFO"][-1]
+    )
 
     # clear the output writer dict
     output._writer.json_output = {}
@@ -137,12 +171,48 @@ def resource_not_found(error: Any) -> Tuple["Response", int]:
     return jsonify(error=str(error)), 404
 
 
+def _jsonify_listing(content: Dict[str, Any], key: str) -> "Response":
+    """
+    Get a JSON response with *content*, encoded incrementally.
+
+    :param content: content of the response.
+    :param key: key of *content* which holds the listing, whose items are
+        encoded one at a time, see :func:`json_backend.iter_dumps`.
+    :return: the JSON response, as :func:`jsonify` would return it.
+    """
+    return Response(
+        json_backend.iter_dumps(content, key), mimetype="application/json"
+    )
+
+
+def _parse_wait_arg() -> float:
+    """
+    Parse the ``wait`` query string argument of the current request.
+
+    :return: number of seconds to wait for, or ``0`` if the argument was not
+        given. Capped to the ``MAX_WAIT`` setting.
+
+    .. note::
+        Abort with a HTTP 400 response if the argument is not a non-negative
+        number.
+    """
+    try:
+        return parse_wait(request.args.get("wait"))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+
 def _operation_id_get(
     server_name: Optional[str], operation_id: str
 ) -> "Response":
     """
     Get status of an operation with ID *operation_id*.
 
+    If the ``wait`` query string argument is given, and the operation is
+    still ``IN_PROGRESS``, block for up to that many seconds until the
+    operation finishes. The wait is served by the shared
+    :class:`FileWatcher`, which watches for the output file of the operation.
+
     :param server_name: name of the Barman server related to the operation, if
         it's a server operation, ``None`` if it's an instance operation.
     :param operation_id: ID of the operation previously created through
@@ -152,15 +222,33 @@ def _operation_id_get(
 
         * ``operation_id``: the same as *operation_id*;
         * ``status``: status of the operation. Maybe be one among: ``DONE``,
-          ``FAILED`` or ``IN_PROGRESS``.
+          ``FAILED``, ``TIMED_OUT``, ``CANCELLED`` or ``IN_PROGRESS``;
+        * ``steps``: only for pipeline operations, the status of each step,
+          see :meth:`OperationServer.get_operation_steps`.
 
         If either *server_name* or *operation_id* is invalid -- or both --
         return a HTTP 400 response with the relevant error message.
     """
+    wait = _parse_wait_arg()
+
     try:
         op_server = OperationServer(server_name)
         status = op_server.get_operation_status(operation_id)
-        response = {"operation_id": operation_id, "status": status}
+
+        if status == "IN_PROGRESS" and wait > 0:
+            output_file = op_server.get_output_file_path(operation_id)
+
+            if get_watcher().wait_for_file(output_file, wait):
+                status = op_server.get_operation_status(operation_id)
+
+        response: Dict[str, Any] = {
+            "operation_id": operation_id,
+            "status": status,
+        }
+        steps = op_server.get_operation_steps(operation_id)
+
+        if steps is not None:
+            response["steps"] = steps
 
         return jsonify(response)
     except OperationServerConfigError as e:
@@ -201,6 +289,410 @@ def instance_operation_id_get(operation_id: str) -> "Response":
     return _operation_id_get(None, operation_id)
 
 
+def _cancel_merged_operation(
+    op_server: OperationServer, operation_id: str
+) -> bool:
+    """
+    Cancel *operation_id* alone, if merged into the run of another operation.
+
+    That's only possible until the runner starts the shared subprocess, as
+    the runner then leaves the cancelled operation out. If the subprocess was
+    started in the meantime, with the changes of *operation_id*, the whole
+    run is cancelled, as they cannot be taken back.
+
+    :param op_server: the Barman server or instance of the operation.
+    :param operation_id: ID of the operation to be cancelled.
+    :return: ``True`` if the operation was recorded as ``CANCELLED``,
+        ``False`` if it's not merged into another one, or if the shared
+        subprocess is already running, so its runner should be signalled.
+    """
+    job = op_server.read_job_file(operation_id)
+    runner = job.get("runner") or {}
+
+    if job.get("merged_into") in (None, operation_id) or runner.get(
+        "process_group"
+    ):
+        return False
+
+    op_server.finish_operation(
+        operation_id, CANCELLED, "Operation cancelled\n"
+    )
+    runner = op_server.read_job_file(operation_id).get("runner") or {}
+
+    if runner.get("process_group"):
+        # Started right before being recorded as cancelled
+        op_server.signal_runner(operation_id)
+
+    return True
+
+
+def _operation_id_delete(
+    server_name: Optional[str], operation_id: str
+) -> "Response":
+    """
+    Cancel an operation with ID *operation_id*.
+
+    An operation still waiting in the :class:`OperationExecutor` queue is
+    taken out of it. A running operation is cancelled by sending SIGTERM to
+    its runner, which kills the whole process group of the operation and
+    records it as ``CANCELLED``. If the runner does not finish within the
+    ``CANCEL_TIMEOUT`` setting, 30 seconds by default, or is gone, both the
+    runner and the process group are sent SIGKILL, and the operation is
+    recorded as ``CANCELLED`` by the REST API.
+
+    A config update operation merged into the run of another one is left out
+    of that run, if it did not start yet, see
+    :func:`_cancel_merged_operation`. Otherwise, the whole run is cancelled.
+
+    :param server_name: name of the Barman server related to the operation, if
+        it's a server operation, ``None`` if it's an instance operation.
+    :param operation_id: ID of the operation previously created through
+        pg-backup-api.
+    :return: if *server_name* and *operation_id* are valid, return a JSON
+        response containing these keys:
+
+        * ``operation_id``: the same as *operation_id*;
+        * ``status``: status of the operation, ``CANCELLED`` unless it
+          finished on its own in the meantime.
+
+        If either *server_name* or *operation_id* is invalid -- or both --
+        return a HTTP 404 response. If the operation has already finished,
+        return a HTTP 409 response.
+    """
+    try:
+        op_server = OperationServer(server_name)
+        status = op_server.get_operation_status(operation_id)
+    except OperationServerConfigError as e:
+        abort(404, description=str(e))
+    except Exception:
+        abort(404, description="Resource not found")
+
+    if status != "IN_PROGRESS":
+        msg_409 = f"Operation '{operation_id}' has already finished"
+        abort(409, description=msg_409)
+
+    get_executor().discard(server_name, operation_id)
+    finished = _cancel_merged_operation(op_server, operation_id)
+
+    if not finished and op_server.signal_runner(operation_id):
+        finished = get_watcher().wait_for_file(
+            op_server.get_output_file_path(operation_id),
+            get_setting("CANCEL_TIMEOUT", 30.0, float),
+        )
+
+    if not finished:
+        op_server.signal_runner(operation_id, force=True)
+        op_server.finish_operation(
+            operation_id, CANCELLED, "Operation cancelled\n"
+        )
+
+    response = {
+        "operation_id": operation_id,
+        "status": op_server.get_operation_status(operation_id),
+    }
+    return jsonify(response)
+
+
+@app.route(
+    "/servers/<server_name>/operations/<operation_id>", methods=("DELETE",)
+)
+def servers_operation_id_delete(
+    server_name: str, operation_id: str
+) -> "Response":
+    """
+    ``DELETE`` request to ``/servers/*server_name*/operations/*operation_id*``.
+
+    Cancel an operation with ID *operation_id* for Barman server named
+    *server_name*.
+
+    :param server_name: name of the Barman server related to the operation.
+    :param operation_id: ID of the operation previously created through
+        pg-backup-api.
+    :return: see :func:`_operation_id_delete` for details.
+    """
+    return _operation_id_delete(server_name, operation_id)
+
+
+@app.route("/operations/<operation_id>", methods=("DELETE",))
+def instance_operation_id_delete(operation_id: str) -> "Response":
+    """
+    ``DELETE`` request to ``/operations/*operation_id*``.
+
+    Cancel an operation with ID *operation_id* for the Barman instance.
+
+    :param operation_id: ID of the operation previously created through
+        pg-backup-api.
+    :return: see :func:`_operation_id_delete` for details.
+    """
+    return _operation_id_delete(None, operation_id)
+
+
+def _parse_status_batch(request_body: Any) -> List[Dict[str, Any]]:
+    """
+    Validate the body of a ``POST`` request to ``/operations/status:batch``.
+
+    :param request_body: the parsed JSON body of the request.
+    :return: the list of requested operations. Each item contains the keys
+        ``server_name`` (``None`` for instance operations) and
+        ``operation_id``.
+
+    .. note::
+        Abort with a HTTP 400 response if the body is malformed, if an
+        operation ID is not valid, or if it contains more operations than
+        allowed by the ``STATUS_BATCH_MAX_SIZE`` setting.
+    """
+    items = None
+
+    if isinstance(request_body, dict):
+        items = request_body.get("operations")
+
+    if not isinstance(items, list) or not items:
+        msg_400 = "Request body should contain a list of ``operations``"
+        abort(400, description=msg_400)
+
+    max_size = get_setting("STATUS_BATCH_MAX_SIZE", 1000, int)
+
+    if len(items) > max_size:
+        msg_400 = f"At most {max_size} operations can be queried at once"
+        abort(400, description=msg_400)
+
+    operations = []
+
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(
+            item.get("operation_id"), str
+        ):
+            msg_400 = "Each operation should contain an ``operation_id``"
+            abort(400, description=msg_400)
+
+        if not _OPERATION_ID.fullmatch(item["operation_id"]):
+            msg_400 = f"Invalid operation ID '{item['operation_id']}'"
+            abort(400, description=msg_400)
+
+        server_name = item.get("server_name")
+
+        if server_name is not None and not isinstance(server_name, str):
+            msg_400 = "``server_name`` should be a string, if given"
+            abort(400, description=msg_400)
+
+        operations.append(
+            {"server_name": server_name, "operation_id": item["operation_id"]}
+        )
+
+    return operations
+
+
+@app.route("/operations/status:batch", methods=("POST",))
+def operations_status_batch() -> "Response":
+    """
+    Handle ``POST`` request to ``/operations/status:batch``.
+
+    Get status of several operations, of any Barman server or the Barman
+    instance, in a single request. Lookups are grouped by server, so the
+    Barman configuration is loaded once, and a single
+    :class:`OperationServer` is created for each server.
+
+    The request should contain a JSON body with a key ``operations``, a list
+    of objects with the keys ``server_name`` (absent or ``null`` for instance
+    operations) and ``operation_id``.
+
+    :return: a JSON response with an ``operations`` key, containing one item
+        for each requested operation, in the same order as requested. Each item
+        contains the keys ``server_name`` and ``operation_id`` and either:
+
+        * ``status``: status of the operation, see :func:`_operation_id_get`;
+          or
+        * ``error``: why the status could not be retrieved.
+
+        If the request body is malformed return a HTTP 400 response with the
+        relevant error message.
+    """
+    operations = _parse_status_batch(request.get_json())
+
+    load_barman_config()
+
+    op_servers: Dict[Optional[str], Union[OperationServer, str]] = {}
+    results = []
+
+    for operation in operations:
+        server_name = operation["server_name"]
+
+        if server_name not in op_servers:
+            try:
+                op_servers[server_name] = OperationServer(
+                    server_name, load_config=False
+                )
+            except OperationServerConfigError as e:
+                op_servers[server_name] = str(e)
+
+        op_server = op_servers[server_name]
+        result: Dict[str, Any] = dict(operation)
+
+        if isinstance(op_server, str):
+            result["error"] = op_server
+        else:
+            try:
+                result["status"] = op_server.get_operation_status(
+                    operation["operation_id"]
+                )
+            except (OperationNotExists, ValueError, OSError) as e:
+                # e.g. unreadable, or corrupt, job or output file
+                result["error"] = str(e)
+
+        results.append(result)
+
+    return _jsonify_listing({"operations": results}, "operations")
+
+
+def _check_recovery(
+    server: "ServerConfig", content: Dict[str, Any], prefix: str = ""
+) -> None:
+    """
+    Check that a requested recovery operation can succeed.
+
+    The backup is resolved through :func:`parse_backup_id`, and the recovery
+    target is checked against the backup and the archived WALs through
+    :func:`check_recovery_target`, so doomed recoveries are rejected before
+    ``barman recover`` starts copying the backup.
+
+    :param server: configuration of the Barman server.
+    :param content: the requested operation, containing at least a
+        ``backup_id`` key.
+    :param prefix: prefix of the error messages.
+
+    .. note::
+        Abort with a HTTP 400 response if the recovery target options are
+        not valid, or the recovery cannot reach its target, or with a HTTP
+        404 response if the backup does not exist.
+    """
+    msg_backup_id = content["backup_id"]
+
+    try:
+        targets = RecoveryOperation.parse_target(content)
+    except MalformedContent as e:
+        abort(400, description=prefix + str(e))
+
+    pool = get_server_pool()
+    wal_index = None
+
+    with pool.server(server) as barman_server:
+        backup_info = parse_backup_id(barman_server, msg_backup_id)
+
+        if backup_info:
+            wal_index = pool.wal_index(barman_server)
+
+    if not backup_info or wal_index is None:
+        msg_404 = f"Backup '{msg_backup_id}' does not exist"
+        abort(404, description=prefix + msg_404)
+
+    try:
+        check_recovery_target(backup_info, wal_index, **targets)
+    except RecoveryTargetError as e:
+        abort(400, description=prefix + str(e))
+
+
+def _check_pipeline(
+    server: "ServerConfig", content: Dict[str, Any], prefix: str = ""
+) -> None:
+    """
+    Check that a requested pipeline operation is valid.
+
+    The steps are validated through
+    :meth:`PipelineOperation._validate_job_content`, and recovery steps are
+    checked as single recovery operations are, see :func:`_check_recovery`.
+
+    :param server: configuration of the Barman server.
+    :param content: the requested operation.
+    :param prefix: prefix of the error messages.
+
+    .. note::
+        Abort with a HTTP 400 or 404 response if any step is not valid.
+    """
+    try:
+        PipelineOperation._validate_job_content(content)
+    except MalformedContent as e:
+        abort(400, description=prefix + str(e))
+
+    for index, step in enumerate(content["steps"]):
+        if step["type"] == OperationType.RECOVERY.value:
+            _check_recovery(server, step, f"{prefix}Step #{index}: ")
+
+
+def _submit(queued_op: QueuedOperation) -> None:
+    """
+    Queue *queued_op* in the shared :class:`OperationExecutor`.
+
+    Operations superseded by *queued_op*, see :meth:`OperationExecutor.submit`,
+    are recorded as :data:`SUPERSEDED`, pointing to *queued_op* through the
+    ``superseded_by`` key of their output file.
+
+    :param queued_op: the operation to be executed.
+    """
+    for superseded in get_executor().submit(queued_op):
+        op_server = OperationServer(superseded.server_name, load_config=False)
+        op_server.finish_operation(
+            superseded.operation_id,
+            SUPERSEDED,
+            f"Operation superseded by '{queued_op.operation_id}'\n",
+            {"superseded_by": queued_op.operation_id},
+        )
+
+
+def _get_idempotency_key(
+    request: "Request", request_body: Dict[str, Any]
+) -> Optional[str]:
+    """
+    Get the idempotency key of a ``POST`` request creating an operation.
+
+    Clients which retry requests, e.g. on timeouts, give the same key on each
+    attempt, so a single operation is created.
+
+    :param request: the flask request that has been received by the routing
+        function.
+    :param request_body: the JSON body of *request*.
+    :return: the ``Idempotency-Key`` header of *request*, otherwise the
+        ``idempotency_key`` key of *request_body*, or ``None`` if neither is
+        given.
+
+    :raises:
+        :exc:`werkzeug.exceptions.BadRequest`: if the key is not a string of
+            1 to 255 characters.
+    """
+    key = request.headers.get(
+        "Idempotency-Key", request_body.get("idempotency_key")
+    )
+
+    if key is not None and (
+        not isinstance(key, str) or not 0 < len(key) <= 255
+    ):
+        msg_400 = (
+            "The idempotency key should be a string of 1 to 255 characters"
+        )
+        abort(400, description=msg_400)
+
+    return key
+
+
+def _record_idempotency_key(operation: "Operation", key: str) -> str:
+    """
+    Record that *operation* was created with idempotency key *key*.
+
+    If a concurrent request with the same key created another operation
+    first, *operation* is withdrawn.
+
+    :param operation: the operation which has been created, but not queued.
+    :param key: the idempotency key of the request.
+    :return: ID of the operation created with *key*. If it's not the ID of
+        *operation*, then *operation* was withdrawn, and must not be queued.
+    """
+    op_id = operation.server.record_idempotency_key(key, operation.id)
+
+    if op_id != operation.id:
+        operation.server.remove_job_file(operation.id)
+
+    return op_id
+
+
 def servers_operations_post(
     server_name: str, request: "Request"
 ) -> Dict[str, str]:
@@ -222,13 +714,23 @@ def servers_operations_post(
             * ``destination_directory``: where to restore the backup in the
               target machine;
             * ``remote_ssh_command``: SSH command to connect to the target
-              machine.
+              machine;
+            * optionally, the recovery target options accepted by
+              :meth:`RecoveryOperation.parse_target`.
 
         * ``config_switch``:
 
             * ``model_name``: the name of the model to be applied; or
             * ``reset``: if you want to unapply a currently active model.
 
+        * ``pipeline``:
+
+            * ``steps``: list of operations to be run back to back, each of
+              them with a ``type`` key -- ``recovery``, ``config_switch`` or
+              ``config_update`` -- the same content as the single operation,
+              and optionally an ``on_failure`` key, see
+              :class:`PipelineOperation`.
+
     :return: if *server_name* and the JSON body informed through the
         ``POST`` request are valid, return a JSON response containing a key
         ``operation_id`` with the ID of the operation that has been created.
@@ -236,7 +738,8 @@ def servers_operations_post(
         Otherwise, if any issue is identified, return a response with either of
         the following statuses and the relevant error message:
 
-        * ``400``: if any required option is missing in the JSON request body.
+        * ``400``: if any required option is missing in the JSON request body,
+            or if a recovery cannot reach its target.
         * ``404``: if either *server_name* or any value in the JSON request
             body is invalid.
     """
@@ -252,28 +755,36 @@ def servers_operations_post(
         msg_404 = f"Server '{server_name}' does not exist"
         abort(404, description=msg_404)
 
+    idempotency_key = _get_idempotency_key(request, request_body)
+
+    if idempotency_key is not None:
+        op_server = OperationServer(server_name, load_config=False)
+        op_id = op_server.get_idempotent_operation(idempotency_key)
+
+        if op_id is not None:
+            return {"operation_id": op_id}
+
+        request_body["idempotency_key"] = idempotency_key
+
     operation = None
     cmd = None
     op_type = OperationType(request_body.get("type", DEFAULT_OP_TYPE.value))
 
     if op_type == OperationType.RECOVERY:
-        try:
-            msg_backup_id = request_body["backup_id"]
-        except KeyError:
+        if "backup_id" not in request_body:
             msg_400 = "Request body is missing ``backup_id``"
             abort(400, description=msg_400)
 
-        backup_id = parse_backup_id(Server(server), msg_backup_id)
-
-        if not backup_id:
-            msg_404 = f"Backup '{msg_backup_id}' does not exist"
-            abort(404, description=msg_404)
-
+        _check_recovery(server, request_body)
         operation = RecoveryOperation(server_name)
         cmd = f"pg-backup-api recovery --server-name {server_name}"
     elif op_type == OperationType.CONFIG_SWITCH:
         operation = ConfigSwitchOperation(server_name)
         cmd = f"pg-backup-api config-switch --server-name {server_name}"
+    elif op_type == OperationType.PIPELINE:
+        _check_pipeline(server, request_body)
+        operation = PipelineOperation(server_name)
+        cmd = f"pg-backup-api pipeline --server-name {server_name}"
 
     if TYPE_CHECKING:  # pragma: no cover
         assert isinstance(operation, Operation)
@@ -285,29 +796,297 @@ def servers_operations_post(
         msg_400 = "Make sure all options/arguments are met and try again"
         abort(400, description=msg_400)
 
+    if idempotency_key is not None:
+        op_id = _record_idempotency_key(operation, idempotency_key)
+
+        if op_id != operation.id:
+            return {"operation_id": op_id}
+
     cmd += f" --operation-id {operation.id}"
-    subprocess.Popen(cmd.split())
+    _submit(
+        QueuedOperation(
+            server_name, operation.id, op_type, cmd.split(), operation.priority
+        )
+    )
 
     return {"operation_id": operation.id}
 
 
+def _parse_date_arg(name: str) -> Optional[datetime]:
+    """
+    Parse the query string argument *name* of the current request as a date.
+
+    :param name: name of the query string argument.
+    :return: the parsed date, or ``None`` if the argument was not given.
+
+    .. note::
+        Abort with a HTTP 400 response if the argument is not a date in the
+        ``YYYY-MM-DD`` format.
+    """
+    value = request.args.get(name)
+
+    if value is None:
+        return None
+
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        msg_400 = f"Invalid ``{name}`` date '{value}', expected YYYY-MM-DD"
+        abort(400, description=msg_400)
+
+
+# Operation types which can be requested for Barman servers, and for the
+# Barman instance, respectively, with the class that handles each of them.
+_SERVER_OPERATIONS = {
+    OperationType.RECOVERY: RecoveryOperation,
+    OperationType.CONFIG_SWITCH: ConfigSwitchOperation,
+    OperationType.PIPELINE: PipelineOperation,
+}
+_INSTANCE_OPERATIONS = {
+    OperationType.CONFIG_UPDATE: ConfigUpdateOperation,
+}
+# ``pg-backup-api`` subcommand which runs each operation type.
+_RUNNER_COMMANDS = {
+    OperationType.RECOVERY: "recovery",
+    OperationType.CONFIG_SWITCH: "config-switch",
+    OperationType.CONFIG_UPDATE: "config-update",
+    OperationType.PIPELINE: "pipeline",
+}
+
+
+def _get_runner_cmd(
+    op_type: OperationType, server_name: Optional[str], operation_id: str
+) -> List[str]:
+    """
+    Get the command line of the pg-backup-api runner of an operation.
+
+    :param op_type: type of the operation.
+    :param server_name: name of the Barman server related to the operation,
+        or ``None`` for an instance operation.
+    :param operation_id: ID of the operation.
+    :return: the ``pg-backup-api`` command which runs the operation.
+    """
+    cmd = ["pg-backup-api", _RUNNER_COMMANDS[op_type]]
+
+    if server_name:
+        cmd += ["--server-name", server_name]
+
+    return cmd + ["--operation-id", operation_id]
+
+
+def _validate_batch_item(
+    index: int, item: Any
+) -> Tuple[Optional[str], OperationType, Dict[str, Any]]:
+    """
+    Validate an operation requested through ``/operations:batch``.
+
+    :param index: position of *item* in the request, used in error messages.
+    :param item: the requested operation. Should be an object with the same
+        content accepted when creating a single operation, plus a
+        ``server_name`` key for server operations.
+    :return: a tuple consisting of:
+
+        * the name of the Barman server, or ``None`` for instance operations;
+        * the type of the operation;
+        * the content of the job file to be created.
+
+    .. note::
+        Abort with a HTTP 400 or 404 response, as the single operation
+        endpoints would do, if the item is not valid.
+    """
+    prefix = f"Operation #{index}: "
+
+    if not isinstance(item, dict):
+        abort(400, description=prefix + "expected an object")
+
+    content = {k: v for k, v in item.items() if k != "server_name"}
+    server_name = item.get("server_name")
+    operations: Dict[OperationType, Any] = _INSTANCE_OPERATIONS
+    default_type = None
+    server = None
+
+    if server_name is not None:
+        if not isinstance(server_name, str):
+            abort(400, description=prefix + "``server_name`` must be a string")
+
+        server = get_server_by_name(server_name)
+
+        if not server:
+            msg_404 = f"Server '{server_name}' does not exist"
+            abort(404, description=prefix + msg_404)
+
+        operations = _SERVER_OPERATIONS
+        default_type = DEFAULT_OP_TYPE.value
+
+    try:
+        op_type = OperationType(content.get("type", default_type))
+    except ValueError:
+        msg_400 = f"invalid operation type '{content.get('type')}'"
+        abort(400, description=prefix + msg_400)
+
+    if op_type not in operations:
+        target = "servers" if server_name else "the Barman instance"
+        msg_400 = f"'{op_type.value}' operations are not valid for {target}"
+        abort(400, description=prefix + msg_400)
+
+    if op_type == OperationType.RECOVERY:
+        if content.get("backup_id") is None:
+            abort(400, description=prefix + "missing ``backup_id``")
+
+        # Recoveries are only valid for servers, checked above
+        if TYPE_CHECKING:  # pragma: no cover
+            assert server is not None
+
+        _check_recovery(server, content, prefix)
+    elif op_type == OperationType.PIPELINE:
+        # Pipelines are only valid for servers, checked above
+        if TYPE_CHECKING:  # pragma: no cover
+            assert server is not None
+
+        _check_pipeline(server, content, prefix)
+
+    try:
+        operations[op_type]._validate_job_content(content)
+        operations[op_type].parse_priority(content)
+    except MalformedContent as e:
+        abort(400, description=prefix + str(e))
+
+    return server_name, op_type, content
+
+
+@app.route("/operations:batch", methods=("POST",))
+def operations_batch() -> Tuple["Response", int]:
+    """
+    Handle ``POST`` request to ``/operations:batch``.
+
+    Create several operations, for any Barman server or the Barman instance,
+    in a single request. All operations are validated before creating any of
+    them, then all job files are created, and finally the operations are
+    queued in the shared :class:`OperationExecutor`, which limits how many of
+    them run concurrently.
+
+    The request should contain a JSON body with a key ``operations``, a list
+    of objects. Each object accepts the same content as ``POST`` requests to
+    ``/servers/*server_name*/operations`` plus a ``server_name`` key, or the
+    same content as ``POST`` requests to ``/operations`` for instance
+    operations.
+
+    :return: a JSON response with HTTP status ``202`` containing an
+        ``operations`` key, with one item for each created operation, in the
+        same order as requested. Each item contains the keys ``server_name``
+        and ``operation_id``.
+
+        If any requested operation is invalid, none is created, and a HTTP
+        ``400`` or ``404`` response is returned with the relevant error
+        message. If writing the job file of an operation fails, the job files
+        already written for the batch are removed, so either all operations
+        are created or none is.
+    """
+    request_body = request.get_json()
+    items = None
+
+    if isinstance(request_body, dict):
+        items = request_body.get("operations")
+
+    if not isinstance(items, list) or not items:
+        msg_400 = "Request body should contain a list of ``operations``"
+        abort(400, description=msg_400)
+
+    max_size = get_setting("SUBMIT_BATCH_MAX_SIZE", 1000, int)
+
+    if len(items) > max_size:
+        msg_400 = f"At most {max_size} operations can be created at once"
+        abort(400, description=msg_400)
+
+    load_barman_config()
+
+    validated = [
+        _validate_batch_item(index, item) for index, item in enumerate(items)
+    ]
+
+    created: List[Tuple[Optional[str], OperationType, Operation]] = []
+
+    try:
+        for server_name, op_type, content in validated:
+            if server_name:
+                op_class = _SERVER_OPERATIONS[op_type]
+            else:
+                op_class = _INSTANCE_OPERATIONS[op_type]
+
+            operation = op_class(server_name, load_config=False)
+            operation.write_job_file(content)
+            created.append((server_name, op_type, operation))
+    except Exception:
+        # None of the operations has been queued yet, so withdraw the ones
+        # already written instead of leaving half of the batch behind
+        for _, _, operation in created:
+            operation.server.remove_job_file(operation.id)
+        raise
+
+    for server_name, op_type, operation in created:
+        _submit(
+            QueuedOperation(
+                server_name,
+                operation.id,
+                op_type,
+                _get_runner_cmd(op_type, server_name, operation.id),
+                operation.priority,
+            )
+        )
+
+    response = {
+        "operations": [
+            {"server_name": server_name, "operation_id": operation.id}
+            for server_name, _, operation in created
+        ]
+    }
+    return jsonify(response), 202
+
+
 def _operations_get(
     server_name: Optional[str],
 ) -> Union[Tuple["Response", int], "Response"]:
     """
     Get a list of operations for a Barman server or instance.
 
+    The list can be filtered by creation date through the ``since`` and
+    ``until`` query string arguments, both in the ``YYYY-MM-DD`` format.
+
+    If the ``resources`` query string argument is ``true``, the resources
+    used by the finished operations in the list are also aggregated by
+    operation type. See :meth:`OperationServer.get_resource_totals`.
+
     :param server_name: name of the Barman server to fetch operations from, or
         ``None`` for instance operations.
 
     :return: a JSON response with ``operations`` key containing a list of
         operations for a Barman server or instance. Each item in the list
-        contains the operation ID and the operation type.
+        contains the operation ID and the operation type. Along with a
+        ``resources`` key if requested.
     """
+    since = _parse_date_arg("since")
+    until = _parse_date_arg("until")
+    resources = request.args.get("resources", "").lower() in (
+        "1",
+        "true",
+        "yes",
+        "on",
+    )
+
     try:
         operation = OperationServer(server_name)
-        available_operations = {"operations": operation.get_operations_list()}
-        return jsonify(available_operations)
+        available_operations: Dict[str, Any] = {
+            "operations": operation.get_operations_list(
+                since=since, until=until
+            )
+        }
+
+        if resources:
+            available_operations["resources"] = (
+                operation.get_resource_totals(since=since, until=until)
+            )
+
+        return _jsonify_listing(available_operations, "operations")
     except OperationServerConfigError as e:
         abort(404, description=str(e))
 
@@ -375,6 +1154,17 @@ def instance_operations_post(request: "Request") -> Dict[str, str]:
         msg_400 = "Minimum barman options not met for instance operation"
         abort(400, description=msg_400)
 
+    idempotency_key = _get_idempotency_key(request, request_body)
+
+    if idempotency_key is not None:
+        op_server = OperationServer(None)
+        op_id = op_server.get_idempotent_operation(idempotency_key)
+
+        if op_id is not None:
+            return {"operation_id": op_id}
+
+        request_body["idempotency_key"] = idempotency_key
+
     operation = None
     cmd = None
     op_type = OperationType(request_body.get("type"))
@@ -393,12 +1183,156 @@ def instance_operations_post(request: "Request") -> Dict[str, str]:
         msg_400 = "Make sure all options/arguments are met and try again"
         abort(400, description=msg_400)
 
+    if idempotency_key is not None:
+        op_id = _record_idempotency_key(operation, idempotency_key)
+
+        if op_id != operation.id:
+            return {"operation_id": op_id}
+
     cmd += f" --operation-id {operation.id}"
-    subprocess.Popen(cmd.split())
+    _submit(
+        QueuedOperation(
+            None, operation.id, op_type, cmd.split(), operation.priority
+        )
+    )
 
     return {"operation_id": operation.id}
 
 
+def _parse_int_arg(name: str, default: int, minimum: int, maximum: int) -> int:
+    """
+    Parse the query string argument *name* of the current request as an int.
+
+    :param name: name of the query string argument.
+    :param default: value to be returned if the argument was not given.
+    :param minimum: minimum accepted value.
+    :param maximum: maximum accepted value.
+    :return: the parsed value, or *default* if the argument was not given.
+
+    .. note::
+        Abort with a HTTP 400 response if the argument is not an integer
+        between *minimum* and *maximum*.
+    """
+    value = request.args.get(name)
+
+    if value is None:
+        return default
+
+    try:
+        parsed = int(value)
+    except ValueError:
+        parsed = minimum - 1
+
+    if not minimum <= parsed <= maximum:
+        msg_400 = (
+            f"Invalid ``{name}`` '{value}', expected an integer between "
+            f"{minimum} and {maximum}"
+        )
+        abort(400, description=msg_400)
+
+    return parsed
+
+
+def _get_server_config(server_name: str) -> "ServerConfig":
+    """
+    Get the configuration of the Barman server *server_name*.
+
+    :param server_name: name of the Barman server.
+    :return: configuration of the Barman server.
+
+    .. note::
+        Abort with a HTTP 404 response if the Barman server doesn't exist.
+    """
+    load_barman_config()
+    server = get_server_by_name(server_name)
+
+    if not server:
+        msg_404 = f"Server '{server_name}' does not exist"
+        abort(404, description=msg_404)
+
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(server, ServerConfig)
+
+    return server
+
+
+@app.route("/servers/<server_name>/backups", methods=("GET",))
+def server_backups(server_name: str) -> "Response":
+    """
+    Handle ``GET`` request to ``/servers/*server_name*/backups``.
+
+    List the backups of a Barman server, from the newest to the oldest. The
+    following query string arguments are accepted:
+
+    * ``status``: comma separated list of statuses. If given, only list
+      backups in any of these statuses;
+    * ``limit``: maximum number of backups to be returned. Defaults to
+      ``100``, and can be up to ``BACKUPS_PAGE_MAX_SIZE``;
+    * ``offset``: number of backups to skip. Defaults to ``0``.
+
+    :param server_name: name of the Barman server.
+    :return: if *server_name* and the arguments are valid, return a JSON
+        response containing these keys:
+
+        * ``backups``: the main fields of each backup in the requested page;
+        * ``total``: number of backups matching the status filter.
+
+        Otherwise, return an HTTP ``400`` or ``404`` response with the
+        relevant error message.
+    """
+    statuses = None
+    status_arg = request.args.get("status")
+
+    if status_arg is not None:
+        statuses = status_arg.split(",")
+        invalid = sorted(set(statuses) - set(BackupInfo.STATUS_ALL))
+
+        if invalid:
+            msg_400 = (
+                f"Invalid ``status`` '{', '.join(invalid)}', expected any "
+                f"among: {', '.join(BackupInfo.STATUS_ALL)}"
+            )
+            abort(400, description=msg_400)
+
+    max_limit = get_setting("BACKUPS_PAGE_MAX_SIZE", 1000, int)
+    limit = _parse_int_arg("limit", min(100, max_limit), 1, max_limit)
+    offset = _parse_int_arg("offset", 0, 0, sys.maxsize)
+
+    server = _get_server_config(server_name)
+    backups = get_server_pool().list_backups(server, statuses)
+
+    return _jsonify_listing(
+        {"backups": backups[offset:offset + limit], "total": len(backups)},
+        "backups",
+    )
+
+
+@app.route("/servers/<server_name>/backups/<backup_id>", methods=("GET",))
+def server_backup(server_name: str, backup_id: str) -> "Response":
+    """
+    Handle ``GET`` request to ``/servers/*server_name*/backups/*backup_id*``.
+
+    :param server_name: name of the Barman server.
+    :param backup_id: ID of the backup. Accepts the aliases accepted by
+        :func:`parse_backup_id`, e.g. ``latest``.
+    :return: if *server_name* and *backup_id* are valid, return a JSON
+        response with all the information about the backup, as given by
+        ``barman show-backup``. Otherwise, return an HTTP ``404`` response
+        with the relevant error message.
+    """
+    server = _get_server_config(server_name)
+
+    with get_server_pool().server(server) as barman_server:
+        backup_info = parse_backup_id(barman_server, backup_id)
+        content = backup_info.to_json() if backup_info else None
+
+    if content is None:
+        msg_404 = f"Backup '{backup_id}' does not exist"
+        abort(404, description=msg_404)
+
+    return jsonify(content)
+
+
 @app.route("/operations", methods=("GET", "POST"))
 def instance_operation() -> Union[Tuple["Response", int], "Response"]:
     """
@@ -423,3 +1357,56 @@ def instance_operation() -> Union[Tuple["Response", int], "Response"]:
         return jsonify(instance_operations_post(request)), 202
 
     return _operations_get(None)
+
+
+@app.route("/events", methods=["GET"])
+def events() -> "Response":
+    """
+    Handle ``GET`` request to ``/events``.
+
+    Stream events about operations of the Barman instance and of all Barman
+    servers, as server-sent events. Each event has its data in JSON format,
+    and an ID which is the cursor to resume streaming right after it.
+
+    The cursor to resume from can be given either through the ``since`` query
+    string argument or through the ``Last-Event-ID`` header. If no cursor is
+    given, events are streamed from the beginning of the event logs.
+
+    If the ``wait`` query string argument is given, the stream is kept open
+    for up to that many seconds, streaming new events as they are logged.
+
+    :return: a ``text/event-stream`` response, or an HTTP ``400`` response if
+        the cursor or ``wait`` are invalid.
+    """
+    cursor = request.args.get("since") or request.headers.get("Last-Event-ID")
+    wait = _parse_wait_arg()
+    offsets: Dict[str, int] = {}
+
+    if cursor:
+        try:
+            offsets = decode_cursor(cursor)
+        except ValueError as e:
+            abort(400, description=str(e))
+
+    load_barman_config()
+    files = get_events_files()
+    interval = get_watcher().interval
+
+    def generate() -> Iterator[str]:
+        deadline = time.monotonic() + wait
+
+        while True:
+            for event in iter_new_events(files, offsets):
+                yield (
+                    f"id: {encode_cursor(offsets)}\n"
+                    f"data: {json.dumps(event)}\n\n"
+                )
+
+            if time.monotonic() >= deadline:
+                return
+
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
+    return Response(
+        stream_with_context(generate()), mimetype="text/event-stream"
+    )
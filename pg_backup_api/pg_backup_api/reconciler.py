@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Finish operations whose runner died before recording their output.
+
+If the ``pg-backup-api`` runner of an operation dies, e.g. killed by the OOM
+killer or because of a host reboot, the operation would be ``IN_PROGRESS``
+forever. The reconciler periodically looks at the operations which have not
+finished yet -- the marker files under the ``running`` directory of each
+Barman server and instance -- and marks as ``FAILED`` those whose runner is
+gone, or stopped recording heartbeats.
+
+:var DEFAULT_INTERVAL: default number of seconds between reconciliations.
+:var DEFAULT_HEARTBEAT_TIMEOUT: default number of seconds without heartbeats
+    after which the runner of an operation is considered gone.
+"""
+import logging
+import threading
+import time
+from typing import Optional, Set, Tuple, TYPE_CHECKING
+
+import barman
+
+from pg_backup_api.executor import get_executor
+from pg_backup_api.server_operation import OperationServer
+from pg_backup_api.utils import get_setting, is_process_alive
+
+if TYPE_CHECKING:  # pragma: no cover
+    from barman.config import Config as BarmanConfig
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60.0
+DEFAULT_HEARTBEAT_TIMEOUT = 120.0
+
+
+class Reconciler:
+    """
+    Mark operations whose runner is gone as ``FAILED``, in the background.
+
+    An operation is considered orphaned if:
+
+    * its runner recorded its PID and start time, and that process is not
+      running anymore; or
+    * it did not start yet, and the REST API process which queued it -- as
+      recorded under the ``queued_by`` key of its job file -- is not running
+      anymore, e.g. because the REST API was restarted, so the in-memory
+      queue holding the operation is lost; or
+    * no heartbeat was recorded for more than :attr:`heartbeat_timeout`
+      seconds, e.g. because its runner never started, or the runner was
+      recorded on another host.
+
+    Operations still waiting in the executor of this process have their
+    heartbeat recorded by the reconciler. When the REST API runs in several
+    processes, each of them runs a reconciler, which records the heartbeats
+    of the operations waiting in its own executor, so operations queued in
+    another process which is still running are not considered orphaned.
+
+    :ivar interval: number of seconds between reconciliations.
+    :ivar heartbeat_timeout: number of seconds without heartbeats after which
+        the runner of an operation is considered gone.
+    """
+
+    def __init__(self, interval: float, heartbeat_timeout: float) -> None:
+        """
+        Initialize a new instance of :class:`Reconciler`.
+
+        :param interval: number of seconds between reconciliations.
+        :param heartbeat_timeout: number of seconds without heartbeats after
+            which the runner of an operation is considered gone.
+        """
+        self.interval = interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._thread: Optional[threading.Thread] = None
+
+    def _get_failure_reason(
+        self, op_server: OperationServer, op_id: str, last_heartbeat: float
+    ) -> Optional[str]:
+        """
+        Check if the runner of operation *op_id* is gone.
+
+        :param op_server: the Barman server or instance of the operation.
+        :param op_id: ID of the operation.
+        :param last_heartbeat: time of the last heartbeat of the operation,
+            as a Unix timestamp.
+        :return: why the operation is considered failed, or ``None`` if its
+            runner is still taking care of it.
+        """
+        job = op_server.read_job_file(op_id)
+        runner = job.get("runner")
+        queued_by = job.get("queued_by")
+
+        if runner and not is_process_alive(
+            runner["pid"], runner.get("start_time")
+        ):
+            return f"its runner (PID {runner['pid']}) is gone"
+
+        if (
+            not runner
+            and queued_by
+            and not is_process_alive(
+                queued_by["pid"], queued_by.get("start_time")
+            )
+        ):
+            return (
+                "it was lost before starting, as the REST API process (PID "
+                f"{queued_by['pid']}) which queued it is gone, e.g. because "
+                "it was restarted"
+            )
+
+        silence = time.time() - last_heartbeat
+
+        if silence <= self.heartbeat_timeout:
+            return None
+
+        if not runner:
+            return f"it did not start within {int(silence)} seconds"
+
+        return f"its runner did not report for {int(silence)} seconds"
+
+    def reconcile_server(
+        self, op_server: OperationServer, pending: Set[str]
+    ) -> int:
+        """
+        Reconcile the unfinished operations of a Barman server or instance.
+
+        .. note::
+            Idempotency keys which expired are also removed.
+
+        :param op_server: the Barman server or instance.
+        :param pending: IDs of the operations of *op_server* which are still
+            waiting in the executor of this process.
+        :return: number of operations which were marked as ``FAILED``.
+        """
+        op_server.prune_idempotency_keys()
+        failed = 0
+        running = op_server.get_running_operations()
+
+        for op_id, last_heartbeat in running.items():
+            if op_id in pending:
+                op_server.heartbeat(op_id)
+                continue
+
+            try:
+                reason = self._get_failure_reason(
+                    op_server, op_id, last_heartbeat
+                )
+            except FileNotFoundError:
+                # The job file is gone, nothing left to be reconciled
+                op_server.remove_running_file(op_id)
+                continue
+
+            if reason is None:
+                continue
+
+            if op_server.finish_operation(
+                op_id, "FAILED", f"Operation failed: {reason}\n"
+            ):
+                log.warning(
+                    "Marked operation '%s' of '%s' as FAILED, as %s",
+                    op_id,
+                    op_server.name or "barman",
+                    reason,
+                )
+                # Do not leave processes of the operation behind
+                op_server.signal_runner(op_id, force=True)
+                failed += 1
+            else:
+                # Finished right before being marked
+                op_server.remove_running_file(op_id)
+
+        return failed
+
+    def reconcile(self) -> int:
+        """
+        Reconcile the unfinished operations of all servers and the instance.
+
+        .. note::
+            The Barman configuration is expected to be already loaded.
+
+        :return: number of operations which were marked as ``FAILED``.
+        """
+        if TYPE_CHECKING:  # pragma: no cover
+            assert isinstance(barman.__config__, BarmanConfig)
+
+        pending: Set[Tuple[Optional[str], str]] = {
+            (queued_op.server_name, queued_op.operation_id)
+            for queued_op in get_executor().pending
+        }
+        failed = 0
+
+        for name in [None] + list(barman.__config__.server_names()):
+            try:
+                op_server = OperationServer(name, load_config=False)
+                failed += self.reconcile_server(
+                    op_server,
+                    {op_id for server, op_id in pending if server == name},
+                )
+            except Exception as e:
+                log.error(
+                    "Could not reconcile operations of '%s': %s",
+                    name or "barman",
+                    e,
+                )
+
+        return failed
+
+    def start(self) -> None:
+        """Reconcile operations now, and then periodically, in a thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="pg-backup-api-reconciler", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Reconcile operations on each round, forever."""
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                log.error("Could not reconcile operations: %s", e)
+
+            time.sleep(self.interval)
+
+
+def start_reconciler() -> Reconciler:
+    """
+    Start reconciling orphaned operations in the background.
+
+    Operations are reconciled right away, and then every
+    ``RECONCILE_INTERVAL`` seconds. Runners are considered gone after
+    ``HEARTBEAT_TIMEOUT`` seconds without heartbeats.
+
+    .. note::
+        The Barman configuration is expected to be already loaded.
+
+    :return: the started :class:`Reconciler` instance.
+    """
+    reconciler = Reconciler(
+        get_setting("RECONCILE_INTERVAL", DEFAULT_INTERVAL, float),
+        get_setting("HEARTBEAT_TIMEOUT", DEFAULT_HEARTBEAT_TIMEOUT, float),
+    )
+    reconciler.start()
+    return reconciler
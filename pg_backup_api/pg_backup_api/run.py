@@ -21,34 +21,64 @@ Implement pg-backup-api CLI commands.
 
 :var app: the Flask application instance.
 """
+import os
 import requests
+import signal
 from typing import Tuple, TYPE_CHECKING
 
 from requests.exceptions import ConnectionError
 
+import barman
 from barman import output
 
+from pg_backup_api.events import start_webhook_deliverer
+from pg_backup_api.reconciler import start_reconciler
+from pg_backup_api.scheduler import start_scheduler
 from pg_backup_api.utils import create_app, load_barman_config
 from pg_backup_api.server_operation import (
+    OperationServer,
+    get_events_files,
     RecoveryOperation,
     ConfigSwitchOperation,
     ConfigUpdateOperation,
+    PipelineOperation,
+    run_operation,
 )
 
 
 if TYPE_CHECKING:  # pragma: no cover
+    from barman.config import Config as BarmanConfig
     from pg_backup_api.server_operation import Operation
     import argparse
 
 app = create_app()
 
 
+def start_event_delivery() -> None:
+    """
+    Start delivering events about operations to the webhook, if configured.
+
+    .. note::
+        See :func:`start_webhook_deliverer` for more details. The Barman
+        configuration is expected to be already loaded.
+    """
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(barman.__config__, BarmanConfig)
+
+    start_webhook_deliverer(
+        get_events_files,
+        os.path.join(barman.__config__.barman_home, "webhook.cursor"),
+    )
+
+
 def serve(args: "argparse.Namespace") -> Tuple[None, bool]:
     """
     Run the Postgres Backup API app.
 
-    Load Barman configuration, set up Barman JSON console output writer and
-    listen to requests on ``127.0.0.1``, on the given port.
+    Load Barman configuration, set up Barman JSON console output writer,
+    start delivering events to the webhook, if any, start reconciling orphaned
+    operations, start creating scheduled operations, if any, and listen to
+    requests on ``127.0.0.1``, on the given port.
 
     :param args: command-line arguments for ``pg-backup-api serve`` command.
         Contains the ``port`` to listen on.
@@ -61,6 +91,9 @@ def serve(args: "argparse.Namespace") -> Tuple[None, bool]:
     # load barman configs/setup barman for the app
     load_barman_config()
     output.set_output_writer(output.AVAILABLE_WRITERS["json"]())
+    start_event_delivery()
+    start_reconciler()
+    start_scheduler()
 
     # bc currently only the PEM agent will be connecting, only run on localhost
     run = app.run(host="127.0.0.1", port=args.port)
@@ -92,15 +125,9 @@ def _run_operation(operation: "Operation") -> Tuple[None, bool]:
     Perform an operation through the pg-backup-api.
 
     .. note::
-        Can only be run if an operation has been previously registered.
+        See :func:`run_operation` for more details.
 
-    In the end of execution creates an output file through *operation*'s
-    ``write_output_file`` method with the following content, to indicate the
-    operation has finished:
-
-    * ``success``: if the operation succeeded or not;
-    * ``end_time``: timestamp when the operation finished;
-    * ``output``: ``stdout``/``stderr`` of the operation.
+    The current process cancels the operation when it receives SIGTERM.
 
     :param operation: a subclass of :class:`Operation` which should be run.
     :return: a tuple consisting of two items:
@@ -108,16 +135,8 @@ def _run_operation(operation: "Operation") -> Tuple[None, bool]:
         * ``None`` -- output of *operation*'s ``write_output_file`` method;
         * ``True`` operation executed successfully, ``False`` otherwise.
     """
-    output, retcode = operation.run()
-    success = not retcode
-    end_time = operation.time_event_now()
-
-    content = operation.read_job_file()
-    content["success"] = success
-    content["end_time"] = end_time
-    content["output"] = output
-
-    return (operation.write_output_file(content), success)
+    signal.signal(signal.SIGTERM, lambda *_: operation.cancel())
+    return run_operation(operation)
 
 
 def recovery_operation(args: "argparse.Namespace") -> Tuple[None, bool]:
@@ -168,11 +187,73 @@ def config_update_operation(args: "argparse.Namespace") -> Tuple[None, bool]:
         See :func:`_run_operation` for more details.
 
     :param args: command-line arguments for ``pg-backup-api config-update``
-        command. Contains the operation ID to be run.
+        command. Contains the operation ID to be run, and the IDs of the
+        operations merged into it, if any.
     :return: a tuple consisting of two items:
 
         * ``None`` -- output of :meth:`ConfigUpdateOperation.write_output_file`
         * ``True`` if ``barman config-update`` was successful, ``False``
             otherwise.
     """
-    return _run_operation(ConfigUpdateOperation(None, args.operation_id))
+    operation = ConfigUpdateOperation(None, args.operation_id)
+    operation.merged_ids = list(args.merge_operation_id)
+    return _run_operation(operation)
+
+
+def pipeline_operation(args: "argparse.Namespace") -> Tuple[None, bool]:
+    """
+    Perform the steps of a pipeline through the pg-backup-api.
+
+    .. note::
+        See :func:`_run_operation` and :class:`PipelineOperation` for more
+        details.
+
+    :param args: command-line arguments for ``pg-backup-api pipeline``
+        command. Contains the name of the Barman server related to the
+        operation.
+    :return: a tuple consisting of two items:
+
+        * ``None`` -- output of :meth:`PipelineOperation.write_output_file`
+        * ``True`` if no step stopped the pipeline, ``False`` otherwise.
+    """
+    return _run_operation(
+        PipelineOperation(args.server_name, args.operation_id)
+    )
+
+
+def migrate_layout(args: "argparse.Namespace") -> Tuple[str, bool]:
+    """
+    Move files of existing operations to another layout.
+
+    .. note::
+        See :meth:`OperationServer.migrate_layout` for more details.
+
+    :param args: command-line arguments for ``pg-backup-api migrate-layout``
+        command. Contains the target ``layout`` and, optionally, the
+        ``server_name`` whose operations should be moved. If no server name is
+        given, then operations of the Barman instance and of all Barman
+        servers are moved.
+    :return: a tuple consisting of two items:
+
+        * a message with the number of files moved for each server;
+        * ``True`` to indicate a successful operation.
+    """
+    server_names = [args.server_name]
+
+    if args.server_name is None:
+        load_barman_config()
+
+        if TYPE_CHECKING:  # pragma: no cover
+            assert isinstance(barman.__config__, BarmanConfig)
+
+        server_names = [None] + list(
+            barman.__config__.server_names()  # pyright: ignore
+        )
+
+    lines = []
+
+    for server_name in server_names:
+        moved = OperationServer(server_name).migrate_layout(args.layout)
+        lines.append(f"{server_name or 'instance'}: {moved} file(s) moved")
+
+    return ("\n".join(lines), True)
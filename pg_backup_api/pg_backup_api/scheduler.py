@@ -0,0 +1,654 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Create operations of Barman servers periodically, as given by schedules.
+
+Schedules are read, when the REST API starts, from the JSON file given by the
+``SCHEDULES_FILE`` setting, by default ``<barman_home>/schedules.json``. It
+contains a list of schedules, each of them with these keys:
+
+* ``name``: unique name of the schedule;
+* ``cron``: when the operation should be created, as a cron expression with
+  5 fields, evaluated in the local time of the host, see
+  :class:`CronExpression`;
+* ``servers``: list of names of Barman servers, which may contain shell-style
+  wildcards, e.g. ``pg-*``, so a group of servers shares a schedule;
+* ``operation``: content of the operation to be created, as accepted by
+  ``POST`` requests to ``/servers/*server_name*/operations``;
+* ``jitter``: optionally, a number of seconds. The operation of each server is
+  created up to that many seconds after the time given by ``cron``, so the
+  operations of a group of servers do not all start at once. The delay of each
+  server is derived from the names of the schedule and of the server, so it
+  does not change from a run to the next.
+
+Scheduled operations are created as any other operation, with a ``schedule``
+key in their job file, and queued in the shared
+:class:`~pg_backup_api.executor.OperationExecutor`. If an operation created by
+a previous run of a schedule for a server is still in progress, the run is
+skipped. That is found from the files of the operations, so it holds across
+restarts and among the processes of the REST API. Each run is recorded as an
+idempotency key, so when the REST API runs in several processes, a single
+operation is created for each run.
+
+:var DEFAULT_JITTER: default number of seconds over which the operations of a
+    schedule are spread.
+:var MAX_WAIT: maximum number of seconds between evaluations of the
+    schedules.
+"""
+from datetime import datetime, timedelta
+from fnmatch import fnmatch
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import barman
+
+from pg_backup_api.executor import QueuedOperation, get_executor
+from pg_backup_api.server_operation import (
+    SUPERSEDED,
+    ConfigSwitchOperation,
+    MalformedContent,
+    OperationServer,
+    OperationType,
+    PipelineOperation,
+    RecoveryOperation,
+)
+from pg_backup_api.utils import get_setting
+
+if TYPE_CHECKING:  # pragma: no cover
+    from barman.config import Config as BarmanConfig
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JITTER = 0
+MAX_WAIT = 60.0
+
+# Operation types which can be scheduled, with the class which handles each
+# of them, and the ``pg-backup-api`` subcommand which runs it.
+_OPERATIONS = {
+    OperationType.RECOVERY: (RecoveryOperation, "recovery"),
+    OperationType.CONFIG_SWITCH: (ConfigSwitchOperation, "config-switch"),
+    OperationType.PIPELINE: (PipelineOperation, "pipeline"),
+}
+
+
+class CronExpression:
+    """
+    Parse a cron expression, and find when it's due.
+
+    The expression has 5 fields, separated by spaces: minute (``0-59``), hour
+    (``0-23``), day of month (``1-31``), month (``1-12``) and day of week
+    (``0-7``, both ``0`` and ``7`` being Sunday). Each field is either ``*``,
+    a value, or a range ``a-b``, optionally followed by a step ``/n``, or a
+    comma separated list of those. As in cron, if both the day of month and
+    the day of week are restricted, a day matching either of them is due.
+
+    :cvar FIELDS: minimum and maximum values of each field.
+    :ivar expression: the cron expression.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        """
+        Initialize a new instance of :class:`CronExpression`.
+
+        :param expression: the cron expression.
+
+        :raises:
+            :exc:`ValueError`: if *expression* is not a valid cron
+                expression.
+        """
+        self.expression = expression
+        fields = expression.split()
+
+        if len(fields) != len(self.FIELDS):
+            raise ValueError(
+                f"Invalid cron expression '{expression}': expected "
+                f"{len(self.FIELDS)} fields"
+            )
+
+        (
+            self._minutes,
+            self._hours,
+            self._days,
+            self._months,
+            self._weekdays,
+        ) = [
+            self._parse_field(field, minimum, maximum)
+            for field, (minimum, maximum) in zip(fields, self.FIELDS)
+        ]
+        # Sunday can be given as both ``0`` and ``7``
+        if 7 in self._weekdays:
+            self._weekdays.add(0)
+
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _parse_field(self, field: str, minimum: int, maximum: int) -> Set[int]:
+        """
+        Parse a field of the cron expression.
+
+        :param field: the field.
+        :param minimum: lowest value of the field.
+        :param maximum: highest value of the field.
+        :return: the values matched by *field*.
+
+        :raises:
+            :exc:`ValueError`: if *field* is not valid.
+        """
+        values: Set[int] = set()
+
+        for item in field.split(","):
+            value_range, _, step = item.partition("/")
+
+            try:
+                if value_range == "*":
+                    start, end = minimum, maximum
+                elif "-" in value_range:
+                    start, end = map(int, value_range.split("-", 1))
+                else:
+                    # As in cron, ``a/n`` means from ``a`` to the maximum
+                    start = int(value_range)
+                    end = maximum if step else start
+
+                step_value = int(step) if step else 1
+            except ValueError:
+                start, end, step_value = 0, -1, 0
+
+            if not minimum <= start <= end <= maximum or step_value < 1:
+                raise ValueError(
+                    f"Invalid cron expression '{self.expression}': invalid "
+                    f"field '{field}'"
+                )
+
+            values.update(range(start, end + 1, step_value))
+
+        return values
+
+    def _is_due_day(self, moment: datetime) -> bool:
+        """
+        Check if the day of *moment* matches the expression.
+
+        :param moment: the date to be checked.
+        :return: ``True`` if the day is due.
+        """
+        # :meth:`datetime.isoweekday` gives 7 for Sunday, cron gives 0
+        day = moment.day in self._days
+        weekday = moment.isoweekday() % 7 in self._weekdays
+
+        if self._any_day or self._any_weekday:
+            return day and weekday
+
+        return day or weekday
+
+    def get_next(self, after: datetime) -> datetime:
+        """
+        Get the first time the expression is due after *after*.
+
+        :param after: the time to start from.
+        :return: the first minute after *after* which matches the expression.
+
+        :raises:
+            :exc:`ValueError`: if the expression is never due, e.g.
+                ``0 0 31 2 *``.
+        """
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Every combination of month, day and weekday occurs within 28 years
+        limit = moment + timedelta(days=366 * 28)
+
+        while moment < limit:
+            if moment.month not in self._months:
+                year = moment.year + moment.month // 12
+                month = moment.month % 12 + 1
+                moment = moment.replace(
+                    year=year, month=month, day=1, hour=0, minute=0
+                )
+            elif not self._is_due_day(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self._hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self._minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+
+        raise ValueError(
+            f"Invalid cron expression '{self.expression}': never due"
+        )
+
+
+class Schedule:
+    """
+    Describe operations to be created periodically for Barman servers.
+
+    See :mod:`pg_backup_api.scheduler` for details about each attribute.
+
+    :ivar name: unique name of the schedule.
+    :ivar cron: when operations should be created.
+    :ivar servers: patterns of names of the Barman servers.
+    :ivar operation: content of the operations to be created.
+    :ivar jitter: number of seconds over which operations are spread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        cron: CronExpression,
+        servers: List[str],
+        operation: Dict[str, Any],
+        jitter: int = DEFAULT_JITTER,
+    ) -> None:
+        """
+        Initialize a new instance of :class:`Schedule`.
+
+        :param name: unique name of the schedule.
+        :param cron: when operations should be created.
+        :param servers: patterns of names of the Barman servers.
+        :param operation: content of the operations to be created.
+        :param jitter: number of seconds over which operations are spread.
+        """
+        self.name = name
+        self.cron = cron
+        self.servers = servers
+        self.operation = operation
+        self.jitter = jitter
+
+    @classmethod
+    def from_dict(cls, content: Any) -> "Schedule":
+        """
+        Create a schedule from its definition in the schedules file.
+
+        :param content: the definition of the schedule.
+        :return: the new :class:`Schedule`.
+
+        :raises:
+            :exc:`ValueError`: if *content* is not a valid schedule.
+        """
+        if not isinstance(content, dict):
+            raise ValueError("expected an object")
+
+        name = content.get("name")
+        servers = content.get("servers")
+        operation = content.get("operation")
+        jitter = content.get("jitter", DEFAULT_JITTER)
+
+        if not isinstance(name, str) or not name:
+            raise ValueError("`name` is expected to be a non-empty string")
+
+        if not isinstance(content.get("cron"), str):
+            raise ValueError("`cron` is expected to be a string")
+
+        if (
+            not isinstance(servers, list)
+            or not servers
+            or not all(isinstance(server, str) for server in servers)
+        ):
+            raise ValueError("`servers` is expected to be a list of strings")
+
+        if (
+            not isinstance(jitter, int)
+            or isinstance(jitter, bool)
+            or jitter < 0
+        ):
+            raise ValueError("`jitter` is expected to be 0 or more seconds")
+
+        if not isinstance(operation, dict):
+            raise ValueError("`operation` is expected to be an object")
+
+        try:
+            op_type = OperationType(operation.get("type"))
+            op_class, _ = _OPERATIONS[op_type]
+        except (KeyError, ValueError):
+            types = ", ".join(op_type.value for op_type in _OPERATIONS)
+            msg = f"`operation` type is expected to be one among: {types}"
+            raise ValueError(msg)
+
+        try:
+            op_class._validate_job_content(operation)
+            op_class.parse_priority(operation)
+        except MalformedContent as e:
+            raise ValueError(f"invalid `operation`: {e}")
+
+        cron = CronExpression(content["cron"])
+        # Make sure the expression is due at some point
+        cron.get_next(datetime.now())
+        return cls(name, cron, servers, operation, jitter)
+
+    def get_delay(self, server_name: str) -> int:
+        """
+        Get how long after each run the operation of *server_name* is due.
+
+        :param server_name: name of the Barman server.
+        :return: a number of seconds between ``0`` and :attr:`jitter`,
+            derived from the names of the schedule and of the server.
+        """
+        digest = hashlib.sha256(f"{self.name}/{server_name}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") % (self.jitter + 1)
+
+    def matches(self, server_name: str) -> bool:
+        """
+        Check if this schedule applies to *server_name*.
+
+        :param server_name: name of the Barman server.
+        :return: ``True`` if *server_name* matches any of :attr:`servers`.
+        """
+        return any(fnmatch(server_name, pattern) for pattern in self.servers)
+
+
+def load_schedules(file_path: str) -> List[Schedule]:
+    """
+    Load the schedules defined in *file_path*.
+
+    .. note::
+        Invalid schedules, or schedules with the same name as a previous one,
+        are logged and ignored, so they do not prevent the REST API from
+        starting.
+
+    :param file_path: path to the JSON schedules file.
+    :return: the valid schedules.
+
+    :raises:
+        :exc:`OSError`: if *file_path* cannot be read.
+        :exc:`ValueError`: if *file_path* does not contain a JSON list.
+    """
+    with open(file_path) as f:
+        content = json.load(f)
+
+    if not isinstance(content, list):
+        raise ValueError(f"'{file_path}' should contain a list of schedules")
+
+    schedules: List[Schedule] = []
+
+    for index, item in enumerate(content):
+        try:
+            schedule = Schedule.from_dict(item)
+        except ValueError as e:
+            log.error("Ignoring schedule #%s of '%s': %s", index, file_path, e)
+            continue
+
+        if any(other.name == schedule.name for other in schedules):
+            log.error(
+                "Ignoring schedule #%s of '%s': duplicate name '%s'",
+                index,
+                file_path,
+                schedule.name,
+            )
+            continue
+
+        schedules.append(schedule)
+
+    return schedules
+
+
+class Scheduler:
+    """
+    Create the operations of the schedules when due, in the background.
+
+    :ivar schedules: the schedules.
+    """
+
+    def __init__(self, schedules: List[Schedule]) -> None:
+        """
+        Initialize a new instance of :class:`Scheduler`.
+
+        :param schedules: the schedules.
+        """
+        self.schedules = schedules
+        # Next run of each schedule for each server, as a tuple with the time
+        # given by the cron expression, and the time the run is due
+        self._next_runs: Dict[Tuple[str, str], Tuple[datetime, datetime]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def _get_next_run(
+        self, schedule: Schedule, server_name: str, after: datetime
+    ) -> Tuple[datetime, datetime]:
+        """
+        Get the next run of *schedule* for *server_name*.
+
+        :param schedule: the schedule.
+        :param server_name: name of the Barman server.
+        :param after: the time to start from.
+        :return: a tuple with the time given by the cron expression, and the
+            time the run is due, which is delayed by the jitter.
+        """
+        moment = schedule.cron.get_next(after)
+        delay = timedelta(seconds=schedule.get_delay(server_name))
+        return moment, moment + delay
+
+    @staticmethod
+    def _get_running_operation(
+        schedule: Schedule, op_server: OperationServer
+    ) -> Optional[str]:
+        """
+        Get an operation created by *schedule* which is still in progress.
+
+        Only the operations with a marker file are looked at, see
+        :meth:`OperationServer.get_running_operations`, and their job file
+        tells which schedule created them, if any.
+
+        :param schedule: the schedule.
+        :param op_server: the Barman server of the operations.
+        :return: ID of the operation, or ``None`` if none is in progress.
+        """
+        for op_id in sorted(op_server.get_running_operations()):
+            try:
+                content = op_server.read_job_file(op_id)
+            except (OSError, ValueError):
+                # Finished and removed in the meantime, or malformed
+                continue
+
+            if content.get("schedule") == schedule.name:
+                return op_id
+
+        return None
+
+    def create_operation(
+        self, schedule: Schedule, server_name: str, moment: datetime
+    ) -> Optional[str]:
+        """
+        Create and queue the operation of the run of *schedule* at *moment*.
+
+        :param schedule: the schedule.
+        :param server_name: name of the Barman server.
+        :param moment: time of the run, as given by the cron expression.
+        :return: ID of the created operation, or ``None`` if the run was
+            skipped, because the previous operation is still in progress, or
+            the run was already taken care of by another process.
+        """
+        op_type = OperationType(schedule.operation["type"])
+        op_class, command = _OPERATIONS[op_type]
+        op_server = OperationServer(server_name, load_config=False)
+        run_key = f"schedule/{schedule.name}/{moment.strftime('%Y%m%dT%H%M')}"
+
+        if op_server.get_idempotent_operation(run_key) is not None:
+            # Created by another process of the REST API
+            return None
+
+        running_id = self._get_running_operation(schedule, op_server)
+
+        if running_id is not None:
+            log.warning(
+                "Skipping run of schedule '%s' for '%s' at %s, as operation "
+                "'%s' is still in progress",
+                schedule.name,
+                server_name,
+                moment,
+                running_id,
+            )
+            return None
+
+        operation = op_class(server_name, load_config=False)
+        content = dict(schedule.operation)
+        content["schedule"] = schedule.name
+        operation.write_job_file(content)
+        op_id = operation.server.record_idempotency_key(run_key, operation.id)
+
+        if op_id != operation.id:
+            # Created by another process of the REST API in the meantime
+            operation.server.remove_job_file(operation.id)
+            return None
+
+        cmd = [
+            "pg-backup-api",
+            command,
+            "--server-name",
+            server_name,
+            "--operation-id",
+            operation.id,
+        ]
+        superseded_ops = get_executor().submit(
+            QueuedOperation(
+                server_name, operation.id, op_type, cmd, operation.priority
+            )
+        )
+
+        for superseded in superseded_ops:
+            op_server.finish_operation(
+                superseded.operation_id,
+                SUPERSEDED,
+                f"Operation superseded by '{operation.id}'\n",
+                {"superseded_by": operation.id},
+            )
+
+        log.info(
+            "Created operation '%s' of '%s' for schedule '%s'",
+            operation.id,
+            server_name,
+            schedule.name,
+        )
+        return operation.id
+
+    def run_pending(self, now: Optional[datetime] = None) -> float:
+        """
+        Create the operations whose run is due.
+
+        Runs which were due while the REST API was not running are not
+        caught up with.
+
+        .. note::
+            The Barman configuration is expected to be already loaded.
+
+        :param now: the current time, by default :meth:`datetime.now`.
+        :return: number of seconds until the next run is due, at most
+            :data:`MAX_WAIT`, so servers added to the configuration are taken
+            into account.
+        """
+        if TYPE_CHECKING:  # pragma: no cover
+            assert isinstance(barman.__config__, BarmanConfig)
+
+        now = now or datetime.now()
+        server_names = list(barman.__config__.server_names())
+        wait = MAX_WAIT
+
+        for schedule in self.schedules:
+            for server_name in server_names:
+                if not schedule.matches(server_name):
+                    continue
+
+                key = (schedule.name, server_name)
+
+                if key not in self._next_runs:
+                    self._next_runs[key] = self._get_next_run(
+                        schedule, server_name, now
+                    )
+
+                moment, due = self._next_runs[key]
+
+                if due <= now:
+                    try:
+                        self.create_operation(schedule, server_name, moment)
+                    except Exception as e:
+                        log.error(
+                            "Could not create operation of '%s' for "
+                            "schedule '%s': %s",
+                            server_name,
+                            schedule.name,
+                            e,
+                        )
+
+                    moment, due = self._next_runs[key] = self._get_next_run(
+                        schedule, server_name, max(moment, now)
+                    )
+
+                wait = min(wait, (due - now).total_seconds())
+
+        return max(wait, 0)
+
+    def start(self) -> None:
+        """Evaluate the schedules periodically, in a thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="pg-backup-api-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Create the operations which are due, forever."""
+        while True:
+            wait = MAX_WAIT
+
+            try:
+                wait = self.run_pending()
+            except Exception as e:
+                log.error("Could not evaluate schedules: %s", e)
+
+            time.sleep(wait)
+
+
+def start_scheduler() -> Optional[Scheduler]:
+    """
+    Start creating the operations of the schedules in the background.
+
+    Schedules are loaded from the ``SCHEDULES_FILE`` setting, by default
+    ``schedules.json`` under the Barman home.
+
+    .. note::
+        The Barman configuration is expected to be already loaded.
+
+    :return: the started :class:`Scheduler` instance, or ``None`` if there is
+        no schedules file, or it has no valid schedule.
+    """
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(barman.__config__, BarmanConfig)
+
+    file_path = get_setting(
+        "SCHEDULES_FILE",
+        os.path.join(barman.__config__.barman_home, "schedules.json"),
+        str,
+    )
+
+    if not os.path.exists(file_path):
+        return None
+
+    try:
+        schedules = load_schedules(file_path)
+    except (OSError, ValueError) as e:
+        log.error("Could not load schedules from '%s': %s", file_path, e)
+        return None
+
+    if not schedules:
+        return None
+
+    scheduler = Scheduler(schedules)
+    scheduler.start()
+    return scheduler
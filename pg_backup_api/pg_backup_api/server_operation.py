@@ -21,19 +21,39 @@ Logic for performing operations through the pg-backup-api.
 
 :data DEFAULT_OP_TYPE: default operation to be performed (``recovery``), if
 none is specified.
+:data TIMED_OUT: status of an operation which was killed because it ran for
+    too long, or produced no output for too long.
+:data CANCELLED: status of an operation which was cancelled through the REST
+    API.
+:data SUPERSEDED: status of a config switch operation which was never run,
+    as a newer config switch operation for the same Barman server was queued
+    before it started.
+:data SKIPPED: status of a step of a pipeline operation which was not run, as
+    an earlier step failed, or the pipeline was cancelled.
+:data DEFAULT_HEARTBEAT_INTERVAL: default number of seconds between
+    heartbeats of the runner of an operation.
 """
 from abc import abstractmethod
 import argparse
 from enum import Enum
+import hashlib
 import json
 import logging
 import os
+import re
+import selectors
+import shlex
+import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
 from typing import (
     Any,
     Callable,
     Dict,
+    Iterator,
     List,
     Optional,
     Set,
@@ -45,7 +65,28 @@ from typing import (
 from datetime import datetime
 from os.path import join
 
-from pg_backup_api.utils import barman, load_barman_config, get_server_by_name
+from barman.server import Server
+from barman.xlog import parse_lsn
+import dateutil.parser
+import dateutil.tz
+
+from pg_backup_api import json_backend
+from pg_backup_api.events import EVENTS_FILE_NAME, append_event
+from pg_backup_api.ssh import (
+    RemoteCommandError,
+    multiplexed_ssh_command,
+    run_remote_command,
+)
+from pg_backup_api.utils import (
+    barman,
+    load_barman_config,
+    get_server_by_name,
+    get_process_start_time,
+    get_setting,
+    is_process_alive,
+    measure_children_resources,
+    parse_backup_id,
+)
 
 if TYPE_CHECKING:  # pragma: no cover
     from barman.config import Config as BarmanConfig
@@ -60,9 +101,16 @@ class OperationType(Enum):
     RECOVERY = "recovery"
     CONFIG_SWITCH = "config_switch"
     CONFIG_UPDATE = "config_update"
+    PIPELINE = "pipeline"
 
 
 DEFAULT_OP_TYPE = OperationType.RECOVERY
+TIMED_OUT = "TIMED_OUT"
+CANCELLED = "CANCELLED"
+SUPERSEDED = "SUPERSEDED"
+SKIPPED = "SKIPPED"
+WITHDRAWN = "WITHDRAWN"
+DEFAULT_HEARTBEAT_INTERVAL = 30.0
 
 
 class OperationServerConfigError(ValueError):
@@ -96,8 +144,26 @@ class OperationServer:
     :ivar output_basedir: directory where to save files with output of
         operations that have been finished for this Barman server or instance
         -- both for failed and successful executions.
+    :ivar layout: how files are laid out under :attr:`jobs_basedir` and
+        :attr:`output_basedir`. Either :attr:`FLAT_LAYOUT` or
+        :attr:`SHARDED_LAYOUT`.
+    :ivar running_basedir: directory with a marker file for each operation
+        that has been created for this Barman server or instance, but has not
+        finished yet. The runner of the operation updates the modification
+        time of the marker file as a heartbeat.
+    :ivar idempotency_basedir: directory with a file for each idempotency key
+        given when creating operations for this Barman server or instance,
+        pointing to the operation which was created.
+    :ivar events_file: path to the event log of this Barman server or
+        instance.
     """
 
+    # All operation files are kept directly under the base directories.
+    FLAT_LAYOUT = "flat"
+    # Operation files are kept under ``<YYYY>/<MM>`` subdirectories of the base
+    # directories, based on the date encoded in the operation ID.
+    SHARDED_LAYOUT = "sharded"
+
     # Name of the pg-backup-api ``jobs`` directory. Files created under this
     # directory indicate the corresponding operation has been created.
     _JOBS_DIR_NAME = "jobs"
@@ -105,6 +171,12 @@ class OperationServer:
     # directory indicate the corresponding operation has finished running --
     # either it has failed or has succeeded.
     _OUTPUT_DIR_NAME = "output"
+    # Name of the pg-backup-api ``running`` directory. Files under this
+    # directory indicate the corresponding operation has not finished yet.
+    _RUNNING_DIR_NAME = "running"
+    # Name of the pg-backup-api ``idempotency`` directory. Each file under
+    # this directory maps an idempotency key to the operation created with it.
+    _IDEMPOTENCY_DIR_NAME = "idempotency"
     # Set of required keys when creating an operation job file.
     _REQUIRED_JOB_KEYS = (
         "operation_type",
@@ -117,7 +189,7 @@ class OperationServer:
         "output",
     )
 
-    def __init__(self, name: Optional[str]) -> None:
+    def __init__(self, name: Optional[str], load_config: bool = True) -> None:
         """
         Initialize a new instance of :class:`OperationServer`.
 
@@ -128,6 +200,9 @@ class OperationServer:
 
         :param name: name of the Barman server, if it's a Barman server
             operation, ``None`` for a "global" (instance) operation.
+        :param load_config: if the Barman configuration should be reloaded.
+            Use ``False`` when creating several objects in a row, after
+            having loaded the configuration once.
 
         :raises:
             :exc:`OperationServerConfigError`: if no Barman configuration could
@@ -136,8 +211,13 @@ class OperationServer:
         """
         self.name = name
         self.config = None
+        self.layout = get_setting("OPERATIONS_LAYOUT", self.FLAT_LAYOUT)
+
+        if self.layout not in (self.FLAT_LAYOUT, self.SHARDED_LAYOUT):
+            raise ValueError(f"Invalid operations layout '{self.layout}'")
 
-        load_barman_config()
+        if load_config:
+            load_barman_config()
 
         if name:
             self.config = get_server_by_name(name)
@@ -157,12 +237,25 @@ class OperationServer:
             self.output_basedir = join(
                 barman_home, name, self._OUTPUT_DIR_NAME
             )
+            self.running_basedir = join(
+                barman_home, name, self._RUNNING_DIR_NAME
+            )
+            self.idempotency_basedir = join(
+                barman_home, name, self._IDEMPOTENCY_DIR_NAME
+            )
         else:
             self.jobs_basedir = join(barman_home, self._JOBS_DIR_NAME)
             self.output_basedir = join(barman_home, self._OUTPUT_DIR_NAME)
+            self.running_basedir = join(barman_home, self._RUNNING_DIR_NAME)
+            self.idempotency_basedir = join(
+                barman_home, self._IDEMPOTENCY_DIR_NAME
+            )
+
+        self.events_file = get_events_files([name])[name or ""]
 
         self._create_jobs_dir()
         self._create_output_dir()
+        self._create_running_dir()
 
     @staticmethod
     def _create_dir(dir_path: str) -> None:
@@ -193,6 +286,58 @@ class OperationServer:
         """Create the ``outputs`` directory of Barman server or instance."""
         self._create_dir(self.output_basedir)
 
+    def _create_running_dir(self) -> None:
+        """Create the ``running`` directory of Barman server or instance."""
+        self._create_dir(self.running_basedir)
+
+    @staticmethod
+    def _get_shard(op_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Get the shard which operation *op_id* belongs to.
+
+        Operation IDs start with the date when the operation was created, in
+        the format ``%Y%m%d``, which is what is used to pick the shard.
+
+        :param op_id: ID of the pg-backup-api operation.
+        :return: a tuple with the year and month of the shard, or ``None`` if
+            *op_id* does not start with a date.
+        """
+        try:
+            date = datetime.strptime(op_id[:8], "%Y%m%d")
+        except ValueError:
+            return None
+
+        return f"{date.year:04d}", f"{date.month:02d}"
+
+    def _get_file_path(self, basedir: str, op_id: str) -> str:
+        """
+        Get path to the file of operation *op_id* under *basedir*.
+
+        When using the :attr:`SHARDED_LAYOUT`, fall back to the path in the
+        :attr:`FLAT_LAYOUT` if the file only exists there, so operations
+        created before switching layouts can still be found.
+
+        :param basedir: either :attr:`jobs_basedir` or :attr:`output_basedir`.
+        :param op_id: ID of the pg-backup-api operation.
+        :return: path to the file of operation *op_id*.
+        """
+        flat_path = os.path.join(basedir, f"{op_id}.json")
+
+        if self.layout == self.FLAT_LAYOUT:
+            return flat_path
+
+        shard = self._get_shard(op_id)
+
+        if shard is None:
+            return flat_path
+
+        sharded_path = os.path.join(basedir, *shard, f"{op_id}.json")
+
+        if not os.path.exists(sharded_path) and os.path.exists(flat_path):
+            return flat_path
+
+        return sharded_path
+
     def get_job_file_path(self, op_id: str) -> str:
         """
         Get path to the job file of operation *op_id*.
@@ -200,7 +345,7 @@ class OperationServer:
         :param op_id: ID of the pg-backup-api operation.
         :return: path to job file of operation *op_id*.
         """
-        return os.path.join(self.jobs_basedir, f"{op_id}.json")
+        return self._get_file_path(self.jobs_basedir, op_id)
 
     def get_output_file_path(self, op_id: str) -> str:
         """
@@ -209,13 +354,262 @@ class OperationServer:
         :param op_id: ID of the pg-backup-api operation.
         :return: path to output file of operation *op_id*.
         """
-        return os.path.join(self.output_basedir, f"{op_id}.json")
+        return self._get_file_path(self.output_basedir, op_id)
+
+    def get_running_file_path(self, op_id: str) -> str:
+        """
+        Get path to the marker file of operation *op_id*, while unfinished.
+
+        .. note::
+            Marker files are always kept directly under
+            :attr:`running_basedir`, whatever the :attr:`layout`, as there
+            are only a few of them.
+
+        :param op_id: ID of the pg-backup-api operation.
+        :return: path to the marker file of operation *op_id*.
+        """
+        return os.path.join(self.running_basedir, op_id)
+
+    def get_running_operations(self) -> Dict[str, float]:
+        """
+        Get the operations of this Barman server or instance not finished yet.
+
+        Only :attr:`running_basedir` is listed, so it's cheap regardless of
+        the number of finished operations.
+
+        .. note::
+            Operations created by versions of pg-backup-api which did not
+            create marker files are not included.
+
+        :return: time of the last heartbeat of each operation, as a Unix
+            timestamp, keyed by operation ID.
+        """
+        operations = {}
+
+        with os.scandir(self.running_basedir) as entries:
+            for entry in entries:
+                try:
+                    operations[entry.name] = entry.stat().st_mtime
+                except FileNotFoundError:
+                    # Finished in the meantime
+                    pass
+
+        return operations
+
+    def _get_idempotency_file_path(self, key: str) -> str:
+        """
+        Get path to the file of idempotency key *key*.
+
+        The file is named after a hash of *key*, so any key maps to a valid
+        file name, and is found without listing the directory.
+
+        :param key: the idempotency key.
+        :return: path to the file of *key* under :attr:`idempotency_basedir`.
+        """
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return join(self.idempotency_basedir, digest)
+
+    @staticmethod
+    def _get_idempotency_retention() -> float:
+        """
+        Get for how long idempotency keys are kept.
+
+        :return: the ``IDEMPOTENCY_RETENTION`` setting, in seconds, by default
+            one day.
+        """
+        return get_setting("IDEMPOTENCY_RETENTION", 86400.0, float)
+
+    def get_idempotent_operation(self, key: str) -> Optional[str]:
+        """
+        Get the operation which was created with idempotency key *key*.
+
+        :param key: the idempotency key.
+        :return: ID of the operation, or ``None`` if no operation was created
+            with *key*, or if it was created more than
+            ``IDEMPOTENCY_RETENTION`` seconds ago.
+        """
+        file_path = self._get_idempotency_file_path(key)
+
+        try:
+            with open(file_path, "rb") as f:
+                age = time.time() - os.fstat(f.fileno()).st_mtime
+                content = json_backend.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if age > self._get_idempotency_retention():
+            return None
+
+        # Guard against hash collisions, however unlikely
+        if content.get("key") != key:
+            return None
+
+        return content.get("operation_id")
+
+    def record_idempotency_key(self, key: str, op_id: str) -> str:
+        """
+        Record that operation *op_id* was created with idempotency key *key*.
+
+        The record is created atomically, so if several requests with the same
+        key race, a single one of them wins.
+
+        :param key: the idempotency key.
+        :param op_id: ID of the operation which has been created.
+        :return: *op_id* if the key was recorded, otherwise the ID of the
+            operation recorded with *key* by a concurrent request.
+        """
+        self._create_dir(self.idempotency_basedir)
+        file_path = self._get_idempotency_file_path(key)
+
+        while True:
+            try:
+                self._write_file(
+                    file_path, {"key": key, "operation_id": op_id}
+                )
+            except FileExistsError:
+                pass
+            else:
+                return op_id
+
+            recorded_id = self.get_idempotent_operation(key)
+
+            if recorded_id is not None:
+                return recorded_id
+
+            if not self._remove_expired_idempotency_file(file_path):
+                # Recorded in the meantime, or recorded for another key with
+                # the same hash, however unlikely
+                return self.get_idempotent_operation(key) or op_id
+
+    def _remove_expired_idempotency_file(self, file_path: str) -> bool:
+        """
+        Remove the idempotency file *file_path*, if it has expired.
+
+        The file is first renamed aside, so it's only removed if the file which
+        was renamed has expired. Otherwise, it was recorded by a concurrent
+        request in the meantime, and it's put back.
+
+        :param file_path: path to the idempotency file.
+        :return: ``True`` if the file is gone, ``False`` if it's still there
+            because it has not expired.
+        """
+        retention = self._get_idempotency_retention()
+        expired_path = (
+            f"{file_path}.{os.getpid()}.{threading.get_ident()}.expired"
+        )
+
+        try:
+            if time.time() - os.stat(file_path).st_mtime <= retention:
+                return False
+
+            os.rename(file_path, expired_path)
+        except FileNotFoundError:
+            return True
+
+        if time.time() - os.stat(expired_path).st_mtime <= retention:
+            try:
+                os.link(expired_path, file_path)
+            except FileExistsError:
+                # Yet another one was recorded, which takes precedence
+                pass
+
+            os.unlink(expired_path)
+            return False
+
+        os.unlink(expired_path)
+        return True
+
+    def prune_idempotency_keys(self) -> int:
+        """
+        Remove the idempotency keys older than ``IDEMPOTENCY_RETENTION``.
+
+        :return: number of keys which were removed.
+        """
+        oldest = time.time() - self._get_idempotency_retention()
+        pruned = 0
+
+        try:
+            entries = list(os.scandir(self.idempotency_basedir))
+        except FileNotFoundError:
+            return 0
+
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime >= oldest:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            if self._remove_expired_idempotency_file(entry.path):
+                pruned += 1
+
+        return pruned
+
+    def heartbeat(self, op_id: str) -> bool:
+        """
+        Record that operation *op_id* is still being taken care of.
+
+        :param op_id: ID of the operation.
+        :return: ``True`` if the heartbeat was recorded, ``False`` if the
+            operation has already finished.
+        """
+        try:
+            os.utime(self.get_running_file_path(op_id))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def _create_running_file(self, op_id: str) -> None:
+        """
+        Create the marker file of operation *op_id*.
+
+        :param op_id: ID of the operation which has been created.
+        """
+        open(self.get_running_file_path(op_id), "w").close()
+
+    def remove_running_file(self, op_id: str) -> None:
+        """
+        Remove the marker file of operation *op_id*, if any.
+
+        :param op_id: ID of the operation which has finished.
+        """
+        try:
+            os.unlink(self.get_running_file_path(op_id))
+        except FileNotFoundError:
+            pass
+
+    def remove_job_file(self, op_id: str) -> None:
+        """
+        Remove the job file of operation *op_id*, and its marker file.
+
+        Used to withdraw an operation which was never queued, e.g. because
+        another operation of the same batch could not be created. A
+        ``withdrawn`` event is logged, to match its ``created`` event.
+
+        :param op_id: ID of the operation to be withdrawn.
+        """
+        job_file = self.get_job_file_path(op_id)
+
+        try:
+            op_type = self._read_file(job_file).get("operation_type")
+            os.unlink(job_file)
+        except FileNotFoundError:
+            pass
+        else:
+            # Its ``created`` event was already logged
+            self.append_event(op_id, "withdrawn", WITHDRAWN, op_type)
+
+        self.remove_running_file(op_id)
 
     @staticmethod
     def _write_file(file_path: str, content: Dict[str, Any]) -> None:
         """
         Write a file to *file_path* with *content*.
 
+        The content is written to a temporary file which is then linked to
+        *file_path*, so readers never see a partially written file.
+
         :param file_path: path where to write the file.
         :param content: content to be written to the file. Expected to be
             parsable as JSON.
@@ -227,8 +621,34 @@ class OperationServer:
         if os.path.exists(file_path):
             raise FileExistsError(f"File '{file_path}' already exists")
 
-        with open(file_path, "w") as fd:
-            json.dump(content, fd)
+        # Unique per thread, as requests may be served by several threads
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(tmp_path, "wb") as fd:
+            fd.write(json_backend.dumps(content))
+
+        try:
+            os.link(tmp_path, file_path)
+        except FileExistsError:
+            raise FileExistsError(f"File '{file_path}' already exists")
+        finally:
+            os.unlink(tmp_path)
+
+    def _prepare_file_path(self, file_path: str) -> str:
+        """
+        Make sure the directory of *file_path* exists before writing to it.
+
+        .. note::
+            Only the :attr:`SHARDED_LAYOUT` needs this, as the base directories
+            are created when initializing the object.
+
+        :param file_path: path to the file which is about to be written.
+        :return: *file_path*.
+        """
+        if self.layout == self.SHARDED_LAYOUT:
+            self._create_dir(os.path.dirname(file_path))
+
+        return file_path
 
     def write_job_file(self, op_id: str, content: Dict[str, Any]) -> None:
         """
@@ -237,7 +657,8 @@ class OperationServer:
         File is created under :attr:`jobs_basedir`.
 
         .. note::
-            Creating a job file means you are registering the operation.
+            Creating a job file means you are registering the operation. A
+            marker file is also created under :attr:`running_basedir`.
 
         :param content: content to be written into the created job file.
             Expects a Python dictionary which will be converted to JSON. It
@@ -259,11 +680,127 @@ class OperationServer:
             raise MalformedContent(msg)
 
         try:
-            self._write_file(self.get_job_file_path(op_id), content)
+            file_path = self._prepare_file_path(self.get_job_file_path(op_id))
+            self._write_file(file_path, content)
         except FileExistsError:
             msg = f"Job file for operation '{op_id}' already exists"
             raise FileExistsError(msg)
 
+        self._create_running_file(op_id)
+
+        self.append_event(
+            op_id, "created", "IN_PROGRESS", content["operation_type"]
+        )
+
+    def update_job_file(self, op_id: str, changes: Dict[str, Any]) -> None:
+        """
+        Update the job file of operation *op_id* with *changes*.
+
+        The updated content is written to a temporary file which then replaces
+        the job file, so readers never see a partially written file.
+
+        .. note::
+            Only the process running the operation is expected to update its
+            job file.
+
+        :param op_id: ID of the operation which job file should be updated.
+        :param changes: keys to be added to, or replaced in, the job file.
+
+        :raises:
+            :exc:`FileNotFoundError`: if the job file for operation *op_id*
+                could not be found.
+        """
+        content = self.read_job_file(op_id)
+        content.update(changes)
+        file_path = self.get_job_file_path(op_id)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "wb") as fd:
+            fd.write(json_backend.dumps(content))
+
+        os.replace(tmp_path, file_path)
+
+    def signal_runner(self, op_id: str, force: bool = False) -> bool:
+        """
+        Signal the processes running operation *op_id*.
+
+        The runner process records its PID and start time, and the process
+        group of the operation subprocess, under the ``runner`` key of the
+        job file. See :meth:`Operation.record_runner`.
+
+        :param op_id: ID of the operation which runner should be signalled.
+        :param force: if ``False``, send SIGTERM to the runner, which then
+            kills the operation subprocess and records the operation as
+            cancelled. If ``True``, send SIGKILL to both the runner and the
+            process group of the operation subprocess.
+        :return: ``True`` if the runner was running, ``False`` if it did not
+            start yet, or it is gone.
+
+        :raises:
+            :exc:`FileNotFoundError`: if the job file for operation *op_id*
+                could not be found.
+        """
+        runner = self.read_job_file(op_id).get("runner") or {}
+        pid: Optional[int] = runner.get("pid")
+        alive = False
+
+        if pid and is_process_alive(pid, runner.get("start_time")):
+            try:
+                os.kill(pid, signal.SIGKILL if force else signal.SIGTERM)
+                alive = True
+            except ProcessLookupError:
+                # Exited right after being checked
+                pass
+
+        process_group = runner.get("process_group")
+
+        if force and process_group:
+            try:
+                os.killpg(process_group, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        return alive
+
+    def finish_operation(
+        self,
+        op_id: str,
+        status: str,
+        output: str,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Finish operation *op_id*, which did not succeed, as *status*.
+
+        Used when the runner of the operation could not record it by itself,
+        e.g. because it did not start yet, was killed, or died.
+
+        :param op_id: ID of the operation to be finished.
+        :param status: status to be recorded for the operation, e.g.
+            :data:`CANCELLED` or ``FAILED``.
+        :param output: the output to be recorded for the operation.
+        :param details: other keys to be recorded in the output file, if any.
+        :return: ``True`` if the output file was written, ``False`` if the
+            operation had already finished.
+
+        :raises:
+            :exc:`FileNotFoundError`: if the job file for operation *op_id*
+                could not be found.
+        """
+        content = self.read_job_file(op_id)
+        content["success"] = False
+        content["end_time"] = Operation.time_event_now()
+        content["output"] = output
+        content["status"] = status
+        content.update(details or {})
+
+        try:
+            self.write_output_file(op_id, content)
+        except FileExistsError:
+            return False
+
+        return True
+
     def write_output_file(self, op_id: str, content: Dict[str, Any]) -> None:
         """
         Create an output file to represent the output of an operation.
@@ -272,7 +809,8 @@ class OperationServer:
 
         .. note::
             Creating an output file means you are finishing the execution of
-            the operation.
+            the operation. Its marker file under :attr:`running_basedir` is
+            removed.
 
         :param content: content to be written into the created output file.
             Expects a Python dictionary which will be converted to JSON. It
@@ -294,24 +832,73 @@ class OperationServer:
             raise MalformedContent(msg)
 
         try:
-            self._write_file(self.get_output_file_path(op_id), content)
+            file_path = self._prepare_file_path(
+                self.get_output_file_path(op_id)
+            )
+            self._write_file(file_path, content)
         except FileExistsError:
             msg = f"Output file for operation '{op_id}' already exists"
             raise FileExistsError(msg)
 
+        self.remove_running_file(op_id)
+
+        self.append_event(
+            op_id,
+            "finished",
+            self._get_final_status(content),
+            content.get("operation_type"),
+        )
+
+    def append_event(
+        self,
+        op_id: str,
+        event: str,
+        status: str,
+        op_type: Optional[str] = None,
+    ) -> None:
+        """
+        Append an event about operation *op_id* to :attr:`events_file`.
+
+        .. note::
+            The event log is informational, so failures to write to it are
+            logged instead of raised.
+
+        :param op_id: ID of the operation.
+        :param event: what happened to the operation -- ``created``,
+            ``started``, ``retrying``, ``finished`` or ``withdrawn``.
+        :param status: status of the operation after the event.
+        :param op_type: type of the operation, if known.
+        """
+        content = {
+            "time": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "server_name": self.name,
+            "operation_id": op_id,
+            "operation_type": op_type,
+            "event": event,
+            "status": status,
+        }
+
+        try:
+            append_event(self.events_file, content)
+        except OSError as e:
+            log.warning(
+                "Could not log event of operation '%s': %s", op_id, e
+            )
+
     @staticmethod
     def _read_file(file_path: str) -> Dict[str, Any]:
         """
         Read file pointed by *file_path*.
 
-        File should contain JSON parsable content.
+        File should contain JSON parsable content, which is parsed straight
+        from bytes.
 
         :param file_path: path to the file to be read and parsed.
 
         :return: a Python dictionary with the contents of file *file_path*.
         """
-        with open(file_path) as fd:
-            return json.load(fd)
+        with open(file_path, "rb") as fd:
+            return json_backend.loads(fd.read())
 
     def read_job_file(self, op_id: str) -> Dict[str, Any]:
         """
@@ -349,17 +936,120 @@ class OperationServer:
             msg = f"Output file for operation '{op_id}' does not exist"
             raise FileNotFoundError(msg)
 
+    @staticmethod
+    def _is_shard_dir_name(name: str, length: int) -> bool:
+        """
+        Check if *name* looks like the name of a shard directory.
+
+        :param name: name of the directory entry.
+        :param length: expected length of the name -- ``4`` for years and
+            ``2`` for months.
+        :return: ``True`` if *name* is a number with *length* digits.
+        """
+        return len(name) == length and name.isdigit()
+
+    def _iter_op_ids(
+        self,
+        basedir: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        all_layouts: bool = False,
+    ) -> Iterator[str]:
+        """
+        Iterate over IDs of operations which have a file under *basedir*.
+
+        Files in the :attr:`FLAT_LAYOUT` are always looked up, while files in
+        the :attr:`SHARDED_LAYOUT` are looked up if that is the :attr:`layout`
+        in use. When filtering by date, whole shards which are out of the
+        range are skipped without being listed.
+
+        :param basedir: either :attr:`jobs_basedir` or :attr:`output_basedir`.
+        :param since: if given, skip operations created before this date.
+        :param until: if given, skip operations created after this date.
+        :param all_layouts: look up files in the :attr:`SHARDED_LAYOUT` even
+            if that is not the :attr:`layout` in use.
+        :yield: ID of each operation found under *basedir*.
+        """
+        include_shards = all_layouts or self.layout == self.SHARDED_LAYOUT
+        since_month = (since.year, since.month) if since else None
+        until_month = (until.year, until.month) if until else None
+
+        def in_range(op_id: str) -> bool:
+            if since is None and until is None:
+                return True
+
+            try:
+                date = datetime.strptime(op_id[:8], "%Y%m%d")
+            except ValueError:
+                # We cannot tell when the operation was created
+                return False
+
+            if since and date.date() < since.date():
+                return False
+
+            return not (until and date.date() > until.date())
+
+        def iter_files(dir_path: str) -> Iterator[str]:
+            for file_name in sorted(os.listdir(dir_path)):
+                if file_name.endswith(".json"):
+                    op_id = file_name[: -len(".json")]
+
+                    if in_range(op_id):
+                        yield op_id
+
+        for entry in sorted(os.listdir(basedir)):
+            if entry.endswith(".json"):
+                op_id = entry[: -len(".json")]
+
+                if in_range(op_id):
+                    yield op_id
+            elif include_shards and self._is_shard_dir_name(entry, 4):
+                year_dir = os.path.join(basedir, entry)
+
+                if not os.path.isdir(year_dir):
+                    continue
+
+                year = int(entry)
+
+                if (since_month and year < since_month[0]) or (
+                    until_month and year > until_month[0]
+                ):
+                    continue
+
+                for month_entry in sorted(os.listdir(year_dir)):
+                    if not self._is_shard_dir_name(month_entry, 2):
+                        continue
+
+                    month = (year, int(month_entry))
+
+                    if (since_month and month < since_month) or (
+                        until_month and month > until_month
+                    ):
+                        continue
+
+                    month_dir = os.path.join(year_dir, month_entry)
+
+                    if os.path.isdir(month_dir):
+                        yield from iter_files(month_dir)
+
     def get_operations_list(
-        self, op_type: Optional[OperationType] = None
+        self,
+        op_type: Optional[OperationType] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
     ) -> List[Dict[str, Any]]:
         """
         Get the list of operations of this Barman server or instance.
 
         Fetch operation from all ``.json`` files found under the
-        :attr:`jobs_basedir` of this server or instance.
+        :attr:`jobs_basedir` of this server or instance, in any layout.
 
         :param op_type: if ``None`` retrieve all operations. If something other
             than ``None``, filter by the given type.
+        :param since: if given, only retrieve operations created on this date
+            or later.
+        :param until: if given, only retrieve operations created on this date
+            or earlier.
 
         :return: list of operations of this Barman server or instance. Each
             item has the following keys:
@@ -370,12 +1060,7 @@ class OperationServer:
         op_type_aux: Optional[str] = op_type.value if op_type else None
         jobs_list = []
 
-        for job_file in os.listdir(self.jobs_basedir):
-            if not job_file.endswith(".json"):
-                continue
-
-            op_id, _ = job_file.split(".json")
-
+        for op_id in self._iter_op_ids(self.jobs_basedir, since, until):
             content = self.read_job_file(op_id)
             operation_type = content.get("operation_type")
 
@@ -389,49 +1074,362 @@ class OperationServer:
 
         return jobs_list
 
-    def get_operation_status(self, op_id: str) -> str:
+    def get_resource_totals(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Dict[str, Dict[str, Any]]:
         """
-        Get the status of the operation *op_id*.
+        Aggregate the resources used by finished operations, by type.
 
-        :param op_id: ID of the operation which status should be retrieved.
-        :return: status of the operation. Can be one among: ``DONE``,
-            ``FAILED``, or ``IN_PROGRESS``.
+        Fetch the ``resources`` recorded in all ``.json`` files found under
+        the :attr:`output_basedir` of this server or instance. Operations
+        finished by versions of pg-backup-api which did not record them are
+        skipped.
 
-        :raises:
-            :exc:`OperationNotExists`: if trying to query the status of a
-                non-existing operation.
+        :param since: if given, only consider operations created on this date
+            or later.
+        :param until: if given, only consider operations created on this date
+            or earlier.
+        :return: totals keyed by operation type, each one with these keys:
+
+            * ``count``: number of operations which recorded their resources;
+            * ``wall_time``, ``user_time``, ``system_time``, ``block_input``,
+              ``block_output``, ``read_bytes`` and ``write_bytes``: sum of the
+              values recorded by those operations;
+            * ``max_rss_kb``: largest value recorded by those operations.
         """
-        try:
+        totals: Dict[str, Dict[str, Any]] = {}
+
+        for op_id in self._iter_op_ids(self.output_basedir, since, until):
             content = self.read_output_file(op_id)
-            return "DONE" if content.get("success") else "FAILED"
-        except FileNotFoundError:
-            pass
+            resources = content.get("resources")
 
-        try:
-            _ = self.read_job_file(op_id)
-            return "IN_PROGRESS"
-        except FileNotFoundError:
-            raise OperationNotExists(f"Operation '{op_id}' does not exist")
+            if not resources:
+                continue
 
+            total = totals.setdefault(
+                content.get("operation_type") or DEFAULT_OP_TYPE.value,
+                {"count": 0, "max_rss_kb": 0},
+            )
+            total["count"] += 1
 
-class Operation:
-    """
-    Contain information about an operation of the pg-backup-api.
+            for key, value in resources.items():
+                if value is None:
+                    continue
 
-    Can be used to create a new operation, or to fetch operation from an
-    existing operation.
+                if key == "max_rss_kb":
+                    total[key] = max(total[key], value)
+                else:
+                    total[key] = total.get(key, 0) + value
 
-    This is a superclass. You are expected to inherit from this class to create
-    a new operation in the pg-backup-api, and to define at least
+        for total in totals.values():
+            for key in ("wall_time", "user_time", "system_time"):
+                if key in total:
+                    total[key] = round(total[key], 3)
+
+        return totals
+
+    def migrate_layout(self, layout: str) -> int:
+        """
+        Move the files of existing operations to *layout*.
+
+        Both job and output files are moved. Files of operations whose ID does
+        not start with a date are kept in the :attr:`FLAT_LAYOUT`.
+
+        :param layout: either :attr:`FLAT_LAYOUT` or :attr:`SHARDED_LAYOUT`.
+        :return: number of files that have been moved.
+
+        :raises:
+            :exc:`ValueError`: if *layout* is not a known layout.
+        """
+        if layout not in (self.FLAT_LAYOUT, self.SHARDED_LAYOUT):
+            raise ValueError(f"Invalid operations layout '{layout}'")
+
+        moved = 0
+
+        for basedir in (self.jobs_basedir, self.output_basedir):
+            for op_id in list(self._iter_op_ids(basedir, all_layouts=True)):
+                flat_path = os.path.join(basedir, f"{op_id}.json")
+                shard = self._get_shard(op_id)
+
+                if shard is None:
+                    continue
+
+                sharded_path = os.path.join(basedir, *shard, f"{op_id}.json")
+
+                if layout == self.SHARDED_LAYOUT:
+                    src, dst = flat_path, sharded_path
+                else:
+                    src, dst = sharded_path, flat_path
+
+                if not os.path.exists(src) or os.path.exists(dst):
+                    continue
+
+                self._create_dir(os.path.dirname(dst))
+                os.replace(src, dst)
+                moved += 1
+
+        return moved
+
+    @staticmethod
+    def _get_final_status(content: Dict[str, Any]) -> str:
+        """
+        Get the status of a finished operation from its output file *content*.
+
+        :param content: content of the output file of the operation.
+        :return: the ``status`` recorded in *content*. If not recorded, e.g.
+            by older versions of pg-backup-api, ``DONE`` or ``FAILED``
+            depending on its ``success``.
+        """
+        return content.get("status") or (
+            "DONE" if content.get("success") else "FAILED"
+        )
+
+    def get_operation_status(self, op_id: str) -> str:
+        """
+        Get the status of the operation *op_id*.
+
+        :param op_id: ID of the operation which status should be retrieved.
+        :return: status of the operation. Can be one among: ``DONE``,
+            ``FAILED``, :data:`TIMED_OUT`, :data:`CANCELLED`,
+            :data:`SUPERSEDED`, or ``IN_PROGRESS``.
+
+        :raises:
+            :exc:`OperationNotExists`: if trying to query the status of a
+                non-existing operation.
+        """
+        try:
+            return self._get_final_status(self.read_output_file(op_id))
+        except FileNotFoundError:
+            pass
+
+        try:
+            _ = self.read_job_file(op_id)
+            return "IN_PROGRESS"
+        except FileNotFoundError:
+            raise OperationNotExists(f"Operation '{op_id}' does not exist")
+
+    def get_operation_steps(
+        self, op_id: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the status of each step of the pipeline operation *op_id*.
+
+        :param op_id: ID of the operation.
+        :return: ``None`` if *op_id* is not a pipeline operation, otherwise a
+            list with one item for each step, in order, with these keys:
+
+            * ``type``: type of the step;
+            * ``operation_id``: ID of the operation created for the step, or
+              ``None`` if the step did not start;
+            * ``status``: status of the step. Besides the statuses returned
+              by :meth:`get_operation_status`, ``PENDING`` if the step did
+              not start yet, or :data:`SKIPPED` if it never will.
+
+        :raises:
+            :exc:`OperationNotExists`: if trying to query the steps of a
+                non-existing operation.
+        """
+        finished = True
+
+        try:
+            content = self.read_output_file(op_id)
+        except FileNotFoundError:
+            finished = False
+
+            try:
+                content = self.read_job_file(op_id)
+            except FileNotFoundError:
+                msg = f"Operation '{op_id}' does not exist"
+                raise OperationNotExists(msg)
+
+        if content.get("operation_type") != OperationType.PIPELINE.value:
+            return None
+
+        steps = []
+
+        for step in content.get("steps", []):
+            step_id = step.get("operation_id")
+            status = step.get("status")
+
+            if status is None and step_id is not None:
+                # Still running, or the runner of the pipeline is gone
+                server_name = self.name
+
+                if step["type"] == OperationType.CONFIG_UPDATE.value:
+                    server_name = None
+
+                step_server = OperationServer(server_name, load_config=False)
+                status = step_server.get_operation_status(step_id)
+            elif status is None:
+                status = SKIPPED if finished else "PENDING"
+
+            steps.append(
+                {
+                    "type": step["type"],
+                    "operation_id": step_id,
+                    "status": status,
+                }
+            )
+
+        return steps
+
+
+def get_events_files(
+    server_names: Optional[List[Optional[str]]] = None,
+) -> Dict[str, str]:
+    """
+    Get the path to the event logs of Barman servers and instance.
+
+    .. note::
+        The Barman configuration is expected to be already loaded.
+
+    :param server_names: names of the Barman servers, ``None`` standing for
+        the Barman instance. If not given, the Barman instance and all the
+        configured Barman servers.
+    :return: path to each event log, keyed by server name, an empty string
+        standing for the Barman instance.
+    """
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(barman.__config__, BarmanConfig)
+
+    barman_home = barman.__config__.barman_home
+
+    names: List[Optional[str]] = [None]
+
+    if server_names is None:
+        names.extend(barman.__config__.server_names())
+    else:
+        names = server_names
+
+    return {
+        name or "": join(barman_home, name or "", EVENTS_FILE_NAME)
+        for name in names
+    }
+
+
+class RetryPolicy:
+    """
+    Describe when, and how, a failed operation is run again.
+
+    :ivar max_attempts: maximum number of times the operation is run. ``1``
+        means it's never retried.
+    :ivar backoff: number of seconds to wait before the first retry. The wait
+        doubles on each retry.
+    :ivar max_backoff: maximum number of seconds to wait before a retry.
+    :ivar exit_codes: exit codes of failed attempts which can be retried.
+    :ivar output_pattern: regular expression which, if found in the output of
+        a failed attempt, means it can be retried.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 1,
+        backoff: float = 0.0,
+        max_backoff: float = 0.0,
+        exit_codes: Optional[Set[int]] = None,
+        output_pattern: Optional["re.Pattern[str]"] = None,
+    ) -> None:
+        """
+        Initialize a new instance of :class:`RetryPolicy`.
+
+        :param max_attempts: maximum number of times the operation is run.
+        :param backoff: number of seconds to wait before the first retry.
+        :param max_backoff: maximum number of seconds to wait before a retry.
+        :param exit_codes: exit codes of failed attempts which can be retried.
+        :param output_pattern: regular expression which, if found in the
+            output of a failed attempt, means it can be retried.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.exit_codes = exit_codes or set()
+        self.output_pattern = output_pattern
+
+    def get_delay(self, attempt: int) -> float:
+        """
+        Get how long to wait before retrying after attempt number *attempt*.
+
+        :param attempt: number of the attempt which failed, starting at ``1``.
+        :return: number of seconds to wait.
+        """
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def is_retryable(self, output: str, retcode: int) -> bool:
+        """
+        Check if a failed attempt can be retried.
+
+        :param output: output of the attempt.
+        :param retcode: exit code of the attempt.
+        :return: ``True`` if *retcode* is one of :attr:`exit_codes`, or
+            :attr:`output_pattern` is found in *output*.
+        """
+        if retcode in self.exit_codes:
+            return True
+
+        return bool(self.output_pattern and self.output_pattern.search(output))
+
+
+class Operation:
+    """
+    Contain information about an operation of the pg-backup-api.
+
+    Can be used to create a new operation, or to fetch operation from an
+    existing operation.
+
+    This is a superclass. You are expected to inherit from this class to create
+    a new operation in the pg-backup-api, and to define at least
     :meth:`_run_logic` when doing that.
 
+    The subprocess of an operation is killed if it runs for longer than the
+    ``<TYPE>_TIMEOUT`` setting, or produces no output for longer than the
+    ``<TYPE>_IDLE_TIMEOUT`` setting, where ``<TYPE>`` is the upper-cased
+    value of :attr:`TYPE`, e.g. ``RECOVERY_TIMEOUT``. Both are given in
+    seconds, and ``0`` -- the default -- disables them.
+
+    Failed operations can be retried, as given by :meth:`_get_retry_policy`.
+
+    Operations are dispatched by priority, see :mod:`pg_backup_api.executor`.
+    The priority can be given through the ``priority`` key of the job file,
+    otherwise the ``<TYPE>_PRIORITY`` setting, or :attr:`DEFAULT_PRIORITY`,
+    is used.
+
     :ivar server: an instance of :class:`OperationServer`. Used for helping
         with management of this operation.
     :ivar id: ID of this operation.
+    :cvar DEFAULT_PRIORITY: priority of operations of this type, unless
+        configured otherwise.
+    :cvar MAX_PRIORITY: highest priority an operation may be given.
+    :ivar priority: priority of this operation, as recorded in its job file.
+    :ivar timed_out: why the subprocess of this operation was killed, if it
+        timed out, otherwise ``None``.
+    :ivar cancelled: if this operation was cancelled, see :meth:`cancel`.
+    :ivar merged_ids: IDs of other operations merged into this one by the
+        executor, which are run along with it by the same runner. See
+        :class:`ConfigUpdateOperation`.
+    :ivar attempts: details of each time this operation was run, if it can be
+        retried, see :meth:`run`.
+
+    :cvar DEFAULT_RETRY_OUTPUT_PATTERN: regular expression which, if found in
+        the output of a failed attempt, means it can be retried, unless
+        configured otherwise.
     """
 
+    TYPE: OperationType
+    DEFAULT_PRIORITY = 0
+    MAX_PRIORITY = 100
+    DEFAULT_RETRY_OUTPUT_PATTERN = ""
+
+    # Number of seconds to wait for the subprocess to exit after sending it
+    # SIGTERM, before sending it SIGKILL.
+    _KILL_GRACE_PERIOD = 10.0
+
     def __init__(
-        self, server_name: Optional[str], id: Optional[str] = None
+        self,
+        server_name: Optional[str],
+        id: Optional[str] = None,
+        load_config: bool = True,
     ) -> None:
         """
         Initialize a new instance of :class:`Operation`.
@@ -441,9 +1439,24 @@ class Operation:
         :param id: ID of the operation. Useful when querying an existing
             operation. Use ``None`` when creating an operation, so this class
             generates a new ID.
+        :param load_config: if the Barman configuration should be reloaded.
+            See :meth:`OperationServer.__init__`.
         """
-        self.server = OperationServer(server_name)
+        self.server = OperationServer(server_name, load_config=load_config)
+        self._auto_id = id is None
         self.id = id or self._generate_id()
+        self.priority = self.DEFAULT_PRIORITY
+        self.timed_out: Optional[str] = None
+        self.cancelled = False
+        self._process: Optional["subprocess.Popen[bytes]"] = None
+        # When the process group is killed, if still running after being
+        # cancelled, as a value of :func:`time.monotonic`
+        self._cancel_deadline: Optional[float] = None
+        # Write end of a pipe which wakes up :meth:`_run_subprocess`
+        self._wakeup_fd: Optional[int] = None
+        self._runner: Optional[Dict[str, Any]] = None
+        self.merged_ids: List[str] = []
+        self.attempts: List[Dict[str, Any]] = []
 
     @staticmethod
     def _generate_id() -> str:
@@ -463,6 +1476,41 @@ class Operation:
         """
         return datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")
 
+    @classmethod
+    def parse_priority(cls, content: Dict[str, Any]) -> int:
+        """
+        Get the priority of an operation from the content of its job file.
+
+        :param content: Python dictionary representing the JSON content of the
+            job file.
+        :return: the ``priority`` key of *content* if present, otherwise the
+            ``<TYPE>_PRIORITY`` setting, or :attr:`DEFAULT_PRIORITY`.
+
+        :raises:
+            :exc:`MalformedContent`: if the ``priority`` key of *content* is
+                not an integer between ``0`` and :attr:`MAX_PRIORITY`.
+        """
+        if "priority" not in content:
+            return get_setting(
+                f"{cls.TYPE.value.upper()}_PRIORITY", cls.DEFAULT_PRIORITY, int
+            )
+
+        priority = content["priority"]
+
+        # ``bool`` is a subclass of ``int``, so it's checked apart
+        if (
+            not isinstance(priority, int)
+            or isinstance(priority, bool)
+            or not 0 <= priority <= cls.MAX_PRIORITY
+        ):
+            msg = (
+                "`priority` is expected to be an integer between 0 and "
+                f"{cls.MAX_PRIORITY}, but `{priority}` was found instead."
+            )
+            raise MalformedContent(msg)
+
+        return priority
+
     @property
     def job_file(self) -> str:
         """Path to the job file of this operation."""
@@ -501,24 +1549,91 @@ class Operation:
         """
         Write the job file of this operation.
 
+        If the ID was generated by this class, and another operation has been
+        created with the same ID in the meantime -- IDs have a resolution of
+        one second --, a numeric suffix is appended to the ID until it is
+        unique.
+
         .. note::
             See :meth:`OperationServer.write_job_file` for more details.
 
         :param content: a Python dictionary representing the JSON content of
-            the job file.
+            the job file. The ``priority`` key is added, if missing, as given
+            by :meth:`parse_priority`. The ``queued_by`` key is set to the PID
+            and start time of the current process, which queues the operation
+            in its :class:`~pg_backup_api.executor.OperationExecutor`, so an
+            operation lost in a restart of the REST API can be told apart
+            from one still waiting in the queue of another process.
+
+        :raises:
+            :exc:`MalformedContent`: if *content* has an invalid priority.
         """
-        self.server.write_job_file(self.id, content)
+        content["priority"] = self.priority = self.parse_priority(content)
+        pid = os.getpid()
+        content["queued_by"] = {
+            "pid": pid,
+            "start_time": get_process_start_time(pid),
+        }
+        base_id = self.id
+        suffix = 0
+
+        while True:
+            try:
+                self.server.write_job_file(self.id, content)
+                return
+            except FileExistsError:
+                if not self._auto_id:
+                    raise
+
+                suffix += 1
+                self.id = f"{base_id}-{suffix}"
+
+    def update_job_file(self, changes: Dict[str, Any]) -> None:
+        """
+        Update the job file of this operation.
+
+        .. note::
+            See :meth:`OperationServer.update_job_file` for more details.
+
+        :param changes: keys to be added to, or replaced in, the job file.
+        """
+        self.server.update_job_file(self.id, changes)
 
     def write_output_file(self, content: Dict[str, Any]) -> None:
         """
         Write the output file of this operation.
 
+        The operations in :attr:`merged_ids` get their own output file too,
+        with the same status, pointing to this operation through the
+        ``merged_into`` key. The resources used are only recorded for this
+        operation, so they are not counted several times.
+
         .. note::
             See :meth:`OperationServer.write_output_file` for more details.
 
         :param content: a Python dictionary representing the JSON content of
             the output file.
         """
+        for merged_id in self.merged_ids:
+            merged_content = self.server.read_job_file(merged_id)
+            merged_content.update(
+                {
+                    key: content[key]
+                    for key in ("success", "end_time", "status")
+                    if key in content
+                }
+            )
+            merged_content["merged_into"] = self.id
+            merged_content["output"] = (
+                f"Run along with operation '{self.id}':\n{content['output']}"
+            )
+
+            try:
+                self.server.write_output_file(merged_id, merged_content)
+            except FileExistsError:
+                # Finished by the REST API in the meantime, e.g. cancelled
+                pass
+
         self.server.write_output_file(self.id, content)
 
     def get_status(self) -> str:
@@ -529,17 +1644,292 @@ class Operation:
             See :meth:`OperationServer.get_operation_status` for more details.
 
         :return: status of this operation. Can be one among: ``DONE``,
-            ``FAILED``, or ``IN_PROGRESS``.
+            ``FAILED``, :data:`TIMED_OUT`, :data:`CANCELLED`,
+            :data:`SUPERSEDED`, or ``IN_PROGRESS``.
         """
         return self.server.get_operation_status(self.id)
 
-    @staticmethod
+    def record_runner(self) -> None:
+        """
+        Record the current process as the runner of this operation.
+
+        Its PID and start time are recorded under the ``runner`` key of the
+        job file, so the runner can be signalled to cancel the operation, or
+        found to be gone. The ``process_group`` of the operation subprocess is
+        added once it's started.
+
+        A background thread then records a heartbeat every
+        ``HEARTBEAT_INTERVAL`` seconds, until the operation finishes.
+
+        The same is done for the operations in :attr:`merged_ids`, which also
+        get a ``merged_into`` key. Those which already finished, e.g. because
+        they were cancelled, are left out of :attr:`merged_ids`.
+        """
+        pid = os.getpid()
+        self._runner = {
+            "pid": pid,
+            "start_time": get_process_start_time(pid),
+            "process_group": None,
+        }
+        self.merged_ids = [
+            merged_id
+            for merged_id in self.merged_ids
+            if not os.path.exists(self.server.get_output_file_path(merged_id))
+        ]
+        self._update_runner()
+
+        for op_id in [self.id] + self.merged_ids:
+            self.server.heartbeat(op_id)
+
+        interval = get_setting(
+            "HEARTBEAT_INTERVAL", DEFAULT_HEARTBEAT_INTERVAL, float
+        )
+        threading.Thread(
+            target=self._heartbeat,
+            args=(interval,),
+            name="pg-backup-api-heartbeat",
+            daemon=True,
+        ).start()
+
+    def hand_over(self) -> bool:
+        """
+        Hand the run of this operation over to the first one merged into it.
+
+        Used when this operation finished before being run, e.g. because it
+        was cancelled while queued, so the operations merged into it are run
+        nonetheless. This instance then represents the first operation in
+        :attr:`merged_ids`, which leads the run of the other ones.
+
+        :return: ``False`` if no operation is merged into this one.
+        """
+        if not self.merged_ids:
+            return False
+
+        self.id = self.merged_ids.pop(0)
+        self.update_job_file({"merged_into": None})
+        self._update_runner()
+        return True
+
+    def _heartbeat(self, interval: float) -> None:
+        """
+        Record a heartbeat every *interval* seconds, until finished.
+
+        :param interval: number of seconds between heartbeats.
+        """
+        while True:
+            time.sleep(interval)
+
+            for merged_id in self.merged_ids:
+                self.server.heartbeat(merged_id)
+
+            if not self.server.heartbeat(self.id):
+                return
+
+    def _update_runner(self) -> None:
+        """
+        Record the runner in the job files of this operation and merged ones.
+        """
+        self.update_job_file({"runner": self._runner})
+
+        for merged_id in self.merged_ids:
+            self.server.update_job_file(
+                merged_id, {"runner": self._runner, "merged_into": self.id}
+            )
+
+    def cancel(self) -> None:
+        """
+        Cancel this operation.
+
+        Send SIGTERM to the process group of the operation subprocess, if
+        it's running, or prevent it from starting otherwise.
+        :meth:`_run_subprocess` then waits for the process group to exit, and
+        kills it if still running after :attr:`_KILL_GRACE_PERIOD` seconds.
+
+        .. note::
+            Called by the signal handler of the runner when it receives
+            SIGTERM, so it does not block, log, nor reap processes.
+        """
+        self.cancelled = True
+
+        if self._cancel_deadline is not None:
+            return
+
+        self._cancel_deadline = time.monotonic() + self._KILL_GRACE_PERIOD
+        process = self._process
+
+        if process is not None and process.returncode is None:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        wakeup_fd = self._wakeup_fd
+
+        if wakeup_fd is not None:
+            try:
+                os.write(wakeup_fd, b"\0")
+            except OSError:
+                pass
+
+    def _get_timeouts(self) -> Tuple[float, float]:
+        """
+        Get the timeouts of the subprocess of this operation.
+
+        :return: a tuple consisting of:
+
+            * maximum number of seconds the subprocess may run for;
+            * maximum number of seconds the subprocess may run for without
+              producing any output.
+
+            ``0`` means no limit.
+        """
+        prefix = self.TYPE.value.upper()
+        return (
+            get_setting(f"{prefix}_TIMEOUT", 0.0, float),
+            get_setting(f"{prefix}_IDLE_TIMEOUT", 0.0, float),
+        )
+
+    def _throttle(self, cmd: List[str]) -> List[str]:
+        """
+        Wrap *cmd* so its whole process tree is throttled, as configured.
+
+        So operations do not starve ``barman backup`` and WAL archiving on the
+        same host, these settings can be given, where ``<TYPE>`` is the type
+        of this operation, e.g. ``RECOVERY``:
+
+        * ``<TYPE>_NICE``: niceness of the processes, set through ``nice``.
+          ``0``, the default, leaves it unchanged;
+        * ``<TYPE>_IONICE_CLASS``: I/O scheduling class of the processes, set
+          through ``ionice``. Either ``best-effort`` or ``idle``, by default
+          unchanged. ``<TYPE>_IONICE_LEVEL``, between ``0`` and ``7``, gives
+          the priority within the ``best-effort`` class;
+        * ``<TYPE>_CGROUP``: path to a cgroup v2 directory, e.g.
+          ``/sys/fs/cgroup/pg-backup-api/recovery``, which the processes are
+          moved into. ``<TYPE>_CGROUP_CPU_WEIGHT``,
+          ``<TYPE>_CGROUP_IO_WEIGHT`` and ``<TYPE>_CGROUP_CPU_MAX``, if set,
+          are written to its ``cpu.weight``, ``io.weight`` and ``cpu.max``
+          files.
+
+        Children, e.g. ``ssh`` and ``rsync`` of ``barman recover``, inherit all
+        of them.
+
+        .. note::
+            Throttling never prevents an operation from running. Settings
+            which cannot be applied are logged, and ignored.
+
+        :param cmd: list of strings composing the command to be ran.
+        :return: the command to be ran instead of *cmd*.
+        """
+        prefix = self.TYPE.value.upper()
+        ionice_class = get_setting(f"{prefix}_IONICE_CLASS", "", str)
+        cgroup = get_setting(f"{prefix}_CGROUP", "", str)
+
+        if ionice_class:
+            classes = {"best-effort": "2", "idle": "3"}
+
+            if ionice_class not in classes:
+                log.warning("Ignoring unknown I/O class '%s'", ionice_class)
+            elif shutil.which("ionice") is None:
+                log.warning("Ignoring I/O class, as ionice is not available")
+            else:
+                ionice = ["ionice", "-c", classes[ionice_class]]
+
+                if ionice_class == "best-effort":
+                    try:
+                        level = get_setting(f"{prefix}_IONICE_LEVEL", 4, int)
+
+                        if not 0 <= level <= 7:
+                            raise ValueError(f"{level} is not between 0 and 7")
+                    except ValueError as e:
+                        log.warning("Ignoring invalid I/O level: %s", e)
+                    else:
+                        ionice += ["-n", str(level)]
+
+                cmd = ionice + cmd
+
+        try:
+            nice = get_setting(f"{prefix}_NICE", 0, int)
+        except ValueError as e:
+            log.warning("Ignoring invalid niceness: %s", e)
+        else:
+            if nice:
+                cmd = ["nice", "-n", str(nice)] + cmd
+
+        if cgroup:
+            limits = {
+                file_name: get_setting(f"{prefix}_CGROUP_{name}", "", str)
+                for file_name, name in (
+                    ("cpu.weight", "CPU_WEIGHT"),
+                    ("io.weight", "IO_WEIGHT"),
+                    ("cpu.max", "CPU_MAX"),
+                )
+            }
+
+            try:
+                os.makedirs(cgroup, exist_ok=True)
+
+                for file_name, value in limits.items():
+                    if value:
+                        with open(join(cgroup, file_name), "w") as f:
+                            f.write(value)
+            except OSError as e:
+                log.warning("Ignoring cgroup '%s': %s", cgroup, e)
+            else:
+                # The shell moves itself into the cgroup before running the
+                # command, so no child is started outside of it
+                script = 'echo $$ > "$0"; exec "$@"'
+                cmd = ["sh", "-c", script, join(cgroup, "cgroup.procs")] + cmd
+
+        return cmd
+
+    def _kill_process_group(
+        self,
+        process: "subprocess.Popen[bytes]",
+        deadline: Optional[float] = None,
+    ) -> None:
+        """
+        Kill the process group led by *process*.
+
+        SIGTERM is sent first, and SIGKILL after :attr:`_KILL_GRACE_PERIOD`
+        seconds, so processes still running, e.g. ``ssh`` or ``rsync``
+        children of ``barman recover``, do not outlive the operation.
+
+        :param process: the leader of the process group.
+        :param deadline: if given, SIGTERM was already sent, and SIGKILL is
+            sent at this value of :func:`time.monotonic`.
+        """
+        if deadline is None:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                return
+
+            deadline = time.monotonic() + self._KILL_GRACE_PERIOD
+
+        try:
+            process.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            pass
+
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
     def _run_subprocess(
+        self,
         cmd: List[str],
     ) -> Tuple[Union[str, bytearray, memoryview], Union[int, Any]]:
         """
         Run *cmd* as a subprocess.
 
+        .. note::
+            The subprocess runs in its own process group, which is killed if
+            it exceeds the timeouts given by :meth:`_get_timeouts`. In that
+            case :attr:`timed_out` is set, and the reason is appended to the
+            output. It's also killed if the operation is cancelled, see
+            :meth:`cancel`. It's throttled as given by :meth:`_throttle`.
+
         :param cmd: list of strings composing the command to be ran.
 
         :return: a tuple consisting of:
@@ -547,12 +1937,119 @@ class Operation:
             * ``stdout``/``stderr`` of the command;
             * exit code of the command.
         """
+        if self.cancelled:
+            return "Operation cancelled\n", 1
+
+        timeout, idle_timeout = self._get_timeouts()
         process = subprocess.Popen(
-            cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE
+            self._throttle(cmd),
+            stderr=subprocess.STDOUT,
+            stdout=subprocess.PIPE,
+            start_new_session=True,
         )
-        stdout, _ = process.communicate()
-        stdout = stdout.decode() if isinstance(stdout, bytes) else stdout
-        return stdout, process.returncode
+        self._process = process
+
+        if self.cancelled:
+            # Cancelled while the subprocess was being started
+            self._cancel_deadline = None
+            self.cancel()
+        elif self._runner is not None:
+            self._runner["process_group"] = process.pid
+            self._update_runner()
+
+            if any(
+                os.path.exists(self.server.get_output_file_path(op_id))
+                for op_id in [self.id] + self.merged_ids
+            ):
+                # Cancelled by the REST API while the subprocess was being
+                # started, before it could find the process group to signal.
+                # The changes of merged operations cannot be taken back
+                # either, so the whole run is cancelled.
+                self.cancel()
+
+        stdout = process.stdout
+
+        if TYPE_CHECKING:  # pragma: no cover
+            assert stdout is not None
+
+        output = bytearray()
+        start = last_output = time.monotonic()
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_w, False)
+        self._wakeup_fd = wakeup_w
+
+        with stdout, selectors.DefaultSelector() as selector:
+            selector.register(stdout.fileno(), selectors.EVENT_READ)
+            selector.register(wakeup_r, selectors.EVENT_READ)
+
+            while True:
+                now = time.monotonic()
+                deadlines = []
+
+                if self._cancel_deadline is not None:
+                    if now >= self._cancel_deadline:
+                        break
+                    deadlines.append(self._cancel_deadline)
+
+                if timeout:
+                    if now - start >= timeout:
+                        self.timed_out = f"ran for more than {timeout} seconds"
+                        break
+                    deadlines.append(start + timeout)
+
+                if idle_timeout:
+                    if now - last_output >= idle_timeout:
+                        self.timed_out = (
+                            f"produced no output for {idle_timeout} seconds"
+                        )
+                        break
+                    deadlines.append(last_output + idle_timeout)
+
+                wait = min(deadlines) - now if deadlines else None
+                ready = {key.fd for key, _ in selector.select(wait)}
+
+                if wakeup_r in ready:
+                    # Cancelled, the deadline is checked on the next round
+                    os.read(wakeup_r, 1024)
+
+                if stdout.fileno() not in ready:
+                    continue
+
+                chunk = os.read(stdout.fileno(), 65536)
+
+                if not chunk:
+                    break
+
+                output += chunk
+                last_output = time.monotonic()
+
+        self._wakeup_fd = None
+        os.close(wakeup_r)
+        os.close(wakeup_w)
+
+        if self.timed_out is None and not self.cancelled and timeout:
+            remaining = start + timeout - time.monotonic()
+
+            try:
+                process.wait(timeout=max(remaining, 0))
+            except subprocess.TimeoutExpired:
+                self.timed_out = f"ran for more than {timeout} seconds"
+
+        if self.timed_out is not None:
+            log.error(
+                "Killing operation '%s', as it %s", self.id, self.timed_out
+            )
+            self._kill_process_group(process)
+            output += f"\nOperation timed out: {self.timed_out}\n".encode()
+        elif self._cancel_deadline is not None:
+            log.info("Cancelled operation '%s'", self.id)
+            self._kill_process_group(process, self._cancel_deadline)
+
+        if self.cancelled:
+            output += b"\nOperation cancelled\n"
+
+        process.wait()
+        return output.decode(), process.returncode
 
     @abstractmethod
     def _run_logic(
@@ -571,20 +2068,156 @@ class Operation:
         """
         pass
 
+    def _get_retry_policy(self) -> RetryPolicy:
+        """
+        Get the retry policy of this operation.
+
+        It's given by these settings, where ``<TYPE>`` is the upper-cased
+        value of :attr:`TYPE`, e.g. ``RECOVERY``:
+
+        * ``<TYPE>_RETRY_MAX_ATTEMPTS``: maximum number of times the
+          operation is run. ``1``, the default, disables retries;
+        * ``<TYPE>_RETRY_BACKOFF``: number of seconds to wait before the first
+          retry, ``10`` by default. The wait doubles on each retry, up to
+          ``<TYPE>_RETRY_MAX_BACKOFF`` seconds, ``300`` by default;
+        * ``<TYPE>_RETRY_EXIT_CODES``: comma separated exit codes of failed
+          attempts which can be retried;
+        * ``<TYPE>_RETRY_OUTPUT_PATTERN``: regular expression which, if found
+          in the output of a failed attempt, means it can be retried. By
+          default :attr:`DEFAULT_RETRY_OUTPUT_PATTERN`.
+
+        .. note::
+            Settings which cannot be parsed are logged, and ignored.
+
+        :return: the retry policy.
+        """
+        prefix = f"{self.TYPE.value.upper()}_RETRY"
+        exit_codes = get_setting(f"{prefix}_EXIT_CODES", "", str)
+        pattern = get_setting(
+            f"{prefix}_OUTPUT_PATTERN", self.DEFAULT_RETRY_OUTPUT_PATTERN, str
+        )
+
+        try:
+            policy = RetryPolicy(
+                get_setting(f"{prefix}_MAX_ATTEMPTS", 1, int),
+                get_setting(f"{prefix}_BACKOFF", 10.0, float),
+                get_setting(f"{prefix}_MAX_BACKOFF", 300.0, float),
+            )
+        except ValueError as e:
+            log.warning("Ignoring invalid %s settings: %s", prefix, e)
+            return RetryPolicy()
+
+        try:
+            policy.exit_codes = {
+                int(code) for code in exit_codes.split(",") if code.strip()
+            }
+        except ValueError:
+            log.warning("Ignoring invalid retry exit codes '%s'", exit_codes)
+
+        if pattern:
+            try:
+                policy.output_pattern = re.compile(pattern)
+            except re.error as e:
+                log.warning(
+                    "Ignoring invalid retry output pattern '%s': %s",
+                    pattern,
+                    e,
+                )
+
+        return policy
+
+    def _wait_retry(self, delay: float) -> None:
+        """
+        Wait *delay* seconds before retrying, unless cancelled meanwhile.
+
+        :param delay: number of seconds to wait.
+        """
+        deadline = time.monotonic() + delay
+
+        while not self.cancelled:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                return
+
+            # Woken up regularly, as :meth:`cancel` cannot wake this up
+            time.sleep(min(remaining, 1.0))
+
     def run(self) -> Tuple[Union[str, bytearray, memoryview], Union[int, Any]]:
         """
         Run the operation.
 
+        If the operation fails, and the failure can be retried as given by
+        :meth:`_get_retry_policy`, it's run again after a backoff, up to the
+        maximum number of attempts. Operations which timed out or were
+        cancelled are not retried.
+
+        When retries are enabled, each attempt is recorded in
+        :attr:`attempts`, and under the ``attempts`` key of the job file,
+        with its ``start_time``, ``end_time`` and ``exit_code``. A
+        ``retrying`` event is appended to the event log of the operation
+        before each retry.
+
         .. note::
             Make sure to not call this method twice or more for the same
             operation.
 
         :return: a tuple consisting of:
 
-            * output of the operation;
-            * return code of the operation.
-        """
-        return self._run_logic()
+            * output of the operation. If it was retried, the output of all
+              attempts;
+            * return code of the last attempt.
+        """
+        policy = self._get_retry_policy()
+
+        if policy.max_attempts <= 1:
+            return self._run_logic()
+
+        previous_output = ""
+
+        while True:
+            start_time = self.time_event_now()
+            output, retcode = self._run_logic()
+            attempt = len(self.attempts) + 1
+            self.attempts.append(
+                {
+                    "attempt": attempt,
+                    "start_time": start_time,
+                    "end_time": self.time_event_now(),
+                    "exit_code": retcode,
+                }
+            )
+            self.update_job_file({"attempts": self.attempts})
+
+            if (
+                not retcode
+                or self.cancelled
+                or self.timed_out is not None
+                or attempt >= policy.max_attempts
+                or not policy.is_retryable(str(output), retcode)
+            ):
+                return previous_output + str(output), retcode
+
+            delay = policy.get_delay(attempt)
+            log.warning(
+                "Attempt %s of operation '%s' failed with exit code %s, "
+                "retrying in %s seconds",
+                attempt,
+                self.id,
+                retcode,
+                delay,
+            )
+            previous_output += (
+                f"{output}\nAttempt {attempt} failed with exit code "
+                f"{retcode}, retrying in {delay} seconds\n\n"
+            )
+            self.server.append_event(
+                self.id, "retrying", "IN_PROGRESS", self.TYPE.value
+            )
+            self._wait_retry(delay)
+
+            if self.cancelled:
+                return previous_output + "Operation cancelled\n", retcode
 
 
 class RecoveryOperation(Operation):
@@ -593,7 +2226,19 @@ class RecoveryOperation(Operation):
 
     :cvar REQUIRED_ARGUMENTS: required arguments when creating a recovery
         operation.
+    :cvar TARGET_ARGUMENTS: optional arguments which set the recovery target.
+        At most one of them can be specified.
+    :cvar TARGET_ACTIONS: possible values of the ``target_action`` argument.
+    :cvar TUNING_ARGUMENTS: optional arguments which tune how the backup is
+        copied, along with the expected type of their values. When not
+        specified, ``barman recover`` uses the configuration of the Barman
+        server, e.g. ``parallel_jobs``, ``bandwidth_limit``,
+        ``recovery_staging_path`` or ``recovery_options``.
     :cvar TYPE: enum type of this operation.
+    :cvar DEFAULT_PRIORITY: recoveries are usually urgent, so they are
+        dispatched before other operations by default.
+    :cvar DEFAULT_RETRY_OUTPUT_PATTERN: SSH errors caused by transient
+        network issues, which are retried if retries are enabled.
     """
 
     REQUIRED_ARGUMENTS = (
@@ -601,7 +2246,38 @@ class RecoveryOperation(Operation):
         "destination_directory",
         "remote_ssh_command",
     )
+    TARGET_ARGUMENTS = (
+        "target_immediate",
+        "target_lsn",
+        "target_name",
+        "target_time",
+        "target_xid",
+    )
+    TARGET_ACTIONS = ("pause", "promote", "shutdown")
+    TUNING_ARGUMENTS = (
+        ("jobs", int),
+        ("jobs_start_batch_period", int),
+        ("jobs_start_batch_size", int),
+        ("bwlimit", int),
+        ("recovery_staging_path", str),
+        ("local_staging_path", str),
+        ("get_wal", bool),
+    )
     TYPE = OperationType.RECOVERY
+    DEFAULT_PRIORITY = 50
+    DEFAULT_RETRY_OUTPUT_PATTERN = (
+        "Connection reset by peer|Broken pipe|Connection closed by|"
+        "Connection timed out|kex_exchange_identification"
+    )
+
+    # Default number of seconds to wait for the pre-flight check of the
+    # recovery host.
+    _PREFLIGHT_TIMEOUT = 30.0
+    # Shell script which prints the space available in the filesystem where
+    # the destination directory is, or is going to be created.
+    _DF_SCRIPT = (
+        'd={}; while [ ! -d "$d" ]; do d=$(dirname "$d"); done; df -Pk "$d"'
+    )
 
     @classmethod
     def _validate_job_content(cls, content: Dict[str, Any]) -> None:
@@ -613,7 +2289,8 @@ class RecoveryOperation(Operation):
 
         :raises:
             :exc:`MalformedContent`: if the set of options in *content* is
-                either missing required keys.
+                either missing required keys, or has invalid recovery target
+                or tuning options.
         """
         required_args: Set[str] = set(cls.REQUIRED_ARGUMENTS)
         missing_args = required_args - set(content.keys())
@@ -625,6 +2302,179 @@ class RecoveryOperation(Operation):
             )
             raise MalformedContent(msg)
 
+        cls.parse_target(content)
+
+        for key in ("ssh_multiplexing", "preflight_check"):
+            if not isinstance(content.get(key, False), bool):
+                msg = (
+                    f"`{key}` is expected to be a `<class 'bool'>`, but a "
+                    f"`{type(content[key])}` was found instead: "
+                    f"`{content[key]}`."
+                )
+                raise MalformedContent(msg)
+
+        for key, type_ in cls.TUNING_ARGUMENTS:
+            if key not in content:
+                continue
+
+            value = content[key]
+
+            # ``bool`` is a subclass of ``int``, so it's checked apart
+            if not isinstance(value, type_) or isinstance(value, bool) != (
+                type_ is bool
+            ):
+                msg = (
+                    f"`{key}` is expected to be a `{type_}`, but a "
+                    f"`{type(value)}` was found instead: `{value}`."
+                )
+                raise MalformedContent(msg)
+
+            # A ``bwlimit`` of 0 means no limit
+            minimum = 0 if key == "bwlimit" else 1
+
+            if (
+                isinstance(value, int)
+                and not isinstance(value, bool)
+                and value < minimum
+            ):
+                msg = f"`{key}` is expected to be {minimum} or more: `{value}`"
+                raise MalformedContent(msg)
+
+            if isinstance(value, str) and not os.path.isabs(value):
+                msg = f"`{key}` is expected to be an absolute path: `{value}`"
+                raise MalformedContent(msg)
+
+    @classmethod
+    def parse_target(cls, content: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate and parse the recovery target options in *content*.
+
+        The recovery target options are the ones in :attr:`TARGET_ARGUMENTS`,
+        plus:
+
+        * ``target_tli``: the target timeline, either a positive integer,
+          ``current`` or ``latest``;
+        * ``target_action``: one among :attr:`TARGET_ACTIONS`;
+        * ``target_exclusive``: if ``True``, stop right before the target.
+
+        :param content: Python dictionary representing the JSON content of the
+            job file.
+        :return: a dictionary with the keys:
+
+            * ``target_time``: the target time as an aware
+              :class:`datetime.datetime`, or ``None``;
+            * ``target_lsn``: the target LSN as an integer, or ``None``;
+            * ``target_tli``: the target timeline, as found in *content*, or
+              ``None``.
+
+        :raises:
+            :exc:`MalformedContent`: if any recovery target option is invalid,
+                or more than one target is specified.
+        """
+        targets = [arg for arg in cls.TARGET_ARGUMENTS if arg in content]
+
+        if len(targets) > 1:
+            msg = (
+                "Only one among the following arguments should be specified: "
+                f"{', '.join(targets)}"
+            )
+            raise MalformedContent(msg)
+
+        for key, type_ in [
+            ("target_time", str),
+            ("target_lsn", str),
+            ("target_xid", (str, int)),
+            ("target_name", str),
+            ("target_immediate", bool),
+            ("target_tli", (str, int)),
+            ("target_action", str),
+            ("target_exclusive", bool),
+        ]:
+            # ``bool`` is a subclass of ``int``, so it's checked apart
+            if key in content and (
+                not isinstance(content[key], type_)
+                or isinstance(content[key], bool) != (type_ is bool)
+            ):
+                msg = (
+                    f"`{key}` is expected to be a `{type_}`, but a "
+                    f"`{type(content[key])}` was found instead: "
+                    f"`{content[key]}`."
+                )
+                raise MalformedContent(msg)
+
+        target_time = None
+        target_lsn = None
+        target_tli = content.get("target_tli")
+
+        if "target_time" in content:
+            try:
+                target_time = dateutil.parser.parse(content["target_time"])
+            except (ValueError, OverflowError):
+                msg = f"Invalid `target_time`: `{content['target_time']}`"
+                raise MalformedContent(msg)
+
+            if target_time.tzinfo is None:
+                # As ``barman recover`` does
+                target_time = target_time.replace(tzinfo=dateutil.tz.tzlocal())
+
+        if "target_lsn" in content:
+            try:
+                target_lsn = parse_lsn(content["target_lsn"])
+            except ValueError:
+                msg = f"Invalid `target_lsn`: `{content['target_lsn']}`"
+                raise MalformedContent(msg)
+
+        if not str(content.get("target_xid", "0")).isdigit():
+            msg = f"Invalid `target_xid`: `{content['target_xid']}`"
+            raise MalformedContent(msg)
+
+        if content.get("target_immediate") is False:
+            msg = (
+                "Value of `target_immediate` key, if present, can only be "
+                "`True`"
+            )
+            raise MalformedContent(msg)
+
+        if target_tli is not None and not (
+            target_tli in ("current", "latest")
+            or isinstance(target_tli, int)
+            and target_tli > 0
+        ):
+            msg = (
+                "`target_tli` is expected to be a positive integer, "
+                f"`current` or `latest`: `{target_tli}`"
+            )
+            raise MalformedContent(msg)
+
+        if "target_action" in content:
+            if content["target_action"] not in cls.TARGET_ACTIONS:
+                msg = (
+                    "`target_action` is expected to be one among: "
+                    f"{', '.join(cls.TARGET_ACTIONS)}"
+                )
+                raise MalformedContent(msg)
+
+            if not targets:
+                msg = "`target_action` requires a recovery target"
+                raise MalformedContent(msg)
+
+        if content.get("target_exclusive") and not set(targets) & {
+            "target_lsn",
+            "target_time",
+            "target_xid",
+        }:
+            msg = (
+                "`target_exclusive` requires one among: target_lsn, "
+                "target_time, target_xid"
+            )
+            raise MalformedContent(msg)
+
+        return {
+            "target_time": target_time,
+            "target_lsn": target_lsn,
+            "target_tli": target_tli,
+        }
+
     def write_job_file(self, content: Dict[str, Any]) -> None:
         """
         Write the job file with *content*.
@@ -644,17 +2494,21 @@ class RecoveryOperation(Operation):
         self._validate_job_content(content)
         super().write_job_file(content)
 
-    def _get_args(self) -> List[str]:
+    def _get_args(self, remote_ssh_command: Optional[str] = None) -> List[str]:
         """
         Get arguments for running ``barman recover`` command.
 
+        :param remote_ssh_command: if given, used instead of the SSH command
+            in the job file, e.g. to multiplex it.
         :return: list of arguments for ``barman recover`` command.
         """
         job_content = self.read_job_file()
 
         backup_id = job_content.get("backup_id")
         destination_directory = job_content.get("destination_directory")
-        remote_ssh_command = job_content.get("remote_ssh_command")
+
+        if remote_ssh_command is None:
+            remote_ssh_command = job_content.get("remote_ssh_command")
 
         if TYPE_CHECKING:  # pragma: no cover
             assert isinstance(self.server.name, str)
@@ -662,7 +2516,7 @@ class RecoveryOperation(Operation):
             assert isinstance(destination_directory, str)
             assert isinstance(remote_ssh_command, str)
 
-        return [
+        args = [
             self.server.name,
             backup_id,
             destination_directory,
@@ -670,6 +2524,35 @@ class RecoveryOperation(Operation):
             remote_ssh_command,
         ]
 
+        for key in self.TARGET_ARGUMENTS + ("target_tli", "target_action"):
+            value = job_content.get(key)
+
+            if value is None:
+                continue
+
+            option = "--" + key.replace("_", "-")
+
+            if value is True:
+                args.append(option)
+            else:
+                args.extend([option, str(value)])
+
+        if job_content.get("target_exclusive"):
+            args.append("--exclusive")
+
+        for key, _ in self.TUNING_ARGUMENTS:
+            value = job_content.get(key)
+
+            if value is None:
+                continue
+
+            if key == "get_wal":
+                args.append("--get-wal" if value else "--no-get-wal")
+            else:
+                args.extend(["--" + key.replace("_", "-"), str(value)])
+
+        return args
+
     def _run_logic(
         self,
     ) -> Tuple[Union[str, bytearray, memoryview], Union[int, Any]]:
@@ -678,16 +2561,160 @@ class RecoveryOperation(Operation):
 
         Run ``barman recover`` command with the configured arguments.
 
+        If ``ssh_multiplexing`` is enabled in the job file, or through the
+        ``SSH_MULTIPLEXING`` setting if not in the job file, the SSH sessions
+        opened by ``barman recover`` share a master connection, see
+        :func:`multiplexed_ssh_command`.
+
+        Unless ``preflight_check`` is ``False`` in the job file, the recovery
+        host is checked first through :meth:`_preflight`, and ``barman
+        recover`` is not run if the check fails. The check is skipped when
+        retrying, see :meth:`Operation.run`.
+
         Will be called when running :meth:`Operation.run`.
 
         :return: a tuple consisting of:
 
-            * ``stdout``/``stderr`` of ``barman recover``;
-            * exit code of ``barman recover``.
+            * ``stdout``/``stderr`` of ``barman recover``, or the reason why
+              the pre-flight check failed;
+            * exit code of ``barman recover``, or ``1`` if the pre-flight
+              check failed.
+        """
+        job_content = self.read_job_file()
+        remote_ssh_command = job_content["remote_ssh_command"]
+        multiplexing = job_content.get(
+            "ssh_multiplexing", get_setting("SSH_MULTIPLEXING", False, bool)
+        )
+
+        if not multiplexing:
+            return self._recover(job_content, remote_ssh_command)
+
+        with multiplexed_ssh_command(remote_ssh_command) as ssh_command:
+            return self._recover(job_content, ssh_command)
+
+    def _recover(
+        self, job_content: Dict[str, Any], remote_ssh_command: str
+    ) -> Tuple[Union[str, bytearray, memoryview], Union[int, Any]]:
+        """
+        Check the recovery host, then run ``barman recover``.
+
+        :param job_content: the content of the job file.
+        :param remote_ssh_command: SSH command to connect to the recovery
+            host.
+        :return: a tuple consisting of the output and the exit code, see
+            :meth:`_run_logic`.
         """
-        cmd = ["barman", "recover"] + self._get_args()
+        # Files copied by previous attempts are reused by ``rsync``, so the
+        # free space check of a retry would be off by their size
+        if job_content.get("preflight_check", True) and not self.attempts:
+            error = self._preflight(job_content, remote_ssh_command)
+
+            if error is not None:
+                return f"Pre-flight check failed: {error}\n", 1
+
+        cmd = ["barman", "recover"] + self._get_args(remote_ssh_command)
         return self._run_subprocess(cmd)
 
+    def _get_required_bytes(self, backup_id: str) -> Optional[int]:
+        """
+        Get the space needed at the destination to recover *backup_id*.
+
+        :param backup_id: ID of the backup, or one of the aliases accepted by
+            :func:`parse_backup_id`.
+        :return: size of the cluster when it was backed up, or size of the
+            backup if the former is not known. ``None`` if the backup could
+            not be loaded.
+        """
+        try:
+            server = Server(self.server.config)
+            backup_info = parse_backup_id(server, backup_id)
+        except Exception as e:
+            log.warning("Could not load backup '%s': %s", backup_id, e)
+            return None
+
+        if backup_info is None:
+            return None
+
+        size = backup_info.cluster_size or backup_info.size
+
+        if TYPE_CHECKING:  # pragma: no cover
+            assert size is None or isinstance(size, int)
+
+        return size
+
+    def _preflight(
+        self, job_content: Dict[str, Any], remote_ssh_command: str
+    ) -> Optional[str]:
+        """
+        Check the recovery host can hold the backup, before copying it.
+
+        The free space of the filesystem of ``destination_directory`` is
+        queried through a single SSH session, which waits at most
+        ``PREFLIGHT_TIMEOUT`` seconds, and compared against the size of the
+        backup.
+
+        The result is recorded in the job file, under the ``preflight`` key:
+
+        * ``reachable``: if the recovery host could be reached;
+        * ``required_bytes``: space needed by the backup, if known;
+        * ``available_bytes``: space available at the destination, if known;
+        * ``error``: why the recovery cannot succeed, if so.
+
+        .. note::
+            If the recovery host is reachable but its free space cannot be
+            queried, e.g. ``df`` is not available, the recovery is not
+            prevented.
+
+        :param job_content: the content of the job file.
+        :param remote_ssh_command: SSH command to connect to the recovery
+            host.
+        :return: why the recovery cannot succeed, or ``None`` if the check
+            passed.
+        """
+        destination = job_content["destination_directory"]
+        required = self._get_required_bytes(job_content["backup_id"])
+        available = None
+        reachable = True
+        error = None
+        script = self._DF_SCRIPT.format(shlex.quote(destination))
+        timeout = get_setting(
+            "PREFLIGHT_TIMEOUT", self._PREFLIGHT_TIMEOUT, float
+        )
+        output = ""
+
+        try:
+            output = run_remote_command(
+                remote_ssh_command, f"sh -c {shlex.quote(script)}", timeout
+            )
+            available = int(output.splitlines()[-1].split()[3]) * 1024
+        except RemoteCommandError as e:
+            if e.returncode is None or e.returncode == 255:
+                reachable = False
+                error = f"cannot reach the recovery host: {e}"
+            else:
+                log.warning("Could not query free space: %s", e)
+        except (IndexError, ValueError):
+            log.warning("Could not parse free space: %r", output)
+
+        if required is not None and available is not None:
+            if available < required:
+                error = (
+                    f"destination directory '{destination}' has {available} "
+                    f"bytes available, but the backup needs {required} bytes"
+                )
+
+        self.update_job_file(
+            {
+                "preflight": {
+                    "reachable": reachable,
+                    "required_bytes": required,
+                    "available_bytes": available,
+                    "error": error,
+                }
+            }
+        )
+        return error
+
 
 class ConfigSwitchOperation(Operation):
     """
@@ -819,6 +2846,11 @@ class ConfigUpdateOperation(Operation):
     """
     Contain information and logic to process a config update operation.
 
+    Config update operations which are queued at the same time can be merged
+    by the executor, see :mod:`pg_backup_api.executor`. Their changes are then
+    applied, in order, by a single ``barman config-update`` run, see
+    :attr:`Operation.merged_ids`.
+
     :cvar REQUIRED_ARGUMENTS: required arguments when creating a config update
         operation.
     :cvar TYPE: enum type of this operation.
@@ -875,8 +2907,31 @@ class ConfigUpdateOperation(Operation):
         :return: list of arguments for ``barman config-update`` command.
         """
         job_content = self.read_job_file()
+        changes = job_content.get("changes")
+        # Merged operations cancelled before the run started are left out
+        self.merged_ids = [
+            merged_id
+            for merged_id in self.merged_ids
+            if not os.path.exists(self.server.get_output_file_path(merged_id))
+        ]
 
-        json_changes = json.dumps(job_content.get("changes"))
+        if self.merged_ids:
+            # Apply the changes of all merged operations, in order, at once
+            changes = []
+            contents = [job_content] + [
+                self.server.read_job_file(merged_id)
+                for merged_id in self.merged_ids
+            ]
+
+            for content in contents:
+                op_changes = content.get("changes")
+
+                if isinstance(op_changes, list):
+                    changes.extend(op_changes)
+                else:
+                    changes.append(op_changes)
+
+        json_changes = json.dumps(changes)
 
         if TYPE_CHECKING:  # pragma: no cover
             assert isinstance(json_changes, str)
@@ -902,6 +2957,327 @@ class ConfigUpdateOperation(Operation):
         return self._run_subprocess(cmd)
 
 
+class PipelineOperation(Operation):
+    """
+    Contain information and logic to process a pipeline operation.
+
+    A pipeline runs several operations, its steps, back to back in the same
+    runner, e.g. switch to a recovery model, recover a backup and reset the
+    model, so the client does not have to wait for each of them to finish
+    before requesting the next one.
+
+    Each step is created as an operation of its own when it starts, with a
+    ``pipeline_id`` key pointing to the pipeline, so its status can be
+    fetched as the status of any other operation. ``config_update`` steps are
+    operations of the Barman instance, the other steps are operations of the
+    Barman server of the pipeline. The ID and status of each step are
+    recorded in the ``steps`` key of the job file of the pipeline, see
+    :meth:`OperationServer.get_operation_steps`.
+
+    The ``on_failure`` key of a step tells what to do if it does not succeed:
+    ``stop``, the default, skips the remaining steps and fails the pipeline,
+    while ``continue`` goes on with the next step. Cancelling the pipeline,
+    or any of its steps, cancels the running step and skips the remaining
+    ones.
+
+    :cvar STEP_TYPES: operation types which can be steps of a pipeline, with
+        the class which handles each of them.
+    :cvar FAILURE_POLICIES: possible values of the ``on_failure`` key of a
+        step.
+    :cvar TYPE: enum type of this operation.
+    """
+
+    STEP_TYPES = {
+        OperationType.RECOVERY: RecoveryOperation,
+        OperationType.CONFIG_SWITCH: ConfigSwitchOperation,
+        OperationType.CONFIG_UPDATE: ConfigUpdateOperation,
+    }
+    FAILURE_POLICIES = ("stop", "continue")
+    TYPE = OperationType.PIPELINE
+
+    def __init__(
+        self,
+        server_name: Optional[str],
+        id: Optional[str] = None,
+        load_config: bool = True,
+    ) -> None:
+        """
+        Initialize a new instance of :class:`PipelineOperation`.
+
+        .. note::
+            See :meth:`Operation.__init__` for more details.
+        """
+        super().__init__(server_name, id, load_config)
+        # The step which is running, if any
+        self._step: Optional[Operation] = None
+
+    @classmethod
+    def _validate_job_content(cls, content: Dict[str, Any]) -> None:
+        """
+        Validate the content of the job file before creating it.
+
+        :param content: Python dictionary representing the JSON content of the
+            job file.
+
+        :raises:
+            :exc:`MalformedContent`: if ``steps`` is not a non-empty list of
+                steps, or any step has an invalid type, failure policy or
+                options.
+        """
+        steps = content.get("steps")
+
+        if not isinstance(steps, list) or not steps:
+            msg = "`steps` is expected to be a non-empty list of operations"
+            raise MalformedContent(msg)
+
+        step_types = [op_type.value for op_type in cls.STEP_TYPES]
+
+        for index, step in enumerate(steps):
+            prefix = f"Step #{index}: "
+
+            if not isinstance(step, dict):
+                raise MalformedContent(prefix + "expected an object")
+
+            if step.get("type") not in step_types:
+                msg = (
+                    f"`type` is expected to be one among: "
+                    f"{', '.join(step_types)}"
+                )
+                raise MalformedContent(prefix + msg)
+
+            if step.get("on_failure", "stop") not in cls.FAILURE_POLICIES:
+                msg = (
+                    f"`on_failure` is expected to be one among: "
+                    f"{', '.join(cls.FAILURE_POLICIES)}"
+                )
+                raise MalformedContent(prefix + msg)
+
+            step_class = cls.STEP_TYPES[OperationType(step["type"])]
+
+            try:
+                step_class._validate_job_content(step)
+            except MalformedContent as e:
+                raise MalformedContent(prefix + str(e))
+
+    def write_job_file(self, content: Dict[str, Any]) -> None:
+        """
+        Write the job file with *content*.
+
+        .. note::
+            See :meth:`Operation.write_job_file` for more details.
+
+        :param content: Python dictionary representing the JSON content of the
+            job file. Besides what is contained in *content*, this method adds
+            the following keys:
+
+            * ``operation_type``: ``pipeline``;
+            * ``start_time``: current timestamp.
+        """
+        content["operation_type"] = self.TYPE.value
+        content["start_time"] = self.time_event_now()
+        self._validate_job_content(content)
+        super().write_job_file(content)
+
+    def write_output_file(self, content: Dict[str, Any]) -> None:
+        """
+        Write the output file of this operation.
+
+        The resources used are recorded by each step, so they are not
+        recorded for the pipeline, and not counted twice.
+
+        .. note::
+            See :meth:`Operation.write_output_file` for more details.
+
+        :param content: a Python dictionary representing the JSON content of
+            the output file.
+        """
+        content.pop("resources", None)
+        super().write_output_file(content)
+
+    def _get_retry_policy(self) -> RetryPolicy:
+        """
+        Get the retry policy of this operation.
+
+        Pipelines are never retried as a whole, as their steps are retried
+        through the retry policy of their own type.
+
+        :return: a policy which disables retries.
+        """
+        return RetryPolicy()
+
+    def cancel(self) -> None:
+        """
+        Cancel this operation, and the step which is running, if any.
+
+        .. note::
+            Called by the signal handler of the runner when it receives
+            SIGTERM, so it does not block, log, nor reap processes.
+        """
+        self.cancelled = True
+        step = self._step
+
+        if step is not None:
+            step.cancel()
+
+    def _create_step(self, step: Dict[str, Any]) -> Operation:
+        """
+        Create the operation of *step*.
+
+        :param step: the step, as given in the job file of this operation.
+        :return: the operation, whose job file has been written.
+        """
+        op_type = OperationType(step["type"])
+        server_name = self.server.name
+
+        if op_type == OperationType.CONFIG_UPDATE:
+            server_name = None
+
+        content = {k: v for k, v in step.items() if k != "on_failure"}
+        content["pipeline_id"] = self.id
+        operation = self.STEP_TYPES[op_type](server_name)
+        operation.write_job_file(content)
+        return operation
+
+    def _run_logic(
+        self,
+    ) -> Tuple[Union[str, bytearray, memoryview], Union[int, Any]]:
+        """
+        Logic to be ran when executing the pipeline operation.
+
+        Create and run each step in turn, through :func:`run_operation`,
+        until the pipeline is cancelled, or a step which should stop the
+        pipeline does not succeed.
+
+        Will be called when running :meth:`Operation.run`.
+
+        :return: a tuple consisting of:
+
+            * a summary with the status of each step;
+            * ``1`` if a step stopped the pipeline, otherwise ``0``.
+        """
+        steps = self.read_job_file()["steps"]
+        lines = []
+        stopped = False
+
+        for index, step in enumerate(steps):
+            if stopped or self.cancelled:
+                step["status"] = SKIPPED
+                lines.append(f"Step #{index} ({step['type']}): {SKIPPED}")
+                continue
+
+            operation = self._create_step(step)
+            step["operation_id"] = operation.id
+            self.update_job_file({"steps": steps})
+            self._step = operation
+
+            if self.cancelled:
+                # Cancelled while the step was being created
+                operation.cancel()
+
+            run_operation(operation)
+            self._step = None
+            step["status"] = operation.get_status()
+            self.update_job_file({"steps": steps})
+            lines.append(
+                f"Step #{index} ({step['type']}, operation "
+                f"'{operation.id}'): {step['status']}"
+            )
+
+            if (
+                step["status"] != "DONE"
+                and step.get("on_failure", "stop") == "stop"
+            ):
+                stopped = True
+
+        self.update_job_file({"steps": steps})
+        return "\n".join(lines) + "\n", int(stopped)
+
+
+def run_operation(operation: Operation) -> Tuple[None, bool]:
+    """
+    Run *operation*, and record its output.
+
+    .. note::
+        Can only be run if an operation has been previously registered.
+
+    In the end of execution creates an output file through *operation*'s
+    ``write_output_file`` method with the following content, to indicate the
+    operation has finished:
+
+    * ``success``: if the operation succeeded or not;
+    * ``end_time``: timestamp when the operation finished;
+    * ``output``: ``stdout``/``stderr`` of the operation;
+    * ``status``: ``DONE``, ``FAILED``, :data:`TIMED_OUT` if the operation
+      was killed because it exceeded its timeouts, or :data:`CANCELLED` if it
+      was cancelled;
+    * ``resources``: resources used by the processes of the operation, see
+      :func:`measure_children_resources`.
+
+    Along with the content of the job file, as of the end of the operation.
+
+    The current process is recorded as the runner of the operation. If the
+    operation was cancelled before the runner started, nothing is run, unless
+    other operations were merged into it, which are then run without it, see
+    :meth:`Operation.hand_over`. If it was finished by the REST API while
+    running, e.g. cancelled while its subprocess was being started, the
+    output file is left as is.
+
+    A ``started`` event is appended to the event log of the operation right
+    before it is run.
+
+    :param operation: a subclass of :class:`Operation` which should be run.
+    :return: a tuple consisting of two items:
+
+        * ``None`` -- output of *operation*'s ``write_output_file`` method;
+        * ``True`` operation executed successfully, ``False`` otherwise.
+    """
+    operation.record_runner()
+
+    while os.path.exists(operation.output_file):
+        # Cancelled while waiting to be run
+        if not operation.hand_over():
+            return None, False
+
+    content = operation.read_job_file()
+    operation.server.append_event(
+        operation.id,
+        "started",
+        "IN_PROGRESS",
+        content.get("operation_type"),
+    )
+
+    for merged_id in operation.merged_ids:
+        operation.server.append_event(
+            merged_id, "started", "IN_PROGRESS", content.get("operation_type")
+        )
+
+    with measure_children_resources() as resources:
+        output, retcode = operation.run()
+
+    success = not retcode and not operation.cancelled
+    end_time = operation.time_event_now()
+
+    # The operation may have recorded details in the job file while running
+    content = operation.read_job_file()
+    content["success"] = success
+    content["end_time"] = end_time
+    content["output"] = output
+    content["resources"] = resources
+
+    if operation.cancelled:
+        content["status"] = CANCELLED
+    elif operation.timed_out is not None:
+        content["status"] = TIMED_OUT
+    else:
+        content["status"] = "DONE" if success else "FAILED"
+
+    try:
+        return (operation.write_output_file(content), success)
+    except FileExistsError:
+        # Already finished by the REST API
+        return None, False
+
+
 def main(callback: Callable[..., Any], *args: Tuple[Any, ...]) -> int:
     """
     Execute *callback* with *args* and log its output as an ``INFO`` message.
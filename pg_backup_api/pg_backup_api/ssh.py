@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Run commands on the recovery host through the SSH command of a recovery.
+
+``barman recover`` opens many SSH sessions to the recovery host through the
+remote SSH command of the recovery: checks, file transfers and each one of the
+parallel ``rsync`` workers. Through :func:`multiplexed_ssh_command` they are
+all multiplexed over a master connection, so the key exchange and
+authentication happen only once.
+
+:func:`run_remote_command` runs a single command on the recovery host, e.g.
+to check it before ``barman recover`` starts.
+
+:var DEFAULT_MASTER_TIMEOUT: default number of seconds to wait for the master
+    connection to be established.
+"""
+from contextlib import contextmanager
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+from typing import Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MASTER_TIMEOUT = 30.0
+
+
+class RemoteCommandError(RuntimeError):
+    """
+    Indicate a command could not be run on the recovery host.
+
+    :ivar returncode: exit code of the SSH command, if it finished. ``ssh``
+        exits with ``255`` if it could not connect to the recovery host.
+    """
+
+    def __init__(self, message: str, returncode: Optional[int] = None):
+        """
+        Initialize a new instance of :class:`RemoteCommandError`.
+
+        :param message: description of the failure.
+        :param returncode: exit code of the SSH command, if it finished.
+        """
+        super().__init__(message)
+        self.returncode = returncode
+
+
+def _join(args: List[str]) -> str:
+    """
+    Join *args* into a shell command line, quoting them as needed.
+
+    :param args: the command and its arguments.
+    :return: the command line.
+    """
+    return " ".join(shlex.quote(arg) for arg in args)
+
+
+def _run_ssh(
+    args: List[str], timeout: float, stderr_path: str
+) -> Optional[str]:
+    """
+    Run the ``ssh`` command *args*, with no input.
+
+    .. note::
+        The output is written to a file rather than to a pipe, as ``ssh -f``
+        keeps running in the background and would keep the pipe open.
+
+    :param args: the command and its arguments.
+    :param timeout: maximum number of seconds to wait for the command.
+    :param stderr_path: file where the output of the command is written to.
+    :return: ``None`` on success, or the reason of the failure.
+    """
+    try:
+        with open(stderr_path, "wb") as stderr:
+            process = subprocess.run(
+                args,
+                stdin=subprocess.DEVNULL,
+                stdout=stderr,
+                stderr=stderr,
+                timeout=timeout,
+            )
+    except subprocess.TimeoutExpired:
+        return f"timed out after {timeout} seconds"
+    except OSError as e:
+        return str(e)
+
+    if process.returncode == 0:
+        return None
+
+    with open(stderr_path, errors="replace") as stderr:
+        output = stderr.read().strip()
+
+    return output or f"exit code {process.returncode}"
+
+
+@contextmanager
+def multiplexed_ssh_command(
+    remote_ssh_command: str, timeout: float = DEFAULT_MASTER_TIMEOUT
+) -> Iterator[str]:
+    """
+    Multiplex *remote_ssh_command* over a master SSH connection.
+
+    The master connection is established when entering the ``with`` block,
+    through a control socket in a private temporary directory, and closed when
+    leaving it.
+
+    .. note::
+        If *remote_ssh_command* is not an ``ssh`` command, or the master
+        connection cannot be established, *remote_ssh_command* is yielded
+        unchanged, so each session connects on its own as usual.
+
+    :param remote_ssh_command: the SSH command used to connect to the
+        recovery host, e.g. ``ssh postgres@pg``.
+    :param timeout: maximum number of seconds to wait for the master
+        connection to be established, or closed.
+    :yield: the SSH command, with the options to use the master connection.
+    """
+    args = shlex.split(remote_ssh_command)
+
+    if not args or os.path.basename(args[0]) != "ssh":
+        log.warning(
+            "Not multiplexing '%s', as it's not an ssh command",
+            remote_ssh_command,
+        )
+        yield remote_ssh_command
+        return
+
+    # Unix socket paths are limited to about 100 characters, so keep it short
+    control_dir = tempfile.mkdtemp(prefix="pg-backup-api-ssh-")
+    control = ["-o", f"ControlPath={os.path.join(control_dir, 'master')}"]
+    stderr_path = os.path.join(control_dir, "ssh.log")
+
+    try:
+        error = _run_ssh(
+            [args[0]]
+            + control
+            + ["-o", "ControlMaster=yes", "-o", "ControlPersist=yes"]
+            + ["-f", "-N"]
+            + args[1:],
+            timeout,
+            stderr_path,
+        )
+
+        if error is not None:
+            log.warning(
+                "Could not open a master SSH connection through '%s': %s",
+                remote_ssh_command,
+                error,
+            )
+            yield remote_ssh_command
+            return
+
+        try:
+            yield _join([args[0]] + control + args[1:])
+        finally:
+            error = _run_ssh(
+                [args[0]] + control + ["-O", "exit"] + args[1:],
+                timeout,
+                stderr_path,
+            )
+
+            if error is not None:
+                log.warning("Could not close master SSH connection: %s", error)
+    finally:
+        shutil.rmtree(control_dir, ignore_errors=True)
+
+
+def run_remote_command(
+    remote_ssh_command: str, command: str, timeout: float
+) -> str:
+    """
+    Run *command* on the recovery host through *remote_ssh_command*.
+
+    :param remote_ssh_command: the SSH command used to connect to the
+        recovery host, e.g. ``ssh postgres@pg``.
+    :param command: the shell command to be run on the recovery host.
+    :param timeout: maximum number of seconds to wait for *command*,
+        including the time to connect to the recovery host.
+    :return: the standard output of *command*.
+
+    :raises:
+        :exc:`RemoteCommandError`: if the recovery host could not be reached
+            in time, or *command* failed.
+    """
+    args = shlex.split(remote_ssh_command)
+
+    if args and os.path.basename(args[0]) == "ssh":
+        # Fail early if the host is not reachable at all
+        connect_timeout = max(int(timeout), 1)
+        args[1:1] = ["-o", f"ConnectTimeout={connect_timeout}"]
+
+    try:
+        process = subprocess.run(
+            args + [command],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise RemoteCommandError(f"timed out after {timeout} seconds")
+    except OSError as e:
+        raise RemoteCommandError(str(e))
+
+    if process.returncode != 0:
+        error = process.stderr.decode(errors="replace").strip()
+        raise RemoteCommandError(
+            error or f"exit code {process.returncode}", process.returncode
+        )
+
+    return process.stdout.decode(errors="replace")
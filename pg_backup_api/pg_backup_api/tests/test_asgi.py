@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the ASGI application."""
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+from flask import Flask, Response, jsonify, request
+import pytest
+
+from pg_backup_api.asgi import AsgiApplication
+
+
+def _call(app, path, query=b"", method="GET", body=b"", headers=None):
+    """Run a request through *app*.
+
+    :param app: the ASGI application.
+    :param path: path of the request.
+    :param query: query string of the request.
+    :param method: method of the request.
+    :param body: body of the request.
+    :param headers: headers of the request.
+    :return: the messages sent by *app*.
+    """
+    sent = []
+    received = [{"type": "http.request", "body": body}]
+
+    async def receive():
+        if received:
+            return received.pop(0)
+
+        # Client never disconnects
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": headers or [],
+    }
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+class TestAsgiApplication:
+    """Run tests for :class:`AsgiApplication`."""
+
+    @pytest.fixture
+    def state(self):
+        """State of the Flask application used for testing.
+
+        :return: status of operation ``OP`` and events logged so far.
+        """
+        return {"status": "IN_PROGRESS", "events": [], "calls": []}
+
+    @pytest.fixture
+    def app(self, state):
+        """Create an :class:`AsgiApplication` instance for testing.
+
+        :return: a new :class:`AsgiApplication` serving a small Flask app.
+        """
+        flask_app = Flask("test")
+
+        @flask_app.route("/operations/<op_id>")
+        def operation(op_id):
+            state["calls"].append(dict(request.args))
+            return jsonify(operation_id=op_id, status=state["status"])
+
+        @flask_app.route("/servers", methods=["POST"])
+        def servers():
+            return jsonify(request.get_json()), 201
+
+        @flask_app.route("/events")
+        def events():
+            state["calls"].append(dict(request.args))
+            since = int(request.args.get("since", 0))
+            body = "".join(
+                f"id: {i + 1}\ndata: {json.dumps(e)}\n\n"
+                for i, e in enumerate(state["events"])
+                if i >= since
+            )
+            return Response(body, mimetype="text/event-stream")
+
+        return AsgiApplication(flask_app, max_workers=2)
+
+    def test_request(self, app):
+        """Test :meth:`AsgiApplication.__call__`.
+
+        Ensure requests are handled by the Flask application, with their
+        body and headers.
+        """
+        sent = _call(
+            app,
+            "/servers",
+            method="POST",
+            body=b'{"name": "SOME_SERVER"}',
+            headers=[(b"content-type", b"application/json")],
+        )
+
+        assert sent[0]["type"] == "http.response.start"
+        assert sent[0]["status"] == 201
+        assert (b"content-type", b"application/json") in sent[0]["headers"]
+        assert json.loads(sent[1]["body"]) == {"name": "SOME_SERVER"}
+        assert sent[1]["more_body"] is False
+
+    def test_request_invalid_wait(self, app, state):
+        """Test :meth:`AsgiApplication.__call__`.
+
+        Ensure invalid ``wait`` arguments are left to the Flask application.
+        """
+        _call(app, "/operations/OP", query=b"wait=-1")
+
+        assert state["calls"] == [{"wait": "-1"}]
+
+    def test_lifespan(self, app):
+        """Test :meth:`AsgiApplication.__call__`.
+
+        Ensure lifespan events are acknowledged, and the thread pool is shut
+        down with the server.
+        """
+        received = [
+            {"type": "lifespan.startup"},
+            {"type": "lifespan.shutdown"},
+        ]
+        sent = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        with patch.object(app, "pool") as mock_pool:
+            asyncio.run(app({"type": "lifespan"}, receive, send))
+
+        assert sent == [
+            {"type": "lifespan.startup.complete"},
+            {"type": "lifespan.shutdown.complete"},
+        ]
+        mock_pool.shutdown.assert_called_once_with(wait=False)
+
+    def test_unsupported_scope(self, app):
+        """Test :meth:`AsgiApplication.__call__`.
+
+        Ensure unsupported scopes are refused.
+        """
+        with pytest.raises(ValueError, match="Unsupported ASGI scope"):
+            asyncio.run(app({"type": "websocket"}, MagicMock(), MagicMock()))
+
+    @patch("pg_backup_api.asgi.get_watcher")
+    @patch.object(AsgiApplication, "_get_output_file_path")
+    def test__wait_operation(
+        self, mock_get_path, mock_get_watcher, app, state
+    ):
+        """Test :meth:`AsgiApplication._wait_operation`.
+
+        Ensure the output file of an operation in progress is awaited in the
+        event loop, and that the status is fetched again afterwards, never
+        waiting in the Flask application.
+        """
+
+        async def wait_for_file(path, timeout):
+            state["status"] = "DONE"
+            return True
+
+        mock_get_watcher.return_value.async_wait_for_file = wait_for_file
+
+        sent = _call(app, "/operations/OP", query=b"wait=5")
+
+        assert json.loads(sent[1]["body"])["status"] == "DONE"
+        assert state["calls"] == [{}, {}]
+        mock_get_path.assert_called_once_with(None, "OP")
+
+    @patch("pg_backup_api.asgi.get_watcher")
+    def test__wait_operation_finished(self, mock_get_watcher, app, state):
+        """Test :meth:`AsgiApplication._wait_operation`.
+
+        Ensure nothing is awaited if the operation already finished.
+        """
+        state["status"] = "FAILED"
+
+        sent = _call(app, "/operations/OP", query=b"wait=5")
+
+        assert json.loads(sent[1]["body"])["status"] == "FAILED"
+        assert state["calls"] == [{}]
+        mock_get_watcher.assert_not_called()
+
+    @patch("pg_backup_api.asgi.get_watcher")
+    @patch.object(AsgiApplication, "_get_signatures")
+    @patch.object(AsgiApplication, "_get_events_signatures")
+    def test__stream_events(
+        self,
+        mock_get_events_signatures,
+        mock_get_signatures,
+        mock_get_watcher,
+        app,
+        state,
+    ):
+        """Test :meth:`AsgiApplication._stream_events`.
+
+        Ensure new events are streamed once the event logs change, resuming
+        from the cursor of the last event sent, until ``wait`` expires.
+        """
+        state["events"].append({"event": "created"})
+        mock_get_events_signatures.return_value = {"/EVENTS": (10, 1)}
+        mock_get_signatures.return_value = {"/EVENTS": (20, 2)}
+        awaited = []
+
+        async def wait_for_change(signatures, timeout):
+            awaited.append(signatures)
+
+            if len(awaited) == 1:
+                state["events"].append({"event": "finished"})
+                return True
+
+            await asyncio.sleep(timeout)
+            return False
+
+        mock_get_watcher.return_value.async_wait_for_change = wait_for_change
+
+        sent = _call(app, "/events", query=b"wait=0.2")
+
+        bodies = b"".join(m.get("body", b"") for m in sent[1:]).decode()
+
+        assert sent[0]["status"] == 200
+        assert bodies.count("data: ") == 2
+        assert '"created"' in bodies and '"finished"' in bodies
+        assert sent[-1] == {"type": "http.response.body", "body": b""}
+        assert state["calls"] == [{}, {"since": "1"}]
+        assert awaited == [{"/EVENTS": (10, 1)}, {"/EVENTS": (20, 2)}]
+        mock_get_signatures.assert_called_once_with(["/EVENTS"])
+
+    @patch("pg_backup_api.asgi.get_watcher")
+    @patch.object(AsgiApplication, "_get_events_signatures")
+    def test__stream_events_no_config(
+        self, mock_get_events_signatures, mock_get_watcher, app, state
+    ):
+        """Test :meth:`AsgiApplication._stream_events`.
+
+        Ensure the response of the Flask route is sent as is, without
+        streaming, if the event logs can't be found.
+        """
+        mock_get_events_signatures.side_effect = OSError("SOME ERROR")
+
+        sent = _call(app, "/events", query=b"wait=5")
+
+        assert sent[0]["status"] == 200
+        assert sent[1]["more_body"] is False
+        assert state["calls"] == [{}]
+        mock_get_watcher.assert_not_called()
+
+    @patch("pg_backup_api.asgi.get_events_files")
+    @patch("pg_backup_api.asgi.load_barman_config")
+    def test__get_events_signatures(
+        self, mock_load_config, mock_get_files, tmp_path
+    ):
+        """Test :meth:`AsgiApplication._get_events_signatures`.
+
+        Ensure the signature of each event log is returned, keyed by path.
+        """
+        path = tmp_path / "events.jsonl"
+        path.write_text("{}\n")
+        missing = str(tmp_path / "SERVER" / "events.jsonl")
+        mock_get_files.return_value = {"": str(path), "SERVER": missing}
+
+        assert AsgiApplication._get_events_signatures() == {
+            str(path): (3, path.stat().st_mtime_ns),
+            missing: None,
+        }
+        mock_load_config.assert_called_once_with()
+
+    def test__get_last_cursor(self):
+        """Test :meth:`AsgiApplication._get_last_cursor`.
+
+        Ensure the ID of the last event is returned, if any.
+        """
+        body = b"id: 1\ndata: {}\n\nid: 2\ndata: {}\n\n"
+
+        assert AsgiApplication._get_last_cursor(body) == "2"
+        assert AsgiApplication._get_last_cursor(b"") is None
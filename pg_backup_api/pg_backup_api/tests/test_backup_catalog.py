@@ -0,0 +1,642 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the cache of Barman servers and backup catalogs."""
+from datetime import datetime, timezone
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pg_backup_api import backup_catalog as backup_catalog_module
+from barman.infofile import BackupInfo
+
+from pg_backup_api.backup_catalog import (
+    BackupIndex,
+    RecoveryTargetError,
+    ServerPool,
+    WalIndex,
+    check_recovery_target,
+    get_config_generation,
+    get_server_pool,
+    summarize_backup,
+)
+
+
+def _set_old_mtime(path):
+    """Set the modification time of *path* to one minute ago.
+
+    :param path: path to a file or directory.
+    """
+    old = time.time() - 60
+    os.utime(str(path), (old, old))
+
+
+@patch("barman.__config__")
+def test_get_config_generation(mock_config, tmp_path):
+    """Test :func:`get_config_generation`.
+
+    Ensure the generation changes when configuration files are modified,
+    created or removed.
+    """
+    config_dir = tmp_path / "barman.d"
+    config_dir.mkdir()
+    (tmp_path / "barman.conf").write_text("[barman]\n")
+    (config_dir / "pg.conf").write_text("[pg]\n")
+
+    mock_config.config_file = str(tmp_path / "barman.conf")
+    mock_config.get.return_value = str(config_dir)
+    mock_config.barman_home = str(tmp_path)
+
+    for path in (tmp_path / "barman.conf", config_dir / "pg.conf", config_dir):
+        _set_old_mtime(path)
+
+    generation = get_config_generation()
+    assert get_config_generation() == generation
+    mock_config.get.assert_called_with(
+        "barman", "configuration_files_directory"
+    )
+
+    (config_dir / "pg2.conf").write_text("[pg2]\n")
+    assert get_config_generation() != generation
+
+    generation = get_config_generation()
+    (tmp_path / ".barman.auto.conf").write_text("[pg]\n")
+    assert get_config_generation() != generation
+
+
+def _write_info(path, status="DONE", old=True):
+    """Write a fake ``backup.info`` file.
+
+    :param path: path to the file.
+    :param status: status of the backup.
+    :param old: if the modification time should be set to one minute ago.
+    """
+    os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+
+    with open(str(path), "w") as fd:
+        fd.write(status)
+
+    if old:
+        _set_old_mtime(path)
+
+
+def _fake_backup_info(server, path):
+    """Build a fake backup from a file written by :func:`_write_info`.
+
+    :param server: the Barman server.
+    :param path: path to the ``backup.info`` file.
+    :return: a mock of :class:`barman.infofile.BackupInfo`.
+    """
+    name = os.path.basename(path)
+
+    if name == "backup.info":
+        backup_id = os.path.basename(os.path.dirname(path))
+    else:
+        backup_id = name[: -len("-backup.info")]
+
+    with open(path) as fd:
+        status = fd.read()
+
+    backup_info = MagicMock(backup_id=backup_id, status=status, filename=path)
+    backup_info.to_json.return_value = {
+        "backup_id": backup_id,
+        "status": status,
+        "SOME_FIELD": "SOME_VALUE",
+    }
+    return backup_info
+
+
+@pytest.fixture
+def barman_server(tmp_path):
+    """Create a fake Barman server with an on-disk backup catalog.
+
+    :return: a mock of :class:`barman.server.Server`.
+    """
+    server = MagicMock()
+    server.config.name = "SOME_SERVER"
+    server.config.basebackups_directory = str(tmp_path / "base")
+    server.meta_directory = str(tmp_path / "meta")
+    server.use_backup_cloud_storage = False
+    server.backup_manager._backup_cache = None
+    os.mkdir(server.config.basebackups_directory)
+    os.mkdir(server.meta_directory)
+    _set_old_mtime(server.config.basebackups_directory)
+    _set_old_mtime(server.meta_directory)
+    return server
+
+
+@patch("pg_backup_api.backup_catalog._build_backup_info")
+def test_summarize_backup(mock_build):
+    """Test :func:`summarize_backup`.
+
+    Ensure only the main fields of the backup are returned.
+    """
+    backup_info = MagicMock()
+    backup_info.to_json.return_value = {
+        "backup_id": "SOME_ID",
+        "status": "DONE",
+        "SOME_FIELD": "SOME_VALUE",
+    }
+
+    summary = summarize_backup(backup_info)
+
+    assert summary["backup_id"] == "SOME_ID"
+    assert summary["status"] == "DONE"
+    assert summary["end_time_iso"] is None
+    assert "SOME_FIELD" not in summary
+
+
+@patch(
+    "pg_backup_api.backup_catalog._build_backup_info",
+    side_effect=_fake_backup_info,
+)
+class TestBackupIndex:
+    """Run tests for :class:`BackupIndex`."""
+
+    def test_update(self, mock_build, barman_server):
+        """Test :meth:`BackupIndex.update`.
+
+        Ensure only new or modified ``backup.info`` files are parsed, that
+        removed ones are dropped, and that the ones in the ``meta`` directory
+        take precedence over the ones in the legacy location.
+        """
+        base = barman_server.config.basebackups_directory
+        meta = barman_server.meta_directory
+        _write_info(os.path.join(base, "B1", "backup.info"))
+        _write_info(os.path.join(base, "B2", "backup.info"), "STARTED")
+        _write_info(os.path.join(meta, "B2-backup.info"), "FAILED")
+        _write_info(os.path.join(meta, "B3-backup.info"))
+
+        index = BackupIndex()
+
+        assert index.update(barman_server) == 4
+        assert {k: b.status for k, b in index.backups.items()} == {
+            "B1": "DONE",
+            "B2": "FAILED",
+            "B3": "DONE",
+        }
+        assert index.summaries["B3"]["status"] == "DONE"
+
+        assert index.update(barman_server) == 0
+
+        _write_info(os.path.join(meta, "B3-backup.info"), "FAILED", old=False)
+        os.unlink(os.path.join(base, "B1", "backup.info"))
+
+        assert index.update(barman_server) == 1
+        assert sorted(index.backups) == ["B2", "B3"]
+        assert index.backups["B3"].status == "FAILED"
+
+        # The last modification is too recent to be trusted
+        assert index.update(barman_server) == 1
+        assert mock_build.call_count == 6
+
+
+def _xlogdb_line(name, archived=1000.0):
+    """Build a line of ``xlog.db``.
+
+    :param name: name of the WAL file.
+    :param archived: archival time of the WAL file.
+    :return: the line, as written by Barman.
+    """
+    return f"{name}\t16777216\t{archived}\tNone\tNone\n"
+
+
+class TestWalIndex:
+    """Run tests for :class:`WalIndex`."""
+
+    def test_update(self, tmp_path):
+        """Test :meth:`WalIndex.update`.
+
+        Ensure only appended lines are parsed, and the index is rebuilt when
+        ``xlog.db`` is rewritten.
+        """
+        xlogdb = tmp_path / "xlog.db"
+        xlogdb.write_text(
+            _xlogdb_line("000000010000000000000002", 1000.0)
+            + _xlogdb_line("000000010000000000000001", 900.0)
+            + _xlogdb_line("00000002.history", 1100.0)
+            + _xlogdb_line("000000010000000000000002.00000028.backup")
+            + "000000020000000000000003\t16"
+        )
+        index = WalIndex(str(xlogdb))
+
+        assert index.update() == 4
+        assert index.names == [
+            "000000010000000000000001",
+            "000000010000000000000002",
+        ]
+        assert index.newest == {1: 1000.0}
+        assert index.history == {2}
+        assert index.update() == 0
+
+        with open(str(xlogdb), "a") as fd:
+            fd.write("777216\t1200.0\tNone\tNone\n")
+
+        assert index.update() == 1
+        assert index.contains("000000020000000000000003")
+        assert index.newest == {1: 1000.0, 2: 1200.0}
+
+        # Barman removes old WALs by rewriting xlog.db in place
+        xlogdb.write_text(
+            _xlogdb_line("000000010000000000000002", 1000.0)
+            + _xlogdb_line("000000020000000000000003", 1200.0)
+        )
+
+        assert index.update() == 2
+        assert index.names == [
+            "000000010000000000000002",
+            "000000020000000000000003",
+        ]
+
+        xlogdb.unlink()
+
+        assert index.update() == 0
+        assert index.names == []
+
+    def test_last_segment(self, tmp_path):
+        """Test :meth:`WalIndex.last_segment`.
+
+        Ensure the last segment of the given timeline is returned.
+        """
+        xlogdb = tmp_path / "xlog.db"
+        xlogdb.write_text(
+            _xlogdb_line("000000010000000000000001")
+            + _xlogdb_line("000000010000000100000000")
+            + _xlogdb_line("000000030000000100000001")
+        )
+        index = WalIndex(str(xlogdb))
+        index.update()
+
+        assert index.last_segment(1) == "000000010000000100000000"
+        assert index.last_segment(2) is None
+        assert index.last_segment(3) == "000000030000000100000001"
+
+
+class TestCheckRecoveryTarget:
+    """Run tests for :func:`check_recovery_target`."""
+
+    @pytest.fixture
+    def backup_info(self):
+        """Create a fake backup, ended at epoch 1000 in segment 3.
+
+        :return: a mock of :class:`barman.infofile.BackupInfo`.
+        """
+        return MagicMock(
+            backup_id="SOME_BACKUP_ID",
+            status=BackupInfo.DONE,
+            version=170000,
+            timeline=1,
+            xlog_segment_size=1 << 24,
+            begin_wal="000000010000000000000002",
+            end_wal="000000010000000000000003",
+            end_xlog="0/3000100",
+            end_time=datetime.fromtimestamp(1000, timezone.utc),
+        )
+
+    @pytest.fixture
+    def wal_index(self, tmp_path):
+        """Create a WAL index with segments 2 to 4 of timeline 1, archived
+        until epoch 2000, and segment 5 of timeline 2.
+
+        :return: an updated :class:`WalIndex`.
+        """
+        xlogdb = tmp_path / "xlog.db"
+        xlogdb.write_text(
+            _xlogdb_line("000000010000000000000002", 900.0)
+            + _xlogdb_line("000000010000000000000003", 1000.0)
+            + _xlogdb_line("000000010000000000000004", 2000.0)
+            + _xlogdb_line("00000002.history", 2500.0)
+            + _xlogdb_line("000000020000000000000005", 3000.0)
+        )
+        index = WalIndex(str(xlogdb))
+        index.update()
+        return index
+
+    def test_ok(self, backup_info, wal_index):
+        """Test :func:`check_recovery_target`.
+
+        Ensure reachable targets are accepted.
+        """
+        check_recovery_target(backup_info, wal_index)
+        check_recovery_target(
+            backup_info,
+            wal_index,
+            target_time=datetime.fromtimestamp(1500, timezone.utc),
+            target_tli="current",
+        )
+        check_recovery_target(
+            backup_info, wal_index, target_lsn=0x5FFFFFF, target_tli=2
+        )
+        check_recovery_target(
+            backup_info,
+            wal_index,
+            target_time=datetime.fromtimestamp(2800, timezone.utc),
+        )
+
+    @pytest.mark.parametrize(
+        "changes,targets,message",
+        [
+            (
+                {"status": BackupInfo.FAILED},
+                {},
+                "Backup 'SOME_BACKUP_ID' cannot be recovered, its status is "
+                "FAILED",
+            ),
+            (
+                {"end_wal": "000000010000000000000006"},
+                {},
+                "WAL file '000000010000000000000005' required by backup "
+                "'SOME_BACKUP_ID' is not archived",
+            ),
+            (
+                {"timeline": 2},
+                {"target_tli": 1},
+                "Target timeline 1 precedes the timeline 2 of backup "
+                "'SOME_BACKUP_ID'",
+            ),
+            ({}, {"target_tli": 3}, "Target timeline 3 is not archived"),
+            (
+                {},
+                {"target_time": datetime.fromtimestamp(999, timezone.utc)},
+                "Target time 1970-01-01 00:16:39+00:00 precedes the end time "
+                "1970-01-01 00:16:40+00:00 of backup 'SOME_BACKUP_ID'",
+            ),
+            (
+                {},
+                {
+                    "target_time": datetime.fromtimestamp(
+                        2001, timezone.utc
+                    ),
+                    "target_tli": "current",
+                },
+                "Target time 1970-01-01 00:33:21+00:00 follows the archival "
+                "time 1970-01-01 00:33:20+00:00 of the last archived WAL "
+                "file",
+            ),
+            (
+                {"version": 90600},
+                {"target_lsn": 0x4000000},
+                "Target LSN requires PostgreSQL 10 or newer",
+            ),
+            (
+                {},
+                {"target_lsn": 0x30000FF},
+                "Target LSN 0/30000FF precedes the end LSN 0/3000100 of "
+                "backup 'SOME_BACKUP_ID'",
+            ),
+            (
+                {},
+                {"target_lsn": 0x5000001, "target_tli": 1},
+                "Target LSN 0/5000001 follows the end LSN 0/5000000 of "
+                "the last archived WAL file",
+            ),
+        ],
+    )
+    def test_unreachable(
+        self, changes, targets, message, backup_info, wal_index
+    ):
+        """Test :func:`check_recovery_target`.
+
+        Ensure recoveries which cannot reach their target are rejected.
+        """
+        for key, value in changes.items():
+            setattr(backup_info, key, value)
+
+        with pytest.raises(RecoveryTargetError) as exc:
+            check_recovery_target(backup_info, wal_index, **targets)
+
+        assert str(exc.value) == message
+
+
+@patch(
+    "pg_backup_api.backup_catalog._build_backup_info",
+    side_effect=_fake_backup_info,
+)
+class TestServerPool:
+    """Run tests for :class:`ServerPool`."""
+
+    def test__refresh_catalog(self, mock_build, barman_server):
+        """Test :meth:`ServerPool._refresh_catalog`.
+
+        Ensure the catalog is only updated when the directories holding the
+        ``backup.info`` files are modified, and that Barman uses it.
+        """
+        pool = ServerPool()
+        meta = barman_server.meta_directory
+        _write_info(os.path.join(meta, "B1-backup.info"))
+        _set_old_mtime(meta)
+        update = BackupIndex.update
+
+        with patch.object(
+            BackupIndex, "update", autospec=True, side_effect=update
+        ) as mock_update:
+            pool._refresh_catalog(barman_server)
+            pool._refresh_catalog(barman_server)
+            assert mock_update.call_count == 1
+            assert list(barman_server.backup_manager._backup_cache) == ["B1"]
+
+            _write_info(
+                os.path.join(barman_server.meta_directory, "B2-backup.info"),
+                old=False,
+            )
+
+            pool._refresh_catalog(barman_server)
+            assert mock_update.call_count == 2
+            assert sorted(barman_server.backup_manager._backup_cache) == [
+                "B1",
+                "B2",
+            ]
+
+            # The modification is too recent to be trusted
+            pool._refresh_catalog(barman_server)
+            assert mock_update.call_count == 3
+
+            _set_old_mtime(barman_server.meta_directory)
+            pool._refresh_catalog(barman_server)
+            pool._refresh_catalog(barman_server)
+            assert mock_update.call_count == 4
+
+        # B1 was only parsed once, B2 while its modification was too recent
+        assert mock_build.call_count == 4
+
+    def test__refresh_catalog_no_meta_directory(
+        self, mock_build, barman_server
+    ):
+        """Test :meth:`ServerPool._refresh_catalog`.
+
+        Ensure Barman versions older than 3.13, which have no meta directory,
+        are supported.
+        """
+        pool = ServerPool()
+        del barman_server.meta_directory
+        base = barman_server.config.basebackups_directory
+        _write_info(os.path.join(base, "B1", "backup.info"))
+        _set_old_mtime(base)
+
+        pool._refresh_catalog(barman_server)
+
+        assert list(barman_server.backup_manager._backup_cache) == ["B1"]
+
+    def test__refresh_catalog_unfinished_backup(
+        self, mock_build, barman_server
+    ):
+        """Test :meth:`ServerPool._refresh_catalog`.
+
+        Ensure the catalog is updated when the ``backup.info`` file of an
+        unfinished backup is modified in the legacy location.
+        """
+        base = barman_server.config.basebackups_directory
+        info_file = os.path.join(base, "B1", "backup.info")
+        _write_info(os.path.join(base, "B0", "backup.info"))
+        _write_info(info_file, "STARTED")
+        _set_old_mtime(base)
+
+        pool = ServerPool()
+
+        pool._refresh_catalog(barman_server)
+        pool._refresh_catalog(barman_server)
+        assert mock_build.call_count == 2
+
+        _write_info(info_file, "DONE", old=False)
+        os.utime(info_file, (time.time() - 30, time.time() - 30))
+
+        pool._refresh_catalog(barman_server)
+        assert mock_build.call_count == 3
+        assert barman_server.backup_manager._backup_cache["B1"].status == (
+            "DONE"
+        )
+
+    def test__refresh_catalog_cloud(self, mock_build, barman_server):
+        """Test :meth:`ServerPool._refresh_catalog`.
+
+        Ensure Barman loads the catalog itself if it may come from the cloud.
+        """
+        barman_server.use_backup_cloud_storage = True
+
+        ServerPool()._refresh_catalog(barman_server)
+
+        barman_server.get_available_backups.assert_called_once_with(
+            BackupInfo.STATUS_ALL
+        )
+        mock_build.assert_not_called()
+
+    @patch("pg_backup_api.backup_catalog.get_config_generation")
+    @patch("pg_backup_api.backup_catalog.Server")
+    def test_server(self, mock_server, mock_generation, mock_build):
+        """Test :meth:`ServerPool.server`.
+
+        Ensure servers are reused until the configuration generation changes.
+        """
+        config = MagicMock()
+        config.name = "SOME_SERVER"
+        mock_generation.return_value = "GENERATION_1"
+        pool = ServerPool()
+
+        with patch.object(pool, "_refresh_catalog") as mock_refresh:
+            with pool.server(config) as server:
+                assert server is mock_server.return_value
+
+            with pool.server(config) as server:
+                assert server is mock_server.return_value
+
+            mock_server.assert_called_once_with(config)
+            assert mock_refresh.call_count == 2
+
+            mock_generation.return_value = "GENERATION_2"
+
+            with pool.server(config):
+                pass
+
+            assert mock_server.call_count == 2
+
+    def test_wal_index(self, mock_build, tmp_path):
+        """Test :meth:`ServerPool.wal_index`.
+
+        Ensure the WAL index of a server is reused and updated, unless the
+        path to ``xlog.db`` changes.
+        """
+        server = MagicMock()
+        server.config.name = "SOME_SERVER"
+        server.xlogdb_file_path = str(tmp_path / "xlog.db")
+        (tmp_path / "xlog.db").write_text(
+            _xlogdb_line("000000010000000000000001")
+        )
+        pool = ServerPool()
+
+        index = pool.wal_index(server)
+        assert index.names == ["000000010000000000000001"]
+
+        with open(str(tmp_path / "xlog.db"), "a") as fd:
+            fd.write(_xlogdb_line("000000010000000000000002"))
+
+        assert pool.wal_index(server) is index
+        assert index.names == [
+            "000000010000000000000001",
+            "000000010000000000000002",
+        ]
+
+        server.xlogdb_file_path = str(tmp_path / "other.db")
+        index = pool.wal_index(server)
+
+        assert index.path == str(tmp_path / "other.db")
+        assert index.names == []
+
+        # Barman versions older than 3.13 keep it in the WALs directory
+        del server.xlogdb_file_path
+        server.config.wals_directory = str(tmp_path / "wals")
+        index = pool.wal_index(server)
+
+        assert index.path == str(tmp_path / "wals" / "xlog.db")
+
+    @patch("pg_backup_api.backup_catalog.get_config_generation", MagicMock())
+    @patch("pg_backup_api.backup_catalog.Server")
+    def test_list_backups(self, mock_server, mock_build, barman_server):
+        """Test :meth:`ServerPool.list_backups`.
+
+        Ensure backups are listed from the newest to the oldest, optionally
+        filtered by status.
+        """
+        mock_server.return_value = barman_server
+        base = barman_server.config.basebackups_directory
+        _write_info(os.path.join(base, "B1", "backup.info"))
+        _write_info(os.path.join(base, "B3", "backup.info"), "FAILED")
+        _write_info(os.path.join(base, "B2", "backup.info"))
+
+        pool = ServerPool()
+        backups = pool.list_backups(barman_server.config)
+
+        assert [b["backup_id"] for b in backups] == ["B3", "B2", "B1"]
+
+        backups = pool.list_backups(barman_server.config, ["DONE"])
+
+        assert [b["backup_id"] for b in backups] == ["B2", "B1"]
+        assert mock_build.call_count == 3
+
+
+def test_get_server_pool():
+    """Test :func:`get_server_pool`.
+
+    Ensure a single pool is created.
+    """
+    with patch.object(backup_catalog_module, "_pool", None):
+        pool = get_server_pool()
+
+        assert isinstance(pool, ServerPool)
+        assert get_server_pool() is pool
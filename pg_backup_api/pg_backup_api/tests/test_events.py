@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the event logs of operations."""
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+import requests
+
+from pg_backup_api.events import (
+    WebhookDeliverer,
+    append_event,
+    decode_cursor,
+    encode_cursor,
+    iter_new_events,
+    read_events,
+    start_webhook_deliverer,
+)
+
+
+def test_append_and_read_events(tmp_path):
+    """Test :func:`append_event` and :func:`read_events`.
+
+    Ensure appended events are read back from the given offset, and that an
+    unterminated trailing line is left to be read later.
+    """
+    path = str(tmp_path / "events.jsonl")
+
+    assert read_events(path, 0) == ([], 0)
+
+    append_event(path, {"operation_id": "OP_1"})
+    append_event(path, {"operation_id": "OP_2"})
+
+    events, end = read_events(path, 0)
+    assert events == [
+        ({"operation_id": "OP_1"}, 24),
+        ({"operation_id": "OP_2"}, 48),
+    ]
+    assert end == 48
+
+    with open(path, "a") as fd:
+        fd.write('{"operation_id":')
+
+    assert read_events(path, 24) == ([({"operation_id": "OP_2"}, 48)], 48)
+    assert read_events(path, 48) == ([], 48)
+
+
+def test_read_events_recreated(tmp_path):
+    """Test :func:`read_events`.
+
+    Ensure a log shorter than the offset is read from the beginning, and that
+    malformed lines are skipped.
+    """
+    path = tmp_path / "events.jsonl"
+    path.write_text('NOT JSON\n{"operation_id":"OP_1"}\n')
+
+    assert read_events(str(path), 1000) == (
+        [({"operation_id": "OP_1"}, 33)],
+        33,
+    )
+
+
+@pytest.mark.parametrize("offsets", [{}, {"": 10, "SERVER_1": 0}])
+def test_cursor(offsets):
+    """Test :func:`encode_cursor` and :func:`decode_cursor`.
+
+    Ensure a cursor decodes back to the offsets it was created from.
+    """
+    assert decode_cursor(encode_cursor(offsets)) == offsets
+
+
+@pytest.mark.parametrize(
+    "cursor", ["SOME_CURSOR", encode_cursor({"": -1}), "WzFd"]
+)
+def test_decode_cursor_invalid(cursor):
+    """Test :func:`decode_cursor`.
+
+    Ensure an exception is raised if the cursor is invalid.
+    """
+    with pytest.raises(ValueError) as exc:
+        decode_cursor(cursor)
+
+    assert str(exc.value) == f"Invalid cursor '{cursor}'"
+
+
+def test_iter_new_events(tmp_path):
+    """Test :func:`iter_new_events`.
+
+    Ensure events of all logs are yielded, with the offsets pointing right
+    after the last yielded event.
+    """
+    files = {
+        "": str(tmp_path / "instance.jsonl"),
+        "SERVER_1": str(tmp_path / "server.jsonl"),
+    }
+    append_event(files[""], {"operation_id": "OP_1"})
+    append_event(files["SERVER_1"], {"operation_id": "OP_2"})
+
+    offsets = {}
+    seen = []
+
+    for event in iter_new_events(files, offsets):
+        seen.append((event["operation_id"], dict(offsets)))
+
+    assert seen == [("OP_1", {"": 24}), ("OP_2", {"": 24, "SERVER_1": 24})]
+    assert list(iter_new_events(files, offsets)) == []
+
+
+class TestWebhookDeliverer:
+    """Run tests for :class:`WebhookDeliverer`."""
+
+    @pytest.fixture
+    def deliverer(self, tmp_path):
+        """Create a :class:`WebhookDeliverer` instance for testing.
+
+        :return: :class:`WebhookDeliverer` instance for testing.
+        """
+        files = {"": str(tmp_path / "events.jsonl")}
+        return WebhookDeliverer(
+            "http://localhost:8080/hook",
+            lambda: files,
+            str(tmp_path / "webhook.cursor"),
+            0.01,
+            batch_size=2,
+            max_retries=2,
+        )
+
+    def test___init___not_local(self, tmp_path):
+        """Test :meth:`WebhookDeliverer.__init__`.
+
+        Ensure an exception is raised if the webhook is not local.
+        """
+        with pytest.raises(ValueError) as exc:
+            WebhookDeliverer("http://example.com/hook", dict, "CURSOR", 1)
+
+        expected = "Webhook URL 'http://example.com/hook' is not a local URL"
+        assert str(exc.value) == expected
+
+    @patch("requests.post")
+    def test_deliver(self, mock_post, deliverer):
+        """Test :meth:`WebhookDeliverer.deliver`.
+
+        Ensure events are posted in batches, and that the cursor is saved so
+        events are not delivered twice.
+        """
+        mock_post.return_value.status_code = 204
+        path = deliverer.get_files()[""]
+
+        for i in range(3):
+            append_event(path, {"operation_id": f"OP_{i}"})
+
+        offsets = {}
+        deliverer.deliver(offsets)
+
+        assert mock_post.call_args_list == [
+            call(
+                "http://localhost:8080/hook",
+                json={
+                    "events": [
+                        {"operation_id": "OP_0"},
+                        {"operation_id": "OP_1"},
+                    ]
+                },
+                timeout=10.0,
+            ),
+            call(
+                "http://localhost:8080/hook",
+                json={"events": [{"operation_id": "OP_2"}]},
+                timeout=10.0,
+            ),
+        ]
+        assert offsets == {"": 72}
+        assert deliverer._load_cursor() == {"": 72}
+
+        mock_post.reset_mock()
+        deliverer.deliver(offsets)
+        mock_post.assert_not_called()
+
+    @patch("time.sleep")
+    @patch("requests.post")
+    def test__post_retries(self, mock_post, mock_sleep, deliverer):
+        """Test :meth:`WebhookDeliverer._post`.
+
+        Ensure failed calls are retried with exponential backoff, up to the
+        maximum number of retries.
+        """
+        mock_post.side_effect = [
+            requests.ConnectionError("SOME_ERROR"),
+            MagicMock(status_code=500),
+            MagicMock(status_code=200),
+        ]
+
+        assert deliverer._post([{"operation_id": "OP_1"}]) is True
+        assert mock_sleep.call_args_list == [call(1.0), call(2.0)]
+
+        mock_post.side_effect = None
+        mock_post.return_value.status_code = 503
+
+        assert deliverer._post([{"operation_id": "OP_1"}]) is False
+
+    def test_start_single_process(self, deliverer, tmp_path):
+        """Test :meth:`WebhookDeliverer.start`.
+
+        Ensure only one deliverer runs at a time for a given cursor file.
+        """
+        other = WebhookDeliverer(
+            deliverer.url,
+            deliverer.get_files,
+            deliverer.cursor_file,
+            deliverer.interval,
+        )
+
+        with patch.object(WebhookDeliverer, "_run"):
+            assert deliverer.start() is True
+            assert other.start() is False
+
+
+@patch("pg_backup_api.events.WebhookDeliverer")
+def test_start_webhook_deliverer(mock_deliverer):
+    """Test :func:`start_webhook_deliverer`.
+
+    Ensure the deliverer is only started if a valid webhook is configured.
+    """
+    assert start_webhook_deliverer(dict, "CURSOR") is None
+    mock_deliverer.assert_not_called()
+
+    env = {
+        "PG_BACKUP_API_WEBHOOK_URL": "http://127.0.0.1/hook",
+        "PG_BACKUP_API_WEBHOOK_BATCH_SIZE": "10",
+    }
+
+    with patch.dict("os.environ", env):
+        assert start_webhook_deliverer(dict, "CURSOR") == (
+            mock_deliverer.return_value
+        )
+
+        mock_deliverer.assert_called_once_with(
+            "http://127.0.0.1/hook", dict, "CURSOR", 0.5, 10, 5
+        )
+
+        mock_deliverer.side_effect = ValueError("SOME_ERROR")
+
+        with patch("pg_backup_api.events.log") as mock_log:
+            assert start_webhook_deliverer(dict, "CURSOR") is None
+
+        mock_log.error.assert_called_once_with(
+            "Not delivering events: %s", mock_deliverer.side_effect
+        )
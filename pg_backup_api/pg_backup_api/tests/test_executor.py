@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the executor of operations."""
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from pg_backup_api import executor as executor_module
+from pg_backup_api.executor import (
+    OperationExecutor,
+    QueuedOperation,
+    get_executor,
+)
+from pg_backup_api.server_operation import OperationType
+
+
+def _queued_op(
+    op_id,
+    server_name="SOME_SERVER",
+    priority=0,
+    op_type=OperationType.CONFIG_UPDATE,
+):
+    """Create a :class:`QueuedOperation` for testing.
+
+    :param op_id: ID of the operation.
+    :param server_name: name of the Barman server of the operation.
+    :param priority: priority of the operation.
+    :param op_type: type of the operation.
+    :return: a new :class:`QueuedOperation`.
+    """
+    return QueuedOperation(
+        server_name,
+        op_id,
+        op_type,
+        ["pg-backup-api", "config-update", "--operation-id", op_id],
+        priority,
+    )
+
+
+class TestOperationExecutor:
+    """Run tests for :class:`OperationExecutor`."""
+
+    def test___init___invalid_workers(self):
+        """Test :meth:`OperationExecutor.__init__`.
+
+        Ensure an exception is raised if there would be no workers.
+        """
+        with pytest.raises(ValueError) as exc:
+            OperationExecutor(0)
+
+        assert str(exc.value) == "The executor needs at least one worker"
+
+    @pytest.mark.parametrize("reserved", [-1, 2])
+    def test___init___invalid_reserved_workers(self, reserved):
+        """Test :meth:`OperationExecutor.__init__`.
+
+        Ensure an exception is raised if no worker would be left for
+        operations other than recoveries.
+        """
+        with pytest.raises(ValueError) as exc:
+            OperationExecutor(2, reserved_recovery_workers=reserved)
+
+        assert str(exc.value) == (
+            "The number of workers reserved for recoveries should be between "
+            "0 and 1"
+        )
+
+    def test_submit_dispatches_all(self):
+        """Test :meth:`OperationExecutor.submit`.
+
+        Ensure every queued operation has its runner executed, and that no
+        more than ``max_workers`` runners are executed concurrently.
+        """
+        executor = OperationExecutor(2)
+        lock = threading.Lock()
+        done = threading.Semaphore(0)
+        state = {"running": 0, "max_running": 0, "cmds": []}
+        release = threading.Event()
+
+        def fake_popen(cmd):
+            with lock:
+                state["running"] += 1
+                state["max_running"] = max(
+                    state["max_running"], state["running"]
+                )
+                state["cmds"].append(cmd)
+
+            def wait():
+                release.wait(5)
+                with lock:
+                    state["running"] -= 1
+                done.release()
+
+            return type("FakeProcess", (), {"wait": staticmethod(wait)})()
+
+        with patch("subprocess.Popen", side_effect=fake_popen):
+            for i in range(5):
+                executor.submit(_queued_op(f"OP_{i}"))
+
+            release.set()
+
+            for _ in range(5):
+                assert done.acquire(timeout=5)
+
+        assert state["max_running"] <= 2
+        assert sorted(cmd[-1] for cmd in state["cmds"]) == [
+            f"OP_{i}" for i in range(5)
+        ]
+        assert len(executor._workers) == 2
+
+    def test_pending(self):
+        """Test :attr:`OperationExecutor.pending`.
+
+        Ensure it lists operations which were not dispatched yet.
+        """
+        executor = OperationExecutor(1)
+        queued_op = _queued_op("OP_1")
+
+        with patch.object(executor, "_start_workers"):
+            executor.submit(queued_op)
+
+        assert executor.pending == [queued_op]
+
+    def test_submit_supersedes_config_switch(self):
+        """Test :meth:`OperationExecutor.submit`.
+
+        Ensure a config switch operation supersedes the queued config switch
+        operations for the same server, and only those.
+        """
+        executor = OperationExecutor(1)
+        switch = OperationType.CONFIG_SWITCH
+        old_ops = [
+            _queued_op("OP_1", op_type=switch),
+            _queued_op("OP_2", server_name="OTHER_SERVER", op_type=switch),
+            _queued_op("OP_3"),
+            _queued_op("OP_4", op_type=switch),
+        ]
+        new_op = _queued_op("OP_5", op_type=switch)
+
+        with patch.object(executor, "_start_workers"):
+            for queued_op in old_ops:
+                assert executor.submit(queued_op) == (
+                    [old_ops[0]] if queued_op is old_ops[3] else []
+                )
+
+            assert executor.submit(new_op) == [old_ops[3]]
+
+        assert executor.pending == [old_ops[1], old_ops[2], new_op]
+
+    def test_discard(self):
+        """Test :meth:`OperationExecutor.discard`.
+
+        Ensure only the given operation is taken out of the queue.
+        """
+        executor = OperationExecutor(1)
+        queued_ops = [
+            _queued_op("OP_1"),
+            _queued_op("OP_1", server_name=None),
+            _queued_op("OP_2"),
+        ]
+
+        with patch.object(executor, "_start_workers"):
+            for queued_op in queued_ops:
+                executor.submit(queued_op)
+
+        assert executor.discard(None, "OP_1") is True
+        assert executor.pending == [queued_ops[0], queued_ops[2]]
+        assert executor.discard(None, "OP_1") is False
+        assert executor.discard("SOME_SERVER", "OP_3") is False
+
+    def test__next_priority(self):
+        """Test :meth:`OperationExecutor._next`.
+
+        Ensure operations are dispatched by priority, and then in FIFO order.
+        """
+        executor = OperationExecutor(1, aging_interval=0)
+
+        with patch.object(executor, "_start_workers"):
+            for op_id, priority in [("OP_1", 0), ("OP_2", 10), ("OP_3", 10)]:
+                executor.submit(_queued_op(op_id, priority=priority))
+
+        dispatched = []
+
+        for _ in range(3):
+            queued_op = executor._next()
+            dispatched.append(queued_op.operation_id)
+            # The single worker is busy until the runner finishes
+            assert executor._pick() is None
+            executor._release(queued_op)
+
+        assert dispatched == ["OP_2", "OP_3", "OP_1"]
+
+    def test__next_aging(self):
+        """Test :meth:`OperationExecutor._next`.
+
+        Ensure the priority of an operation grows while it waits, so it's not
+        starved by operations with a higher priority.
+        """
+        executor = OperationExecutor(2, aging_interval=60)
+        old_op = _queued_op("OP_1", priority=0)
+        old_op.queued_at -= 700
+        new_op = _queued_op("OP_2", priority=10)
+
+        assert executor.get_effective_priority(
+            old_op, old_op.queued_at + 90
+        ) == pytest.approx(1.5)
+
+        with patch.object(executor, "_start_workers"):
+            executor.submit(new_op)
+            executor.submit(old_op)
+
+        assert executor._next() is old_op
+
+    def test__next_reserved_recovery_workers(self):
+        """Test :meth:`OperationExecutor._next`.
+
+        Ensure operations other than recoveries do not use the reserved
+        workers, even if they have a higher priority.
+        """
+        executor = OperationExecutor(2, reserved_recovery_workers=1)
+        recovery = _queued_op("OP_3", op_type=OperationType.RECOVERY)
+
+        with patch.object(executor, "_start_workers"):
+            executor.submit(_queued_op("OP_1", priority=20))
+            executor.submit(_queued_op("OP_2", priority=20))
+            executor.submit(recovery)
+
+        assert executor._next().operation_id == "OP_1"
+        assert executor._pick() is recovery
+        assert executor._next() is recovery
+        assert executor._pick() is None
+
+    def test__work_releases_worker(self):
+        """Test :meth:`OperationExecutor._work`.
+
+        Ensure a worker used by an operation other than a recovery is
+        released once its runner finishes, even if it failed.
+        """
+        executor = OperationExecutor(2, reserved_recovery_workers=1)
+
+        with patch.object(executor, "_start_workers"):
+            executor.submit(_queued_op("OP_1"))
+            executor.submit(_queued_op("OP_2"))
+
+        with patch.object(
+            executor, "_dispatch", side_effect=RuntimeError("SOME ERROR")
+        ):
+            with pytest.raises(RuntimeError):
+                executor._work()
+
+        assert executor._running_others == 0
+        assert executor._next().operation_id == "OP_2"
+
+    @pytest.mark.parametrize(
+        "load,backlog,expected",
+        [
+            (3.0, 10, None),
+            (9.0, 10, "the load average per CPU is 2.25"),
+            (3.0, 50, "50 WAL files are waiting to be archived"),
+        ],
+    )
+    @patch("pg_backup_api.executor.get_wal_backlog")
+    @patch("os.cpu_count", return_value=4)
+    @patch("os.getloadavg")
+    def test_get_pause_reason(
+        self, mock_load, _, mock_backlog, load, backlog, expected
+    ):
+        """Test :meth:`OperationExecutor.get_pause_reason`.
+
+        Ensure dispatching is paused if the load average per CPU, or the WAL
+        backlog, exceeds its threshold.
+        """
+        mock_load.return_value = (load, 0.0, 0.0)
+        mock_backlog.return_value = backlog
+        executor = OperationExecutor(1, max_load=2.0, max_wal_backlog=20)
+
+        assert executor.get_pause_reason() == expected
+
+    @patch("pg_backup_api.executor.get_wal_backlog")
+    @patch("os.getloadavg")
+    def test_get_pause_reason_disabled(self, mock_load, mock_backlog):
+        """Test :meth:`OperationExecutor.get_pause_reason`.
+
+        Ensure the host is not checked if no threshold is set.
+        """
+        assert OperationExecutor(1).get_pause_reason() is None
+        mock_load.assert_not_called()
+        mock_backlog.assert_not_called()
+
+    @patch("pg_backup_api.executor.log")
+    def test__next_paused(self, mock_log):
+        """Test :meth:`OperationExecutor._next`.
+
+        Ensure no operation is dispatched while paused, the host is checked
+        at most once per interval, and dispatching resumes once it's idle.
+        """
+        executor = OperationExecutor(1, pause_check_interval=0.05)
+
+        with patch.object(executor, "_start_workers"):
+            executor.submit(_queued_op("OP_1"))
+
+        with patch.object(
+            executor,
+            "get_pause_reason",
+            side_effect=["SOME REASON", "SOME REASON", None],
+        ) as mock_reason:
+            assert executor._is_paused(100.0) is True
+            assert executor._is_paused(100.01) is True
+            assert mock_reason.call_count == 1
+            assert executor._next().operation_id == "OP_1"
+
+        assert mock_reason.call_count == 3
+        assert executor._paused is False
+        mock_log.warning.assert_called_once_with(
+            "Pausing dispatch of operations, as %s", "SOME REASON"
+        )
+        mock_log.info.assert_called_once_with(
+            "Resuming dispatch of operations"
+        )
+
+    def test__is_paused_not_paused(self):
+        """Test :meth:`OperationExecutor._is_paused`.
+
+        Ensure the host is checked at most once per interval while not
+        paused either.
+        """
+        executor = OperationExecutor(1, pause_check_interval=10.0)
+
+        with patch.object(
+            executor, "get_pause_reason", side_effect=[None, "SOME REASON"]
+        ) as mock_reason:
+            assert executor._is_paused(100.0) is False
+            assert executor._is_paused(105.0) is False
+            assert mock_reason.call_count == 1
+            assert executor._is_paused(110.0) is True
+            assert mock_reason.call_count == 2
+
+    def test__next_coalesce(self):
+        """Test :meth:`OperationExecutor._next`.
+
+        Ensure config update operations wait for the coalescing window, and
+        are then merged, in order, up to the maximum, while other operations
+        are not held back.
+        """
+        executor = OperationExecutor(
+            2, aging_interval=0, coalesce_window=0.2, coalesce_max=3
+        )
+        updates = [
+            _queued_op(f"OP_{i}", op_type=OperationType.CONFIG_UPDATE)
+            for i in range(1, 5)
+        ]
+
+        with patch.object(executor, "_start_workers"):
+            executor.submit(updates[0])
+            executor.submit(
+                _queued_op("OP_SWITCH", op_type=OperationType.CONFIG_SWITCH)
+            )
+
+            for queued_op in updates[1:]:
+                executor.submit(queued_op)
+
+        assert executor._next().operation_id == "OP_SWITCH"
+        assert executor._pick() is None
+
+        start = time.monotonic()
+        leader = executor._next()
+
+        assert time.monotonic() - start >= 0.1
+        assert leader is updates[0]
+        assert leader.merged == updates[1:3]
+        assert executor.pending == [updates[3]]
+
+    @patch("subprocess.Popen")
+    def test__dispatch_merged(self, mock_popen):
+        """Test :meth:`OperationExecutor._dispatch`.
+
+        Ensure the runner is given the IDs of the merged operations.
+        """
+        queued_op = _queued_op("OP_1", op_type=OperationType.CONFIG_UPDATE)
+        queued_op.merged = [_queued_op("OP_2"), _queued_op("OP_3")]
+
+        OperationExecutor(1)._dispatch(queued_op)
+
+        mock_popen.assert_called_once_with(
+            queued_op.cmd
+            + [
+                "--merge-operation-id",
+                "OP_2",
+                "--merge-operation-id",
+                "OP_3",
+            ]
+        )
+
+    @patch("pg_backup_api.executor.log")
+    @patch("subprocess.Popen")
+    def test__dispatch_error(self, mock_popen, mock_log):
+        """Test :meth:`OperationExecutor._dispatch`.
+
+        Ensure an error is logged if the runner cannot be started.
+        """
+        mock_popen.side_effect = FileNotFoundError("pg-backup-api")
+
+        OperationExecutor(1)._dispatch(_queued_op("OP_1"))
+
+        mock_log.error.assert_called_once_with(
+            "Could not run operation '%s': %s",
+            "OP_1",
+            mock_popen.side_effect,
+        )
+
+
+@patch.dict(
+    "os.environ",
+    {
+        "PG_BACKUP_API_EXECUTOR_WORKERS": "7",
+        "PG_BACKUP_API_EXECUTOR_AGING_INTERVAL": "30",
+        "PG_BACKUP_API_EXECUTOR_RESERVED_RECOVERY_WORKERS": "2",
+        "PG_BACKUP_API_EXECUTOR_MAX_LOAD": "1.5",
+        "PG_BACKUP_API_EXECUTOR_MAX_WAL_BACKLOG": "100",
+        "PG_BACKUP_API_EXECUTOR_COALESCE_WINDOW": "2",
+    },
+)
+def test_get_executor():
+    """Test :func:`get_executor`.
+
+    Ensure a single executor is created, with the configured number of
+    workers, aging interval, reserved workers and pause thresholds.
+    """
+    with patch.object(executor_module, "_executor", None):
+        executor = get_executor()
+
+        assert executor.max_workers == 7
+        assert executor.aging_interval == 30.0
+        assert executor.reserved_recovery_workers == 2
+        assert executor.max_load == 1.5
+        assert executor.max_wal_backlog == 100
+        assert executor.pause_check_interval == 10.0
+        assert executor.coalesce_window == 2.0
+        assert executor.coalesce_max == 100
+        assert get_executor() is executor
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the JSON backend."""
+from datetime import datetime
+import json
+from unittest.mock import patch
+
+from flask import Flask, jsonify
+import pytest
+
+from pg_backup_api import json_backend
+from pg_backup_api.json_backend import dumps, init_app, iter_dumps, loads
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request):
+    """Run the test with each backend.
+
+    :yield: name of the backend in use.
+    """
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield request.param
+    else:
+        with patch.object(json_backend, "orjson", None):
+            yield request.param
+
+
+def test_dumps(backend):
+    """Test :func:`dumps`.
+
+    Ensure both backends produce the same compact JSON.
+    """
+    content = {"b": [1, 2.5, None], "a": {"c": True}}
+
+    assert dumps(content) == b'{"b":[1,2.5,null],"a":{"c":true}}'
+    assert dumps(content, sort_keys=True) == (
+        b'{"a":{"c":true},"b":[1,2.5,null]}'
+    )
+    assert json.loads(dumps(content, indent=True)) == content
+    assert b'\n  "b"' in dumps(content, indent=True)
+
+
+def test_dumps_default(backend):
+    """Test :func:`dumps`.
+
+    Ensure *default* is called with objects which cannot be encoded
+    otherwise.
+    """
+    content = {"date": datetime(2026, 10, 19), "value": {1}}
+
+    assert dumps(content, default=str) == (
+        b'{"date":"2026-10-19 00:00:00","value":"{1}"}'
+    )
+
+    with pytest.raises(TypeError):
+        dumps(content)
+
+
+def test_dumps_fallback():
+    """Test :func:`dumps`.
+
+    Ensure content which ``orjson`` cannot encode is encoded by the standard
+    library.
+    """
+    pytest.importorskip("orjson")
+
+    assert dumps({1: "a", "big": 2**70}) == (
+        b'{"1":"a","big":1180591620717411303424}'
+    )
+
+
+def test_loads(backend):
+    """Test :func:`loads`.
+
+    Ensure both bytes and strings are decoded, and that invalid documents
+    raise :exc:`ValueError`.
+    """
+    assert loads(b'{"a": [1, "b"]}') == {"a": [1, "b"]}
+    assert loads('{"a": [1, "b"]}') == {"a": [1, "b"]}
+
+    with pytest.raises(ValueError):
+        loads(b'{"a": ')
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64 * 1024])
+def test_iter_dumps(backend, chunk_size):
+    """Test :func:`iter_dumps`.
+
+    Ensure the listing is encoded incrementally, with the same result as
+    encoding it at once with sorted keys.
+    """
+    content = {
+        "total": 3,
+        "backups": [{"id": i, "status": "DONE"} for i in range(3)],
+    }
+
+    with patch.object(json_backend, "CHUNK_SIZE", chunk_size):
+        chunks = list(iter_dumps(content, "backups"))
+
+    assert len(chunks) == (4 if chunk_size == 1 else 1)
+    assert b"".join(chunks) == dumps(content, sort_keys=True) + b"\n"
+    assert b"".join(iter_dumps({"backups": []}, "backups")) == (
+        b'{"backups":[]}\n'
+    )
+
+
+def test_init_app(backend):
+    """Test :func:`init_app`.
+
+    Ensure responses of the Flask application are encoded through the
+    backend, as compact JSON with sorted keys.
+    """
+    app = Flask("test")
+    init_app(app)
+
+    with app.app_context():
+        response = jsonify({"b": 1, "a": datetime(2026, 10, 19)})
+
+    assert response.data == b'{"a":"Mon, 19 Oct 2026 00:00:00 GMT","b":1}\n'
+    assert app.json.loads(b'{"a": 1}') == {"a": 1}
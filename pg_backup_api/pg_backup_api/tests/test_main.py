@@ -30,10 +30,11 @@ _HELP_OUTPUT = {
     "pg-backup-api --help": dedent(
         """\
         usage: pg-backup-api [-h]
-                             {serve,status,recovery,config-switch,config-update} ...
+                             {serve,status,recovery,config-switch,config-update,pipeline,migrate-layout}
+                             ...
 
         positional arguments:
-          {serve,status,recovery,config-switch,config-update}
+          {serve,status,recovery,config-switch,config-update,pipeline,migrate-layout}
 
         optional arguments:
           -h, --help            show this help message and exit
@@ -105,6 +106,7 @@ _HELP_OUTPUT = {
     "pg-backup-api config-update --help": dedent(
         """\
         usage: pg-backup-api config-update [-h] --operation-id OPERATION_ID
+                                           [--merge-operation-id MERGE_OPERATION_ID]
 
         Perform a 'barman config-update' through the 'pg-backup-api'. Can only be run
         if a config-update operation has been previously registered.
@@ -113,6 +115,45 @@ _HELP_OUTPUT = {
           -h, --help            show this help message and exit
           --operation-id OPERATION_ID
                                 ID of the operation in the 'pg-backup-api'.
+          --merge-operation-id MERGE_OPERATION_ID
+                                ID of another config-update operation to be run along
+                                with it. Can be given several times.
+\
+    """
+    ),  # noqa: E501
+    "pg-backup-api pipeline --help": dedent(
+        """\
+        usage: pg-backup-api pipeline [-h] --server-name SERVER_NAME --operation-id
+                                      OPERATION_ID
+
+        Perform the steps of a pipeline through the 'pg-backup-api'. Can only be run
+        if a pipeline operation has been previously registered.
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          --server-name SERVER_NAME
+                                Name of the Barman server related to the pipeline.
+          --operation-id OPERATION_ID
+                                ID of the operation in the 'pg-backup-api'.
+\
+    """
+    ),  # noqa: E501
+    "pg-backup-api migrate-layout --help": dedent(
+        """\
+        usage: pg-backup-api migrate-layout [-h] [--server-name SERVER_NAME]
+                                            [--layout {flat,sharded}]
+
+        Move files of existing operations to the given layout. Should be run after
+        changing 'PG_BACKUP_API_OPERATIONS_LAYOUT'.
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          --server-name SERVER_NAME
+                                Name of the Barman server whose operations should be
+                                moved. If not given, move operations of the Barman
+                                instance and of all Barman servers.
+          --layout {flat,sharded}
+                                Layout the files should be moved to.
 \
     """
     ),  # noqa: E501
@@ -124,6 +165,8 @@ _COMMAND_FUNC = {
     "pg-backup-api recovery --server-name SOME_SERVER --operation-id SOME_OP_ID": "recovery_operation",  # noqa: E501
     "pg-backup-api config-switch --server-name SOME_SERVER --operation-id SOME_OP_ID": "config_switch_operation",  # noqa: E501
     "pg-backup-api config-update --operation-id SOME_OP_ID": "config_update_operation",  # noqa: E501
+    "pg-backup-api pipeline --server-name SOME_SERVER --operation-id SOME_OP_ID": "pipeline_operation",  # noqa: E501
+    "pg-backup-api migrate-layout --layout sharded": "migrate_layout",  # noqa: E501
 }
 
 
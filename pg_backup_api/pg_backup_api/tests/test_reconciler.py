@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the reconciliation of orphaned operations."""
+
+import time
+from unittest.mock import MagicMock, Mock, call, patch
+
+import pytest
+
+from pg_backup_api.executor import QueuedOperation
+from pg_backup_api.reconciler import Reconciler, start_reconciler
+from pg_backup_api.server_operation import OperationType
+
+
+class TestReconciler:
+    """Run tests for :class:`Reconciler`."""
+
+    @pytest.fixture
+    def reconciler(self):
+        """Create a :class:`Reconciler` instance for testing.
+
+        :return: a new :class:`Reconciler`, with a heartbeat timeout of 100
+            seconds.
+        """
+        return Reconciler(60, 100)
+
+    @pytest.mark.parametrize(
+        "runner,alive,silence,expected",
+        [
+            (None, None, 10, None),
+            (None, None, 200, "it did not start within 200 seconds"),
+            ({"pid": 1234, "start_time": 5678}, True, 10, None),
+            (
+                {"pid": 1234, "start_time": 5678},
+                False,
+                10,
+                "its runner (PID 1234) is gone",
+            ),
+            (
+                {"pid": 1234, "start_time": 5678},
+                True,
+                200,
+                "its runner did not report for 200 seconds",
+            ),
+        ],
+    )
+    @patch("pg_backup_api.reconciler.is_process_alive")
+    def test__get_failure_reason(
+        self, mock_is_alive, runner, alive, silence, expected, reconciler
+    ):
+        """Test :meth:`Reconciler._get_failure_reason`.
+
+        Ensure an operation is failed if its runner is gone, or no heartbeat
+        was recorded in time.
+        """
+        op_server = MagicMock()
+        op_server.read_job_file.return_value = {"runner": runner}
+        mock_is_alive.return_value = alive
+        last_heartbeat = time.time() - silence - 0.5
+
+        assert (
+            reconciler._get_failure_reason(op_server, "OP_ID", last_heartbeat)
+            == expected
+        )
+
+        op_server.read_job_file.assert_called_once_with("OP_ID")
+
+        if runner:
+            mock_is_alive.assert_called_once_with(1234, 5678)
+
+    @pytest.mark.parametrize(
+        "runner,queuer_alive,silence,expected",
+        [
+            (None, True, 10, None),
+            (None, True, 200, "it did not start within 200 seconds"),
+            (
+                None,
+                False,
+                10,
+                "it was lost before starting, as the REST API process (PID "
+                "4321) which queued it is gone, e.g. because it was restarted",
+            ),
+            ({"pid": 1234, "start_time": 5678}, False, 10, None),
+        ],
+    )
+    @patch("pg_backup_api.reconciler.is_process_alive")
+    def test__get_failure_reason_queued_by(
+        self,
+        mock_is_alive,
+        runner,
+        queuer_alive,
+        silence,
+        expected,
+        reconciler,
+    ):
+        """Test :meth:`Reconciler._get_failure_reason`.
+
+        Ensure an operation which did not start yet is failed right away if
+        the process which queued it is gone, but not once it has a runner.
+        """
+        op_server = MagicMock()
+        op_server.read_job_file.return_value = {
+            "runner": runner,
+            "queued_by": {"pid": 4321, "start_time": 8765},
+        }
+        mock_is_alive.side_effect = lambda pid, start_time: (
+            pid == 1234 or queuer_alive
+        )
+        last_heartbeat = time.time() - silence - 0.5
+
+        assert (
+            reconciler._get_failure_reason(op_server, "OP_ID", last_heartbeat)
+            == expected
+        )
+
+        if not runner:
+            mock_is_alive.assert_called_once_with(4321, 8765)
+
+    @patch("pg_backup_api.reconciler.log", Mock())
+    def test_reconcile_server(self, reconciler):
+        """Test :meth:`Reconciler.reconcile_server`.
+
+        Ensure orphaned operations are marked as ``FAILED`` and their
+        processes killed, pending operations get a heartbeat, and markers of
+        finished operations are removed.
+        """
+        op_server = MagicMock()
+        op_server.get_running_operations.return_value = {
+            "PENDING": 1.0,
+            "ORPHANED": 2.0,
+            "RUNNING": 3.0,
+            "FINISHED": 4.0,
+            "DELETED": 5.0,
+        }
+        op_server.finish_operation.side_effect = [True, False]
+        reasons = {
+            "ORPHANED": "SOME REASON",
+            "RUNNING": None,
+            "FINISHED": "OTHER REASON",
+        }
+
+        def get_failure_reason(op_server, op_id, last_heartbeat):
+            if op_id == "DELETED":
+                raise FileNotFoundError(op_id)
+            return reasons[op_id]
+
+        with patch.object(
+            reconciler, "_get_failure_reason", side_effect=get_failure_reason
+        ):
+            assert reconciler.reconcile_server(op_server, {"PENDING"}) == 1
+
+        op_server.heartbeat.assert_called_once_with("PENDING")
+        op_server.prune_idempotency_keys.assert_called_once_with()
+        op_server.finish_operation.assert_has_calls(
+            [
+                call("ORPHANED", "FAILED", "Operation failed: SOME REASON\n"),
+                call("FINISHED", "FAILED", "Operation failed: OTHER REASON\n"),
+            ]
+        )
+        op_server.signal_runner.assert_called_once_with(
+            "ORPHANED", force=True
+        )
+        op_server.remove_running_file.assert_has_calls(
+            [call("FINISHED"), call("DELETED")]
+        )
+
+    @patch("pg_backup_api.reconciler.log")
+    @patch("pg_backup_api.reconciler.get_executor")
+    @patch("pg_backup_api.reconciler.OperationServer")
+    @patch("barman.__config__")
+    def test_reconcile(
+        self,
+        mock_config,
+        mock_op_server,
+        mock_get_executor,
+        mock_log,
+        reconciler,
+    ):
+        """Test :meth:`Reconciler.reconcile`.
+
+        Ensure the Barman instance and all Barman servers are reconciled, and
+        a failure with one of them does not prevent the others.
+        """
+        mock_config.server_names.return_value = ["SERVER_1", "SERVER_2"]
+        mock_get_executor.return_value.pending = [
+            QueuedOperation("SERVER_1", "OP_1", OperationType.RECOVERY, []),
+            QueuedOperation(None, "OP_2", OperationType.CONFIG_UPDATE, []),
+        ]
+        error = OSError("SOME ERROR")
+        mock_op_server.side_effect = [Mock(), Mock(), error]
+
+        with patch.object(
+            reconciler, "reconcile_server", return_value=2
+        ) as mock_reconcile_server:
+            assert reconciler.reconcile() == 4
+
+        mock_op_server.assert_has_calls(
+            [
+                call(None, load_config=False),
+                call("SERVER_1", load_config=False),
+                call("SERVER_2", load_config=False),
+            ]
+        )
+        assert [c[0][1] for c in mock_reconcile_server.call_args_list] == [
+            {"OP_2"},
+            {"OP_1"},
+        ]
+        mock_log.error.assert_called_once_with(
+            "Could not reconcile operations of '%s': %s", "SERVER_2", error
+        )
+
+
+@patch.dict(
+    "os.environ",
+    {
+        "PG_BACKUP_API_RECONCILE_INTERVAL": "10",
+        "PG_BACKUP_API_HEARTBEAT_TIMEOUT": "20",
+    },
+)
+@patch.object(Reconciler, "start")
+def test_start_reconciler(mock_start):
+    """Test :func:`start_reconciler`.
+
+    Ensure the reconciler is configured through the settings, and started.
+    """
+    reconciler = start_reconciler()
+
+    assert reconciler.interval == 10.0
+    assert reconciler.heartbeat_timeout == 20.0
+    mock_start.assert_called_once_with()
@@ -20,24 +20,39 @@
 
 import argparse
 from requests.exceptions import ConnectionError
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import ANY, MagicMock, Mock, patch, call
 
 import pytest
 
+from pg_backup_api.server_operation import get_events_files
 from pg_backup_api.run import (
     serve,
     status,
     recovery_operation,
     config_switch_operation,
     config_update_operation,
+    pipeline_operation,
+    migrate_layout,
+    start_event_delivery,
 )
 
 
 @pytest.mark.parametrize("port", [7480, 7481])
+@patch("pg_backup_api.run.start_scheduler")
+@patch("pg_backup_api.run.start_reconciler")
+@patch("pg_backup_api.run.start_event_delivery")
 @patch("pg_backup_api.run.output")
 @patch("pg_backup_api.run.load_barman_config")
 @patch("pg_backup_api.run.app")
-def test_serve(mock_app, mock_load_config, mock_output, port):
+def test_serve(
+    mock_app,
+    mock_load_config,
+    mock_output,
+    mock_start_delivery,
+    mock_start_reconciler,
+    mock_start_scheduler,
+    port,
+):
     """Test :func:`serve`.
 
     Ensure :func:`serve` performs the expected calls and return the expected
@@ -55,9 +70,29 @@ def test_serve(mock_app, mock_load_config, mock_output, port):
     mock_output.set_output_writer.assert_called_once_with(
         expected.return_value,
     )
+    mock_start_delivery.assert_called_once_with()
+    mock_start_reconciler.assert_called_once_with()
+    mock_start_scheduler.assert_called_once_with()
     mock_app.run.assert_called_once_with(host="127.0.0.1", port=port)
 
 
+@patch("barman.__config__")
+@patch("pg_backup_api.run.start_webhook_deliverer")
+def test_start_event_delivery(mock_start_deliverer, mock_config):
+    """Test :func:`start_event_delivery`.
+
+    Ensure the webhook deliverer is started with the event logs of all
+    servers, and a cursor file under the Barman home.
+    """
+    mock_config.barman_home = "/BARMAN/HOME"
+
+    start_event_delivery()
+
+    mock_start_deliverer.assert_called_once_with(
+        get_events_files, "/BARMAN/HOME/webhook.cursor"
+    )
+
+
 @pytest.mark.parametrize("port", [7480, 7481])
 @patch("requests.get")
 def test_status_ok(mock_request, port):
@@ -94,6 +129,8 @@ def test_status_failed(mock_request, port):
 @pytest.mark.parametrize("server_name", ["SERVER_1", "SERVER_2"])
 @pytest.mark.parametrize("operation_id", ["OPERATION_1", "OPERATION_2"])
 @pytest.mark.parametrize("rc", [0, 1])
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=False))
 @patch("pg_backup_api.run.RecoveryOperation")
 def test_recovery_operation(mock_rec_op, server_name, operation_id, rc):
     """Test :func:`recovery_operation`.
@@ -106,6 +143,8 @@ def test_recovery_operation(mock_rec_op, server_name, operation_id, rc):
     )
 
     mock_rec_op.return_value.run.return_value = ("SOME_OUTPUT", rc)
+    mock_rec_op.return_value.timed_out = None
+    mock_rec_op.return_value.cancelled = False
     mock_write_output = mock_rec_op.return_value.write_output_file
     mock_time_event = mock_rec_op.return_value.time_event_now
     mock_read_job = mock_rec_op.return_value.read_job_file
@@ -117,17 +156,25 @@ def test_recovery_operation(mock_rec_op, server_name, operation_id, rc):
 
     mock_rec_op.assert_called_once_with(server_name, operation_id)
     mock_rec_op.return_value.run.assert_called_once_with()
+    mock_rec_op.return_value.server.append_event.assert_called_once_with(
+        mock_rec_op.return_value.id,
+        "started",
+        "IN_PROGRESS",
+        mock_read_job.return_value.get.return_value,
+    )
     mock_time_event.assert_called_once_with()
-    mock_read_job.assert_called_once_with()
+    assert mock_read_job.call_count == 2
 
     # Make sure the expected content was added to `read_job_file` output before
     # writing it to the output file.
-    assert len(mock_read_job.return_value.__setitem__.mock_calls) == 3
+    assert len(mock_read_job.return_value.__setitem__.mock_calls) == 5
     mock_read_job.return_value.__setitem__.assert_has_calls(
         [
             call("success", rc == 0),
             call("end_time", mock_time_event.return_value),
             call("output", "SOME_OUTPUT"),
+            call("resources", ANY),
+            call("status", "DONE" if rc == 0 else "FAILED"),
         ]
     )
 
@@ -137,6 +184,8 @@ def test_recovery_operation(mock_rec_op, server_name, operation_id, rc):
 @pytest.mark.parametrize("server_name", ["SERVER_1", "SERVER_2"])
 @pytest.mark.parametrize("operation_id", ["OPERATION_1", "OPERATION_2"])
 @pytest.mark.parametrize("rc", [0, 1])
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=False))
 @patch("pg_backup_api.run.ConfigSwitchOperation")
 def test_config_switch_operation(mock_cs_op, server_name, operation_id, rc):
     """Test :func:`config_switch_operation`.
@@ -149,6 +198,8 @@ def test_config_switch_operation(mock_cs_op, server_name, operation_id, rc):
     )
 
     mock_cs_op.return_value.run.return_value = ("SOME_OUTPUT", rc)
+    mock_cs_op.return_value.timed_out = None
+    mock_cs_op.return_value.cancelled = False
     mock_write_output = mock_cs_op.return_value.write_output_file
     mock_time_event = mock_cs_op.return_value.time_event_now
     mock_read_job = mock_cs_op.return_value.read_job_file
@@ -160,35 +211,51 @@ def test_config_switch_operation(mock_cs_op, server_name, operation_id, rc):
 
     mock_cs_op.assert_called_once_with(server_name, operation_id)
     mock_cs_op.return_value.run.assert_called_once_with()
+    mock_cs_op.return_value.server.append_event.assert_called_once_with(
+        mock_cs_op.return_value.id,
+        "started",
+        "IN_PROGRESS",
+        mock_read_job.return_value.get.return_value,
+    )
     mock_time_event.assert_called_once_with()
-    mock_read_job.assert_called_once_with()
+    assert mock_read_job.call_count == 2
 
     # Make sure the expected content was added to `read_job_file` output before
     # writing it to the output file.
-    assert len(mock_read_job.return_value.__setitem__.mock_calls) == 3
+    assert len(mock_read_job.return_value.__setitem__.mock_calls) == 5
     mock_read_job.return_value.__setitem__.assert_has_calls(
         [
             call("success", rc == 0),
             call("end_time", mock_time_event.return_value),
             call("output", "SOME_OUTPUT"),
+            call("resources", ANY),
+            call("status", "DONE" if rc == 0 else "FAILED"),
         ]
     )
 
     mock_write_output.assert_called_once_with(mock_read_job.return_value)
 
 
+@pytest.mark.parametrize("merged", [[], ["OPERATION_3", "OPERATION_4"]])
 @pytest.mark.parametrize("operation_id", ["OPERATION_1", "OPERATION_2"])
 @pytest.mark.parametrize("rc", [0, 1])
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=False))
 @patch("pg_backup_api.run.ConfigUpdateOperation")
-def test_config_update_operation(mock_cu_op, operation_id, rc):
+def test_config_update_operation(mock_cu_op, operation_id, rc, merged):
     """Test :func:`config_update_operation`.
 
-    Ensure the operation is created and executed, and that the expected values
-    are returned depending on the return code.
+    Ensure the operation is created and executed, along with the operations
+    merged into it, and that the expected values are returned depending on
+    the return code.
     """
-    args = argparse.Namespace(operation_id=operation_id)
+    args = argparse.Namespace(
+        operation_id=operation_id, merge_operation_id=merged
+    )
 
     mock_cu_op.return_value.run.return_value = ("SOME_OUTPUT", rc)
+    mock_cu_op.return_value.timed_out = None
+    mock_cu_op.return_value.cancelled = False
     mock_write_output = mock_cu_op.return_value.write_output_file
     mock_time_event = mock_cu_op.return_value.time_event_now
     mock_read_job = mock_cu_op.return_value.read_job_file
@@ -199,19 +266,235 @@ def test_config_update_operation(mock_cu_op, operation_id, rc):
     )
 
     mock_cu_op.assert_called_once_with(None, operation_id)
+    assert mock_cu_op.return_value.merged_ids == merged
     mock_cu_op.return_value.run.assert_called_once_with()
+    op_type = mock_read_job.return_value.get.return_value
+    assert mock_cu_op.return_value.server.append_event.call_args_list == [
+        call(op_id, "started", "IN_PROGRESS", op_type)
+        for op_id in [mock_cu_op.return_value.id] + merged
+    ]
     mock_time_event.assert_called_once_with()
-    mock_read_job.assert_called_once_with()
+    assert mock_read_job.call_count == 2
 
     # Make sure the expected content was added to `read_job_file` output before
     # writing it to the output file.
-    assert len(mock_read_job.return_value.__setitem__.mock_calls) == 3
+    assert len(mock_read_job.return_value.__setitem__.mock_calls) == 5
     mock_read_job.return_value.__setitem__.assert_has_calls(
         [
             call("success", rc == 0),
             call("end_time", mock_time_event.return_value),
             call("output", "SOME_OUTPUT"),
+            call("resources", ANY),
+            call("status", "DONE" if rc == 0 else "FAILED"),
         ]
     )
 
     mock_write_output.assert_called_once_with(mock_read_job.return_value)
+
+
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(side_effect=[True, False]))
+@patch("pg_backup_api.run.ConfigUpdateOperation")
+def test_config_update_operation_leader_finished(mock_cu_op):
+    """Test :func:`config_update_operation`.
+
+    Ensure the operations merged into one which finished before the runner
+    started, e.g. cancelled while queued, are run nonetheless.
+    """
+    args = argparse.Namespace(
+        operation_id="OPERATION_1", merge_operation_id=["OPERATION_2"]
+    )
+
+    mock_cu_op.return_value.run.return_value = ("SOME_OUTPUT", 0)
+    mock_cu_op.return_value.timed_out = None
+    mock_cu_op.return_value.cancelled = False
+    mock_cu_op.return_value.hand_over.return_value = True
+    mock_write_output = mock_cu_op.return_value.write_output_file
+
+    assert config_update_operation(args) == (
+        mock_write_output.return_value,
+        True,
+    )
+
+    mock_cu_op.return_value.hand_over.assert_called_once_with()
+    mock_cu_op.return_value.run.assert_called_once_with()
+
+
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=False))
+@patch("pg_backup_api.run.RecoveryOperation")
+def test_recovery_operation_timed_out(mock_rec_op):
+    """Test :func:`recovery_operation`.
+
+    Ensure a ``TIMED_OUT`` status is recorded if the operation was killed.
+    """
+    args = argparse.Namespace(server_name="SERVER", operation_id="OPERATION")
+
+    mock_rec_op.return_value.run.return_value = ("SOME_OUTPUT", -15)
+    mock_rec_op.return_value.timed_out = "ran for more than 10.0 seconds"
+    mock_rec_op.return_value.cancelled = False
+    mock_read_job = mock_rec_op.return_value.read_job_file
+    mock_read_job.return_value = {"operation_type": "recovery"}
+
+    recovery_operation(args)
+
+    content = mock_rec_op.return_value.write_output_file.call_args[0][0]
+    assert content["success"] is False
+    assert content["status"] == "TIMED_OUT"
+    assert set(content["resources"]) == {
+        "wall_time",
+        "user_time",
+        "system_time",
+        "max_rss_kb",
+        "block_input",
+        "block_output",
+        "read_bytes",
+        "write_bytes",
+    }
+
+
+@patch("pg_backup_api.run.signal")
+@patch("os.path.exists", Mock(return_value=False))
+@patch("pg_backup_api.run.RecoveryOperation")
+def test_recovery_operation_cancelled(mock_rec_op, mock_signal):
+    """Test :func:`recovery_operation`.
+
+    Ensure the runner is recorded, cancels the operation on SIGTERM, and a
+    ``CANCELLED`` status is recorded if the operation was cancelled.
+    """
+    args = argparse.Namespace(server_name="SERVER", operation_id="OPERATION")
+
+    mock_rec_op.return_value.run.return_value = ("SOME_OUTPUT", 0)
+    mock_rec_op.return_value.timed_out = None
+    mock_rec_op.return_value.cancelled = True
+    mock_read_job = mock_rec_op.return_value.read_job_file
+    mock_read_job.return_value = {"operation_type": "recovery"}
+
+    recovery_operation(args)
+
+    mock_rec_op.return_value.record_runner.assert_called_once_with()
+    mock_signal.signal.assert_called_once_with(mock_signal.SIGTERM, ANY)
+    handler = mock_signal.signal.call_args[0][1]
+    handler(mock_signal.SIGTERM, None)
+    mock_rec_op.return_value.cancel.assert_called_once_with()
+
+    content = mock_rec_op.return_value.write_output_file.call_args[0][0]
+    assert content["success"] is False
+    assert content["status"] == "CANCELLED"
+
+
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=False))
+@patch("pg_backup_api.run.RecoveryOperation")
+def test_recovery_operation_finished_while_running(mock_rec_op):
+    """Test :func:`recovery_operation`.
+
+    Ensure the output file written by the REST API is kept if the operation
+    was finished while running, e.g. cancelled while starting.
+    """
+    args = argparse.Namespace(server_name="SERVER", operation_id="OPERATION")
+
+    mock_rec_op.return_value.run.return_value = ("SOME_OUTPUT", -15)
+    mock_rec_op.return_value.timed_out = None
+    mock_rec_op.return_value.cancelled = True
+    mock_read_job = mock_rec_op.return_value.read_job_file
+    mock_read_job.return_value = {"operation_type": "recovery"}
+    mock_write_output = mock_rec_op.return_value.write_output_file
+    mock_write_output.side_effect = FileExistsError
+
+    assert recovery_operation(args) == (None, False)
+
+    mock_write_output.assert_called_once()
+
+
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=True))
+@patch("pg_backup_api.run.RecoveryOperation")
+def test_recovery_operation_already_finished(mock_rec_op):
+    """Test :func:`recovery_operation`.
+
+    Ensure nothing is run if the operation was cancelled before the runner
+    started.
+    """
+    args = argparse.Namespace(server_name="SERVER", operation_id="OPERATION")
+    mock_rec_op.return_value.hand_over.return_value = False
+
+    assert recovery_operation(args) == (None, False)
+
+    mock_rec_op.return_value.record_runner.assert_called_once_with()
+    mock_rec_op.return_value.hand_over.assert_called_once_with()
+    mock_rec_op.return_value.run.assert_not_called()
+    mock_rec_op.return_value.write_output_file.assert_not_called()
+
+
+@pytest.mark.parametrize("rc", [0, 1])
+@patch("pg_backup_api.run.signal", Mock())
+@patch("os.path.exists", Mock(return_value=False))
+@patch("pg_backup_api.run.PipelineOperation")
+def test_pipeline_operation(mock_pipeline_op, rc):
+    """Test :func:`pipeline_operation`.
+
+    Ensure the operation is created and executed, and that the expected values
+    are returned depending on the return code.
+    """
+    args = argparse.Namespace(server_name="SERVER", operation_id="OPERATION")
+
+    mock_pipeline_op.return_value.run.return_value = ("SOME_OUTPUT", rc)
+    mock_pipeline_op.return_value.timed_out = None
+    mock_pipeline_op.return_value.cancelled = False
+    mock_write_output = mock_pipeline_op.return_value.write_output_file
+
+    assert pipeline_operation(args) == (
+        mock_write_output.return_value,
+        rc == 0,
+    )
+
+    mock_pipeline_op.assert_called_once_with("SERVER", "OPERATION")
+    mock_pipeline_op.return_value.run.assert_called_once_with()
+    content = mock_write_output.call_args[0][0]
+    content.__setitem__.assert_any_call(
+        "status", "DONE" if rc == 0 else "FAILED"
+    )
+
+
+@patch("pg_backup_api.run.OperationServer")
+def test_migrate_layout_server(mock_op_server):
+    """Test :func:`migrate_layout`.
+
+    Ensure only the given server is migrated when a server name is given.
+    """
+    args = argparse.Namespace(server_name="SERVER_1", layout="sharded")
+    mock_migrate = mock_op_server.return_value.migrate_layout
+    mock_migrate.return_value = 3
+
+    assert migrate_layout(args) == ("SERVER_1: 3 file(s) moved", True)
+
+    mock_op_server.assert_called_once_with("SERVER_1")
+    mock_migrate.assert_called_once_with("sharded")
+
+
+@patch("pg_backup_api.run.load_barman_config", MagicMock())
+@patch("barman.__config__")
+@patch("pg_backup_api.run.OperationServer")
+def test_migrate_layout_all(mock_op_server, mock_config):
+    """Test :func:`migrate_layout`.
+
+    Ensure the instance and all servers are migrated when no server name is
+    given.
+    """
+    args = argparse.Namespace(server_name=None, layout="flat")
+    mock_config.server_names.return_value = ["SERVER_1", "SERVER_2"]
+    mock_migrate = mock_op_server.return_value.migrate_layout
+    mock_migrate.side_effect = [0, 1, 2]
+
+    expected = (
+        "instance: 0 file(s) moved\n"
+        "SERVER_1: 1 file(s) moved\n"
+        "SERVER_2: 2 file(s) moved"
+    )
+    assert migrate_layout(args) == (expected, True)
+
+    mock_op_server.assert_has_calls(
+        [call(None), call("SERVER_1"), call("SERVER_2")], any_order=True
+    )
+    mock_migrate.assert_has_calls([call("flat")] * 3)
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the scheduling of periodic operations."""
+
+from datetime import datetime
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pg_backup_api.executor import QueuedOperation
+from pg_backup_api.scheduler import (
+    CronExpression,
+    Schedule,
+    Scheduler,
+    load_schedules,
+    start_scheduler,
+)
+from pg_backup_api.server_operation import OperationType
+
+_SWITCH = {"type": "config_switch", "model_name": "SOME_MODEL"}
+
+
+class TestCronExpression:
+    """Run tests for :class:`CronExpression`."""
+
+    @pytest.mark.parametrize(
+        "expression,after,expected",
+        [
+            ("0 3 * * *", datetime(2026, 1, 31, 3), datetime(2026, 2, 1, 3)),
+            (
+                "*/15 * * * *",
+                datetime(2026, 12, 31, 23, 59, 30),
+                datetime(2027, 1, 1),
+            ),
+            (
+                "5/20 * * * *",
+                datetime(2026, 1, 1, 0, 30),
+                datetime(2026, 1, 1, 0, 45),
+            ),
+            ("0 0 29 2 *", datetime(2026, 3, 1), datetime(2028, 2, 29)),
+            (
+                "30 2 * * 7",
+                datetime(2026, 10, 19),
+                datetime(2026, 10, 25, 2, 30),
+            ),
+            (
+                "30 2 * * 0",
+                datetime(2026, 10, 19),
+                datetime(2026, 10, 25, 2, 30),
+            ),
+            # Either the day of month or the day of week
+            ("0 0 13 * 5", datetime(2026, 1, 1), datetime(2026, 1, 2)),
+            (
+                "0 8-10,20 * 6 1-5",
+                datetime(2026, 6, 5, 20),
+                datetime(2026, 6, 8, 8),
+            ),
+        ],
+    )
+    def test_get_next(self, expression, after, expected):
+        """Test :meth:`CronExpression.get_next`.
+
+        Ensure the first time the expression is due is returned.
+        """
+        assert CronExpression(expression).get_next(after) == expected
+
+    @pytest.mark.parametrize(
+        "expression,message",
+        [
+            ("* * * *", "expected 5 fields"),
+            ("60 * * * *", "invalid field '60'"),
+            ("a * * * *", "invalid field 'a'"),
+            ("*/0 * * * *", "invalid field '*/0'"),
+            ("* 5-1 * * *", "invalid field '5-1'"),
+            ("* * 0 * *", "invalid field '0'"),
+        ],
+    )
+    def test___init___invalid(self, expression, message):
+        """Test :meth:`CronExpression.__init__`.
+
+        Ensure an exception is raised if the expression is not valid.
+        """
+        with pytest.raises(ValueError) as exc:
+            CronExpression(expression)
+
+        assert str(exc.value) == (
+            f"Invalid cron expression '{expression}': {message}"
+        )
+
+    def test_get_next_never_due(self):
+        """Test :meth:`CronExpression.get_next`.
+
+        Ensure an exception is raised if the expression is never due.
+        """
+        with pytest.raises(ValueError) as exc:
+            CronExpression("0 0 31 2 *").get_next(datetime(2026, 1, 1))
+
+        assert str(exc.value) == (
+            "Invalid cron expression '0 0 31 2 *': never due"
+        )
+
+
+class TestSchedule:
+    """Run tests for :class:`Schedule`."""
+
+    def test_from_dict(self):
+        """Test :meth:`Schedule.from_dict`.
+
+        Ensure the schedule is created from its definition.
+        """
+        schedule = Schedule.from_dict(
+            {
+                "name": "SOME_NAME",
+                "cron": "0 3 * * *",
+                "servers": ["pg-*"],
+                "operation": _SWITCH,
+                "jitter": 600,
+            }
+        )
+
+        assert schedule.name == "SOME_NAME"
+        assert schedule.cron.expression == "0 3 * * *"
+        assert schedule.servers == ["pg-*"]
+        assert schedule.operation == _SWITCH
+        assert schedule.jitter == 600
+
+    @pytest.mark.parametrize(
+        "changes,message",
+        [
+            ({"name": ""}, "`name` is expected to be a non-empty string"),
+            ({"cron": None}, "`cron` is expected to be a string"),
+            ({"cron": "* * *"}, "expected 5 fields"),
+            ({"servers": "pg"}, "`servers` is expected to be a list"),
+            ({"jitter": -1}, "`jitter` is expected to be 0 or more"),
+            ({"operation": None}, "`operation` is expected to be an object"),
+            (
+                {"operation": {"type": "config_update", "changes": []}},
+                "`operation` type is expected to be one among: recovery, "
+                "config_switch, pipeline",
+            ),
+            (
+                {"operation": {"type": "config_switch"}},
+                "invalid `operation`: One among the following arguments",
+            ),
+        ],
+    )
+    def test_from_dict_invalid(self, changes, message):
+        """Test :meth:`Schedule.from_dict`.
+
+        Ensure an exception is raised if the definition is not valid.
+        """
+        content = {
+            "name": "SOME_NAME",
+            "cron": "0 3 * * *",
+            "servers": ["pg-*"],
+            "operation": _SWITCH,
+        }
+        content.update(changes)
+
+        with pytest.raises(ValueError) as exc:
+            Schedule.from_dict(content)
+
+        assert message in str(exc.value)
+
+    def test_get_delay(self):
+        """Test :meth:`Schedule.get_delay`.
+
+        Ensure the delay of each server is within the jitter, does not change,
+        and is spread among servers.
+        """
+        schedule = Schedule("SOME_NAME", CronExpression("* * * * *"), [], {})
+        assert schedule.get_delay("pg-1") == 0
+
+        schedule.jitter = 3600
+        delays = [schedule.get_delay(f"pg-{i}") for i in range(100)]
+
+        assert all(0 <= delay <= 3600 for delay in delays)
+        assert delays == [schedule.get_delay(f"pg-{i}") for i in range(100)]
+        assert len(set(delays)) > 90
+
+    def test_matches(self):
+        """Test :meth:`Schedule.matches`.
+
+        Ensure server names are matched against the patterns.
+        """
+        schedule = Schedule(
+            "SOME_NAME", CronExpression("* * * * *"), ["pg-*", "main"], {}
+        )
+
+        assert schedule.matches("pg-1")
+        assert schedule.matches("main")
+        assert not schedule.matches("other")
+
+
+@patch("pg_backup_api.scheduler.log")
+def test_load_schedules(mock_log, tmp_path):
+    """Test :func:`load_schedules`.
+
+    Ensure valid schedules are loaded, and invalid or duplicate ones are
+    logged and ignored.
+    """
+    schedule = {
+        "name": "SOME_NAME",
+        "cron": "0 3 * * *",
+        "servers": ["pg-*"],
+        "operation": _SWITCH,
+    }
+    file_path = tmp_path / "schedules.json"
+    file_path.write_text(json.dumps([schedule, {"name": "OTHER"}, schedule]))
+
+    schedules = load_schedules(str(file_path))
+
+    assert [schedule.name for schedule in schedules] == ["SOME_NAME"]
+    assert mock_log.error.call_count == 2
+
+    file_path.write_text(json.dumps({}))
+
+    with pytest.raises(ValueError):
+        load_schedules(str(file_path))
+
+
+@patch("pg_backup_api.scheduler.get_executor")
+@patch("pg_backup_api.scheduler.OperationServer")
+class TestScheduler:
+    """Run tests for :class:`Scheduler`."""
+
+    @pytest.fixture
+    def schedule(self):
+        """Create a :class:`Schedule` instance for testing.
+
+        :return: a schedule of a config switch for ``pg-*`` servers, every
+            day at 03:00, with a jitter of 10 minutes.
+        """
+        return Schedule(
+            "SOME_NAME", CronExpression("0 3 * * *"), ["pg-*"], _SWITCH, 600
+        )
+
+    @pytest.fixture
+    def mock_cs_op(self):
+        """Replace the class of scheduled config switch operations.
+
+        :yield: the mock of :class:`ConfigSwitchOperation`.
+        """
+        mock_cs_op = MagicMock()
+        operations = {
+            OperationType.CONFIG_SWITCH: (mock_cs_op, "config-switch"),
+        }
+
+        with patch.dict("pg_backup_api.scheduler._OPERATIONS", operations):
+            yield mock_cs_op
+
+    def test_create_operation(
+        self, mock_op_server, mock_get_executor, mock_cs_op, schedule
+    ):
+        """Test :meth:`Scheduler.create_operation`.
+
+        Ensure the operation is created, recorded for the run, and queued.
+        """
+        scheduler = Scheduler([schedule])
+        operation = mock_cs_op.return_value
+        operation.id = "SOME_OP_ID"
+        operation.priority = 0
+        operation.server.record_idempotency_key.return_value = "SOME_OP_ID"
+        mock_op_server.return_value.get_idempotent_operation.return_value = (
+            None
+        )
+        mock_op_server.return_value.get_running_operations.return_value = {}
+        mock_submit = mock_get_executor.return_value.submit
+        mock_submit.return_value = [
+            QueuedOperation(
+                "pg-1", "OLD_OP_ID", OperationType.CONFIG_SWITCH, ["CMD"]
+            )
+        ]
+
+        moment = datetime(2026, 1, 1, 3)
+        assert scheduler.create_operation(schedule, "pg-1", moment) == (
+            "SOME_OP_ID"
+        )
+
+        mock_cs_op.assert_called_once_with("pg-1", load_config=False)
+        operation.write_job_file.assert_called_once_with(
+            dict(_SWITCH, schedule="SOME_NAME")
+        )
+        operation.server.record_idempotency_key.assert_called_once_with(
+            "schedule/SOME_NAME/20260101T0300", "SOME_OP_ID"
+        )
+        queued_op = mock_submit.call_args[0][0]
+        assert queued_op.server_name == "pg-1"
+        assert queued_op.cmd == [
+            "pg-backup-api",
+            "config-switch",
+            "--server-name",
+            "pg-1",
+            "--operation-id",
+            "SOME_OP_ID",
+        ]
+        mock_op_server.return_value.finish_operation.assert_called_once_with(
+            "OLD_OP_ID",
+            "SUPERSEDED",
+            "Operation superseded by 'SOME_OP_ID'\n",
+            {"superseded_by": "SOME_OP_ID"},
+        )
+
+    @patch("pg_backup_api.scheduler.log")
+    def test_create_operation_still_running(
+        self, mock_log, mock_op_server, mock_get_executor, mock_cs_op, schedule
+    ):
+        """Test :meth:`Scheduler.create_operation`.
+
+        Ensure the run is skipped while an operation of the schedule is in
+        progress, as found from the files of the operations, even if it was
+        created by another process or before a restart.
+        """
+        scheduler = Scheduler([schedule])
+        op_server = mock_op_server.return_value
+        op_server.get_idempotent_operation.return_value = None
+        op_server.get_running_operations.return_value = {
+            "OP_1": 1.0,
+            "OP_2": 2.0,
+            "OP_3": 3.0,
+            "OP_4": 4.0,
+        }
+        jobs = {
+            "OP_1": FileNotFoundError("SOME ERROR"),
+            "OP_2": {"operation_type": "config_switch"},
+            "OP_3": {"schedule": "OTHER_NAME"},
+            "OP_4": {"schedule": "SOME_NAME"},
+        }
+
+        def read_job_file(op_id):
+            if isinstance(jobs[op_id], Exception):
+                raise jobs[op_id]
+
+            return jobs[op_id]
+
+        op_server.read_job_file.side_effect = read_job_file
+
+        moment = datetime(2026, 1, 2, 3)
+        assert scheduler.create_operation(schedule, "pg-1", moment) is None
+
+        mock_cs_op.assert_not_called()
+        mock_get_executor.return_value.submit.assert_not_called()
+        assert mock_log.warning.call_args[0][-1] == "OP_4"
+
+        # Not skipped once the operation finished
+        del op_server.get_running_operations.return_value["OP_4"]
+        mock_cs_op.return_value.server.record_idempotency_key.return_value = (
+            mock_cs_op.return_value.id
+        )
+        mock_cs_op.return_value.priority = 0
+        mock_get_executor.return_value.submit.return_value = []
+
+        assert scheduler.create_operation(schedule, "pg-1", moment) == (
+            mock_cs_op.return_value.id
+        )
+
+    @pytest.mark.parametrize("race", [False, True])
+    def test_create_operation_other_process(
+        self, mock_op_server, mock_get_executor, race, mock_cs_op, schedule
+    ):
+        """Test :meth:`Scheduler.create_operation`.
+
+        Ensure nothing is queued if another process took care of the run,
+        either before or while creating the operation.
+        """
+        scheduler = Scheduler([schedule])
+        operation = mock_cs_op.return_value
+        operation.id = "SOME_OP_ID"
+        operation.server.record_idempotency_key.return_value = "OTHER_OP_ID"
+        mock_op_server.return_value.get_running_operations.return_value = {}
+        mock_get_op = mock_op_server.return_value.get_idempotent_operation
+        mock_get_op.return_value = None if race else "OTHER_OP_ID"
+
+        moment = datetime(2026, 1, 1, 3)
+        assert scheduler.create_operation(schedule, "pg-1", moment) is None
+
+        if race:
+            operation.server.remove_job_file.assert_called_once_with(
+                "SOME_OP_ID"
+            )
+        else:
+            mock_cs_op.assert_not_called()
+
+        mock_get_executor.return_value.submit.assert_not_called()
+
+    @patch("barman.__config__")
+    def test_run_pending(
+        self, mock_config, mock_op_server, mock_get_executor, schedule
+    ):
+        """Test :meth:`Scheduler.run_pending`.
+
+        Ensure operations are created once due, for matching servers only,
+        and that the time until the next run is returned.
+        """
+        mock_config.server_names.return_value = ["pg-1", "other"]
+        scheduler = Scheduler([schedule])
+
+        with patch.object(
+            scheduler, "create_operation"
+        ) as mock_create, patch.object(
+            schedule, "get_delay", return_value=300
+        ):
+            assert scheduler.run_pending(datetime(2026, 1, 1, 2, 59)) == 60
+            assert scheduler.run_pending(datetime(2026, 1, 1, 3, 4, 30)) == 30
+            mock_create.assert_not_called()
+
+            assert scheduler.run_pending(datetime(2026, 1, 1, 3, 10)) == 60
+
+        mock_create.assert_called_once_with(
+            schedule, "pg-1", datetime(2026, 1, 1, 3)
+        )
+        assert scheduler._next_runs == {
+            ("SOME_NAME", "pg-1"): (
+                datetime(2026, 1, 2, 3),
+                datetime(2026, 1, 2, 3, 5),
+            )
+        }
+
+
+@patch("pg_backup_api.scheduler.Scheduler")
+@patch("barman.__config__")
+def test_start_scheduler(mock_config, mock_scheduler, tmp_path):
+    """Test :func:`start_scheduler`.
+
+    Ensure the scheduler is only started if there are valid schedules.
+    """
+    mock_config.barman_home = str(tmp_path)
+
+    assert start_scheduler() is None
+
+    schedule = {
+        "name": "SOME_NAME",
+        "cron": "0 3 * * *",
+        "servers": ["pg-*"],
+        "operation": _SWITCH,
+    }
+    (tmp_path / "schedules.json").write_text(json.dumps([schedule]))
+
+    assert start_scheduler() == mock_scheduler.return_value
+    mock_scheduler.return_value.start.assert_called_once_with()
+    assert mock_scheduler.call_args[0][0][0].name == "SOME_NAME"
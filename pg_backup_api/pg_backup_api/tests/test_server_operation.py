@@ -17,10 +17,18 @@
 # along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
 
 """Unit tests for the classes related with REST API operations."""
+from datetime import datetime
+import json
 import os
+import re
+import shlex
+import signal
 import subprocess
-from unittest.mock import Mock, MagicMock, call, patch
+import threading
+import time
+from unittest.mock import ANY, Mock, MagicMock, call, patch
 
+import dateutil.tz
 import pytest
 
 from pg_backup_api.server_operation import (
@@ -32,7 +40,11 @@ from pg_backup_api.server_operation import (
     RecoveryOperation,
     ConfigSwitchOperation,
     ConfigUpdateOperation,
+    PipelineOperation,
+    RetryPolicy,
+    get_events_files,
 )
+from pg_backup_api.ssh import RemoteCommandError
 
 
 _BARMAN_HOME = "/BARMAN/HOME"
@@ -65,6 +77,8 @@ class TestOperationServer:
         expected_name = None
         expected_jobs = os.path.join(_BARMAN_HOME, "jobs")
         expected_output = os.path.join(_BARMAN_HOME, "output")
+        expected_running = os.path.join(_BARMAN_HOME, "running")
+        expected_events = os.path.join(_BARMAN_HOME, "events.jsonl")
 
         if op_server.name is not None:
             expected_name = _BARMAN_SERVER
@@ -72,6 +86,12 @@ class TestOperationServer:
             expected_output = os.path.join(
                 _BARMAN_HOME, _BARMAN_SERVER, "output"
             )
+            expected_running = os.path.join(
+                _BARMAN_HOME, _BARMAN_SERVER, "running"
+            )
+            expected_events = os.path.join(
+                _BARMAN_HOME, _BARMAN_SERVER, "events.jsonl"
+            )
 
         # Ensure name is as expected.
         assert op_server.name == expected_name
@@ -82,6 +102,38 @@ class TestOperationServer:
         # Ensure "output" directory is created in the expected path.
         assert op_server.output_basedir == expected_output
 
+        # Ensure "running" directory is created in the expected path.
+        assert op_server.running_basedir == expected_running
+
+        # Ensure the event log is in the expected path.
+        assert op_server.events_file == expected_events
+
+    @pytest.mark.parametrize("load_config", [True, False])
+    @patch("pg_backup_api.server_operation.get_server_by_name", Mock())
+    @patch("pg_backup_api.server_operation.load_barman_config")
+    @patch.object(OperationServer, "_create_dir", Mock())
+    def test___init___load_config(self, mock_load_config, load_config):
+        """Test :meth:`OperationServer.__init__`.
+
+        Ensure the Barman configuration is only loaded if requested.
+        """
+        with patch("barman.__config__") as mock_config:
+            mock_config.barman_home = _BARMAN_HOME
+            OperationServer(_BARMAN_SERVER, load_config=load_config)
+
+        assert mock_load_config.called is load_config
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_OPERATIONS_LAYOUT": "invalid"})
+    def test___init___invalid_layout(self):
+        """Test :meth:`OperationServer.__init__`.
+
+        Ensure an exception is raised if the configured layout is unknown.
+        """
+        with pytest.raises(ValueError) as exc:
+            OperationServer(_BARMAN_SERVER)
+
+        assert str(exc.value) == "Invalid operations layout 'invalid'"
+
     @patch("os.path.isdir")
     @patch("os.path.exists")
     def test__create_dir_file_exists(self, mock_exists, mock_isdir, op_server):
@@ -180,6 +232,69 @@ class TestOperationServer:
         expected = os.path.join(op_server.output_basedir, f"{id}.json")
         assert op_server.get_output_file_path(id) == expected
 
+    @pytest.mark.parametrize(
+        "op_id,expected",
+        [
+            ("20261019T101010", ("2026", "10")),
+            ("20260102T000000", ("2026", "01")),
+            ("SOME_OP_ID", None),
+            ("2026", None),
+        ],
+    )
+    def test__get_shard(self, op_id, expected, op_server):
+        """Test :meth:`OperationServer._get_shard`.
+
+        Ensure the shard is taken from the date in the ID, if any.
+        """
+        assert op_server._get_shard(op_id) == expected
+
+    def test_get_job_file_path_sharded(self, op_server, tmp_path):
+        """Test :meth:`OperationServer.get_job_file_path`.
+
+        Ensure the sharded path is returned when using the sharded layout.
+        """
+        op_server.layout = OperationServer.SHARDED_LAYOUT
+        op_server.jobs_basedir = str(tmp_path)
+
+        expected = os.path.join(
+            str(tmp_path), "2026", "10", "20261019T101010.json"
+        )
+        assert op_server.get_job_file_path("20261019T101010") == expected
+
+        # IDs which do not start with a date are kept flat
+        expected = os.path.join(str(tmp_path), "SOME_OP_ID.json")
+        assert op_server.get_job_file_path("SOME_OP_ID") == expected
+
+    def test_get_output_file_path_sharded_fallback(self, op_server, tmp_path):
+        """Test :meth:`OperationServer.get_output_file_path`.
+
+        Ensure the flat path is returned when using the sharded layout, if the
+        file only exists in the flat layout.
+        """
+        op_server.layout = OperationServer.SHARDED_LAYOUT
+        op_server.output_basedir = str(tmp_path)
+        flat_path = tmp_path / "20261019T101010.json"
+        flat_path.write_text("{}")
+
+        assert op_server.get_output_file_path("20261019T101010") == str(
+            flat_path
+        )
+
+    def test__prepare_file_path(self, op_server):
+        """Test :meth:`OperationServer._prepare_file_path`.
+
+        Ensure the directory of the file is only created in the sharded layout.
+        """
+        file_path = "/SOME/DIR/FILE.json"
+
+        with patch.object(op_server, "_create_dir") as mock_create_dir:
+            assert op_server._prepare_file_path(file_path) == file_path
+            mock_create_dir.assert_not_called()
+
+            op_server.layout = OperationServer.SHARDED_LAYOUT
+            assert op_server._prepare_file_path(file_path) == file_path
+            mock_create_dir.assert_called_once_with("/SOME/DIR")
+
     @patch("os.path.exists")
     def test__write_file_file_already_exists(self, mock_exists, op_server):
         """Test :meth:`OperationServer._write_file`.
@@ -198,26 +313,61 @@ class TestOperationServer:
 
         assert str(str(exc.value)) == f"File '{file_path}' already exists"
 
-    @patch("json.dump")
+    @patch("os.unlink")
+    @patch("os.link")
+    @patch("pg_backup_api.json_backend.dumps")
     @patch("builtins.open")
     @patch("os.path.exists")
     def test__write_file_ok(
-        self, mock_exists, mock_open, mock_dump, op_server
+        self,
+        mock_exists,
+        mock_open,
+        mock_dump,
+        mock_link,
+        mock_unlink,
+        op_server,
     ):
         """Test :meth:`OperationServer._write_file`.
 
-        Ensure the file is created with the expected content.
+        Ensure the file is created with the expected content, through a
+        temporary file.
         """
         file_path = "/SOME/FILE"
         file_content = {"SOME": "CONTENT"}
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
 
-        mock_open.return_value.__enter__.return_value = "SOME_FILE_DESCRIPTOR"
+        mock_fd = mock_open.return_value.__enter__.return_value
 
         mock_exists.return_value = False
 
         op_server._write_file(file_path, file_content)
-        mock_open.assert_called_once_with(file_path, "w")
-        mock_dump.assert_called_once_with(file_content, "SOME_FILE_DESCRIPTOR")
+        mock_open.assert_called_once_with(tmp_path, "wb")
+        mock_dump.assert_called_once_with(file_content)
+        mock_fd.write.assert_called_once_with(mock_dump.return_value)
+        mock_link.assert_called_once_with(tmp_path, file_path)
+        mock_unlink.assert_called_once_with(tmp_path)
+
+    def test__write_file_race(self, op_server, tmp_path):
+        """Test :meth:`OperationServer._write_file`.
+
+        Ensure an exception is raised, and the existing file is kept, if the
+        file is created by someone else while writing it.
+        """
+        file_path = str(tmp_path / "FILE.json")
+
+        def create_file(src, dst):
+            with open(dst, "w") as fd:
+                fd.write("{}")
+
+            raise FileExistsError
+
+        with patch("os.link", side_effect=create_file):
+            with pytest.raises(FileExistsError) as exc:
+                op_server._write_file(file_path, {"SOME": "CONTENT"})
+
+        assert str(exc.value) == f"File '{file_path}' already exists"
+        assert os.listdir(str(tmp_path)) == ["FILE.json"]
+        assert (tmp_path / "FILE.json").read_text() == "{}"
 
     @pytest.mark.parametrize(
         "content,missing_keys",
@@ -281,12 +431,288 @@ class TestOperationServer:
         }
 
         with patch.object(op_server, "_write_file") as mock_write_file:
-            op_server.write_job_file(id, content)
+            with patch.object(
+                op_server, "_create_running_file"
+            ) as mock_create_running, patch.object(
+                op_server, "append_event"
+            ) as mock_append:
+                op_server.write_job_file(id, content)
 
             mock_write_file.assert_called_once_with(
                 op_server.get_job_file_path(id),
                 content,
             )
+            mock_create_running.assert_called_once_with(id)
+            mock_append.assert_called_once_with(
+                id, "created", "IN_PROGRESS", "SOME_OPERATION_TYPE"
+            )
+
+    def test_running_files(self, op_server, tmp_path):
+        """Test the marker files of unfinished operations.
+
+        Ensure they are listed along with their last heartbeat, and that
+        heartbeats are not recorded once the operation finished.
+        """
+        op_server.running_basedir = str(tmp_path)
+
+        op_server._create_running_file("OP_1")
+        op_server._create_running_file("OP_2")
+        os.utime(op_server.get_running_file_path("OP_1"), (100, 100))
+
+        marker = op_server.get_running_file_path("OP_1")
+        assert marker == str(tmp_path / "OP_1")
+        operations = op_server.get_running_operations()
+        assert sorted(operations) == ["OP_1", "OP_2"]
+        assert operations["OP_1"] == 100
+
+        assert op_server.heartbeat("OP_1") is True
+        assert op_server.get_running_operations()["OP_1"] > 100
+
+        op_server.remove_running_file("OP_1")
+        op_server.remove_running_file("OP_1")
+
+        assert op_server.heartbeat("OP_1") is False
+        assert list(op_server.get_running_operations()) == ["OP_2"]
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_IDEMPOTENCY_RETENTION": "60"})
+    def test_idempotency_keys(self, op_server, tmp_path):
+        """Test the idempotency keys of :class:`OperationServer`.
+
+        Ensure a key maps to the first operation recorded with it, until it
+        expires, and that expired keys are pruned.
+        """
+        op_server.idempotency_basedir = str(tmp_path / "idempotency")
+
+        assert op_server.get_idempotent_operation("KEY_1") is None
+        assert op_server.prune_idempotency_keys() == 0
+
+        assert op_server.record_idempotency_key("KEY_1", "OP_1") == "OP_1"
+        assert op_server.record_idempotency_key("KEY_1", "OP_2") == "OP_1"
+        assert op_server.record_idempotency_key("KEY_2", "OP_3") == "OP_3"
+        assert op_server.get_idempotent_operation("KEY_1") == "OP_1"
+        assert op_server.get_idempotent_operation("KEY_2") == "OP_3"
+        assert len(os.listdir(op_server.idempotency_basedir)) == 2
+
+        key_file = op_server._get_idempotency_file_path("KEY_1")
+        os.utime(key_file, (time.time() - 120, time.time() - 120))
+
+        assert op_server.get_idempotent_operation("KEY_1") is None
+        assert op_server.prune_idempotency_keys() == 1
+        assert op_server.record_idempotency_key("KEY_1", "OP_4") == "OP_4"
+        assert op_server.get_idempotent_operation("KEY_1") == "OP_4"
+
+        # Expired keys are replaced even if not pruned yet
+        key_file = op_server._get_idempotency_file_path("KEY_2")
+        os.utime(key_file, (time.time() - 120, time.time() - 120))
+
+        assert op_server.record_idempotency_key("KEY_2", "OP_5") == "OP_5"
+        assert op_server.get_idempotent_operation("KEY_2") == "OP_5"
+        assert len(os.listdir(op_server.idempotency_basedir)) == 2
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_IDEMPOTENCY_RETENTION": "60"})
+    def test__remove_expired_idempotency_file(self, op_server, tmp_path):
+        """Test :meth:`OperationServer._remove_expired_idempotency_file`.
+
+        Ensure only expired files are removed, and that a file recorded by a
+        concurrent request while being removed is put back.
+        """
+        key_file = str(tmp_path / "KEY")
+
+        assert op_server._remove_expired_idempotency_file(key_file) is True
+
+        with open(key_file, "w"):
+            pass
+
+        assert op_server._remove_expired_idempotency_file(key_file) is False
+        assert os.path.exists(key_file)
+
+        os.utime(key_file, (time.time() - 120, time.time() - 120))
+        rename = os.rename
+
+        def rename_recorded(src, dst):
+            # Expired, then recorded again, right before being renamed
+            os.utime(src)
+            rename(src, dst)
+
+        with patch("os.rename", side_effect=rename_recorded):
+            assert (
+                op_server._remove_expired_idempotency_file(key_file) is False
+            )
+
+        assert os.listdir(str(tmp_path)) == ["KEY"]
+
+        os.utime(key_file, (time.time() - 120, time.time() - 120))
+
+        assert op_server._remove_expired_idempotency_file(key_file) is True
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_remove_job_file(self, op_server, tmp_path):
+        """Test :meth:`OperationServer.remove_job_file`.
+
+        Ensure both the job file and the marker file are removed, along with
+        a ``withdrawn`` event, and that removing them again is a no-op.
+        """
+        op_server.jobs_basedir = str(tmp_path / "jobs")
+        op_server.running_basedir = str(tmp_path / "running")
+        os.makedirs(op_server.jobs_basedir)
+        os.makedirs(op_server.running_basedir)
+
+        with patch.object(op_server, "append_event") as mock_append:
+            op_server.write_job_file(
+                "OP_1",
+                {"operation_type": "SOME_TYPE", "start_time": "SOME_TIME"},
+            )
+
+            assert os.path.exists(op_server.get_job_file_path("OP_1"))
+            assert list(op_server.get_running_operations()) == ["OP_1"]
+
+            mock_append.reset_mock()
+            op_server.remove_job_file("OP_1")
+            op_server.remove_job_file("OP_1")
+
+        assert not os.path.exists(op_server.get_job_file_path("OP_1"))
+        assert op_server.get_running_operations() == {}
+        mock_append.assert_called_once_with(
+            "OP_1", "withdrawn", "WITHDRAWN", "SOME_TYPE"
+        )
+
+    @pytest.mark.parametrize("force", [False, True])
+    @pytest.mark.parametrize("alive", [False, True])
+    @patch("os.killpg")
+    @patch("os.kill")
+    @patch("pg_backup_api.server_operation.is_process_alive")
+    def test_signal_runner(
+        self,
+        mock_is_alive,
+        mock_kill,
+        mock_killpg,
+        alive,
+        force,
+        op_server,
+    ):
+        """Test :meth:`OperationServer.signal_runner`.
+
+        Ensure the runner is signalled only if it's still the same process,
+        and the process group is killed only when forcing.
+        """
+        mock_is_alive.return_value = alive
+        runner = {"pid": 1234, "start_time": 5678, "process_group": 4321}
+
+        with patch.object(op_server, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = {"runner": runner}
+            assert op_server.signal_runner("SOME_OP_ID", force) is alive
+
+        mock_is_alive.assert_called_once_with(1234, 5678)
+
+        if alive:
+            mock_kill.assert_called_once_with(
+                1234, signal.SIGKILL if force else signal.SIGTERM
+            )
+        else:
+            mock_kill.assert_not_called()
+
+        if force:
+            mock_killpg.assert_called_once_with(4321, signal.SIGKILL)
+        else:
+            mock_killpg.assert_not_called()
+
+    @patch("os.kill", side_effect=ProcessLookupError)
+    @patch("pg_backup_api.server_operation.is_process_alive")
+    def test_signal_runner_exited(self, mock_is_alive, mock_kill, op_server):
+        """Test :meth:`OperationServer.signal_runner`.
+
+        Ensure a runner which exits right after being checked is reported as
+        gone.
+        """
+        mock_is_alive.return_value = True
+
+        with patch.object(op_server, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = {"runner": {"pid": 1234}}
+            assert op_server.signal_runner("SOME_OP_ID") is False
+
+        mock_kill.assert_called_once_with(1234, signal.SIGTERM)
+
+    @patch("os.killpg")
+    @patch("os.kill")
+    def test_signal_runner_not_started(
+        self, mock_kill, mock_killpg, op_server
+    ):
+        """Test :meth:`OperationServer.signal_runner`.
+
+        Ensure nothing is signalled if the runner did not start yet.
+        """
+        with patch.object(op_server, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = {"operation_type": "recovery"}
+            assert op_server.signal_runner("SOME_OP_ID", True) is False
+
+        mock_kill.assert_not_called()
+        mock_killpg.assert_not_called()
+
+    @pytest.mark.parametrize("exists", [False, True])
+    def test_finish_operation(self, exists, op_server):
+        """Test :meth:`OperationServer.finish_operation`.
+
+        Ensure the operation is recorded with the given status, unless it
+        already finished.
+        """
+        with patch.object(
+            op_server, "read_job_file", return_value={"SOME": "CONTENT"}
+        ), patch.object(op_server, "write_output_file") as mock_write:
+            if exists:
+                mock_write.side_effect = FileExistsError
+
+            assert op_server.finish_operation(
+                "SOME_OP_ID", "CANCELLED", "SOME_OUTPUT"
+            ) is not exists
+
+        op_id, content = mock_write.call_args[0]
+        assert op_id == "SOME_OP_ID"
+        assert content.pop("end_time")
+        assert content == {
+            "SOME": "CONTENT",
+            "success": False,
+            "output": "SOME_OUTPUT",
+            "status": "CANCELLED",
+        }
+
+    def test_finish_operation_details(self, op_server):
+        """Test :meth:`OperationServer.finish_operation`.
+
+        Ensure the given details are recorded in the output file.
+        """
+        with patch.object(
+            op_server, "read_job_file", return_value={"SOME": "CONTENT"}
+        ), patch.object(op_server, "write_output_file") as mock_write:
+            assert op_server.finish_operation(
+                "SOME_OP_ID",
+                "SUPERSEDED",
+                "SOME_OUTPUT",
+                {"superseded_by": "OTHER_OP_ID"},
+            )
+
+        content = mock_write.call_args[0][1]
+        assert content["status"] == "SUPERSEDED"
+        assert content["superseded_by"] == "OTHER_OP_ID"
+
+    def test_update_job_file(self, op_server, tmp_path):
+        """Test :meth:`OperationServer.update_job_file`.
+
+        Ensure the changes are merged into the job file, which is replaced
+        without leaving temporary files behind.
+        """
+        job_file = tmp_path / "SOME_OP_ID.json"
+        job_file.write_text('{"operation_type": "recovery", "a": 1}')
+
+        with patch.object(op_server, "get_job_file_path") as mock_get_path:
+            mock_get_path.return_value = str(job_file)
+            op_server.update_job_file("SOME_OP_ID", {"a": 2, "b": [3]})
+
+        assert json.loads(job_file.read_text()) == {
+            "operation_type": "recovery",
+            "a": 2,
+            "b": [3],
+        }
+        assert os.listdir(str(tmp_path)) == ["SOME_OP_ID.json"]
 
     @pytest.mark.parametrize(
         "content,missing_keys",
@@ -365,27 +791,80 @@ class TestOperationServer:
         }
 
         with patch.object(op_server, "_write_file") as mock_write_file:
-            op_server.write_output_file(id, content)
+            with patch.object(
+                op_server, "remove_running_file"
+            ) as mock_remove_running, patch.object(
+                op_server, "append_event"
+            ) as mock_append:
+                op_server.write_output_file(id, content)
 
             mock_write_file.assert_called_once_with(
                 op_server.get_output_file_path(id),
                 content,
             )
+            mock_remove_running.assert_called_once_with(id)
+            mock_append.assert_called_once_with(id, "finished", "DONE", None)
+
+        content["status"] = "TIMED_OUT"
+
+        with patch.object(op_server, "_write_file"), patch.object(
+            op_server, "remove_running_file"
+        ):
+            with patch.object(op_server, "append_event") as mock_append:
+                op_server.write_output_file(id, content)
+
+            mock_append.assert_called_once_with(
+                id, "finished", "TIMED_OUT", None
+            )
+
+    @patch("pg_backup_api.server_operation.append_event")
+    def test_append_event(self, mock_append_event, op_server):
+        """Test :meth:`OperationServer.append_event`.
+
+        Ensure the event is appended to the event log, and that failures to
+        do so are only logged.
+        """
+        op_server.append_event(
+            "SOME_OP_ID", "finished", "FAILED", "SOME_OPERATION_TYPE"
+        )
 
-    @patch("json.load")
+        mock_append_event.assert_called_once()
+        file_path, event = mock_append_event.call_args[0]
+        assert file_path == op_server.events_file
+        assert datetime.strptime(event.pop("time"), "%Y-%m-%dT%H:%M:%S.%f")
+        assert event == {
+            "server_name": op_server.name,
+            "operation_id": "SOME_OP_ID",
+            "operation_type": "SOME_OPERATION_TYPE",
+            "event": "finished",
+            "status": "FAILED",
+        }
+
+        mock_append_event.side_effect = PermissionError("SOME_ERROR")
+
+        with patch("pg_backup_api.server_operation.log") as mock_log:
+            op_server.append_event("SOME_OP_ID", "started", "IN_PROGRESS")
+
+        mock_log.warning.assert_called_once_with(
+            "Could not log event of operation '%s': %s",
+            "SOME_OP_ID",
+            mock_append_event.side_effect,
+        )
+
+    @patch("pg_backup_api.json_backend.loads")
     @patch("builtins.open")
     def test__read_file(self, mock_open, mock_load, op_server):
         """Test :meth:`OperationServer._read_file`.
 
-        Ensure the file is read and its content is parsed from JSON.
+        Ensure the file is read and its content is parsed from JSON bytes.
         """
         file_path = "/SOME/FILE"
 
-        mock_open.return_value.__enter__.return_value = "SOME_FILE_DESCRIPTOR"
+        mock_fd = mock_open.return_value.__enter__.return_value
 
         op_server._read_file(file_path)
-        mock_open.assert_called_once_with(file_path)
-        mock_load.assert_called_once_with("SOME_FILE_DESCRIPTOR")
+        mock_open.assert_called_once_with(file_path, "rb")
+        mock_load.assert_called_once_with(mock_fd.read.return_value)
 
     def test_read_job_file_file_does_not_exist(self, op_server):
         """Test :meth:`OperationServer._read_job_file`.
@@ -555,6 +1034,154 @@ class TestOperationServer:
             ]
         )
 
+    def test_get_operations_list_sharded(self, op_server, tmp_path):
+        """Test :meth:`OperationServer.get_operations_list`.
+
+        Ensure operations are found in both layouts, and that shards out of
+        the requested date range are skipped.
+        """
+        op_server.layout = OperationServer.SHARDED_LAYOUT
+        op_server.jobs_basedir = str(tmp_path)
+        content = '{"operation_type": "recovery"}'
+
+        (tmp_path / "20250101T000000.json").write_text(content)
+        for year, month, op_id in [
+            ("2026", "09", "20260930T000000"),
+            ("2026", "10", "20261019T000000"),
+            ("2026", "10", "20261020T000000"),
+        ]:
+            (tmp_path / year / month).mkdir(parents=True, exist_ok=True)
+            (tmp_path / year / month / f"{op_id}.json").write_text(content)
+
+        result = op_server.get_operations_list()
+        assert [op["id"] for op in result] == [
+            "20250101T000000",
+            "20260930T000000",
+            "20261019T000000",
+            "20261020T000000",
+        ]
+
+        with patch("os.listdir", wraps=os.listdir) as mock_listdir:
+            result = op_server.get_operations_list(
+                since=datetime(2026, 10, 1), until=datetime(2026, 10, 19)
+            )
+
+        assert result == [{"id": "20261019T000000", "type": "recovery"}]
+        # The shard of September was not listed
+        listed = [c.args[0] for c in mock_listdir.call_args_list]
+        assert os.path.join(str(tmp_path), "2026", "09") not in listed
+
+    def test_get_resource_totals(self, op_server, tmp_path):
+        """Test :meth:`OperationServer.get_resource_totals`.
+
+        Ensure resources are summed by operation type, except the maximum
+        RSS, and operations which did not record them are skipped.
+        """
+        op_server.output_basedir = str(tmp_path)
+        resources = {
+            "wall_time": 1.5,
+            "user_time": 0.25,
+            "system_time": 0.125,
+            "max_rss_kb": 1000,
+            "block_input": 8,
+            "block_output": 16,
+            "read_bytes": None,
+            "write_bytes": None,
+        }
+        for op_id, content in [
+            ("20261019T000001", {"operation_type": "recovery"}),
+            (
+                "20261019T000002",
+                {"operation_type": "recovery", "resources": resources},
+            ),
+            (
+                "20261019T000003",
+                {
+                    "operation_type": "recovery",
+                    "resources": dict(
+                        resources, max_rss_kb=3000, read_bytes=4096
+                    ),
+                },
+            ),
+            (
+                "20261019T000004",
+                {"operation_type": "config_update", "resources": resources},
+            ),
+        ]:
+            (tmp_path / f"{op_id}.json").write_text(json.dumps(content))
+
+        assert op_server.get_resource_totals() == {
+            "recovery": {
+                "count": 2,
+                "wall_time": 3.0,
+                "user_time": 0.5,
+                "system_time": 0.25,
+                "max_rss_kb": 3000,
+                "block_input": 16,
+                "block_output": 32,
+                "read_bytes": 4096,
+            },
+            "config_update": {
+                "count": 1,
+                "wall_time": 1.5,
+                "user_time": 0.25,
+                "system_time": 0.125,
+                "max_rss_kb": 1000,
+                "block_input": 8,
+                "block_output": 16,
+            },
+        }
+        since = datetime(2026, 10, 20)
+        assert op_server.get_resource_totals(since=since) == {}
+
+    @pytest.mark.parametrize(
+        "layout", [OperationServer.FLAT_LAYOUT, OperationServer.SHARDED_LAYOUT]
+    )
+    def test_migrate_layout(self, layout, op_server, tmp_path):
+        """Test :meth:`OperationServer.migrate_layout`.
+
+        Ensure job and output files are moved to the requested layout, and
+        that files without a date in the ID are kept in place.
+        """
+        op_server.jobs_basedir = str(tmp_path / "jobs")
+        op_server.output_basedir = str(tmp_path / "output")
+        flat = [
+            tmp_path / "jobs" / "20261019T000000.json",
+            tmp_path / "output" / "20261019T000000.json",
+        ]
+        sharded = [
+            tmp_path / "jobs" / "2026" / "10" / "20261019T000000.json",
+            tmp_path / "output" / "2026" / "10" / "20261019T000000.json",
+        ]
+        source, target = flat, sharded
+
+        if layout == OperationServer.FLAT_LAYOUT:
+            source, target = sharded, flat
+
+        for path in source:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("{}")
+
+        (tmp_path / "jobs" / "SOME_OP_ID.json").write_text("{}")
+
+        assert op_server.migrate_layout(layout) == 2
+        assert all(path.exists() for path in target)
+        assert not any(path.exists() for path in source)
+        assert (tmp_path / "jobs" / "SOME_OP_ID.json").exists()
+
+        # Running it again is a no-op
+        assert op_server.migrate_layout(layout) == 0
+
+    def test_migrate_layout_invalid(self, op_server):
+        """Test :meth:`OperationServer.migrate_layout`.
+
+        Ensure an exception is raised if the layout is unknown.
+        """
+        with pytest.raises(ValueError) as exc:
+            op_server.migrate_layout("SOME_LAYOUT")
+
+        assert str(exc.value) == "Invalid operations layout 'SOME_LAYOUT'"
+
     @patch("pg_backup_api.server_operation.OperationServer.read_output_file")
     @patch("pg_backup_api.server_operation.OperationServer.read_job_file")
     def test_get_operation_status_done(
@@ -591,6 +1218,26 @@ class TestOperationServer:
         mock_read_job_file.assert_not_called()
         mock_read_output_file.assert_called_once_with(id)
 
+    @patch("pg_backup_api.server_operation.OperationServer.read_output_file")
+    @patch("pg_backup_api.server_operation.OperationServer.read_job_file")
+    def test_get_operation_status_timed_out(
+        self, mock_read_job_file, mock_read_output_file, op_server
+    ):
+        """Test :meth:`OperationServer.get_operation_status`.
+
+        Ensure it returns the status recorded in the output file, if any.
+        """
+        id = "SOME_OP_ID"
+
+        mock_read_output_file.return_value = {
+            "success": False,
+            "status": "TIMED_OUT",
+        }
+
+        assert op_server.get_operation_status(id) == "TIMED_OUT"
+
+        mock_read_job_file.assert_not_called()
+
     @patch("pg_backup_api.server_operation.OperationServer.read_output_file")
     @patch("pg_backup_api.server_operation.OperationServer.read_job_file")
     def test_get_operation_status_in_progress(
@@ -633,6 +1280,105 @@ class TestOperationServer:
         mock_read_job_file.assert_called_once_with(id)
         mock_read_output_file.assert_called_once_with(id)
 
+    @patch("pg_backup_api.server_operation.OperationServer.read_output_file")
+    @patch("pg_backup_api.server_operation.OperationServer.read_job_file")
+    def test_get_operation_steps_not_pipeline(
+        self, mock_read_job_file, mock_read_output_file, op_server
+    ):
+        """Test :meth:`OperationServer.get_operation_steps`.
+
+        Ensure ``None`` is returned for operations which are not pipelines,
+        and an exception is raised for non-existing operations.
+        """
+        mock_read_output_file.side_effect = FileNotFoundError
+        mock_read_job_file.return_value = {"operation_type": "recovery"}
+
+        assert op_server.get_operation_steps("SOME_OP_ID") is None
+
+        mock_read_job_file.side_effect = FileNotFoundError
+
+        with pytest.raises(OperationNotExists):
+            op_server.get_operation_steps("SOME_OP_ID")
+
+    @pytest.mark.parametrize("finished", [False, True])
+    @patch("pg_backup_api.server_operation.OperationServer.read_output_file")
+    @patch("pg_backup_api.server_operation.OperationServer.read_job_file")
+    def test_get_operation_steps(
+        self, mock_read_job_file, mock_read_output_file, finished, op_server
+    ):
+        """Test :meth:`OperationServer.get_operation_steps`.
+
+        Ensure the status of each step is taken from the pipeline, or from the
+        operation of the step if not recorded yet, and that steps which did
+        not start are ``PENDING``, or ``SKIPPED`` once the pipeline finished.
+        """
+        content = {
+            "operation_type": "pipeline",
+            "steps": [
+                {
+                    "type": "config_switch",
+                    "operation_id": "OP_1",
+                    "status": "DONE",
+                },
+                {"type": "config_update", "operation_id": "OP_2"},
+                {"type": "recovery"},
+            ],
+        }
+
+        if finished:
+            mock_read_output_file.return_value = content
+        else:
+            mock_read_output_file.side_effect = FileNotFoundError
+            mock_read_job_file.return_value = content
+
+        with patch(
+            "pg_backup_api.server_operation.OperationServer"
+        ) as mock_op_server:
+            mock_get_status = mock_op_server.return_value.get_operation_status
+            mock_get_status.return_value = "IN_PROGRESS"
+
+            assert op_server.get_operation_steps("SOME_OP_ID") == [
+                {
+                    "type": "config_switch",
+                    "operation_id": "OP_1",
+                    "status": "DONE",
+                },
+                {
+                    "type": "config_update",
+                    "operation_id": "OP_2",
+                    "status": "IN_PROGRESS",
+                },
+                {
+                    "type": "recovery",
+                    "operation_id": None,
+                    "status": "SKIPPED" if finished else "PENDING",
+                },
+            ]
+
+        # ``config_update`` steps are operations of the Barman instance
+        mock_op_server.assert_called_once_with(None, load_config=False)
+        mock_get_status.assert_called_once_with("OP_2")
+
+
+@patch("barman.__config__")
+def test_get_events_files(mock_config):
+    """Test :func:`get_events_files`.
+
+    Ensure the event logs of the instance and all servers are returned by
+    default, or only the ones of the requested servers.
+    """
+    mock_config.barman_home = _BARMAN_HOME
+    mock_config.server_names.return_value = ["SERVER_1", "SERVER_2"]
+
+    assert get_events_files() == {
+        "": os.path.join(_BARMAN_HOME, "events.jsonl"),
+        "SERVER_1": os.path.join(_BARMAN_HOME, "SERVER_1", "events.jsonl"),
+        "SERVER_2": os.path.join(_BARMAN_HOME, "SERVER_2", "events.jsonl"),
+    }
+    assert get_events_files(["SERVER_2"]) == {
+        "SERVER_2": os.path.join(_BARMAN_HOME, "SERVER_2", "events.jsonl"),
+    }
+
 
 @patch("pg_backup_api.server_operation.OperationServer", MagicMock())
 class TestOperation:
@@ -738,32 +1484,185 @@ class TestOperation:
             operation.id,
         )
 
-    def test_write_job_file(self, operation):
-        """Test :meth:`Operation.write_jobf_file`.
+    def test_update_job_file(self, operation):
+        """Test :meth:`Operation.update_job_file`.
 
-        Ensure :meth:`OperationServer.write_job_file` is called as expected.
+        Ensure :meth:`OperationServer.update_job_file` is called as expected.
         """
-        content = {"SOME": "CONTENT"}
-        operation.write_job_file(content)
-        operation.server.write_job_file.assert_called_once_with(
+        changes = {"SOME": "CHANGES"}
+        operation.update_job_file(changes)
+        operation.server.update_job_file.assert_called_once_with(
             operation.id,
-            content,
+            changes,
         )
 
-    def test_write_output_file(self, operation):
-        """Test :meth:`Operation.write_output_file`.
+    @patch.object(Operation, "parse_priority", Mock(return_value=7))
+    @patch("pg_backup_api.server_operation.get_process_start_time")
+    def test_write_job_file(self, mock_get_start_time, operation):
+        """Test :meth:`Operation.write_jobf_file`.
 
-        Ensure :meth:`OperationServer.write_output_file` is called as expected.
+        Ensure :meth:`OperationServer.write_job_file` is called as expected,
+        with the priority of the operation and the process which queues it.
         """
         content = {"SOME": "CONTENT"}
-        operation.write_output_file(content)
-        operation.server.write_output_file.assert_called_once_with(
+        operation.write_job_file(content)
+        operation.server.write_job_file.assert_called_once_with(
             operation.id,
-            content,
+            {
+                "SOME": "CONTENT",
+                "priority": 7,
+                "queued_by": {
+                    "pid": os.getpid(),
+                    "start_time": mock_get_start_time.return_value,
+                },
+            },
         )
+        assert operation.priority == 7
+        mock_get_start_time.assert_called_once_with(os.getpid())
 
-    def test_get_status(self, operation):
-        """Test :meth:`Operation.get_status`.
+    @pytest.mark.parametrize(
+        "op_class,env,content,expected",
+        [
+            (ConfigSwitchOperation, {}, {}, 0),
+            (RecoveryOperation, {}, {}, 50),
+            (
+                RecoveryOperation,
+                {"PG_BACKUP_API_RECOVERY_PRIORITY": "80"},
+                {},
+                80,
+            ),
+            (
+                RecoveryOperation,
+                {"PG_BACKUP_API_RECOVERY_PRIORITY": "80"},
+                {"priority": 0},
+                0,
+            ),
+            (ConfigUpdateOperation, {}, {"priority": 100}, 100),
+        ],
+    )
+    def test_parse_priority(self, op_class, env, content, expected):
+        """Test :meth:`Operation.parse_priority`.
+
+        Ensure the requested priority takes precedence over the configured
+        one, and the default of the operation type.
+        """
+        with patch.dict("os.environ", env):
+            assert op_class.parse_priority(content) == expected
+
+    @pytest.mark.parametrize("priority", [-1, 101, 1.5, True, "10", None])
+    def test_parse_priority_invalid(self, priority):
+        """Test :meth:`Operation.parse_priority`.
+
+        Ensure an exception is raised if the priority is not valid.
+        """
+        with pytest.raises(MalformedContent) as exc:
+            RecoveryOperation.parse_priority({"priority": priority})
+
+        assert str(exc.value) == (
+            "`priority` is expected to be an integer between 0 and 100, but "
+            f"`{priority}` was found instead."
+        )
+
+    @patch.object(Operation, "parse_priority", Mock(return_value=7))
+    def test_write_job_file_auto_id_conflict(self, operation):
+        """Test :meth:`Operation.write_job_file`.
+
+        Ensure a suffix is appended to an auto generated ID if another
+        operation already uses it.
+        """
+        with patch.object(Operation, "_generate_id") as mock_generate_id:
+            mock_generate_id.return_value = "20261019T101010"
+            operation = Operation(operation.server.name)
+
+        mock_write = operation.server.write_job_file
+        mock_write.side_effect = [FileExistsError, FileExistsError, None]
+        content = {"SOME": "CONTENT"}
+
+        operation.write_job_file(content)
+
+        assert operation.id == "20261019T101010-2"
+        mock_write.assert_has_calls(
+            [
+                call("20261019T101010", content),
+                call("20261019T101010-1", content),
+                call("20261019T101010-2", content),
+            ]
+        )
+
+    @patch.object(Operation, "parse_priority", Mock(return_value=7))
+    def test_write_job_file_custom_id_conflict(self, operation):
+        """Test :meth:`Operation.write_job_file`.
+
+        Ensure an exception is raised if a custom ID is already in use.
+        """
+        operation = Operation(operation.server.name, "CUSTOM_OP_ID")
+        operation.server.write_job_file.side_effect = FileExistsError
+
+        with pytest.raises(FileExistsError):
+            operation.write_job_file({"SOME": "CONTENT"})
+
+        assert operation.id == "CUSTOM_OP_ID"
+
+    def test_write_output_file(self, operation):
+        """Test :meth:`Operation.write_output_file`.
+
+        Ensure :meth:`OperationServer.write_output_file` is called as expected.
+        """
+        content = {"SOME": "CONTENT"}
+        operation.write_output_file(content)
+        operation.server.write_output_file.assert_called_once_with(
+            operation.id,
+            content,
+        )
+
+    def test_write_output_file_merged(self, operation):
+        """Test :meth:`Operation.write_output_file`.
+
+        Ensure merged operations get their own output file, with the same
+        status and pointing to this operation, unless already finished.
+        """
+        operation.merged_ids = ["OP_2", "OP_3"]
+        operation.server.read_job_file.side_effect = lambda op_id: {
+            "operation_type": "config_update",
+            "changes": [op_id],
+        }
+        operation.server.write_output_file.side_effect = [
+            None,
+            FileExistsError("OP_3"),
+            None,
+        ]
+        content = {
+            "success": True,
+            "end_time": "SOME_TIME",
+            "status": "DONE",
+            "output": "SOME OUTPUT\n",
+            "resources": {"SOME": "RESOURCES"},
+        }
+
+        operation.write_output_file(content)
+
+        assert operation.server.write_output_file.call_args_list == [
+            call(
+                "OP_2",
+                {
+                    "operation_type": "config_update",
+                    "changes": ["OP_2"],
+                    "success": True,
+                    "end_time": "SOME_TIME",
+                    "status": "DONE",
+                    "merged_into": operation.id,
+                    "output": (
+                        f"Run along with operation '{operation.id}':\n"
+                        "SOME OUTPUT\n"
+                    ),
+                },
+            ),
+            call("OP_3", ANY),
+            call(operation.id, content),
+        ]
+
+    def test_get_status(self, operation):
+        """Test :meth:`Operation.get_status`.
 
         Test :meth:`OperationServer.get_operation_status` is called as
         expected.
@@ -773,180 +1672,1305 @@ class TestOperation:
             operation.id,
         )
 
-    def test__run_subprocess(self, operation):
+    @patch.object(Operation, "_get_timeouts", return_value=(0.0, 0.0))
+    @patch.object(Operation, "_throttle", lambda self, cmd: cmd)
+    def test__run_subprocess(self, mock_get_timeouts, operation):
+        """Test :meth:`Operation._run_subprocess`.
+
+        Ensure the output and exit code of the command are returned.
+        """
+        cmd = ["sh", "-c", "echo SOME OUTPUT; echo SOME ERROR >&2; exit 3"]
+
+        assert operation._run_subprocess(cmd) == (
+            "SOME OUTPUT\nSOME ERROR\n",
+            3,
+        )
+        assert operation.timed_out is None
+
+    @pytest.mark.parametrize(
+        "timeouts,cmd,reason",
+        [
+            (
+                (0.5, 0.0),
+                "echo SOME OUTPUT; sleep 30",
+                "ran for more than 0.5 seconds",
+            ),
+            (
+                (0.5, 0.0),
+                "exec >&-; sleep 30",
+                "ran for more than 0.5 seconds",
+            ),
+            (
+                (30.0, 0.5),
+                "echo SOME OUTPUT; sleep 30",
+                "produced no output for 0.5 seconds",
+            ),
+        ],
+    )
+    @patch("pg_backup_api.server_operation.log", Mock())
+    @patch.object(Operation, "_throttle", lambda self, cmd: cmd)
+    def test__run_subprocess_timed_out(self, timeouts, cmd, reason, operation):
+        """Test :meth:`Operation._run_subprocess`.
+
+        Ensure the process group is killed if the command exceeds its
+        timeouts, and the reason is recorded.
+        """
+        with patch.object(
+            Operation, "_get_timeouts", return_value=timeouts
+        ), patch("os.killpg", wraps=os.killpg) as mock_killpg:
+            start = time.monotonic()
+            output, returncode = operation._run_subprocess(["sh", "-c", cmd])
+
+        assert time.monotonic() - start < 10
+        assert output.endswith(f"\nOperation timed out: {reason}\n")
+        assert returncode == -signal.SIGTERM
+        assert operation.timed_out == reason
+        assert mock_killpg.call_args_list[0][0][1] == signal.SIGTERM
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_HEARTBEAT_INTERVAL": "5"})
+    @patch("threading.Thread")
+    @patch("pg_backup_api.server_operation.get_process_start_time")
+    def test_record_runner(self, mock_get_start_time, mock_thread, operation):
+        """Test :meth:`Operation.record_runner`.
+
+        Ensure the current process is recorded in the job file, and the
+        heartbeats are started.
+        """
+        operation.record_runner()
+
+        operation.server.heartbeat.assert_called_once_with(operation.id)
+        mock_thread.assert_called_once_with(
+            target=operation._heartbeat,
+            args=(5.0,),
+            name="pg-backup-api-heartbeat",
+            daemon=True,
+        )
+        mock_thread.return_value.start.assert_called_once_with()
+
+        mock_get_start_time.assert_called_once_with(os.getpid())
+        operation.server.update_job_file.assert_called_once_with(
+            operation.id,
+            {
+                "runner": {
+                    "pid": os.getpid(),
+                    "start_time": mock_get_start_time.return_value,
+                    "process_group": None,
+                }
+            },
+        )
+
+    @patch("threading.Thread", MagicMock())
+    @patch("pg_backup_api.server_operation.get_process_start_time")
+    def test_record_runner_merged(self, mock_get_start_time, operation):
+        """Test :meth:`Operation.record_runner`.
+
+        Ensure the runner is also recorded for the merged operations which did
+        not finish yet, and that those which finished are left out.
+        """
+        operation.merged_ids = ["OP_2", "OP_3"]
+        operation.server.get_output_file_path.side_effect = (
+            lambda op_id: f"/SOME/OUTPUT/{op_id}"
+        )
+
+        with patch(
+            "os.path.exists",
+            side_effect=lambda path: path == "/SOME/OUTPUT/OP_3",
+        ):
+            operation.record_runner()
+
+        runner = {
+            "pid": os.getpid(),
+            "start_time": mock_get_start_time.return_value,
+            "process_group": None,
+        }
+        assert operation.merged_ids == ["OP_2"]
+        assert operation.server.update_job_file.call_args_list == [
+            call(operation.id, {"runner": runner}),
+            call("OP_2", {"runner": runner, "merged_into": operation.id}),
+        ]
+        assert operation.server.heartbeat.call_args_list == [
+            call(operation.id),
+            call("OP_2"),
+        ]
+
+    def test_hand_over(self, operation):
+        """Test :meth:`Operation.hand_over`.
+
+        Ensure the run is handed over to the first merged operation, which
+        leads the remaining ones.
+        """
+        operation.merged_ids = ["OP_2", "OP_3"]
+
+        assert operation.hand_over() is True
+
+        assert operation.id == "OP_2"
+        assert operation.merged_ids == ["OP_3"]
+        assert operation.server.update_job_file.call_args_list == [
+            call("OP_2", {"merged_into": None}),
+            call("OP_2", {"runner": ANY}),
+            call("OP_3", {"runner": ANY, "merged_into": "OP_2"}),
+        ]
+
+    def test_hand_over_nothing_merged(self, operation):
+        """Test :meth:`Operation.hand_over`.
+
+        Ensure nothing is done if no operation is merged into this one.
+        """
+        assert operation.hand_over() is False
+
+        operation.server.update_job_file.assert_not_called()
+
+    @patch("time.sleep")
+    def test__heartbeat(self, mock_sleep, operation):
+        """Test :meth:`Operation._heartbeat`.
+
+        Ensure heartbeats are recorded until the operation finishes.
+        """
+        operation.server.heartbeat.side_effect = [True, True, False]
+
+        operation._heartbeat(5.0)
+
+        assert mock_sleep.call_args_list == [call(5.0)] * 3
+        operation.server.heartbeat.assert_has_calls([call(operation.id)] * 3)
+
+    @patch("threading.Thread", Mock())
+    @patch.object(Operation, "_get_timeouts", return_value=(0.0, 0.0))
+    @patch.object(Operation, "_throttle", lambda self, cmd: cmd)
+    def test__run_subprocess_records_process_group(
+        self, mock_get_timeouts, operation
+    ):
+        """Test :meth:`Operation._run_subprocess`.
+
+        Ensure the process group of the subprocess is recorded, if running
+        as the runner of the operation.
+        """
+        operation.server.get_output_file_path.return_value = "/SOME/OUTPUT"
+        operation.record_runner()
+        operation.server.update_job_file.reset_mock()
+
+        with patch("os.path.exists", return_value=False):
+            operation._run_subprocess(["true"])
+
+        changes = operation.server.update_job_file.call_args[0][1]
+        assert changes["runner"]["pid"] == os.getpid()
+        assert changes["runner"]["process_group"] > 0
+        assert operation.cancelled is False
+
+    @patch("threading.Thread", Mock())
+    @patch("pg_backup_api.server_operation.log", Mock())
+    @patch.object(Operation, "_get_timeouts", return_value=(0.0, 0.0))
+    @patch.object(Operation, "_throttle", lambda self, cmd: cmd)
+    def test__run_subprocess_finished_while_starting(
+        self, mock_get_timeouts, operation, tmp_path
+    ):
         """Test :meth:`Operation._run_subprocess`.
 
-        Ensure it has the expected interactions with :mod:`subprocess`.
+        Ensure the subprocess is cancelled if the operation was finished by
+        the REST API before its process group was recorded.
+        """
+        output_file = tmp_path / "SOME_OP_ID.json"
+        output_file.write_text("{}")
+        operation.server.get_output_file_path.return_value = str(output_file)
+        operation.record_runner()
+
+        start = time.monotonic()
+        output, returncode = operation._run_subprocess(["sleep", "30"])
+
+        assert time.monotonic() - start < 10
+        assert output == "\nOperation cancelled\n"
+        assert returncode == -signal.SIGTERM
+        assert operation.cancelled is True
+
+    @patch("pg_backup_api.server_operation.log", Mock())
+    @patch.object(Operation, "_get_timeouts", return_value=(0.0, 0.0))
+    @patch.object(Operation, "_throttle", lambda self, cmd: cmd)
+    def test_cancel(self, mock_get_timeouts, operation):
+        """Test :meth:`Operation.cancel`.
+
+        Ensure a running subprocess is killed, and no subprocess is started
+        once cancelled.
+        """
+        timer = threading.Timer(0.5, operation.cancel)
+        timer.start()
+
+        try:
+            start = time.monotonic()
+            output, returncode = operation._run_subprocess(
+                ["sh", "-c", "echo SOME OUTPUT; sleep 30"]
+            )
+        finally:
+            timer.cancel()
+
+        assert time.monotonic() - start < 10
+        assert output == "SOME OUTPUT\n\nOperation cancelled\n"
+        assert returncode == -signal.SIGTERM
+        assert operation.cancelled is True
+        assert operation.timed_out is None
+
+        with patch("subprocess.Popen") as mock_popen:
+            assert operation._run_subprocess(["true"]) == (
+                "Operation cancelled\n",
+                1,
+            )
+
+        mock_popen.assert_not_called()
+
+    @patch("pg_backup_api.server_operation.log", Mock())
+    @patch.object(Operation, "_KILL_GRACE_PERIOD", 0.5)
+    @patch.object(Operation, "_get_timeouts", return_value=(0.0, 0.0))
+    @patch.object(Operation, "_throttle", lambda self, cmd: cmd)
+    def test_cancel_sigterm_ignored(self, mock_get_timeouts, operation):
+        """Test :meth:`Operation.cancel`.
+
+        Ensure cancelling does not block, and the subprocess is killed after
+        the grace period if it ignores SIGTERM.
         """
-        cmd = ["SOME", "COMMAND"]
-        stdout = "SOME OUTPUT"
-        return_code = 0
+        durations = []
 
-        with patch("subprocess.Popen", MagicMock()) as mock_popen:
-            mock_popen.return_value.communicate.return_value = (stdout, None)
-            mock_popen.return_value.returncode = return_code
+        def cancel():
+            start = time.monotonic()
+            operation.cancel()
+            durations.append(time.monotonic() - start)
 
-            assert operation._run_subprocess(cmd) == (stdout, return_code)
+        timer = threading.Timer(0.5, cancel)
+        timer.start()
 
-            mock_popen.assert_called_once_with(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        try:
+            start = time.monotonic()
+            output, returncode = operation._run_subprocess(
+                ["sh", "-c", "trap '' TERM; echo SOME OUTPUT; sleep 30"]
             )
+        finally:
+            timer.cancel()
+
+        assert time.monotonic() - start < 10
+        assert durations[0] < 0.5
+        assert output == "SOME OUTPUT\n\nOperation cancelled\n"
+        assert returncode == -signal.SIGKILL
+
+    @patch("os.killpg")
+    def test__kill_process_group(self, mock_killpg, operation):
+        """Test :meth:`Operation._kill_process_group`.
+
+        Ensure SIGKILL follows SIGTERM if the process does not exit in time.
+        """
+        process = Mock(pid=1234)
+        process.wait.side_effect = subprocess.TimeoutExpired("cmd", 10)
+
+        operation._kill_process_group(process)
+
+        mock_killpg.assert_has_calls(
+            [call(1234, signal.SIGTERM), call(1234, signal.SIGKILL)]
+        )
+        assert process.wait.call_args[1]["timeout"] == pytest.approx(
+            operation._KILL_GRACE_PERIOD, abs=1
+        )
+
+        # SIGTERM was already sent, and the deadline passed
+        mock_killpg.reset_mock()
+        process.wait.reset_mock()
+
+        operation._kill_process_group(process, time.monotonic() - 5)
+
+        mock_killpg.assert_called_once_with(1234, signal.SIGKILL)
+        process.wait.assert_called_once_with(timeout=0)
+
+        mock_killpg.reset_mock()
+        mock_killpg.side_effect = ProcessLookupError
+
+        operation._kill_process_group(process)
+
+        mock_killpg.assert_called_once_with(1234, signal.SIGTERM)
+
+    @patch.object(Operation, "_get_retry_policy", return_value=RetryPolicy())
+    def test_run(self, mock_get_retry_policy, operation):
+        """Test :meth:`Operation.run`.
+
+        Ensure :meth:`Operation._run_logic` is called.
+        """
+        with patch.object(operation, "_run_logic") as mock_run_logic:
+            operation.run()
+            mock_run_logic.assert_called_once()
+
+        assert operation.attempts == []
+
+    @patch("time.sleep", Mock())
+    @patch.object(Operation, "_get_retry_policy")
+    def test_run_retry(self, mock_get_retry_policy, operation):
+        """Test :meth:`Operation.run`.
+
+        Ensure a retryable failure is retried after a backoff, and that the
+        attempts and the output of all of them are recorded.
+        """
+        mock_get_retry_policy.return_value = RetryPolicy(3, 10, 300, {255})
+        operation.TYPE = OperationType.RECOVERY
+
+        with patch.object(
+            operation, "_run_logic"
+        ) as mock_run_logic, patch.object(
+            operation, "_wait_retry"
+        ) as mock_wait_retry:
+            mock_run_logic.side_effect = [("FAILED\n", 255), ("DONE\n", 0)]
+            output, retcode = operation.run()
+
+        assert retcode == 0
+        assert output == (
+            "FAILED\n\nAttempt 1 failed with exit code 255, retrying in 10 "
+            "seconds\n\nDONE\n"
+        )
+        assert [a["exit_code"] for a in operation.attempts] == [255, 0]
+        assert [a["attempt"] for a in operation.attempts] == [1, 2]
+        mock_wait_retry.assert_called_once_with(10)
+        operation.server.append_event.assert_called_once_with(
+            operation.id, "retrying", "IN_PROGRESS", "recovery"
+        )
+        operation.server.update_job_file.assert_called_with(
+            operation.id, {"attempts": operation.attempts}
+        )
+
+    @pytest.mark.parametrize(
+        "results,timed_out,expected_calls",
+        [
+            # Not retryable exit code
+            ([("FAILED", 1)], None, 1),
+            # Timed out
+            ([("FAILED", 255)], "ran for too long", 1),
+            # Attempts exhausted
+            ([("FAILED", 255)] * 3, None, 3),
+        ],
+    )
+    @patch.object(Operation, "_wait_retry", Mock())
+    @patch.object(Operation, "_get_retry_policy")
+    def test_run_retry_stop(
+        self,
+        mock_get_retry_policy,
+        results,
+        timed_out,
+        expected_calls,
+        operation,
+    ):
+        """Test :meth:`Operation.run`.
+
+        Ensure failures are not retried if they are not retryable, if the
+        operation timed out, or if all the attempts were made.
+        """
+        mock_get_retry_policy.return_value = RetryPolicy(3, 1, 1, {255})
+        operation.TYPE = OperationType.RECOVERY
+        operation.timed_out = timed_out
+
+        with patch.object(operation, "_run_logic") as mock_run_logic:
+            mock_run_logic.side_effect = results
+            _, retcode = operation.run()
+
+        assert retcode == results[-1][1]
+        assert mock_run_logic.call_count == expected_calls
+        assert len(operation.attempts) == expected_calls
+
+    @patch.object(Operation, "_get_retry_policy")
+    def test_run_retry_cancelled(self, mock_get_retry_policy, operation):
+        """Test :meth:`Operation.run`.
+
+        Ensure the operation is not retried if cancelled during the backoff.
+        """
+        mock_get_retry_policy.return_value = RetryPolicy(
+            3, 60, 60, output_pattern=re.compile("Broken pipe")
+        )
+        operation.TYPE = OperationType.RECOVERY
+
+        def cancel(_):
+            operation.cancelled = True
+
+        with patch.object(operation, "_run_logic") as mock_run_logic, patch(
+            "time.sleep", side_effect=cancel
+        ) as mock_sleep:
+            mock_run_logic.return_value = ("Broken pipe\n", 255)
+            output, retcode = operation.run()
+
+        assert retcode == 255
+        assert output.endswith("Operation cancelled\n")
+        mock_run_logic.assert_called_once()
+        mock_sleep.assert_called_once_with(1.0)
+
+    @pytest.mark.parametrize(
+        "env,expected",
+        [
+            ({}, (1, 10.0, 300.0, set(), None)),
+            (
+                {
+                    "PG_BACKUP_API_RECOVERY_RETRY_MAX_ATTEMPTS": "3",
+                    "PG_BACKUP_API_RECOVERY_RETRY_BACKOFF": "5",
+                    "PG_BACKUP_API_RECOVERY_RETRY_MAX_BACKOFF": "60",
+                    "PG_BACKUP_API_RECOVERY_RETRY_EXIT_CODES": "1, 255",
+                    "PG_BACKUP_API_RECOVERY_RETRY_OUTPUT_PATTERN": "reset",
+                },
+                (3, 5.0, 60.0, {1, 255}, "reset"),
+            ),
+            (
+                {
+                    "PG_BACKUP_API_RECOVERY_RETRY_MAX_ATTEMPTS": "many",
+                    "PG_BACKUP_API_RECOVERY_RETRY_EXIT_CODES": "1",
+                },
+                (1, 0.0, 0.0, set(), None),
+            ),
+            (
+                {
+                    "PG_BACKUP_API_RECOVERY_RETRY_MAX_ATTEMPTS": "3",
+                    "PG_BACKUP_API_RECOVERY_RETRY_EXIT_CODES": "one",
+                    "PG_BACKUP_API_RECOVERY_RETRY_OUTPUT_PATTERN": "(",
+                },
+                (3, 10.0, 300.0, set(), None),
+            ),
+        ],
+    )
+    def test__get_retry_policy(self, env, expected, operation):
+        """Test :meth:`Operation._get_retry_policy`.
+
+        Ensure the policy is read from the settings of the operation type,
+        and that invalid settings are ignored.
+        """
+        operation.TYPE = OperationType.RECOVERY
+
+        with patch.dict("os.environ", env, clear=True):
+            policy = operation._get_retry_policy()
+
+        pattern = policy.output_pattern
+        assert (
+            policy.max_attempts,
+            policy.backoff,
+            policy.max_backoff,
+            policy.exit_codes,
+            pattern.pattern if pattern else None,
+        ) == expected
+
+    def test__wait_retry(self, operation):
+        """Test :meth:`Operation._wait_retry`.
+
+        Ensure it waits for the given time, unless cancelled meanwhile.
+        """
+        start = time.monotonic()
+        operation._wait_retry(0.1)
+        assert time.monotonic() - start >= 0.1
+
+        operation.cancelled = True
+
+        with patch("time.sleep") as mock_sleep:
+            operation._wait_retry(10)
+
+        mock_sleep.assert_not_called()
+
+
+class TestRetryPolicy:
+    """Run tests for :class:`RetryPolicy`."""
+
+    def test_get_delay(self):
+        """Test :meth:`RetryPolicy.get_delay`.
+
+        Ensure the delay doubles on each attempt, up to the maximum.
+        """
+        policy = RetryPolicy(5, 10, 30)
+
+        assert [policy.get_delay(i) for i in range(1, 5)] == [10, 20, 30, 30]
+
+    @pytest.mark.parametrize(
+        "output,retcode,expected",
+        [
+            ("ssh: Connection reset by peer", 1, True),
+            ("SOME ERROR", 255, True),
+            ("SOME ERROR", 1, False),
+        ],
+    )
+    def test_is_retryable(self, output, retcode, expected):
+        """Test :meth:`RetryPolicy.is_retryable`.
+
+        Ensure failures are retryable if their exit code or their output
+        match the policy.
+        """
+        pattern = re.compile(RecoveryOperation.DEFAULT_RETRY_OUTPUT_PATTERN)
+        policy = RetryPolicy(3, exit_codes={255}, output_pattern=pattern)
+
+        assert policy.is_retryable(output, retcode) is expected
+
+
+@patch("pg_backup_api.server_operation.OperationServer", MagicMock())
+class TestRecoveryOperation:
+    """Run tests for :class:`RecoveryOperation`."""
+
+    @pytest.fixture
+    @patch("pg_backup_api.server_operation.OperationServer", MagicMock())
+    def operation(self):
+        """Create a :class:`RecoveryOperation` instance for testing.
+
+        :return: a new instance of :class:`RecoveryOperation` for testing.
+        """
+        return RecoveryOperation(_BARMAN_SERVER)
+
+    @pytest.mark.parametrize(
+        "content,missing_keys",
+        [
+            (
+                {},
+                "backup_id, destination_directory, remote_ssh_command",
+            ),
+            (
+                {"backup_id": "SOME_BACKUP_ID"},
+                "destination_directory, remote_ssh_command",
+            ),
+            (
+                {"destination_directory": "SOME_DESTINATION_DIRECTORY"},
+                "backup_id, remote_ssh_command",
+            ),
+            (
+                {"remote_ssh_command": "SOME_REMOTE_SSH_COMMAND"},
+                "backup_id, destination_directory",
+            ),
+            (
+                {
+                    "backup_id": "SOME_BACKUP_ID",
+                    "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                },
+                "remote_ssh_command",
+            ),
+            (
+                {
+                    "backup_id": "SOME_BACKUP_ID",
+                    "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                },
+                "destination_directory",
+            ),
+            (
+                {
+                    "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                    "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                },
+                "backup_id",
+            ),
+        ],
+    )
+    def test__validate_job_content_content_missing_keys(
+        self, content, missing_keys, operation
+    ):
+        """Test :meth:`RecoveryOperation._validate_job_content`.
+
+        Ensure an exception is raised if the content is missing keys.
+        """
+        with pytest.raises(MalformedContent) as exc:
+            operation._validate_job_content(content)
+
+        assert str(exc.value) == f"Missing required arguments: {missing_keys}"
+
+    def test__validate_job_content_ok(self, operation):
+        """Test :meth:`RecoveryOperation._validate_job_content`.
+
+        Ensure execution is fine if everything is filled as expected.
+        """
+        content = {
+            "backup_id": "SOME_BACKUP_ID",
+            "destination_directory": "SOME_DESTINATION_DIRECTORY",
+            "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+        }
+        operation._validate_job_content(content)
+
+    @pytest.mark.parametrize(
+        "key,value,message",
+        [
+            (
+                "jobs",
+                "4",
+                "`jobs` is expected to be a `<class 'int'>`, but a "
+                "`<class 'str'>` was found instead: `4`.",
+            ),
+            (
+                "jobs_start_batch_size",
+                True,
+                "`jobs_start_batch_size` is expected to be a "
+                "`<class 'int'>`, but a `<class 'bool'>` was found instead: "
+                "`True`.",
+            ),
+            ("jobs", 0, "`jobs` is expected to be 1 or more: `0`"),
+            ("bwlimit", -1, "`bwlimit` is expected to be 0 or more: `-1`"),
+            (
+                "recovery_staging_path",
+                "staging",
+                "`recovery_staging_path` is expected to be an absolute path: "
+                "`staging`",
+            ),
+            (
+                "ssh_multiplexing",
+                "yes",
+                "`ssh_multiplexing` is expected to be a `<class 'bool'>`, but "
+                "a `<class 'str'>` was found instead: `yes`.",
+            ),
+            (
+                "get_wal",
+                1,
+                "`get_wal` is expected to be a `<class 'bool'>`, but a "
+                "`<class 'int'>` was found instead: `1`.",
+            ),
+        ],
+    )
+    def test__validate_job_content_invalid_tuning(
+        self, key, value, message, operation
+    ):
+        """Test :meth:`RecoveryOperation._validate_job_content`.
+
+        Ensure an exception is raised if a tuning option is not valid.
+        """
+        content = {
+            "backup_id": "SOME_BACKUP_ID",
+            "destination_directory": "SOME_DESTINATION_DIRECTORY",
+            "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+            key: value,
+        }
+
+        with pytest.raises(MalformedContent) as exc:
+            operation._validate_job_content(content)
+
+        assert str(exc.value) == message
+
+    @pytest.mark.parametrize(
+        "content,message",
+        [
+            (
+                {"target_time": "2025-01-01", "target_lsn": "0/1"},
+                "Only one among the following arguments should be specified: "
+                "target_lsn, target_time",
+            ),
+            (
+                {"target_time": "NOT A TIME"},
+                "Invalid `target_time`: `NOT A TIME`",
+            ),
+            ({"target_lsn": "0/XYZ"}, "Invalid `target_lsn`: `0/XYZ`"),
+            ({"target_xid": "abc"}, "Invalid `target_xid`: `abc`"),
+            (
+                {"target_xid": True},
+                "`target_xid` is expected to be a `(<class 'str'>, "
+                "<class 'int'>)`, but a `<class 'bool'>` was found instead: "
+                "`True`.",
+            ),
+            (
+                {"target_immediate": False},
+                "Value of `target_immediate` key, if present, can only be "
+                "`True`",
+            ),
+            (
+                {"target_tli": 0},
+                "`target_tli` is expected to be a positive integer, "
+                "`current` or `latest`: `0`",
+            ),
+            (
+                {"target_name": "SOME_NAME", "target_action": "stop"},
+                "`target_action` is expected to be one among: pause, "
+                "promote, shutdown",
+            ),
+            (
+                {"target_action": "promote"},
+                "`target_action` requires a recovery target",
+            ),
+            (
+                {"target_name": "SOME_NAME", "target_exclusive": True},
+                "`target_exclusive` requires one among: target_lsn, "
+                "target_time, target_xid",
+            ),
+        ],
+    )
+    def test_parse_target_invalid(self, content, message, operation):
+        """Test :meth:`RecoveryOperation.parse_target`.
+
+        Ensure an exception is raised if the recovery target options are not
+        valid.
+        """
+        with pytest.raises(MalformedContent) as exc:
+            operation.parse_target(content)
+
+        assert str(exc.value) == message
+
+    def test_parse_target(self, operation):
+        """Test :meth:`RecoveryOperation.parse_target`.
+
+        Ensure the recovery target is parsed, and naive target times are
+        assumed to be in the local time zone, as ``barman recover`` does.
+        """
+        assert operation.parse_target({}) == {
+            "target_time": None,
+            "target_lsn": None,
+            "target_tli": None,
+        }
+        assert operation.parse_target(
+            {"target_lsn": "1/2A", "target_tli": "latest"}
+        ) == {
+            "target_time": None,
+            "target_lsn": 0x10000002A,
+            "target_tli": "latest",
+        }
+
+        targets = operation.parse_target(
+            {"target_time": "2025-01-02 03:04:05", "target_tli": 2}
+        )
+        expected = datetime(2025, 1, 2, 3, 4, 5, tzinfo=dateutil.tz.tzlocal())
+        assert targets == {
+            "target_time": expected,
+            "target_lsn": None,
+            "target_tli": 2,
+        }
+
+    @patch("pg_backup_api.server_operation.Operation.time_event_now")
+    @patch("pg_backup_api.server_operation.Operation.write_job_file")
+    def test_write_job_file(
+        self, mock_write_job_file, mock_time_event_now, operation
+    ):
+        """Test :meth:`RecoveryOperation.write_job_file`.
+
+        Ensure the underlying methods are called as expected.
+        """
+        content = {
+            "SOME": "CONTENT",
+        }
+        extended_content = {
+            "SOME": "CONTENT",
+            "operation_type": OperationType.RECOVERY.value,
+            "start_time": "SOME_TIMESTAMP",
+        }
+
+        with patch.object(operation, "_validate_job_content") as mock:
+            mock_time_event_now.return_value = "SOME_TIMESTAMP"
+
+            operation.write_job_file(content)
+
+            mock_time_event_now.assert_called_once()
+            mock.assert_called_once_with(extended_content)
+            mock_write_job_file.assert_called_once_with(extended_content)
+
+    def test__get_args(self, operation):
+        """Test :meth:`RecoveryOperation._get_args`.
+
+        Ensure it returns the correct arguments for ``barman recover``.
+        """
+        with patch.object(operation, "read_job_file") as mock:
+            mock.return_value = {
+                "backup_id": "SOME_BACKUP_ID",
+                "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+            }
+
+            expected = [
+                operation.server.name,
+                "SOME_BACKUP_ID",
+                "SOME_DESTINATION_DIRECTORY",
+                "--remote-ssh-command",
+                "SOME_REMOTE_SSH_COMMAND",
+            ]
+            assert operation._get_args() == expected
+
+    def test__get_args_target(self, operation):
+        """Test :meth:`RecoveryOperation._get_args`.
+
+        Ensure the recovery target options are passed to ``barman recover``.
+        """
+        with patch.object(operation, "read_job_file") as mock:
+            mock.return_value = {
+                "backup_id": "SOME_BACKUP_ID",
+                "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                "target_xid": 1234,
+                "target_tli": "latest",
+                "target_action": "promote",
+                "target_exclusive": True,
+            }
+
+            expected = [
+                operation.server.name,
+                "SOME_BACKUP_ID",
+                "SOME_DESTINATION_DIRECTORY",
+                "--remote-ssh-command",
+                "SOME_REMOTE_SSH_COMMAND",
+                "--target-xid",
+                "1234",
+                "--target-tli",
+                "latest",
+                "--target-action",
+                "promote",
+                "--exclusive",
+            ]
+            assert operation._get_args() == expected
+
+            mock.return_value = {
+                "backup_id": "SOME_BACKUP_ID",
+                "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                "target_immediate": True,
+            }
+
+            assert operation._get_args()[-1] == "--target-immediate"
+
+    def test__get_args_tuning(self, operation):
+        """Test :meth:`RecoveryOperation._get_args`.
+
+        Ensure the tuning options are passed to ``barman recover``, and the
+        ones which are not given are left to the Barman configuration.
+        """
+        with patch.object(operation, "read_job_file") as mock:
+            mock.return_value = {
+                "backup_id": "SOME_BACKUP_ID",
+                "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                "jobs": 8,
+                "bwlimit": 0,
+                "recovery_staging_path": "/SOME/STAGING/PATH",
+                "get_wal": False,
+            }
+
+            expected = [
+                operation.server.name,
+                "SOME_BACKUP_ID",
+                "SOME_DESTINATION_DIRECTORY",
+                "--remote-ssh-command",
+                "SOME_REMOTE_SSH_COMMAND",
+                "--jobs",
+                "8",
+                "--bwlimit",
+                "0",
+                "--recovery-staging-path",
+                "/SOME/STAGING/PATH",
+                "--no-get-wal",
+            ]
+            assert operation._get_args() == expected
+
+            mock.return_value["get_wal"] = True
+
+            assert operation._get_args()[-1] == "--get-wal"
+            assert operation._get_args("ssh -o ControlPath=x pg")[4] == (
+                "ssh -o ControlPath=x pg"
+            )
+
+    @patch.dict("os.environ", {}, clear=True)
+    @patch("pg_backup_api.server_operation.multiplexed_ssh_command")
+    @patch("pg_backup_api.server_operation.RecoveryOperation._preflight")
+    @patch("pg_backup_api.server_operation.Operation._run_subprocess")
+    @patch("pg_backup_api.server_operation.RecoveryOperation._get_args")
+    def test__run_logic(
+        self,
+        mock_get_args,
+        mock_run_subprocess,
+        mock_preflight,
+        mock_multiplexed,
+        operation,
+    ):
+        """Test :meth:`RecoveryOperation._run_logic`.
+
+        Ensure the underlying calls occur as expected.
+        """
+        arguments = ["SOME", "ARGUMENTS"]
+        output = ("SOME OUTPUT", 0)
+        content = {"remote_ssh_command": "ssh pg"}
+
+        mock_get_args.return_value = arguments
+        mock_run_subprocess.return_value = output
+        mock_preflight.return_value = None
+
+        with patch.object(operation, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = content
+            assert operation._run_logic() == output
+
+        mock_preflight.assert_called_once_with(content, "ssh pg")
+        mock_get_args.assert_called_once_with("ssh pg")
+        mock_multiplexed.assert_not_called()
+        mock_run_subprocess.assert_called_once_with(
+            ["barman", "recover"] + arguments,
+        )
+
+    def test__get_timeouts(self, operation):
+        """Test :meth:`Operation._get_timeouts`.
+
+        Ensure the timeouts are read from the settings of the operation type,
+        and are disabled by default.
+        """
+        assert operation._get_timeouts() == (0.0, 0.0)
+
+        with patch.dict(
+            "os.environ",
+            {
+                "PG_BACKUP_API_RECOVERY_TIMEOUT": "3600",
+                "PG_BACKUP_API_RECOVERY_IDLE_TIMEOUT": "600",
+                "PG_BACKUP_API_CONFIG_SWITCH_TIMEOUT": "60",
+            },
+        ):
+            assert operation._get_timeouts() == (3600.0, 600.0)
+
+    @patch("shutil.which", return_value="/usr/bin/ionice")
+    def test__throttle(self, _, operation, tmp_path):
+        """Test :meth:`Operation._throttle`.
+
+        Ensure the command is left unchanged by default, and otherwise wrapped
+        with ``nice``, ``ionice`` and a move into the configured cgroup, whose
+        limits are written.
+        """
+        cmd = ["barman", "recover"]
+        assert operation._throttle(cmd) == cmd
+
+        cgroup = str(tmp_path / "recovery")
+
+        with patch.dict(
+            "os.environ",
+            {
+                "PG_BACKUP_API_RECOVERY_NICE": "10",
+                "PG_BACKUP_API_RECOVERY_IONICE_CLASS": "best-effort",
+                "PG_BACKUP_API_RECOVERY_IONICE_LEVEL": "7",
+                "PG_BACKUP_API_RECOVERY_CGROUP": cgroup,
+                "PG_BACKUP_API_RECOVERY_CGROUP_CPU_WEIGHT": "20",
+                "PG_BACKUP_API_RECOVERY_CGROUP_CPU_MAX": "50000 100000",
+            },
+        ):
+            assert operation._throttle(cmd) == [
+                "sh",
+                "-c",
+                'echo $$ > "$0"; exec "$@"',
+                os.path.join(cgroup, "cgroup.procs"),
+                "nice",
+                "-n",
+                "10",
+                "ionice",
+                "-c",
+                "2",
+                "-n",
+                "7",
+            ] + cmd
+
+        assert sorted(os.listdir(cgroup)) == ["cpu.max", "cpu.weight"]
+
+        with open(os.path.join(cgroup, "cpu.weight")) as f:
+            assert f.read() == "20"
+
+    @pytest.mark.parametrize(
+        "env,which,message",
+        [
+            (
+                {"PG_BACKUP_API_RECOVERY_IONICE_CLASS": "realtime"},
+                "/usr/bin/ionice",
+                "Ignoring unknown I/O class '%s'",
+            ),
+            (
+                {"PG_BACKUP_API_RECOVERY_IONICE_CLASS": "idle"},
+                None,
+                "Ignoring I/O class, as ionice is not available",
+            ),
+            (
+                {"PG_BACKUP_API_RECOVERY_CGROUP": "/proc/NOT_A_CGROUP"},
+                None,
+                "Ignoring cgroup '%s': %s",
+            ),
+            (
+                {"PG_BACKUP_API_RECOVERY_NICE": "low"},
+                None,
+                "Ignoring invalid niceness: %s",
+            ),
+        ],
+    )
+    @patch("pg_backup_api.server_operation.log")
+    def test__throttle_ignored(self, mock_log, env, which, message, operation):
+        """Test :meth:`Operation._throttle`.
+
+        Ensure settings which cannot be applied are logged, and the command
+        is still ran.
+        """
+        cmd = ["barman", "recover"]
+
+        with patch.dict("os.environ", env), patch(
+            "shutil.which", return_value=which
+        ):
+            assert operation._throttle(cmd) == cmd
+
+        assert mock_log.warning.call_args[0][0] == message
+
+    @pytest.mark.parametrize("level", ["high", "8"])
+    @patch("pg_backup_api.server_operation.log")
+    def test__throttle_invalid_ionice_level(self, mock_log, level, operation):
+        """Test :meth:`Operation._throttle`.
+
+        Ensure an invalid I/O level is logged, and the I/O class is still
+        applied.
+        """
+        env = {
+            "PG_BACKUP_API_RECOVERY_IONICE_CLASS": "best-effort",
+            "PG_BACKUP_API_RECOVERY_IONICE_LEVEL": level,
+        }
+        cmd = ["barman", "recover"]
+
+        with patch.dict("os.environ", env), patch(
+            "shutil.which", return_value="/usr/bin/ionice"
+        ):
+            assert operation._throttle(cmd) == ["ionice", "-c", "2"] + cmd
+
+        assert mock_log.warning.call_args[0][0] == (
+            "Ignoring invalid I/O level: %s"
+        )
 
-    def test_run(self, operation):
-        """Test :meth:`Operation.run`.
+    @pytest.mark.parametrize(
+        "backup_info,expected",
+        [
+            (None, None),
+            (MagicMock(cluster_size=2048, size=1024), 2048),
+            (MagicMock(cluster_size=None, size=1024), 1024),
+        ],
+    )
+    @patch("pg_backup_api.server_operation.parse_backup_id")
+    @patch("pg_backup_api.server_operation.Server")
+    def test__get_required_bytes(
+        self, mock_server, mock_parse_id, backup_info, expected, operation
+    ):
+        """Test :meth:`RecoveryOperation._get_required_bytes`.
 
-        Ensure :meth:`Operation._run_logic` is called.
+        Ensure the size of the cluster is preferred over the size of the
+        backup.
         """
-        with patch.object(operation, "_run_logic") as mock_run_logic:
-            operation.run()
-            mock_run_logic.assert_called_once()
+        mock_parse_id.return_value = backup_info
 
+        assert operation._get_required_bytes("latest") == expected
 
-@patch("pg_backup_api.server_operation.OperationServer", MagicMock())
-class TestRecoveryOperation:
-    """Run tests for :class:`RecoveryOperation`."""
+        mock_server.assert_called_once_with(operation.server.config)
+        mock_parse_id.assert_called_once_with(
+            mock_server.return_value, "latest"
+        )
 
-    @pytest.fixture
-    @patch("pg_backup_api.server_operation.OperationServer", MagicMock())
-    def operation(self):
-        """Create a :class:`RecoveryOperation` instance for testing.
+    @patch("pg_backup_api.server_operation.Server")
+    def test__get_required_bytes_error(self, mock_server, operation):
+        """Test :meth:`RecoveryOperation._get_required_bytes`.
 
-        :return: a new instance of :class:`RecoveryOperation` for testing.
+        Ensure the size is unknown if the backup cannot be loaded.
         """
-        return RecoveryOperation(_BARMAN_SERVER)
+        mock_server.side_effect = Exception("SOME ERROR")
+
+        assert operation._get_required_bytes("latest") is None
 
     @pytest.mark.parametrize(
-        "content,missing_keys",
+        "output,error,required,expected",
         [
             (
-                {},
-                "backup_id, destination_directory, remote_ssh_command",
-            ),
-            (
-                {"backup_id": "SOME_BACKUP_ID"},
-                "destination_directory, remote_ssh_command",
+                "Filesystem 1024-blocks Used Available Capacity Mounted on\n"
+                "/dev/sda1 1000 10 990 1% /\n",
+                None,
+                1000,
+                {
+                    "reachable": True,
+                    "required_bytes": 1000,
+                    "available_bytes": 990 * 1024,
+                    "error": None,
+                },
             ),
             (
-                {"destination_directory": "SOME_DESTINATION_DIRECTORY"},
-                "backup_id, remote_ssh_command",
+                "Filesystem 1024-blocks Used Available Capacity Mounted on\n"
+                "/dev/sda1 1000 10 990 1% /\n",
+                None,
+                990 * 1024 + 1,
+                {
+                    "reachable": True,
+                    "required_bytes": 990 * 1024 + 1,
+                    "available_bytes": 990 * 1024,
+                    "error": "destination directory '/var/lib/pg data' has "
+                    "1013760 bytes available, but the backup needs 1013761 "
+                    "bytes",
+                },
             ),
             (
-                {"remote_ssh_command": "SOME_REMOTE_SSH_COMMAND"},
-                "backup_id, destination_directory",
+                None,
+                RemoteCommandError("Connection refused", 255),
+                1000,
+                {
+                    "reachable": False,
+                    "required_bytes": 1000,
+                    "available_bytes": None,
+                    "error": "cannot reach the recovery host: Connection "
+                    "refused",
+                },
             ),
             (
+                None,
+                RemoteCommandError("timed out after 30.0 seconds"),
+                None,
                 {
-                    "backup_id": "SOME_BACKUP_ID",
-                    "destination_directory": "SOME_DESTINATION_DIRECTORY",
+                    "reachable": False,
+                    "required_bytes": None,
+                    "available_bytes": None,
+                    "error": "cannot reach the recovery host: timed out "
+                    "after 30.0 seconds",
                 },
-                "remote_ssh_command",
             ),
             (
+                None,
+                RemoteCommandError("df: not found", 127),
+                1000,
                 {
-                    "backup_id": "SOME_BACKUP_ID",
-                    "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                    "reachable": True,
+                    "required_bytes": 1000,
+                    "available_bytes": None,
+                    "error": None,
                 },
-                "destination_directory",
             ),
             (
+                "UNEXPECTED OUTPUT\n",
+                None,
+                1000,
                 {
-                    "destination_directory": "SOME_DESTINATION_DIRECTORY",
-                    "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+                    "reachable": True,
+                    "required_bytes": 1000,
+                    "available_bytes": None,
+                    "error": None,
                 },
-                "backup_id",
             ),
         ],
     )
-    def test__validate_job_content_content_missing_keys(
-        self, content, missing_keys, operation
+    @patch.dict("os.environ", {"PG_BACKUP_API_PREFLIGHT_TIMEOUT": "5"})
+    @patch("pg_backup_api.server_operation.run_remote_command")
+    def test__preflight(
+        self, mock_run_remote, output, error, required, expected, operation
     ):
-        """Test :meth:`RecoveryOperation._validate_job_content`.
+        """Test :meth:`RecoveryOperation._preflight`.
 
-        Ensure an exception is raised if the content is missing keys.
+        Ensure the free space at the destination is compared against the
+        size of the backup, and the result is recorded in the job file.
         """
-        with pytest.raises(MalformedContent) as exc:
-            operation._validate_job_content(content)
+        mock_run_remote.return_value = output
+        mock_run_remote.side_effect = error
+        content = {
+            "backup_id": "SOME_BACKUP_ID",
+            "destination_directory": "/var/lib/pg data",
+        }
 
-        assert str(exc.value) == f"Missing required arguments: {missing_keys}"
+        with patch.object(
+            operation, "_get_required_bytes", return_value=required
+        ), patch.object(operation, "update_job_file") as mock_update:
+            assert operation._preflight(content, "ssh pg") == (
+                expected["error"]
+            )
 
-    def test__validate_job_content_ok(self, operation):
-        """Test :meth:`RecoveryOperation._validate_job_content`.
+        mock_update.assert_called_once_with({"preflight": expected})
+        script = (
+            "d='/var/lib/pg data'; while [ ! -d \"$d\" ]; do "
+            'd=$(dirname "$d"); done; df -Pk "$d"'
+        )
+        mock_run_remote.assert_called_once_with(
+            "ssh pg", "sh -c " + shlex.quote(script), 5.0
+        )
 
-        Ensure execution is fine if everything is filled as expected.
+    @patch.dict(
+        "os.environ", {"PG_BACKUP_API_PREFLIGHT_TIMEOUT": "NOT A NUMBER"}
+    )
+    @patch("pg_backup_api.server_operation.run_remote_command")
+    def test__preflight_invalid_timeout(self, mock_run_remote, operation):
+        """Test :meth:`RecoveryOperation._preflight`.
+
+        Ensure an invalid timeout is reported as such, without connecting to
+        the recovery host.
         """
         content = {
             "backup_id": "SOME_BACKUP_ID",
-            "destination_directory": "SOME_DESTINATION_DIRECTORY",
-            "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+            "destination_directory": "/var/lib/pgdata",
         }
-        operation._validate_job_content(content)
 
-    @patch("pg_backup_api.server_operation.Operation.time_event_now")
-    @patch("pg_backup_api.server_operation.Operation.write_job_file")
-    def test_write_job_file(
-        self, mock_write_job_file, mock_time_event_now, operation
+        with patch.object(
+            operation, "_get_required_bytes", return_value=1000
+        ), patch.object(operation, "update_job_file") as mock_update:
+            with pytest.raises(ValueError):
+                operation._preflight(content, "ssh pg")
+
+        mock_run_remote.assert_not_called()
+        mock_update.assert_not_called()
+
+    @pytest.mark.parametrize("preflight_check", [True, False])
+    @patch.dict("os.environ", {}, clear=True)
+    @patch("pg_backup_api.server_operation.RecoveryOperation._preflight")
+    @patch("pg_backup_api.server_operation.Operation._run_subprocess")
+    @patch("pg_backup_api.server_operation.RecoveryOperation._get_args")
+    def test__run_logic_preflight_failed(
+        self,
+        mock_get_args,
+        mock_run_subprocess,
+        mock_preflight,
+        preflight_check,
+        operation,
     ):
-        """Test :meth:`RecoveryOperation.write_job_file`.
+        """Test :meth:`RecoveryOperation._run_logic`.
 
-        Ensure the underlying methods are called as expected.
+        Ensure ``barman recover`` is not run if the pre-flight check fails,
+        unless the check is disabled.
         """
-        content = {
-            "SOME": "CONTENT",
-        }
-        extended_content = {
-            "SOME": "CONTENT",
-            "operation_type": OperationType.RECOVERY.value,
-            "start_time": "SOME_TIMESTAMP",
-        }
+        mock_preflight.return_value = "SOME ERROR"
+        mock_get_args.return_value = ["SOME", "ARGUMENTS"]
 
-        with patch.object(operation, "_validate_job_content") as mock:
-            mock_time_event_now.return_value = "SOME_TIMESTAMP"
-
-            operation.write_job_file(content)
+        with patch.object(operation, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = {
+                "remote_ssh_command": "ssh pg",
+                "preflight_check": preflight_check,
+            }
+            result = operation._run_logic()
 
-            mock_time_event_now.assert_called_once()
-            mock.assert_called_once_with(extended_content)
-            mock_write_job_file.assert_called_once_with(extended_content)
+        if preflight_check:
+            assert result == ("Pre-flight check failed: SOME ERROR\n", 1)
+            mock_run_subprocess.assert_not_called()
+        else:
+            assert result == mock_run_subprocess.return_value
+            mock_preflight.assert_not_called()
 
-    def test__get_args(self, operation):
-        """Test :meth:`RecoveryOperation._get_args`.
+    @patch.dict("os.environ", {}, clear=True)
+    @patch("pg_backup_api.server_operation.RecoveryOperation._preflight")
+    @patch("pg_backup_api.server_operation.Operation._run_subprocess")
+    @patch("pg_backup_api.server_operation.RecoveryOperation._get_args")
+    def test__run_logic_retry_skips_preflight(
+        self, mock_get_args, mock_run_subprocess, mock_preflight, operation
+    ):
+        """Test :meth:`RecoveryOperation._run_logic`.
 
-        Ensure it returns the correct arguments for ``barman recover``.
+        Ensure the pre-flight check is skipped when retrying, so the files
+        copied by previous attempts are reused.
         """
-        with patch.object(operation, "read_job_file") as mock:
-            mock.return_value = {
-                "backup_id": "SOME_BACKUP_ID",
-                "destination_directory": "SOME_DESTINATION_DIRECTORY",
-                "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
-            }
+        mock_get_args.return_value = ["SOME", "ARGUMENTS"]
+        operation.attempts = [{"attempt": 1, "exit_code": 255}]
 
-            expected = [
-                operation.server.name,
-                "SOME_BACKUP_ID",
-                "SOME_DESTINATION_DIRECTORY",
-                "--remote-ssh-command",
-                "SOME_REMOTE_SSH_COMMAND",
-            ]
-            assert operation._get_args() == expected
+        with patch.object(operation, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = {"remote_ssh_command": "ssh pg"}
+            result = operation._run_logic()
+
+        assert result == mock_run_subprocess.return_value
+        mock_preflight.assert_not_called()
 
+    @pytest.mark.parametrize(
+        "content,env",
+        [
+            ({"ssh_multiplexing": True}, {}),
+            ({}, {"PG_BACKUP_API_SSH_MULTIPLEXING": "true"}),
+        ],
+    )
+    @patch("pg_backup_api.server_operation.multiplexed_ssh_command")
     @patch("pg_backup_api.server_operation.Operation._run_subprocess")
     @patch("pg_backup_api.server_operation.RecoveryOperation._get_args")
-    def test__run_logic(self, mock_get_args, mock_run_subprocess, operation):
+    def test__run_logic_ssh_multiplexing(
+        self,
+        mock_get_args,
+        mock_run_subprocess,
+        mock_multiplexed,
+        content,
+        env,
+        operation,
+    ):
         """Test :meth:`RecoveryOperation._run_logic`.
 
-        Ensure the underlying calls occur as expected.
+        Ensure ``barman recover`` is given the multiplexed SSH command when
+        enabled through the job file or the settings.
         """
-        arguments = ["SOME", "ARGUMENTS"]
-        output = ("SOME OUTPUT", 0)
+        mock_get_args.return_value = ["SOME", "ARGUMENTS"]
+        mock_ssh = mock_multiplexed.return_value.__enter__.return_value
 
-        mock_get_args.return_value = arguments
-        mock_run_subprocess.return_value = output
+        with patch.object(operation, "read_job_file") as mock_read_job:
+            mock_read_job.return_value = dict(
+                content, remote_ssh_command="ssh pg", preflight_check=False
+            )
 
-        assert operation._run_logic() == output
+            with patch.dict("os.environ", env, clear=True):
+                operation._run_logic()
 
-        mock_get_args.assert_called_once()
+        mock_multiplexed.assert_called_once_with("ssh pg")
+        mock_get_args.assert_called_once_with(mock_ssh)
         mock_run_subprocess.assert_called_once_with(
-            ["barman", "recover"] + arguments,
+            ["barman", "recover", "SOME", "ARGUMENTS"],
         )
 
 
@@ -1195,6 +3219,48 @@ class TestConfigUpdateOperation:
             expected = ['[{"SOME": "CHANGES"}]']
             assert operation._get_args() == expected
 
+    @patch("os.path.exists", Mock(return_value=False))
+    def test__get_args_merged(self, operation):
+        """Test :meth:`ConfigUpdateOperation._get_args`.
+
+        Ensure the changes of the merged operations are applied in order,
+        along with the changes of this operation.
+        """
+        operation.merged_ids = ["OP_2", "OP_3"]
+        operation.server.read_job_file.side_effect = lambda op_id: {
+            "changes": [{"SOME": op_id}] if op_id == "OP_2" else {"ONE": 1}
+        }
+
+        with patch.object(operation, "read_job_file") as mock:
+            mock.return_value = {"changes": [{"SOME": "CHANGES"}]}
+
+            assert operation._get_args() == [
+                '[{"SOME": "CHANGES"}, {"SOME": "OP_2"}, {"ONE": 1}]'
+            ]
+
+    def test__get_args_merged_cancelled(self, operation):
+        """Test :meth:`ConfigUpdateOperation._get_args`.
+
+        Ensure merged operations cancelled before the run started are left
+        out.
+        """
+        operation.merged_ids = ["OP_2", "OP_3"]
+        operation.server.get_output_file_path.side_effect = lambda op_id: op_id
+        operation.server.read_job_file.side_effect = lambda op_id: {
+            "changes": [{"SOME": op_id}]
+        }
+
+        with patch.object(operation, "read_job_file") as mock, \
+                patch("os.path.exists") as mock_exists:
+            mock.return_value = {"changes": [{"SOME": "CHANGES"}]}
+            mock_exists.side_effect = lambda path: path == "OP_2"
+
+            assert operation._get_args() == [
+                '[{"SOME": "CHANGES"}, {"SOME": "OP_3"}]'
+            ]
+
+        assert operation.merged_ids == ["OP_3"]
+
     @patch("pg_backup_api.server_operation.Operation._run_subprocess")
     @patch("pg_backup_api.server_operation.ConfigUpdateOperation._get_args")
     def test__run_logic(self, mock_get_args, mock_run_subprocess, operation):
@@ -1214,3 +3280,257 @@ class TestConfigUpdateOperation:
         mock_run_subprocess.assert_called_once_with(
             ["barman", "config-update"] + arguments,
         )
+
+
+@patch("pg_backup_api.server_operation.OperationServer", MagicMock())
+class TestPipelineOperation:
+    """Run tests for :class:`PipelineOperation`."""
+
+    @pytest.fixture
+    @patch("pg_backup_api.server_operation.OperationServer", MagicMock())
+    def operation(self):
+        """Create a :class:`PipelineOperation` instance for testing.
+
+        :return: a new instance of :class:`PipelineOperation` for testing.
+        """
+        operation = PipelineOperation(_BARMAN_SERVER)
+        operation.server.name = _BARMAN_SERVER
+        return operation
+
+    @patch.dict(
+        "os.environ", {"PG_BACKUP_API_PIPELINE_RETRY_MAX_ATTEMPTS": "3"}
+    )
+    def test__get_retry_policy(self, operation):
+        """Test :meth:`PipelineOperation._get_retry_policy`.
+
+        Ensure pipelines are never retried as a whole.
+        """
+        assert operation._get_retry_policy().max_attempts == 1
+
+    @pytest.mark.parametrize(
+        "steps,message",
+        [
+            (None, "`steps` is expected to be a non-empty list of operations"),
+            ([], "`steps` is expected to be a non-empty list of operations"),
+            (["STEP"], "Step #0: expected an object"),
+            (
+                [{"type": "pipeline"}],
+                "Step #0: `type` is expected to be one among: recovery, "
+                "config_switch, config_update",
+            ),
+            (
+                [{"type": "config_switch", "reset": True, "on_failure": "x"}],
+                "Step #0: `on_failure` is expected to be one among: stop, "
+                "continue",
+            ),
+            (
+                [
+                    {"type": "config_switch", "reset": True},
+                    {"type": "recovery"},
+                ],
+                "Step #1: Missing required arguments: backup_id, "
+                "destination_directory, remote_ssh_command",
+            ),
+        ],
+    )
+    def test__validate_job_content_invalid(self, steps, message, operation):
+        """Test :meth:`PipelineOperation._validate_job_content`.
+
+        Ensure an exception is raised if the steps are not valid.
+        """
+        with pytest.raises(MalformedContent) as exc:
+            operation._validate_job_content({"steps": steps})
+
+        assert str(exc.value) == message
+
+    def test__validate_job_content_ok(self, operation):
+        """Test :meth:`PipelineOperation._validate_job_content`.
+
+        Ensure execution is fine if all steps are valid.
+        """
+        operation._validate_job_content(
+            {
+                "steps": [
+                    {"type": "config_switch", "model_name": "SOME_MODEL"},
+                    {
+                        "type": "config_update",
+                        "changes": "SOME_CHANGES",
+                        "on_failure": "continue",
+                    },
+                    {"type": "config_switch", "reset": True},
+                ]
+            }
+        )
+
+    @patch("pg_backup_api.server_operation.Operation.time_event_now")
+    @patch("pg_backup_api.server_operation.Operation.write_job_file")
+    def test_write_job_file(
+        self, mock_write_job_file, mock_time_event_now, operation
+    ):
+        """Test :meth:`PipelineOperation.write_job_file`.
+
+        Ensure the underlying methods are called as expected.
+        """
+        content = {
+            "SOME": "CONTENT",
+        }
+        extended_content = {
+            "SOME": "CONTENT",
+            "operation_type": OperationType.PIPELINE.value,
+            "start_time": "SOME_TIMESTAMP",
+        }
+
+        with patch.object(operation, "_validate_job_content") as mock:
+            mock_time_event_now.return_value = "SOME_TIMESTAMP"
+
+            operation.write_job_file(content)
+
+            mock_time_event_now.assert_called_once()
+            mock.assert_called_once_with(extended_content)
+            mock_write_job_file.assert_called_once_with(extended_content)
+
+    def test_write_output_file(self, operation):
+        """Test :meth:`PipelineOperation.write_output_file`.
+
+        Ensure the resources are left to the steps.
+        """
+        operation.write_output_file({"SOME": "CONTENT", "resources": {}})
+
+        operation.server.write_output_file.assert_called_once_with(
+            operation.id, {"SOME": "CONTENT"}
+        )
+
+    def test_cancel(self, operation):
+        """Test :meth:`PipelineOperation.cancel`.
+
+        Ensure the running step, if any, is cancelled along with the pipeline.
+        """
+        operation.cancel()
+        assert operation.cancelled is True
+
+        operation._step = MagicMock()
+        operation.cancel()
+        operation._step.cancel.assert_called_once_with()
+
+    @pytest.mark.parametrize(
+        "step_type,server_name",
+        [
+            ("config_switch", _BARMAN_SERVER),
+            ("config_update", None),
+        ],
+    )
+    def test__create_step(self, step_type, server_name, operation):
+        """Test :meth:`PipelineOperation._create_step`.
+
+        Ensure the operation of the step is created for the right Barman
+        server or instance, pointing to the pipeline.
+        """
+        step = {"type": step_type, "SOME": "OPTION", "on_failure": "continue"}
+        mock_class = MagicMock()
+        step_types = {OperationType(step_type): mock_class}
+
+        with patch.object(operation, "STEP_TYPES", step_types):
+            assert operation._create_step(step) == mock_class.return_value
+
+        mock_class.assert_called_once_with(server_name)
+        mock_class.return_value.write_job_file.assert_called_once_with(
+            {"type": step_type, "SOME": "OPTION", "pipeline_id": operation.id}
+        )
+
+    @pytest.mark.parametrize(
+        "on_failure,run_statuses,statuses,expected_rc",
+        [
+            ("stop", ["DONE"] * 3, ["DONE"] * 3, 0),
+            ("stop", ["DONE", "FAILED"], ["DONE", "FAILED", "SKIPPED"], 1),
+            (
+                "continue",
+                ["DONE", "FAILED", "DONE"],
+                ["DONE", "FAILED", "DONE"],
+                0,
+            ),
+            (
+                "continue",
+                ["TIMED_OUT"],
+                ["TIMED_OUT", "SKIPPED", "SKIPPED"],
+                1,
+            ),
+        ],
+    )
+    @patch("pg_backup_api.server_operation.run_operation")
+    def test__run_logic(
+        self,
+        mock_run_operation,
+        on_failure,
+        run_statuses,
+        statuses,
+        expected_rc,
+        operation,
+    ):
+        """Test :meth:`PipelineOperation._run_logic`.
+
+        Ensure steps are run in order, and the remaining steps are skipped
+        once a step which should stop the pipeline does not succeed.
+        """
+        steps = [
+            {"type": "config_switch", "reset": True},
+            {
+                "type": "config_update",
+                "changes": "SOME_CHANGES",
+                "on_failure": on_failure,
+            },
+            {"type": "config_switch", "model_name": "SOME_MODEL"},
+        ]
+        step_ops = [MagicMock(id=f"OP_{i}") for i in range(len(run_statuses))]
+
+        for step_op, status in zip(step_ops, run_statuses):
+            step_op.get_status.return_value = status
+
+        with patch.object(
+            operation, "read_job_file", return_value={"steps": steps}
+        ), patch.object(
+            operation, "_create_step", side_effect=step_ops
+        ), patch.object(
+            operation, "update_job_file"
+        ) as mock_update:
+            output, retcode = operation._run_logic()
+
+        assert retcode == expected_rc
+        assert [step["status"] for step in steps] == statuses
+        assert [step.get("operation_id") for step in steps] == [
+            step_op.id for step_op in step_ops
+        ] + [None] * (3 - len(step_ops))
+        assert mock_run_operation.call_args_list == [
+            call(step_op) for step_op in step_ops
+        ]
+        mock_update.assert_called_with({"steps": steps})
+        assert output.splitlines()[0] == (
+            f"Step #0 (config_switch, operation 'OP_0'): {statuses[0]}"
+        )
+
+    @patch("pg_backup_api.server_operation.run_operation")
+    def test__run_logic_cancelled(self, mock_run_operation, operation):
+        """Test :meth:`PipelineOperation._run_logic`.
+
+        Ensure the remaining steps are skipped once the pipeline is cancelled.
+        """
+        steps = [
+            {"type": "config_switch", "reset": True, "on_failure": "continue"},
+            {"type": "config_switch", "model_name": "SOME_MODEL"},
+        ]
+        step_op = MagicMock(id="OP_0")
+        step_op.get_status.return_value = "CANCELLED"
+        mock_run_operation.side_effect = lambda _: operation.cancel()
+
+        with patch.object(
+            operation, "read_job_file", return_value={"steps": steps}
+        ), patch.object(
+            operation, "_create_step", return_value=step_op
+        ), patch.object(
+            operation, "update_job_file"
+        ):
+            _, retcode = operation._run_logic()
+
+        assert retcode == 0
+        assert operation.cancelled is True
+        assert [step["status"] for step in steps] == ["CANCELLED", "SKIPPED"]
+        mock_run_operation.assert_called_once_with(step_op)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the commands run through SSH."""
+
+import os
+import shlex
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from pg_backup_api.ssh import (
+    RemoteCommandError,
+    multiplexed_ssh_command,
+    run_remote_command,
+)
+
+
+@pytest.fixture
+def fake_ssh(tmp_path):
+    """Create a fake ``ssh`` executable, which logs its arguments.
+
+    It fails with an error message if the ``FAIL`` file exists next to it.
+
+    :return: path to the fake ``ssh`` executable.
+    """
+    ssh = tmp_path / "ssh"
+    ssh.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> {tmp_path}/calls\n'
+        f"if [ -e {tmp_path}/FAIL ]; then\n"
+        "    echo 'Connection refused' >&2\n"
+        "    exit 255\n"
+        "fi\n"
+    )
+    ssh.chmod(0o755)
+    return str(ssh)
+
+
+def _get_calls(fake_ssh):
+    """Get the arguments of each call to the fake ``ssh`` executable.
+
+    :param fake_ssh: path to the fake ``ssh`` executable.
+    :return: the arguments of each call.
+    """
+    with open(os.path.join(os.path.dirname(fake_ssh), "calls")) as fd:
+        return [line.split() for line in fd.read().splitlines()]
+
+
+def test_multiplexed_ssh_command(fake_ssh):
+    """Test :func:`multiplexed_ssh_command`.
+
+    Ensure a master connection is opened before the ``with`` block and closed
+    after it, and the yielded command uses it.
+    """
+    with multiplexed_ssh_command(f"{fake_ssh} -p 2222 postgres@pg") as cmd:
+        args = shlex.split(cmd)
+        control_path = args[2][len("ControlPath="):]
+
+        assert args == [
+            fake_ssh,
+            "-o",
+            f"ControlPath={control_path}",
+            "-p",
+            "2222",
+            "postgres@pg",
+        ]
+        assert os.path.isdir(os.path.dirname(control_path))
+        assert len(_get_calls(fake_ssh)) == 1
+
+    assert _get_calls(fake_ssh) == [
+        [
+            "-o",
+            f"ControlPath={control_path}",
+            "-o",
+            "ControlMaster=yes",
+            "-o",
+            "ControlPersist=yes",
+            "-f",
+            "-N",
+            "-p",
+            "2222",
+            "postgres@pg",
+        ],
+        [
+            "-o",
+            f"ControlPath={control_path}",
+            "-O",
+            "exit",
+            "-p",
+            "2222",
+            "postgres@pg",
+        ],
+    ]
+    assert not os.path.exists(os.path.dirname(control_path))
+
+
+@patch("pg_backup_api.ssh.log")
+def test_multiplexed_ssh_command_master_failed(mock_log, fake_ssh):
+    """Test :func:`multiplexed_ssh_command`.
+
+    Ensure the command is yielded unchanged if the master connection cannot
+    be opened.
+    """
+    open(os.path.join(os.path.dirname(fake_ssh), "FAIL"), "w").close()
+
+    with multiplexed_ssh_command(f"{fake_ssh} postgres@pg") as cmd:
+        assert cmd == f"{fake_ssh} postgres@pg"
+
+    assert len(_get_calls(fake_ssh)) == 1
+    mock_log.warning.assert_called_once_with(
+        "Could not open a master SSH connection through '%s': %s",
+        f"{fake_ssh} postgres@pg",
+        "Connection refused",
+    )
+
+
+@patch("subprocess.run")
+def test_multiplexed_ssh_command_master_timeout(mock_run):
+    """Test :func:`multiplexed_ssh_command`.
+
+    Ensure the command is yielded unchanged if the master connection is not
+    opened in time, and its control directory is removed.
+    """
+    mock_run.side_effect = subprocess.TimeoutExpired("ssh", 5)
+
+    with multiplexed_ssh_command("ssh postgres@pg", timeout=5) as cmd:
+        assert cmd == "ssh postgres@pg"
+
+    control_path = mock_run.call_args[0][0][2][len("ControlPath="):]
+    assert not os.path.exists(os.path.dirname(control_path))
+
+
+@patch("subprocess.run")
+def test_multiplexed_ssh_command_not_ssh(mock_run):
+    """Test :func:`multiplexed_ssh_command`.
+
+    Ensure commands other than ``ssh`` are yielded unchanged.
+    """
+    with multiplexed_ssh_command("my-wrapper postgres@pg") as cmd:
+        assert cmd == "my-wrapper postgres@pg"
+
+    mock_run.assert_not_called()
+
+
+def test_run_remote_command(fake_ssh):
+    """Test :func:`run_remote_command`.
+
+    Ensure the command is run through the SSH command, with a connection
+    timeout, and its output is returned.
+    """
+    assert run_remote_command(f"{fake_ssh} postgres@pg", "true", 5.5) == ""
+
+    assert _get_calls(fake_ssh) == [
+        ["-o", "ConnectTimeout=5", "postgres@pg", "true"],
+    ]
+
+
+def test_run_remote_command_failed(fake_ssh):
+    """Test :func:`run_remote_command`.
+
+    Ensure the error output and exit code are reported on failures.
+    """
+    open(os.path.join(os.path.dirname(fake_ssh), "FAIL"), "w").close()
+
+    with pytest.raises(RemoteCommandError) as exc:
+        run_remote_command(f"{fake_ssh} postgres@pg", "true", 5)
+
+    assert str(exc.value) == "Connection refused"
+    assert exc.value.returncode == 255
+
+
+@patch("subprocess.run")
+def test_run_remote_command_timeout(mock_run):
+    """Test :func:`run_remote_command`.
+
+    Ensure a timeout is reported with no exit code.
+    """
+    mock_run.side_effect = subprocess.TimeoutExpired("ssh", 0.5)
+
+    with pytest.raises(RemoteCommandError) as exc:
+        run_remote_command("ssh postgres@pg", "true", 0.5)
+
+    assert str(exc.value) == "timed out after 0.5 seconds"
+    assert exc.value.returncode is None
+    assert mock_run.call_args[0][0] == [
+        "ssh", "-o", "ConnectTimeout=1", "postgres@pg", "true"
+    ]
@@ -17,17 +17,24 @@
 # along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
 
 """Unit tests for the REST API endpoints."""
+from datetime import datetime
 from distutils.version import StrictVersion
 import json
 import sys
-from unittest.mock import Mock, MagicMock, patch
+import threading
+import time
+from unittest.mock import Mock, MagicMock, call, patch
 
 import flask
 import pytest
 
+from pg_backup_api.backup_catalog import RecoveryTargetError
+from pg_backup_api.events import append_event, encode_cursor
+from pg_backup_api.executor import QueuedOperation
 from pg_backup_api.server_operation import (
     OperationServerConfigError,
     OperationNotExists,
+    OperationType,
     MalformedContent,
 )
 
@@ -166,6 +173,7 @@ class TestUtilityController:
 
         mock_op_server.return_value.config = object()
         mock_get_status = mock_op_server.return_value.get_operation_status
+        mock_op_server.return_value.get_operation_steps.return_value = None
 
         mock_get_status.return_value = status
 
@@ -180,6 +188,34 @@ class TestUtilityController:
         ).encode()
         assert response.data == expected
 
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_get_pipeline(self, mock_op_server, client):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure the status of each step is returned for pipeline operations.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
+        steps = [
+            {"type": "config_switch", "operation_id": "OP_1", "status": "OK"},
+            {"type": "recovery", "operation_id": None, "status": "PENDING"},
+        ]
+
+        mock_op_server.return_value.get_operation_status.return_value = (
+            "IN_PROGRESS"
+        )
+        mock_op_server.return_value.get_operation_steps.return_value = steps
+
+        response = client.get(path)
+
+        mock_get_steps = mock_op_server.return_value.get_operation_steps
+        mock_get_steps.assert_called_once_with("SOME_OPERATION_ID")
+        assert response.status_code == 200
+        assert response.get_json() == {
+            "operation_id": "SOME_OPERATION_ID",
+            "status": "IN_PROGRESS",
+            "steps": steps,
+        }
+
     @patch("pg_backup_api.logic.utility_controller.OperationServer")
     def test_servers_operation_id_get_server_does_not_exist(
         self, mock_op_server, client
@@ -215,6 +251,95 @@ class TestUtilityController:
         expected = b'{"error":"404 Not Found: Resource not found"}\n'
         assert response.data == expected
 
+    @pytest.mark.parametrize(
+        "created,final_status", [(True, "DONE"), (False, "IN_PROGRESS")]
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_watcher")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_get_wait(
+        self, mock_op_server, mock_get_watcher, created, final_status, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure a ``GET`` request with ``wait`` waits for the output file of an
+        operation in progress, and returns its latest status.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID?wait=5"
+
+        mock_op_server.return_value.config = object()
+        mock_get_status = mock_op_server.return_value.get_operation_status
+        mock_op_server.return_value.get_operation_steps.return_value = None
+        mock_get_path = mock_op_server.return_value.get_output_file_path
+        mock_wait = mock_get_watcher.return_value.wait_for_file
+
+        mock_get_status.side_effect = ["IN_PROGRESS", "DONE"]
+        mock_get_path.return_value = "SOME_OUTPUT_FILE"
+        mock_wait.return_value = created
+
+        response = client.get(path)
+
+        mock_get_path.assert_called_once_with("SOME_OPERATION_ID")
+        mock_wait.assert_called_once_with("SOME_OUTPUT_FILE", 5.0)
+
+        assert response.status_code == 200
+        expected = (
+            '{"operation_id":"SOME_OPERATION_ID",'
+            f'"status":"{final_status}"}}\n'
+        ).encode()
+        assert response.data == expected
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_MAX_WAIT": "2"})
+    @patch("pg_backup_api.logic.utility_controller.get_watcher")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_get_wait_capped(
+        self, mock_op_server, mock_get_watcher, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure ``wait`` is capped to the ``MAX_WAIT`` setting, and that there
+        is no wait if the operation is already finished.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
+
+        mock_op_server.return_value.config = object()
+        mock_get_status = mock_op_server.return_value.get_operation_status
+        mock_wait = mock_get_watcher.return_value.wait_for_file
+
+        mock_get_status.return_value = "IN_PROGRESS"
+        mock_wait.return_value = False
+
+        client.get(f"{path}?wait=100")
+        mock_wait.assert_called_once_with(
+            mock_op_server.return_value.get_output_file_path.return_value, 2.0
+        )
+
+        mock_wait.reset_mock()
+        mock_get_status.return_value = "DONE"
+
+        client.get(f"{path}?wait=100")
+        mock_wait.assert_not_called()
+
+    @pytest.mark.parametrize("wait", ["-1", "nan", "SOME_WAIT"])
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_get_wait_invalid(
+        self, mock_op_server, wait, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure ``GET`` returns ``400`` if ``wait`` is not a valid number of
+        seconds.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
+
+        response = client.get(f"{path}?wait={wait}")
+
+        mock_op_server.assert_not_called()
+        assert response.status_code == 400
+        expected = (
+            f"Invalid ``wait`` &#39;{wait}&#39;, expected a number of seconds"
+        ).encode()
+        assert expected in response.data
+
     def test_servers_operation_id_get_not_allowed(self, client):
         """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
 
@@ -222,8 +347,120 @@ class TestUtilityController:
         """
         path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
         self._ensure_http_methods_not_allowed(
-            _HTTP_METHODS - {"GET"}, path, client
+            _HTTP_METHODS - {"GET", "DELETE"}, path, client
+        )
+
+    @pytest.mark.parametrize(
+        "alive,finished,forced",
+        [(True, True, False), (True, False, True), (False, None, True)],
+    )
+    @patch.dict("os.environ", {"PG_BACKUP_API_CANCEL_TIMEOUT": "5"})
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    @patch("pg_backup_api.logic.utility_controller.get_watcher")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_delete(
+        self,
+        mock_op_server,
+        mock_get_watcher,
+        mock_get_executor,
+        alive,
+        finished,
+        forced,
+        client,
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure a ``DELETE`` request signals the runner and waits for it to
+        finish, and kills the operation if the runner does not finish in time
+        or is gone.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
+
+        op_server = mock_op_server.return_value
+        op_server.get_operation_status.side_effect = [
+            "IN_PROGRESS",
+            "CANCELLED",
+        ]
+        op_server.get_output_file_path.return_value = "SOME_OUTPUT_FILE"
+        op_server.read_job_file.return_value = {"operation_type": "recovery"}
+        op_server.signal_runner.return_value = alive
+        mock_wait = mock_get_watcher.return_value.wait_for_file
+        mock_wait.return_value = finished
+
+        response = client.delete(path)
+
+        assert response.status_code == 200
+        assert response.json == {
+            "operation_id": "SOME_OPERATION_ID",
+            "status": "CANCELLED",
+        }
+
+        mock_op_server.assert_called_once_with("SOME_SERVER_NAME")
+        mock_get_executor.return_value.discard.assert_called_once_with(
+            "SOME_SERVER_NAME", "SOME_OPERATION_ID"
+        )
+
+        if alive:
+            mock_wait.assert_called_once_with("SOME_OUTPUT_FILE", 5.0)
+        else:
+            mock_wait.assert_not_called()
+
+        if forced:
+            op_server.signal_runner.assert_has_calls(
+                [
+                    call("SOME_OPERATION_ID"),
+                    call("SOME_OPERATION_ID", force=True),
+                ]
+            )
+            op_server.finish_operation.assert_called_once_with(
+                "SOME_OPERATION_ID", "CANCELLED", "Operation cancelled\n"
+            )
+        else:
+            op_server.signal_runner.assert_called_once_with(
+                "SOME_OPERATION_ID"
+            )
+            op_server.finish_operation.assert_not_called()
+
+    @pytest.mark.parametrize("status", ["DONE", "FAILED", "CANCELLED"])
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_delete_finished(
+        self, mock_op_server, status, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure ``DELETE`` returns ``409`` if the operation already finished.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
+
+        op_server = mock_op_server.return_value
+        op_server.get_operation_status.return_value = status
+
+        response = client.delete(path)
+
+        assert response.status_code == 409
+        expected = (
+            b"Operation &#39;SOME_OPERATION_ID&#39; has already finished"
         )
+        assert expected in response.data
+        op_server.signal_runner.assert_not_called()
+
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_servers_operation_id_delete_operation_does_not_exist(
+        self, mock_op_server, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure ``DELETE`` returns ``404`` if the operation doesn't exist.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations/SOME_OPERATION_ID"
+
+        mock_get_status = mock_op_server.return_value.get_operation_status
+        mock_get_status.side_effect = OperationNotExists("NOT_FOUND")
+
+        response = client.delete(path)
+        assert response.status_code == 404
+        expected = b'{"error":"404 Not Found: Resource not found"}\n'
+        assert response.data == expected
 
     @pytest.mark.parametrize("status", ["IN_PROGRESS", "DONE", "FAILED"])
     @patch("pg_backup_api.logic.utility_controller.OperationServer")
@@ -239,6 +476,7 @@ class TestUtilityController:
 
         mock_op_server.return_value.config = object()
         mock_get_status = mock_op_server.return_value.get_operation_status
+        mock_op_server.return_value.get_operation_steps.return_value = None
 
         mock_get_status.return_value = status
 
@@ -279,7 +517,265 @@ class TestUtilityController:
         """
         path = "/operations/SOME_OPERATION_ID"
         self._ensure_http_methods_not_allowed(
-            _HTTP_METHODS - {"GET"}, path, client
+            _HTTP_METHODS - {"GET", "DELETE"}, path, client
+        )
+
+    @patch("pg_backup_api.logic.utility_controller.get_executor", MagicMock())
+    @patch("pg_backup_api.logic.utility_controller.get_watcher")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_instance_operation_id_delete(
+        self, mock_op_server, mock_get_watcher, client
+    ):
+        """Test ``/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure a ``DELETE`` request cancels the instance operation.
+        """
+        path = "/operations/SOME_OPERATION_ID"
+
+        op_server = mock_op_server.return_value
+        op_server.get_operation_status.side_effect = [
+            "IN_PROGRESS",
+            "CANCELLED",
+        ]
+        op_server.read_job_file.return_value = {
+            "operation_type": "config_update"
+        }
+        op_server.signal_runner.return_value = True
+        mock_get_watcher.return_value.wait_for_file.return_value = True
+
+        response = client.delete(path)
+
+        assert response.status_code == 200
+        assert response.json == {
+            "operation_id": "SOME_OPERATION_ID",
+            "status": "CANCELLED",
+        }
+        mock_op_server.assert_called_once_with(None)
+        op_server.signal_runner.assert_called_once_with("SOME_OPERATION_ID")
+
+    @pytest.mark.parametrize(
+        "process_groups,signalled,finished",
+        [
+            ([None, None], False, True),
+            ([None, 4321], True, True),
+            ([4321], True, False),
+        ],
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_executor", MagicMock())
+    @patch("pg_backup_api.logic.utility_controller.get_watcher")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_instance_operation_id_delete_merged(
+        self,
+        mock_op_server,
+        mock_get_watcher,
+        process_groups,
+        signalled,
+        finished,
+        client,
+    ):
+        """Test ``/operations/<OPERATION_ID>`` endpoint.
+
+        Ensure a ``DELETE`` request cancels an operation merged into the run
+        of another one by itself, unless the shared subprocess already
+        started, in which case the whole run is cancelled.
+        """
+        path = "/operations/SOME_OPERATION_ID"
+
+        op_server = mock_op_server.return_value
+        op_server.get_operation_status.side_effect = [
+            "IN_PROGRESS",
+            "CANCELLED",
+        ]
+        op_server.read_job_file.side_effect = [
+            {
+                "merged_into": "SOME_LEADER_ID",
+                "runner": {"pid": 1234, "process_group": process_group},
+            }
+            for process_group in process_groups
+        ]
+        op_server.signal_runner.return_value = True
+        mock_get_watcher.return_value.wait_for_file.return_value = True
+
+        response = client.delete(path)
+
+        assert response.status_code == 200
+        assert response.json["status"] == "CANCELLED"
+
+        if signalled:
+            op_server.signal_runner.assert_called_once_with(
+                "SOME_OPERATION_ID"
+            )
+        else:
+            op_server.signal_runner.assert_not_called()
+
+        if finished:
+            op_server.finish_operation.assert_called_once_with(
+                "SOME_OPERATION_ID", "CANCELLED", "Operation cancelled\n"
+            )
+        else:
+            op_server.finish_operation.assert_not_called()
+
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_operations_status_batch_ok(self, mock_op_server, client):
+        """Test ``/operations/status:batch`` endpoint.
+
+        Ensure a ``POST`` request returns ``200`` with the status of each
+        operation, or why it could not be retrieved, and that a single
+        :class:`OperationServer` is created for each server.
+        """
+        path = "/operations/status:batch"
+        json_data = {
+            "operations": [
+                {"server_name": "SERVER_1", "operation_id": "OP_1"},
+                {"server_name": "SERVER_2", "operation_id": "OP_2"},
+                {"server_name": "SERVER_1", "operation_id": "OP_3"},
+                {"operation_id": "OP_4"},
+                {"server_name": "SERVER_3", "operation_id": "OP_5"},
+                {"server_name": "SERVER_1", "operation_id": "OP_6"},
+            ]
+        }
+
+        op_server_1, op_server_2, op_server_instance = (
+            MagicMock(),
+            MagicMock(),
+            MagicMock(),
+        )
+        op_server_1.get_operation_status.side_effect = [
+            "DONE",
+            "FAILED",
+            PermissionError("Permission denied"),
+        ]
+        op_server_2.get_operation_status.side_effect = OperationNotExists(
+            "Operation 'OP_2' does not exist"
+        )
+        op_server_instance.get_operation_status.return_value = "IN_PROGRESS"
+        mock_op_server.side_effect = [
+            op_server_1,
+            op_server_2,
+            op_server_instance,
+            OperationServerConfigError(
+                "No barman config found for 'SERVER_3'."
+            ),
+        ]
+
+        response = client.post(path, json=json_data)
+
+        assert response.status_code == 200
+        assert response.get_json() == {
+            "operations": [
+                {
+                    "server_name": "SERVER_1",
+                    "operation_id": "OP_1",
+                    "status": "DONE",
+                },
+                {
+                    "server_name": "SERVER_2",
+                    "operation_id": "OP_2",
+                    "error": "Operation 'OP_2' does not exist",
+                },
+                {
+                    "server_name": "SERVER_1",
+                    "operation_id": "OP_3",
+                    "status": "FAILED",
+                },
+                {
+                    "server_name": None,
+                    "operation_id": "OP_4",
+                    "status": "IN_PROGRESS",
+                },
+                {
+                    "server_name": "SERVER_3",
+                    "operation_id": "OP_5",
+                    "error": "No barman config found for 'SERVER_3'.",
+                },
+                {
+                    "server_name": "SERVER_1",
+                    "operation_id": "OP_6",
+                    "error": "Permission denied",
+                },
+            ]
+        }
+        mock_op_server.assert_has_calls(
+            [
+                call("SERVER_1", load_config=False),
+                call("SERVER_2", load_config=False),
+                call(None, load_config=False),
+                call("SERVER_3", load_config=False),
+            ]
+        )
+        assert mock_op_server.call_count == 4
+
+    @pytest.mark.parametrize(
+        "json_data,expected",
+        [
+            ({}, b"Request body should contain a list of ``operations``"),
+            (
+                {"operations": []},
+                b"Request body should contain a list of ``operations``",
+            ),
+            (
+                {"operations": [{"server_name": "SERVER_1"}]},
+                b"Each operation should contain an ``operation_id``",
+            ),
+            (
+                {"operations": [{"server_name": 1, "operation_id": "OP_1"}]},
+                b"``server_name`` should be a string, if given",
+            ),
+            (
+                {"operations": [{"operation_id": "../../secret"}]},
+                b"Invalid operation ID",
+            ),
+            (
+                {"operations": [{"operation_id": "OP_1\n"}]},
+                b"Invalid operation ID",
+            ),
+        ],
+    )
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_operations_status_batch_malformed(
+        self, mock_op_server, json_data, expected, client
+    ):
+        """Test ``/operations/status:batch`` endpoint.
+
+        Ensure a ``POST`` request returns ``400`` if the body is malformed.
+        """
+        response = client.post("/operations/status:batch", json=json_data)
+
+        assert response.status_code == 400
+        assert expected in response.data
+        mock_op_server.assert_not_called()
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_STATUS_BATCH_MAX_SIZE": "1"})
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_operations_status_batch_too_big(self, mock_op_server, client):
+        """Test ``/operations/status:batch`` endpoint.
+
+        Ensure a ``POST`` request returns ``400`` if too many operations are
+        requested.
+        """
+        json_data = {
+            "operations": [
+                {"operation_id": "OP_1"},
+                {"operation_id": "OP_2"},
+            ]
+        }
+
+        response = client.post("/operations/status:batch", json=json_data)
+
+        assert response.status_code == 400
+        assert b"At most 1 operations can be queried at once" in response.data
+        mock_op_server.assert_not_called()
+
+    def test_operations_status_batch_not_allowed(self, client):
+        """Test ``/operations/status:batch`` endpoint.
+
+        Ensure all other HTTP request methods return an error.
+        """
+        path = "/operations/status:batch"
+        # ``GET`` and ``DELETE`` requests are routed to
+        # ``/operations/<OPERATION_ID>``
+        self._ensure_http_methods_not_allowed(
+            _HTTP_METHODS - {"GET", "POST", "DELETE"}, path, client
         )
 
     @patch("pg_backup_api.logic.utility_controller.OperationServer")
@@ -306,7 +802,7 @@ class TestUtilityController:
         response = client.get(path)
 
         mock_op_server.assert_called_once_with("SOME_SERVER_NAME")
-        mock_get_ops.assert_called_once_with()
+        mock_get_ops.assert_called_once_with(since=None, until=None)
 
         assert response.status_code == 200
         data = json.dumps({"operations": mock_get_ops.return_value})
@@ -314,6 +810,30 @@ class TestUtilityController:
         expected = data.encode()
         assert response.data == expected
 
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_server_operation_get_resources(self, mock_op_server, client):
+        """Test :func:`server_operation_get`.
+
+        Ensure the resources of the operations are aggregated on request.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations?resources=true"
+
+        mock_op_server.return_value.config = object()
+        mock_get_ops = mock_op_server.return_value.get_operations_list
+        mock_get_ops.return_value = [{"id": "SOME_ID", "type": "SOME_TYPE"}]
+        mock_get_totals = mock_op_server.return_value.get_resource_totals
+        mock_get_totals.return_value = {"SOME_TYPE": {"count": 1}}
+
+        response = client.get(path)
+
+        mock_get_totals.assert_called_once_with(since=None, until=None)
+
+        assert response.status_code == 200
+        assert response.json == {
+            "operations": [{"id": "SOME_ID", "type": "SOME_TYPE"}],
+            "resources": {"SOME_TYPE": {"count": 1}},
+        }
+
     @patch("pg_backup_api.logic.utility_controller.OperationServer")
     def test_server_operation_get_server_does_not_exist(
         self, mock_op_server, client
@@ -335,6 +855,41 @@ class TestUtilityController:
         assert response.status_code == 404
         assert response.data == b'{"error":"404 Not Found: SOME_ISSUE"}\n'
 
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_server_operation_get_date_range(self, mock_op_server, client):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure ``since`` and ``until`` query string arguments are used to
+        filter the operations.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations"
+        path += "?since=2026-10-01&until=2026-10-19"
+
+        mock_get_ops = mock_op_server.return_value.get_operations_list
+        mock_get_ops.return_value = []
+
+        response = client.get(path)
+
+        assert response.status_code == 200
+        mock_get_ops.assert_called_once_with(
+            since=datetime(2026, 10, 1), until=datetime(2026, 10, 19)
+        )
+
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    def test_server_operation_get_invalid_date(self, mock_op_server, client):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure ``GET`` request returns ``400`` if a date is invalid.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations?since=yesterday"
+
+        response = client.get(path)
+
+        mock_op_server.assert_not_called()
+        assert response.status_code == 400
+        expected = b"Invalid ``since`` date &#39;yesterday&#39;"
+        assert expected in response.data
+
     def test_server_operation_post_not_json(self, client):
         """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
 
@@ -366,14 +921,14 @@ class TestUtilityController:
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_empty_json(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -397,22 +952,22 @@ class TestUtilityController:
         mock_get_server.assert_not_called()
         mock_op_type.assert_not_called()
         mock_parse_id.assert_not_called()
-        mock_server.assert_not_called()
+        mock_get_pool.return_value.server.assert_not_called()
         mock_rec_op.assert_not_called()
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_server_rec_op_does_not_exist(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -435,9 +990,9 @@ class TestUtilityController:
         mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
         mock_op_type.assert_not_called()
         mock_parse_id.assert_not_called()
-        mock_server.assert_not_called()
+        mock_get_pool.return_value.server.assert_not_called()
         mock_rec_op.assert_not_called()
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
         assert response.status_code == 404
         expected = (
@@ -451,14 +1006,14 @@ class TestUtilityController:
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_rec_op_backup_id_missing(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -481,9 +1036,9 @@ class TestUtilityController:
         mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
         mock_op_type.assert_called_once_with("recovery")
         mock_parse_id.assert_not_called()
-        mock_server.assert_not_called()
+        mock_get_pool.return_value.server.assert_not_called()
         mock_rec_op.assert_not_called()
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
         assert response.status_code == 400
         assert b"Request body is missing ``backup_id``" in response.data
@@ -492,14 +1047,14 @@ class TestUtilityController:
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_rec_op_backup_does_not_exist(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -523,12 +1078,15 @@ class TestUtilityController:
 
         mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
         mock_op_type.assert_called_once_with("recovery")
-        mock_server.assert_called_once_with(mock_get_server.return_value)
+        mock_get_pool.return_value.server.assert_called_once_with(
+            mock_get_server.return_value
+        )
+        mock_server = mock_get_pool.return_value.server.return_value
         mock_parse_id.assert_called_once_with(
-            mock_server.return_value, "SOME_BACKUP_ID"
+            mock_server.__enter__.return_value, "SOME_BACKUP_ID"
         )
         mock_rec_op.assert_not_called()
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
         assert response.status_code == 404
         expected = (
@@ -537,18 +1095,22 @@ class TestUtilityController:
         )
         assert response.data == expected
 
+    @patch(
+        "pg_backup_api.logic.utility_controller.check_recovery_target",
+        Mock(),
+    )
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_rec_op_missing_options(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -575,13 +1137,16 @@ class TestUtilityController:
 
         mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
         mock_op_type.assert_called_once_with("recovery")
-        mock_server.assert_called_once_with(mock_get_server.return_value)
+        mock_get_pool.return_value.server.assert_called_once_with(
+            mock_get_server.return_value
+        )
+        mock_server = mock_get_pool.return_value.server.return_value
         mock_parse_id.assert_called_once_with(
-            mock_server.return_value, "SOME_BACKUP_ID"
+            mock_server.__enter__.return_value, "SOME_BACKUP_ID"
         )
         mock_rec_op.assert_called_once_with("SOME_SERVER_NAME")
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
         assert response.status_code == 400
         expected = b"Make sure all options/arguments are met and try again"
@@ -591,9 +1156,14 @@ class TestUtilityController:
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.ConfigSwitchOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_cs_op_missing_options(
-        self, mock_popen, mock_cs_op, mock_op_type, mock_get_server, client
+        self,
+        mock_get_executor,
+        mock_cs_op,
+        mock_op_type,
+        mock_get_server,
+        client,
     ):
         """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
 
@@ -616,24 +1186,28 @@ class TestUtilityController:
         mock_op_type.assert_called_once_with("config_switch")
         mock_cs_op.assert_called_once_with("SOME_SERVER_NAME")
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
         assert response.status_code == 400
         expected = b"Make sure all options/arguments are met and try again"
         assert expected in response.data
 
+    @patch(
+        "pg_backup_api.logic.utility_controller.check_recovery_target",
+        Mock(),
+    )
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_rec_op_ok(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -659,33 +1233,109 @@ class TestUtilityController:
         mock_write_job = mock_rec_op.return_value.write_job_file
         mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
         mock_op_type.assert_called_once_with("recovery")
-        mock_server.assert_called_once_with(mock_get_server.return_value)
+        mock_get_pool.return_value.server.assert_called_once_with(
+            mock_get_server.return_value
+        )
+        mock_server = mock_get_pool.return_value.server.return_value
         mock_parse_id.assert_called_once_with(
-            mock_server.return_value, "SOME_BACKUP_ID"
+            mock_server.__enter__.return_value, "SOME_BACKUP_ID"
         )
         mock_rec_op.assert_called_once_with("SOME_SERVER_NAME")
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_called_once_with(
-            [
-                "pg-backup-api",
-                "recovery",
-                "--server-name",
-                "SOME_SERVER_NAME",
-                "--operation-id",
-                "SOME_OP_ID",
-            ]
-        )
+        mock_submit = mock_get_executor.return_value.submit
+        mock_submit.assert_called_once()
+        queued_op = mock_submit.call_args[0][0]
+        assert queued_op.cmd == [
+            "pg-backup-api",
+            "recovery",
+            "--server-name",
+            "SOME_SERVER_NAME",
+            "--operation-id",
+            "SOME_OP_ID",
+        ]
+        assert queued_op.priority == mock_rec_op.return_value.priority
 
         assert response.status_code == 202
         assert response.data == b'{"operation_id":"SOME_OP_ID"}\n'
 
+    @patch("pg_backup_api.logic.utility_controller.check_recovery_target")
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_server_operation_post_rec_op_target_unreachable(
+        self,
+        mock_get_executor,
+        mock_get_pool,
+        mock_parse_id,
+        mock_get_server,
+        mock_check,
+        client,
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure ``POST`` request returns ``400`` if the recovery cannot reach
+        its target, without starting the subprocess.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations"
+        json_data = {
+            "type": "recovery",
+            "backup_id": "SOME_BACKUP_ID",
+            "destination_directory": "SOME_DESTINATION_DIRECTORY",
+            "remote_ssh_command": "SOME_REMOTE_SSH_COMMAND",
+            "target_lsn": "0/5000001",
+        }
+
+        mock_check.side_effect = RecoveryTargetError(
+            "Target LSN 0/5000001 follows the end LSN 0/5000000 of the last "
+            "archived WAL file"
+        )
+
+        response = client.post(path, json=json_data)
+
+        mock_server = mock_get_pool.return_value.server.return_value
+        mock_parse_id.assert_called_once_with(
+            mock_server.__enter__.return_value, "SOME_BACKUP_ID"
+        )
+        mock_get_pool.return_value.wal_index.assert_called_once_with(
+            mock_server.__enter__.return_value
+        )
+        mock_check.assert_called_once_with(
+            mock_parse_id.return_value,
+            mock_get_pool.return_value.wal_index.return_value,
+            target_time=None,
+            target_lsn=0x5000001,
+            target_tli=None,
+        )
+        mock_get_executor.assert_not_called()
+
+        assert response.status_code == 400
+        assert b"follows the end LSN 0/5000000" in response.data
+
+        # Invalid target options are rejected before resolving the backup
+        mock_parse_id.reset_mock()
+        json_data["target_lsn"] = "NOT AN LSN"
+
+        response = client.post(path, json=json_data)
+
+        mock_parse_id.assert_not_called()
+        mock_get_executor.assert_not_called()
+
+        assert response.status_code == 400
+        assert b"Invalid `target_lsn`: `NOT AN LSN`" in response.data
+
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.ConfigSwitchOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_cs_op_ok(
-        self, mock_popen, mock_cs_op, mock_op_type, mock_get_server, client
+        self,
+        mock_get_executor,
+        mock_cs_op,
+        mock_op_type,
+        mock_get_server,
+        client,
     ):
         """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
 
@@ -708,32 +1358,38 @@ class TestUtilityController:
         mock_op_type.assert_called_once_with("config_switch")
         mock_cs_op.assert_called_once_with("SOME_SERVER_NAME")
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_called_once_with(
-            [
-                "pg-backup-api",
-                "config-switch",
-                "--server-name",
-                "SOME_SERVER_NAME",
-                "--operation-id",
-                "SOME_OP_ID",
-            ]
-        )
+        mock_submit = mock_get_executor.return_value.submit
+        mock_submit.assert_called_once()
+        queued_op = mock_submit.call_args[0][0]
+        assert queued_op.cmd == [
+            "pg-backup-api",
+            "config-switch",
+            "--server-name",
+            "SOME_SERVER_NAME",
+            "--operation-id",
+            "SOME_OP_ID",
+        ]
+        assert queued_op.priority == mock_cs_op.return_value.priority
 
         assert response.status_code == 202
         assert response.data == b'{"operation_id":"SOME_OP_ID"}\n'
 
+    @patch(
+        "pg_backup_api.logic.utility_controller.check_recovery_target",
+        Mock(),
+    )
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
-    @patch("pg_backup_api.logic.utility_controller.Server")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
     @patch("pg_backup_api.logic.utility_controller.RecoveryOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_server_operation_post_ok_type_missing(
         self,
-        mock_popen,
+        mock_get_executor,
         mock_rec_op,
-        mock_server,
+        mock_get_pool,
         mock_parse_id,
         mock_op_type,
         mock_get_server,
@@ -759,22 +1415,27 @@ class TestUtilityController:
         mock_write_job = mock_rec_op.return_value.write_job_file
         mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
         mock_op_type.assert_called_once_with("recovery")
-        mock_server.assert_called_once_with(mock_get_server.return_value)
+        mock_get_pool.return_value.server.assert_called_once_with(
+            mock_get_server.return_value
+        )
+        mock_server = mock_get_pool.return_value.server.return_value
         mock_parse_id.assert_called_once_with(
-            mock_server.return_value, "SOME_BACKUP_ID"
+            mock_server.__enter__.return_value, "SOME_BACKUP_ID"
         )
         mock_rec_op.assert_called_once_with("SOME_SERVER_NAME")
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_called_once_with(
-            [
-                "pg-backup-api",
-                "recovery",
-                "--server-name",
-                "SOME_SERVER_NAME",
-                "--operation-id",
-                "SOME_OP_ID",
-            ]
-        )
+        mock_submit = mock_get_executor.return_value.submit
+        mock_submit.assert_called_once()
+        queued_op = mock_submit.call_args[0][0]
+        assert queued_op.cmd == [
+            "pg-backup-api",
+            "recovery",
+            "--server-name",
+            "SOME_SERVER_NAME",
+            "--operation-id",
+            "SOME_OP_ID",
+        ]
+        assert queued_op.priority == mock_rec_op.return_value.priority
 
         assert response.status_code == 202
         assert response.data == b'{"operation_id":"SOME_OP_ID"}\n'
@@ -790,6 +1451,302 @@ class TestUtilityController:
             _HTTP_METHODS - {"GET", "POST"}, path, client
         )
 
+    @patch(
+        "pg_backup_api.logic.utility_controller.check_recovery_target",
+        Mock(),
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
+    def test_operations_batch_ok(
+        self,
+        mock_get_pool,
+        mock_parse_id,
+        mock_get_server,
+        mock_get_executor,
+        client,
+    ):
+        """Test ``/operations:batch`` endpoint.
+
+        Ensure ``POST`` request returns ``202`` and the created operations,
+        and that they are queued in the executor.
+        """
+        path = "/operations:batch"
+        json_data = {
+            "operations": [
+                {
+                    "server_name": "SERVER_1",
+                    "type": "recovery",
+                    "backup_id": "latest",
+                    "destination_directory": "/SOME/DIR",
+                    "remote_ssh_command": "ssh SOME_HOST",
+                },
+                {
+                    "server_name": "SERVER_2",
+                    "type": "config_switch",
+                    "model_name": "SOME_MODEL",
+                },
+                {"type": "config_update", "changes": [{"SOME": "CHANGE"}]},
+            ]
+        }
+
+        mock_ops = {
+            OperationType.RECOVERY: MagicMock(),
+            OperationType.CONFIG_SWITCH: MagicMock(),
+            OperationType.CONFIG_UPDATE: MagicMock(),
+        }
+        for op_type, mock_op in mock_ops.items():
+            mock_op.return_value.id = f"{op_type.value}_ID"
+
+        with patch.dict(
+            "pg_backup_api.logic.utility_controller._SERVER_OPERATIONS",
+            {
+                OperationType.RECOVERY: mock_ops[OperationType.RECOVERY],
+                OperationType.CONFIG_SWITCH: mock_ops[
+                    OperationType.CONFIG_SWITCH
+                ],
+            },
+        ), patch.dict(
+            "pg_backup_api.logic.utility_controller._INSTANCE_OPERATIONS",
+            {
+                OperationType.CONFIG_UPDATE: mock_ops[
+                    OperationType.CONFIG_UPDATE
+                ]
+            },
+        ):
+            response = client.post(path, json=json_data)
+
+        assert response.status_code == 202
+        assert response.get_json() == {
+            "operations": [
+                {"server_name": "SERVER_1", "operation_id": "recovery_ID"},
+                {
+                    "server_name": "SERVER_2",
+                    "operation_id": "config_switch_ID",
+                },
+                {"server_name": None, "operation_id": "config_update_ID"},
+            ]
+        }
+
+        mock_server = mock_get_pool.return_value.server.return_value
+        mock_parse_id.assert_called_once_with(
+            mock_server.__enter__.return_value, "latest"
+        )
+        mock_ops[OperationType.RECOVERY].assert_called_once_with(
+            "SERVER_1", load_config=False
+        )
+        mock_ops[OperationType.CONFIG_UPDATE].assert_called_once_with(
+            None, load_config=False
+        )
+        mock_write = mock_ops[OperationType.CONFIG_SWITCH].return_value
+        mock_write.write_job_file.assert_called_once_with(
+            {"type": "config_switch", "model_name": "SOME_MODEL"}
+        )
+
+        mock_submit = mock_get_executor.return_value.submit
+        assert mock_submit.call_count == 3
+        queued = [c.args[0] for c in mock_submit.call_args_list]
+        assert [q.priority for q in queued] == [
+            mock_ops[op_type].return_value.priority
+            for op_type in (
+                OperationType.RECOVERY,
+                OperationType.CONFIG_SWITCH,
+                OperationType.CONFIG_UPDATE,
+            )
+        ]
+        assert [q.cmd for q in queued] == [
+            [
+                "pg-backup-api",
+                "recovery",
+                "--server-name",
+                "SERVER_1",
+                "--operation-id",
+                "recovery_ID",
+            ],
+            [
+                "pg-backup-api",
+                "config-switch",
+                "--server-name",
+                "SERVER_2",
+                "--operation-id",
+                "config_switch_ID",
+            ],
+            [
+                "pg-backup-api",
+                "config-update",
+                "--operation-id",
+                "config_update_ID",
+            ],
+        ]
+
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_operations_batch_write_error(self, mock_get_executor, client):
+        """Test ``/operations:batch`` endpoint.
+
+        Ensure the job files already written are removed, and nothing is
+        queued, if writing a job file of the batch fails.
+        """
+        path = "/operations:batch"
+        item = {"type": "config_update", "changes": []}
+        json_data = {"operations": [item, item, item]}
+
+        mock_op = MagicMock()
+        created = [MagicMock(id="OP_1"), MagicMock(id="OP_2"), MagicMock()]
+        created[2].write_job_file.side_effect = OSError("SOME_ERROR")
+        mock_op.side_effect = created
+
+        with patch.dict(
+            "pg_backup_api.logic.utility_controller._INSTANCE_OPERATIONS",
+            {OperationType.CONFIG_UPDATE: mock_op},
+        ), pytest.raises(OSError, match="SOME_ERROR"):
+            client.post(path, json=json_data)
+
+        created[0].server.remove_job_file.assert_called_once_with("OP_1")
+        created[1].server.remove_job_file.assert_called_once_with("OP_2")
+        created[2].server.remove_job_file.assert_not_called()
+        mock_get_executor.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "item,server_exists,backup_exists,status_code,expected",
+        [
+            ("NOT_AN_OBJECT", True, True, 400, b"expected an object"),
+            (
+                {"server_name": "SERVER_1", "type": "config_update"},
+                True,
+                True,
+                400,
+                b"&#39;config_update&#39; operations are not valid for "
+                b"servers",
+            ),
+            (
+                {"type": "recovery"},
+                True,
+                True,
+                400,
+                b"&#39;recovery&#39; operations are not valid for the "
+                b"Barman instance",
+            ),
+            (
+                {"server_name": "SERVER_1", "type": "SOME_TYPE"},
+                True,
+                True,
+                400,
+                b"invalid operation type &#39;SOME_TYPE&#39;",
+            ),
+            (
+                {"server_name": "SERVER_1", "model_name": "SOME_MODEL"},
+                True,
+                True,
+                400,
+                b"missing ``backup_id``",
+            ),
+            (
+                {"server_name": "SERVER_1", "type": "config_switch"},
+                True,
+                True,
+                400,
+                b"One among the following arguments must be specified",
+            ),
+            (
+                {"type": "config_update", "changes": [], "priority": 500},
+                True,
+                True,
+                400,
+                b"`priority` is expected to be an integer between 0 and 100",
+            ),
+            (
+                {"server_name": "SERVER_1", "type": "config_switch"},
+                False,
+                True,
+                404,
+                b"Server 'SERVER_1' does not exist",
+            ),
+            (
+                {"server_name": "SERVER_1", "backup_id": "SOME_BACKUP_ID"},
+                True,
+                False,
+                404,
+                b"Backup 'SOME_BACKUP_ID' does not exist",
+            ),
+        ],
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
+    @patch(
+        "pg_backup_api.logic.utility_controller.get_server_pool", MagicMock()
+    )
+    def test_operations_batch_invalid(
+        self,
+        mock_parse_id,
+        mock_get_server,
+        mock_get_executor,
+        item,
+        server_exists,
+        backup_exists,
+        status_code,
+        expected,
+        client,
+    ):
+        """Test ``/operations:batch`` endpoint.
+
+        Ensure ``POST`` request fails, and nothing is created, if any of the
+        requested operations is invalid.
+        """
+        path = "/operations:batch"
+        valid = {"type": "config_update", "changes": []}
+        json_data = {"operations": [valid, item]}
+
+        mock_get_server.return_value = object() if server_exists else None
+        mock_parse_id.return_value = object() if backup_exists else None
+
+        with patch(
+            "pg_backup_api.server_operation.OperationServer"
+        ) as mock_op_server:
+            response = client.post(path, json=json_data)
+
+        assert response.status_code == status_code
+        assert b"Operation #1: " + expected in response.data
+        mock_op_server.assert_not_called()
+        mock_get_executor.assert_not_called()
+
+    @patch.dict("os.environ", {"PG_BACKUP_API_SUBMIT_BATCH_MAX_SIZE": "1"})
+    def test_operations_batch_too_big(self, client):
+        """Test ``/operations:batch`` endpoint.
+
+        Ensure ``POST`` request returns ``400`` if too many operations are
+        requested.
+        """
+        json_data = {"operations": [{}, {}]}
+
+        response = client.post("/operations:batch", json=json_data)
+
+        assert response.status_code == 400
+        assert b"At most 1 operations can be created at once" in response.data
+
+    @pytest.mark.parametrize("json_data", [{}, {"operations": "SOME"}])
+    def test_operations_batch_malformed(self, json_data, client):
+        """Test ``/operations:batch`` endpoint.
+
+        Ensure ``POST`` request returns ``400`` if the body has no list of
+        operations.
+        """
+        response = client.post("/operations:batch", json=json_data)
+
+        assert response.status_code == 400
+        expected = b"Request body should contain a list of ``operations``"
+        assert expected in response.data
+
+    def test_operations_batch_not_allowed(self, client):
+        """Test ``/operations:batch`` endpoint.
+
+        Ensure all other HTTP request methods return an error.
+        """
+        self._ensure_http_methods_not_allowed(
+            _HTTP_METHODS - {"POST"}, "/operations:batch", client
+        )
+
     @patch("pg_backup_api.logic.utility_controller.OperationServer")
     def test_instance_operation_get_ok(self, mock_op_server, client):
         """Test ``/operations`` endpoint.
@@ -814,7 +1771,7 @@ class TestUtilityController:
         response = client.get(path)
 
         mock_op_server.assert_called_once_with(None)
-        mock_get_ops.assert_called_once_with()
+        mock_get_ops.assert_called_once_with(since=None, until=None)
 
         assert response.status_code == 200
         data = json.dumps({"operations": mock_get_ops.return_value})
@@ -851,9 +1808,9 @@ class TestUtilityController:
 
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.OperationType")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_instance_operation_post_empty_json(
-        self, mock_popen, mock_op_type, client
+        self, mock_get_executor, mock_op_type, client
     ):
         """Test ``/operations`` endpoint.
 
@@ -868,14 +1825,14 @@ class TestUtilityController:
         assert expected in response.data
 
         mock_op_type.assert_not_called()
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.ConfigUpdateOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_instance_operation_post_cu_op_missing_options(
-        self, mock_popen, mock_cu_op, mock_op_type, client
+        self, mock_get_executor, mock_cu_op, mock_op_type, client
     ):
         """Test ``operations`` endpoint.
 
@@ -897,7 +1854,7 @@ class TestUtilityController:
         mock_op_type.assert_called_once_with("config_update")
         mock_cu_op.assert_called_once_with(None)
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_not_called()
+        mock_get_executor.assert_not_called()
 
         assert response.status_code == 400
         expected = b"Make sure all options/arguments are met and try again"
@@ -906,9 +1863,9 @@ class TestUtilityController:
     @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
     @patch("pg_backup_api.logic.utility_controller.OperationType")
     @patch("pg_backup_api.logic.utility_controller.ConfigUpdateOperation")
-    @patch("subprocess.Popen")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
     def test_instance_operation_post_cu_ok(
-        self, mock_popen, mock_cu_op, mock_op_type, client
+        self, mock_get_executor, mock_cu_op, mock_op_type, client
     ):
         """Test ``operations`` endpoint.
 
@@ -931,13 +1888,265 @@ class TestUtilityController:
         mock_op_type.assert_called_once_with("config_update")
         mock_cu_op.assert_called_once_with(None)
         mock_write_job.assert_called_once_with(json_data)
-        mock_popen.assert_called_once_with(
-            ["pg-backup-api", "config-update", "--operation-id", "SOME_OP_ID"]
+        mock_submit = mock_get_executor.return_value.submit
+        mock_submit.assert_called_once()
+        queued_op = mock_submit.call_args[0][0]
+        assert queued_op.cmd == [
+            "pg-backup-api",
+            "config-update",
+            "--operation-id",
+            "SOME_OP_ID",
+        ]
+        assert queued_op.priority == mock_cu_op.return_value.priority
+
+        assert response.status_code == 202
+        assert response.data == b'{"operation_id":"SOME_OP_ID"}\n'
+
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    @patch("pg_backup_api.logic.utility_controller.ConfigSwitchOperation")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_server_operation_post_cs_op_supersedes(
+        self,
+        mock_get_executor,
+        mock_cs_op,
+        mock_op_server,
+        mock_get_server,
+        client,
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure the config switch operations superseded by the new one are
+        recorded as ``SUPERSEDED``, pointing to it.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations"
+        json_data = {"type": "config_switch", "model_name": "SOME_MODEL"}
+        mock_cs_op.return_value.id = "NEW_OP_ID"
+        mock_get_executor.return_value.submit.return_value = [
+            QueuedOperation(
+                "SOME_SERVER_NAME",
+                "OLD_OP_ID",
+                OperationType.CONFIG_SWITCH,
+                ["SOME", "CMD"],
+            )
+        ]
+
+        response = client.post(path, json=json_data)
+
+        assert response.status_code == 202
+        assert response.get_json() == {"operation_id": "NEW_OP_ID"}
+        mock_op_server.assert_called_once_with(
+            "SOME_SERVER_NAME", load_config=False
+        )
+        mock_op_server.return_value.finish_operation.assert_called_once_with(
+            "OLD_OP_ID",
+            "SUPERSEDED",
+            "Operation superseded by 'NEW_OP_ID'\n",
+            {"superseded_by": "NEW_OP_ID"},
+        )
+
+    @patch("pg_backup_api.logic.utility_controller.OperationServer", Mock())
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller._check_recovery")
+    @patch("pg_backup_api.logic.utility_controller.PipelineOperation")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_server_operation_post_pipeline_ok(
+        self,
+        mock_get_executor,
+        mock_pipeline_op,
+        mock_check_recovery,
+        mock_get_server,
+        client,
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure ``POST`` request returns ``202`` if everything is ok when
+        requesting a pipeline operation, that recovery steps are checked, and
+        that the subprocess is started.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations"
+        json_data = {
+            "type": "pipeline",
+            "steps": [
+                {"type": "config_switch", "model_name": "SOME_MODEL"},
+                {"type": "recovery", "backup_id": "SOME_BACKUP_ID"},
+                {"type": "config_switch", "reset": True},
+            ],
+        }
+
+        mock_pipeline_op.return_value.id = "SOME_OP_ID"
+
+        response = client.post(path, json=json_data)
+
+        mock_validate = mock_pipeline_op._validate_job_content
+        mock_validate.assert_called_once_with(json_data)
+        mock_check_recovery.assert_called_once_with(
+            mock_get_server.return_value, json_data["steps"][1], "Step #1: "
         )
+        mock_pipeline_op.assert_called_once_with("SOME_SERVER_NAME")
+        mock_write_job = mock_pipeline_op.return_value.write_job_file
+        mock_write_job.assert_called_once_with(json_data)
+        mock_submit = mock_get_executor.return_value.submit
+        mock_submit.assert_called_once()
+        queued_op = mock_submit.call_args[0][0]
+        assert queued_op.operation_type == OperationType.PIPELINE
+        assert queued_op.cmd == [
+            "pg-backup-api",
+            "pipeline",
+            "--server-name",
+            "SOME_SERVER_NAME",
+            "--operation-id",
+            "SOME_OP_ID",
+        ]
 
         assert response.status_code == 202
         assert response.data == b'{"operation_id":"SOME_OP_ID"}\n'
 
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_server_operation_post_pipeline_invalid(
+        self, mock_get_executor, mock_get_server, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure ``POST`` request returns ``400`` if any step of a pipeline
+        operation is invalid, without creating it.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations"
+        json_data = {
+            "type": "pipeline",
+            "steps": [{"type": "config_switch"}],
+        }
+
+        response = client.post(path, json=json_data)
+
+        assert response.status_code == 400
+        expected = (
+            b"Step #0: One among the following arguments must be specified: "
+            b"model_name, reset"
+        )
+        assert expected in response.data
+        mock_get_executor.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "headers,json_data",
+        [
+            (
+                {"Idempotency-Key": "SOME_KEY"},
+                {"type": "config_switch", "model_name": "SOME_MODEL"},
+            ),
+            (
+                {},
+                {
+                    "type": "config_switch",
+                    "model_name": "SOME_MODEL",
+                    "idempotency_key": "SOME_KEY",
+                },
+            ),
+        ],
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    @patch("pg_backup_api.logic.utility_controller.ConfigSwitchOperation")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_server_operation_post_idempotency_key_replayed(
+        self,
+        mock_get_executor,
+        mock_cs_op,
+        mock_op_server,
+        mock_get_server,
+        headers,
+        json_data,
+        client,
+    ):
+        """Test ``/servers/<SERVER_NAME>/operations`` endpoint.
+
+        Ensure a ``POST`` request replayed with the same idempotency key
+        returns the original operation, without creating nor queueing one.
+        """
+        path = "/servers/SOME_SERVER_NAME/operations"
+        mock_get_op = mock_op_server.return_value.get_idempotent_operation
+        mock_get_op.return_value = "ORIGINAL_OP_ID"
+
+        response = client.post(path, json=json_data, headers=headers)
+
+        assert response.status_code == 202
+        assert response.get_json() == {"operation_id": "ORIGINAL_OP_ID"}
+        mock_op_server.assert_called_once_with(
+            "SOME_SERVER_NAME", load_config=False
+        )
+        mock_get_op.assert_called_once_with("SOME_KEY")
+        mock_cs_op.assert_not_called()
+        mock_get_executor.assert_not_called()
+
+    @pytest.mark.parametrize("winner", ["SOME_OP_ID", "OTHER_OP_ID"])
+    @patch("pg_backup_api.logic.utility_controller.OperationServer")
+    @patch("pg_backup_api.logic.utility_controller.ConfigUpdateOperation")
+    @patch("pg_backup_api.logic.utility_controller.get_executor")
+    def test_instance_operation_post_idempotency_key_new(
+        self, mock_get_executor, mock_cu_op, mock_op_server, winner, client
+    ):
+        """Test ``/operations`` endpoint.
+
+        Ensure a ``POST`` request with a new idempotency key creates and
+        queues the operation, recording the key, unless a concurrent request
+        with the same key won the race, in which case the operation is
+        withdrawn.
+        """
+        path = "/operations"
+        json_data = {"type": "config_update", "changes": []}
+        mock_get_op = mock_op_server.return_value.get_idempotent_operation
+        mock_get_op.return_value = None
+        operation = mock_cu_op.return_value
+        operation.id = "SOME_OP_ID"
+        operation.server.record_idempotency_key.return_value = winner
+
+        response = client.post(
+            path, json=json_data, headers={"Idempotency-Key": "SOME_KEY"}
+        )
+
+        assert response.status_code == 202
+        assert response.get_json() == {"operation_id": winner}
+        operation.write_job_file.assert_called_once_with(
+            {
+                "type": "config_update",
+                "changes": [],
+                "idempotency_key": "SOME_KEY",
+            }
+        )
+        operation.server.record_idempotency_key.assert_called_once_with(
+            "SOME_KEY", "SOME_OP_ID"
+        )
+        mock_submit = mock_get_executor.return_value.submit
+
+        if winner == "SOME_OP_ID":
+            operation.server.remove_job_file.assert_not_called()
+            mock_submit.assert_called_once()
+        else:
+            operation.server.remove_job_file.assert_called_once_with(
+                "SOME_OP_ID"
+            )
+            mock_submit.assert_not_called()
+
+    @pytest.mark.parametrize("key", ["", "K" * 256, 123])
+    @patch("pg_backup_api.logic.utility_controller.ConfigUpdateOperation")
+    def test_instance_operation_post_idempotency_key_invalid(
+        self, mock_cu_op, key, client
+    ):
+        """Test ``/operations`` endpoint.
+
+        Ensure ``POST`` request returns ``400`` if the idempotency key is not
+        a string of 1 to 255 characters.
+        """
+        path = "/operations"
+        json_data = {"type": "config_update", "idempotency_key": key}
+
+        response = client.post(path, json=json_data)
+
+        assert response.status_code == 400
+        assert b"The idempotency key should be a string" in response.data
+        mock_cu_op.assert_not_called()
+
     def test_instance_operation_not_allowed(self, client):
         """Test ``/operations`` endpoint.
 
@@ -948,3 +2157,219 @@ class TestUtilityController:
         self._ensure_http_methods_not_allowed(
             _HTTP_METHODS - {"GET", "POST"}, path, client
         )
+
+    @patch("pg_backup_api.logic.utility_controller.get_events_files")
+    def test_events_get(self, mock_get_files, client, tmp_path):
+        """Test ``/events`` endpoint.
+
+        Ensure ``GET`` streams the logged events as server-sent events, each
+        one with the cursor to resume right after it.
+        """
+        files = {
+            "": str(tmp_path / "instance.jsonl"),
+            "SERVER_1": str(tmp_path / "server.jsonl"),
+        }
+        mock_get_files.return_value = files
+
+        append_event(files[""], {"operation_id": "OP_1"})
+        append_event(files["SERVER_1"], {"operation_id": "OP_2"})
+
+        response = client.get("/events")
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        assert response.data.decode() == (
+            f"id: {encode_cursor({'': 24})}\n"
+            'data: {"operation_id": "OP_1"}\n\n'
+            f"id: {encode_cursor({'': 24, 'SERVER_1': 24})}\n"
+            'data: {"operation_id": "OP_2"}\n\n'
+        )
+
+        cursor = encode_cursor({"": 24})
+        expected = (
+            f"id: {encode_cursor({'': 24, 'SERVER_1': 24})}\n"
+            'data: {"operation_id": "OP_2"}\n\n'
+        ).encode()
+
+        response = client.get(f"/events?since={cursor}")
+        assert response.data == expected
+
+        response = client.get("/events", headers={"Last-Event-ID": cursor})
+        assert response.data == expected
+
+    @patch("pg_backup_api.logic.utility_controller.get_events_files")
+    def test_events_get_wait(self, mock_get_files, client, tmp_path):
+        """Test ``/events`` endpoint.
+
+        Ensure ``GET`` with ``wait`` streams events logged while waiting.
+        """
+        files = {"": str(tmp_path / "instance.jsonl")}
+        mock_get_files.return_value = files
+
+        def append_later():
+            time.sleep(0.1)
+            append_event(files[""], {"operation_id": "OP_1"})
+
+        thread = threading.Thread(target=append_later)
+        thread.start()
+
+        response = client.get("/events?wait=5", buffered=False)
+        first = next(response.response)
+        response.close()
+        thread.join()
+
+        assert first.decode() == (
+            f"id: {encode_cursor({'': 24})}\n"
+            'data: {"operation_id": "OP_1"}\n\n'
+        )
+
+    def test_events_get_invalid_cursor(self, client):
+        """Test ``/events`` endpoint.
+
+        Ensure ``GET`` returns ``400`` if the cursor is invalid.
+        """
+        response = client.get("/events?since=SOME_CURSOR")
+
+        assert response.status_code == 400
+        assert b"Invalid cursor &#39;SOME_CURSOR&#39;" in response.data
+
+    def test_events_not_allowed(self, client):
+        """Test ``/events`` endpoint.
+
+        Ensure all other HTTP request methods return an error.
+        """
+        self._ensure_http_methods_not_allowed(
+            _HTTP_METHODS - {"GET"}, "/events", client
+        )
+
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    def test_server_backups_get(self, mock_get_server, mock_get_pool, client):
+        """Test ``/servers/<SERVER_NAME>/backups`` endpoint.
+
+        Ensure ``GET`` returns the requested page of backups, filtered by
+        status.
+        """
+        path = "/servers/SOME_SERVER_NAME/backups"
+        mock_list = mock_get_pool.return_value.list_backups
+        mock_list.return_value = [{"backup_id": f"B{i}"} for i in range(5)]
+
+        response = client.get(f"{path}?status=DONE,FAILED&limit=2&offset=1")
+
+        mock_get_server.assert_called_once_with("SOME_SERVER_NAME")
+        mock_list.assert_called_once_with(
+            mock_get_server.return_value, ["DONE", "FAILED"]
+        )
+        assert response.status_code == 200
+        assert response.json == {
+            "backups": [{"backup_id": "B1"}, {"backup_id": "B2"}],
+            "total": 5,
+        }
+
+        mock_list.reset_mock()
+        response = client.get(path)
+
+        mock_list.assert_called_once_with(mock_get_server.return_value, None)
+        assert len(response.json["backups"]) == 5
+
+    @pytest.mark.parametrize(
+        "query,expected",
+        [
+            (
+                "status=DONE,SOME_STATUS",
+                "Invalid ``status`` &#39;SOME_STATUS&#39;",
+            ),
+            (
+                "limit=0",
+                "Invalid ``limit`` &#39;0&#39;, expected an integer between "
+                "1 and 1000",
+            ),
+            ("limit=SOME_LIMIT", "Invalid ``limit`` &#39;SOME_LIMIT&#39;"),
+            ("offset=-1", "Invalid ``offset`` &#39;-1&#39;"),
+        ],
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
+    def test_server_backups_get_invalid(
+        self, mock_get_pool, query, expected, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/backups`` endpoint.
+
+        Ensure ``GET`` returns ``400`` if the query string is invalid.
+        """
+        response = client.get(f"/servers/SOME_SERVER_NAME/backups?{query}")
+
+        assert response.status_code == 400
+        assert expected.encode() in response.data
+        mock_get_pool.assert_not_called()
+
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    def test_server_backups_get_server_does_not_exist(
+        self, mock_get_server, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/backups`` endpoint.
+
+        Ensure ``GET`` returns ``404`` if the Barman server doesn't exist.
+        """
+        mock_get_server.return_value = None
+
+        response = client.get("/servers/SOME_SERVER_NAME/backups")
+
+        assert response.status_code == 404
+        expected = (
+            b'{"error":"404 Not Found: Server '
+            b"'SOME_SERVER_NAME' does not exist\"}\n"
+        )
+        assert response.data == expected
+
+    def test_server_backups_not_allowed(self, client):
+        """Test ``/servers/<SERVER_NAME>/backups`` endpoint.
+
+        Ensure all other HTTP request methods return an error.
+        """
+        path = "/servers/SOME_SERVER_NAME/backups"
+        self._ensure_http_methods_not_allowed(
+            _HTTP_METHODS - {"GET"}, path, client
+        )
+
+    @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
+    @patch("pg_backup_api.logic.utility_controller.get_server_pool")
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name")
+    def test_server_backup_get(
+        self, mock_get_server, mock_get_pool, mock_parse_id, client
+    ):
+        """Test ``/servers/<SERVER_NAME>/backups/<BACKUP_ID>`` endpoint.
+
+        Ensure ``GET`` resolves the backup ID, including aliases, and returns
+        the information about the backup.
+        """
+        mock_server = mock_get_pool.return_value.server
+        mock_parse_id.return_value.to_json.return_value = {"SOME": "INFO"}
+
+        response = client.get("/servers/SOME_SERVER_NAME/backups/latest")
+
+        mock_server.assert_called_once_with(mock_get_server.return_value)
+        mock_parse_id.assert_called_once_with(
+            mock_server.return_value.__enter__.return_value, "latest"
+        )
+        assert response.status_code == 200
+        assert response.json == {"SOME": "INFO"}
+
+    @patch("pg_backup_api.logic.utility_controller.parse_backup_id")
+    @patch(
+        "pg_backup_api.logic.utility_controller.get_server_pool", MagicMock()
+    )
+    @patch("pg_backup_api.logic.utility_controller.get_server_by_name", Mock())
+    def test_server_backup_get_does_not_exist(self, mock_parse_id, client):
+        """Test ``/servers/<SERVER_NAME>/backups/<BACKUP_ID>`` endpoint.
+
+        Ensure ``GET`` returns ``404`` if the backup doesn't exist.
+        """
+        mock_parse_id.return_value = None
+
+        response = client.get("/servers/SOME_SERVER_NAME/backups/SOME_ID")
+
+        assert response.status_code == 404
+        expected = (
+            b"{\"error\":\"404 Not Found: Backup 'SOME_ID' does not exist\"}\n"
+        )
+        assert response.data == expected
@@ -17,6 +17,8 @@
 # along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
 
 """Unit tests for utilitary functions."""
+import os
+import subprocess
 from unittest.mock import MagicMock, patch, call
 
 from barman.infofile import BackupInfo
@@ -24,10 +26,16 @@ import pytest
 
 from pg_backup_api.utils import (
     create_app,
+    get_setting,
     load_barman_config,
     setup_logging_for_wsgi_server,
     get_server_by_name,
+    get_wal_backlog,
     parse_backup_id,
+    parse_wait,
+    get_process_start_time,
+    is_process_alive,
+    measure_children_resources,
 )
 
 
@@ -57,6 +65,119 @@ def test_load_barman_config(mock_global_config, mock_config):
     mock_load.assert_called_once_with()
 
 
+@pytest.mark.parametrize(
+    "env,default,type_,expected",
+    [
+        ({}, "SOME_DEFAULT", str, "SOME_DEFAULT"),
+        ({"PG_BACKUP_API_SOME_SETTING": "VALUE"}, "DEFAULT", str, "VALUE"),
+        ({"PG_BACKUP_API_SOME_SETTING": "10"}, 5, int, 10),
+        ({"PG_BACKUP_API_SOME_SETTING": "1.5"}, 5.0, float, 1.5),
+        ({"PG_BACKUP_API_SOME_SETTING": "true"}, False, bool, True),
+        ({"PG_BACKUP_API_SOME_SETTING": "On"}, False, bool, True),
+        ({"PG_BACKUP_API_SOME_SETTING": "no"}, True, bool, False),
+    ],
+)
+def test_get_setting(env, default, type_, expected):
+    """Test :func:`get_setting`.
+
+    Ensure the setting is read from the environment, converted to the
+    expected type, and that the default is used if it is not set.
+    """
+    with patch.dict("os.environ", env, clear=True):
+        assert get_setting("SOME_SETTING", default, type_) == expected
+
+
+def test_get_setting_invalid():
+    """Test :func:`get_setting`.
+
+    Ensure an exception is raised if the value cannot be converted.
+    """
+    env = {"PG_BACKUP_API_SOME_SETTING": "NOT_A_NUMBER"}
+
+    with patch.dict("os.environ", env, clear=True):
+        with pytest.raises(ValueError):
+            get_setting("SOME_SETTING", 1, int)
+
+
+@pytest.mark.parametrize(
+    "value,expected", [(None, 0), ("2.5", 2.5), ("120", 30.0)]
+)
+@patch.dict("os.environ", {}, clear=True)
+def test_parse_wait(value, expected):
+    """Test :func:`parse_wait`.
+
+    Ensure the number of seconds is returned, capped to ``MAX_WAIT``.
+    """
+    assert parse_wait(value) == expected
+
+
+@pytest.mark.parametrize("value", ["-1", "nan", "SOME_VALUE"])
+def test_parse_wait_invalid(value):
+    """Test :func:`parse_wait`.
+
+    Ensure an exception is raised if the value is not a non-negative number.
+    """
+    with pytest.raises(ValueError, match="expected a number of seconds"):
+        parse_wait(value)
+
+
+def test_is_process_alive():
+    """Test :func:`is_process_alive`.
+
+    Ensure a process is identified by its PID and start time, and exited
+    processes are not considered alive, even if not reaped yet.
+    """
+    pid = os.getpid()
+    start_time = get_process_start_time(pid)
+
+    assert isinstance(start_time, int)
+    assert is_process_alive(pid) is True
+    assert is_process_alive(pid, start_time) is True
+    assert is_process_alive(pid, start_time + 1) is False
+
+    process = subprocess.Popen(["true"])
+
+    # Wait for it to exit, without reaping it
+    os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+
+    assert is_process_alive(process.pid) is False
+    process.wait()
+    assert is_process_alive(process.pid) is False
+    assert get_process_start_time(process.pid) is None
+
+
+def test_measure_children_resources():
+    """Test :func:`measure_children_resources`.
+
+    Ensure the resources of children reaped within the ``with`` block are
+    measured, and the dictionary is filled only on exit.
+    """
+    with measure_children_resources() as resources:
+        assert resources == {}
+        subprocess.run(
+            ["dd", "if=/dev/zero", "of=/dev/null", "bs=1M", "count=8"],
+            stderr=subprocess.DEVNULL,
+        )
+
+    assert set(resources) == {
+        "wall_time",
+        "user_time",
+        "system_time",
+        "max_rss_kb",
+        "block_input",
+        "block_output",
+        "read_bytes",
+        "write_bytes",
+    }
+    assert resources["wall_time"] > 0
+    assert resources["max_rss_kb"] > 0
+
+    if os.path.exists("/proc/self/io"):
+        assert resources["read_bytes"] >= 0
+    else:
+        assert resources["read_bytes"] is None
+
+
 @patch("pg_backup_api.utils.dictConfig")
 def test_setup_logging_for_wsgi_server(mock_dict_config):
     """Test :func:`setup_logging_for_wsgi_server`.
@@ -86,6 +207,38 @@ def test_setup_logging_for_wsgi_server(mock_dict_config):
     mock_dict_config.assert_called_once_with(expected)
 
 
+@patch("barman.__config__")
+def test_get_wal_backlog(mock_config, tmp_path):
+    """Test :func:`get_wal_backlog`.
+
+    Ensure WAL files waiting in the ``incoming`` and ``streaming`` directories
+    of all servers are counted, but not partial files, nor directories which
+    are missing or not configured.
+    """
+    for name in ("incoming", "streaming"):
+        (tmp_path / name).mkdir()
+
+    for name in ("000000010000000000000001", "000000010000000000000002"):
+        (tmp_path / "incoming" / name).touch()
+
+    (tmp_path / "streaming" / "000000010000000000000003").touch()
+    (tmp_path / "streaming" / "000000010000000000000004.partial").touch()
+
+    mock_config.server_names.return_value = ["SERVER_1", "SERVER_2"]
+    mock_config.get_server.side_effect = [
+        MagicMock(
+            incoming_wals_directory=str(tmp_path / "incoming"),
+            streaming_wals_directory=str(tmp_path / "streaming"),
+        ),
+        MagicMock(
+            incoming_wals_directory=str(tmp_path / "missing"),
+            streaming_wals_directory=None,
+        ),
+    ]
+
+    assert get_wal_backlog() == 3
+
+
 @patch("barman.__config__")
 def test_get_server_by_name_not_found(mock_config):
     """Test :func:`get_server_by_name`.
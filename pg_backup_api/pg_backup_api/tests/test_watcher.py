@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Unit tests for the watcher of operation files."""
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import patch
+
+from pg_backup_api import watcher as watcher_module
+from pg_backup_api.watcher import (
+    FileWatcher,
+    get_file_signature,
+    get_watcher,
+)
+
+
+class TestFileWatcher:
+    """Run tests for :class:`FileWatcher`."""
+
+    def test_wait_for_file_exists(self, tmp_path):
+        """Test :meth:`FileWatcher.wait_for_file`.
+
+        Ensure it returns right away if the file already exists, without
+        starting the background thread.
+        """
+        path = tmp_path / "SOME_FILE.json"
+        path.write_text("{}")
+
+        watcher = FileWatcher(10)
+
+        assert watcher.wait_for_file(str(path), 5) is True
+        assert watcher._thread is None
+
+    def test_wait_for_file_created(self, tmp_path):
+        """Test :meth:`FileWatcher.wait_for_file`.
+
+        Ensure it returns once the file is created by someone else, even in a
+        directory which did not exist when the wait started.
+        """
+        path = tmp_path / "2026" / "10" / "SOME_FILE.json"
+        watcher = FileWatcher(0.01)
+
+        def create_file():
+            time.sleep(0.1)
+            path.parent.mkdir(parents=True)
+            path.write_text("{}")
+
+        thread = threading.Thread(target=create_file)
+        thread.start()
+
+        assert watcher.wait_for_file(str(path), 5) is True
+        thread.join()
+        assert watcher._waiters == {}
+
+    def test_wait_for_file_timeout(self, tmp_path):
+        """Test :meth:`FileWatcher.wait_for_file`.
+
+        Ensure it returns ``False`` if the file is not created in time.
+        """
+        watcher = FileWatcher(0.01)
+
+        path = str(tmp_path / "SOME_FILE")
+
+        assert watcher.wait_for_file(path, 0.05) is False
+        assert watcher._waiters == {}
+
+    def test_async_wait_for_file(self, tmp_path):
+        """Test :meth:`FileWatcher.async_wait_for_file`.
+
+        Ensure coroutines are woken up once the file is created, or return
+        ``False`` if it's not created in time.
+        """
+        path = tmp_path / "SOME_FILE.json"
+        watcher = FileWatcher(0.01)
+
+        async def wait():
+            timed_out = await watcher.async_wait_for_file(str(path), 0.05)
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.1, path.write_text, "{}")
+            created = await watcher.async_wait_for_file(str(path), 5)
+            return timed_out, created
+
+        assert asyncio.run(wait()) == (False, True)
+        assert watcher._waiters == {}
+
+    def test_async_wait_for_change(self, tmp_path):
+        """Test :meth:`FileWatcher.async_wait_for_change`.
+
+        Ensure coroutines are woken up once any of the files changes, or
+        return ``False`` if none changes in time.
+        """
+        path = tmp_path / "events.jsonl"
+        path.write_text("{}\n")
+        missing = tmp_path / "SERVER" / "events.jsonl"
+        signatures = {
+            str(path): get_file_signature(str(path)),
+            str(missing): None,
+        }
+        watcher = FileWatcher(0.01)
+
+        async def wait():
+            timed_out = await watcher.async_wait_for_change(signatures, 0.05)
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.1, path.write_text, "{}\n{}\n")
+            changed = await watcher.async_wait_for_change(signatures, 5)
+            return timed_out, changed
+
+        assert asyncio.run(wait()) == (False, True)
+        assert watcher._change_waiters == {}
+
+    def test_async_wait_for_change_already_changed(self, tmp_path):
+        """Test :meth:`FileWatcher.async_wait_for_change`.
+
+        Ensure it returns right away if a file already changed, without
+        starting the background thread.
+        """
+        path = tmp_path / "events.jsonl"
+        path.write_text("{}\n")
+        watcher = FileWatcher(10)
+
+        assert asyncio.run(
+            watcher.async_wait_for_change({str(path): None}, 5)
+        ) is True
+        assert watcher._thread is None
+
+    def test__check_changes(self, tmp_path):
+        """Test :meth:`FileWatcher._check_changes`.
+
+        Ensure only the waiters which saw another signature are woken up.
+        """
+        path = tmp_path / "events.jsonl"
+        path.write_text("{}\n")
+        signature = get_file_signature(str(path))
+        unchanged = threading.Event()
+        changed = threading.Event()
+
+        FileWatcher._check_changes(
+            {str(path): [(signature, unchanged), ((0, 0), changed)]}
+        )
+
+        assert not unchanged.is_set()
+        assert changed.is_set()
+
+    def test__check_unchanged_dir(self, tmp_path):
+        """Test :meth:`FileWatcher._check`.
+
+        Ensure files are not looked for again if their directory has not been
+        modified since it was last checked.
+        """
+        path = str(tmp_path / "SOME_FILE")
+        event = threading.Event()
+        old = time.time() - 60
+        os.utime(str(tmp_path), (old, old))
+
+        watcher = FileWatcher(10)
+        watcher._check({path: [event]})
+
+        assert watcher._dir_mtimes == {
+            str(tmp_path): os.stat(str(tmp_path)).st_mtime_ns
+        }
+
+        with patch("os.path.exists") as mock_exists:
+            watcher._check({path: [event]})
+            mock_exists.assert_not_called()
+
+        assert not event.is_set()
+
+    def test__check_recent_dir(self, tmp_path):
+        """Test :meth:`FileWatcher._check`.
+
+        Ensure a recently modified directory is checked again on the next
+        round, as a file could be created without changing its mtime.
+        """
+        path = str(tmp_path / "SOME_FILE")
+        event = threading.Event()
+
+        watcher = FileWatcher(10)
+        watcher._check({path: [event]})
+
+        assert watcher._dir_mtimes == {}
+
+        with open(path, "w") as fd:
+            fd.write("{}")
+
+        watcher._check({path: [event]})
+
+        assert event.is_set()
+
+
+def test_get_file_signature(tmp_path):
+    """Test :func:`get_file_signature`.
+
+    Ensure the size and modification time of the file are returned, or
+    ``None`` if it doesn't exist.
+    """
+    path = tmp_path / "events.jsonl"
+
+    assert get_file_signature(str(path)) is None
+
+    path.write_text("{}\n")
+
+    assert get_file_signature(str(path)) == (3, path.stat().st_mtime_ns)
+
+
+@patch.dict("os.environ", {"PG_BACKUP_API_WAIT_POLL_INTERVAL": "0.25"})
+def test_get_watcher():
+    """Test :func:`get_watcher`.
+
+    Ensure a single watcher is created, with the configured interval.
+    """
+    with patch.object(watcher_module, "_watcher", None):
+        watcher = get_watcher()
+
+        assert watcher.interval == 0.25
+        assert get_watcher() is watcher
@@ -21,9 +21,22 @@ Utility functions and constants used through pg-backup-api code.
 
 :var CONFIG_FILENAME: path to the main Barman configuration file.
 :var LOG_FILENAME: path to the file where pg-backup-api logs its messages.
+:var SETTINGS_ENV_PREFIX: prefix of the environment variables which can be
+    used to change pg-backup-api settings.
 """
+from contextlib import contextmanager
 from logging.config import dictConfig
-from typing import Optional, TYPE_CHECKING
+import resource
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TYPE_CHECKING,
+)
 
 from flask import Flask
 
@@ -33,6 +46,8 @@ from barman.infofile import BackupInfo
 
 import os
 
+from pg_backup_api import json_backend
+
 if TYPE_CHECKING:  # pragma: no cover
     import flask.app
     from barman.config import Config as BarmanConfig, ServerConfig
@@ -41,15 +56,20 @@ if TYPE_CHECKING:  # pragma: no cover
 
 DEFAULT_BARMAN_CONFIG_FILE = "/etc/barman.conf"
 LOG_FILENAME = "/var/log/barman/barman-api.log"
+SETTINGS_ENV_PREFIX = "PG_BACKUP_API_"
 
 
 def create_app() -> "flask.app.Flask":
     """
     Create the connexion app with the required API.
 
+    Responses are encoded through :mod:`pg_backup_api.json_backend`.
+
     :return: flask application instance with name ``Postgres Backup API``.
     """
-    return Flask("Postgres Backup API")
+    app = Flask("Postgres Backup API")
+    json_backend.init_app(app)
+    return app
 
 
 def load_barman_config() -> None:
@@ -72,6 +92,206 @@ def get_barman_config_file() -> str:
     return os.getenv("PG_BACKUP_API_BARMAN_CONF", DEFAULT_BARMAN_CONFIG_FILE)
 
 
+def get_setting(
+    name: str, default: Any, type_: Callable[[str], Any] = str
+) -> Any:
+    """
+    Get the value of the pg-backup-api setting *name*.
+
+    The setting is read from the environment variable named
+    :data:`SETTINGS_ENV_PREFIX` followed by *name*, e.g.
+    ``PG_BACKUP_API_OPERATIONS_LAYOUT`` for setting ``OPERATIONS_LAYOUT``.
+
+    :param name: name of the setting, without the environment prefix.
+    :param default: value to be returned if the setting is not set.
+    :param type_: callable used to convert the raw string value. If
+        :class:`bool`, then ``1``, ``true``, ``yes`` and ``on`` are
+        considered ``True``, and anything else ``False``.
+    :return: value of the setting converted through *type_*, or *default* if
+        the setting is not set.
+
+    :raises:
+        :exc:`ValueError`: if the value cannot be converted through *type_*.
+    """
+    value = os.getenv(f"{SETTINGS_ENV_PREFIX}{name}")
+
+    if value is None:
+        return default
+
+    if type_ is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    return type_(value)
+
+
+def parse_wait(value: Optional[str]) -> float:
+    """
+    Parse the value of a ``wait`` query string argument.
+
+    :param value: raw value of the argument, ``None`` if it was not given.
+    :return: number of seconds to wait for, or ``0`` if *value* is ``None``.
+        Capped to the ``MAX_WAIT`` setting.
+
+    :raises:
+        :exc:`ValueError`: if *value* is not a non-negative number.
+    """
+    if value is None:
+        return 0
+
+    try:
+        wait = float(value)
+    except ValueError:
+        wait = -1
+
+    if not wait >= 0:
+        raise ValueError(
+            f"Invalid ``wait`` '{value}', expected a number of seconds"
+        )
+
+    return min(wait, get_setting("MAX_WAIT", 30.0, float))
+
+
+def _read_proc_stat(pid: int) -> Optional[List[bytes]]:
+    """
+    Read the status of process *pid* from ``/proc``.
+
+    :param pid: ID of the process.
+    :return: fields of ``/proc/<pid>/stat`` which follow the command name,
+        starting with the state of the process. ``None`` if not available,
+        e.g. if the process does not exist, or not running on Linux.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as fd:
+            stat = fd.read()
+    except OSError:
+        return None
+
+    # The command name is enclosed in parentheses, and may contain spaces
+    return stat[stat.rindex(b")") + 2:].split()
+
+
+def get_process_start_time(pid: int) -> Optional[int]:
+    """
+    Get when process *pid* started.
+
+    Along with the process ID, it identifies a process even if the process ID
+    is reused after the process exits.
+
+    :param pid: ID of the process.
+    :return: start time of the process, in clock ticks since boot, or
+        ``None`` if not available.
+    """
+    fields = _read_proc_stat(pid)
+    return int(fields[19]) if fields else None
+
+
+def is_process_alive(pid: int, start_time: Optional[int] = None) -> bool:
+    """
+    Check if process *pid* is running.
+
+    :param pid: ID of the process.
+    :param start_time: start time of the process, as returned by
+        :func:`get_process_start_time` when the process was running. If
+        given, a different process which reused *pid* is not considered.
+    :return: ``True`` if the process is running, ``False`` if it does not
+        exist or is a zombie.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists, but belongs to another user
+        pass
+
+    fields = _read_proc_stat(pid)
+
+    if fields is None:
+        return True
+
+    if fields[0] == b"Z":
+        return False
+
+    return start_time is None or int(fields[19]) == start_time
+
+
+def _read_proc_io() -> Optional[Dict[str, int]]:
+    """
+    Read the I/O counters of the current process from ``/proc``.
+
+    .. note::
+        They include the I/O of the children which have been waited for.
+
+    :return: the counters, e.g. ``read_bytes`` and ``write_bytes``, or
+        ``None`` if not available, e.g. if not running on Linux.
+    """
+    try:
+        with open("/proc/self/io") as fd:
+            lines = fd.read().splitlines()
+    except OSError:
+        return None
+
+    counters = {}
+
+    for line in lines:
+        key, _, value = line.partition(":")
+        counters[key.strip()] = int(value)
+
+    return counters
+
+
+@contextmanager
+def measure_children_resources() -> Iterator[Dict[str, Any]]:
+    """
+    Measure the resources used by the children of the current process.
+
+    Only children which finish, and are waited for, inside the ``with`` block
+    are accounted for, along with their own waited-for descendants.
+
+    :yield: a dictionary, filled when leaving the ``with`` block, with:
+
+        * ``wall_time``: number of seconds spent in the ``with`` block;
+        * ``user_time`` and ``system_time``: CPU time of the children, in
+          seconds;
+        * ``max_rss_kb``: largest resident set size among all children of the
+          current process, in kilobytes;
+        * ``block_input`` and ``block_output``: number of block I/O
+          operations of the children;
+        * ``read_bytes`` and ``write_bytes``: bytes read from, and written
+          to, storage. ``None`` if ``/proc`` is not available.
+
+    .. note::
+        Linux only accounts the storage I/O of waited-for children within
+        ``/proc/self/io``, along with the I/O of the current process itself.
+        So ``read_bytes`` and ``write_bytes`` also include what the current
+        process reads and writes inside the ``with`` block, e.g. the job
+        file of an operation.
+    """
+    usage: Dict[str, Any] = {}
+    start = time.monotonic()
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    io_before = _read_proc_io()
+
+    try:
+        yield usage
+    finally:
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        io_after = _read_proc_io()
+
+        usage["wall_time"] = round(time.monotonic() - start, 3)
+        usage["user_time"] = round(after.ru_utime - before.ru_utime, 3)
+        usage["system_time"] = round(after.ru_stime - before.ru_stime, 3)
+        usage["max_rss_kb"] = after.ru_maxrss
+        usage["block_input"] = after.ru_inblock - before.ru_inblock
+        usage["block_output"] = after.ru_oublock - before.ru_oublock
+
+        for key in ("read_bytes", "write_bytes"):
+            if io_before and io_after and key in io_after:
+                usage[key] = io_after[key] - io_before.get(key, 0)
+            else:
+                usage[key] = None
+
+
 def setup_logging_for_wsgi_server() -> None:
     """
     Configure logging.
@@ -118,6 +338,50 @@ def get_server_by_name(server_name: str) -> Optional["ServerConfig"]:
             return conf
 
 
+def get_wal_backlog() -> int:
+    """
+    Count the WAL files which are waiting to be archived by Barman.
+
+    Those are the files in the ``incoming`` and ``streaming`` directories of
+    all Barman servers, which ``barman cron`` moves to the WAL archive. A
+    growing backlog means archiving does not keep up.
+
+    .. note::
+        Partial WAL files being received through ``pg_receivewal`` are not
+        counted.
+
+    :return: number of WAL files waiting to be archived.
+    """
+    if TYPE_CHECKING:  # pragma: no cover
+        assert isinstance(barman.__config__, BarmanConfig)
+
+    backlog = 0
+
+    for name in barman.__config__.server_names():  # pyright: ignore
+        server = barman.__config__.get_server(name)
+
+        for directory in (
+            server.incoming_wals_directory,
+            server.streaming_wals_directory,
+        ):
+            if not directory:
+                continue
+
+            try:
+                with os.scandir(directory) as entries:
+                    backlog += sum(
+                        1
+                        for entry in entries
+                        if entry.is_file()
+                        and not entry.name.endswith(".partial")
+                    )
+            except OSError:
+                # Not created yet, e.g. no WAL was ever received
+                continue
+
+    return backlog
+
+
 def parse_backup_id(
     server: barman.server.Server, backup_id: str
 ) -> Optional[BackupInfo]:
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+# © Copyright EnterpriseDB UK Limited 2021-2025 - All rights reserved.
+#
+# This file is part of Postgres Backup API.
+#
+# Postgres Backup API is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Postgres Backup API is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Postgres Backup API.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Wait for files of operations to be created or changed.
+
+A single background thread serves all waiters. On each round it ``stat``\\ s
+each directory being watched, and only looks for the awaited files of a
+directory if its modification time has changed since the previous round.
+Files awaited to change, e.g. event logs, are ``stat``\\ ed themselves, and
+compared against their signature, see :func:`get_file_signature`.
+
+Waiters can either block their thread, through
+:meth:`FileWatcher.wait_for_file`, or be coroutines, through
+:meth:`FileWatcher.async_wait_for_file`, which cost no thread while waiting.
+
+:var DEFAULT_INTERVAL: default number of seconds between rounds.
+"""
+import asyncio
+from collections import defaultdict
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from pg_backup_api.utils import get_setting
+
+DEFAULT_INTERVAL = 0.5
+
+
+class _LoopEvent:
+    """
+    Set an :class:`asyncio.Event` from the thread of the watcher.
+
+    Quacks like a :class:`threading.Event` as far as the watcher is concerned.
+    """
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, event: asyncio.Event
+    ) -> None:
+        """
+        Initialize a new instance of :class:`_LoopEvent`.
+
+        :param loop: the event loop *event* belongs to.
+        :param event: the event to be set.
+        """
+        self._loop = loop
+        self._event = event
+
+    def set(self) -> None:
+        """Set the event, in the thread of its event loop."""
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # The loop was closed meanwhile, nobody is waiting anymore
+            pass
+
+
+_Waiter = Union[threading.Event, _LoopEvent]
+_Signature = Optional[Tuple[int, int]]
+
+
+def get_file_signature(path: str) -> _Signature:
+    """
+    Get the signature of *path*, which changes whenever the file is modified.
+
+    :param path: path to the file.
+    :return: a tuple of the size and modification time of *path*, ``None`` if
+        it doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher:
+    """
+    Wait for files to be created, using a thread shared by all waiters.
+
+    :ivar interval: number of seconds between rounds of checks.
+    """
+
+    # Directory modification times more recent than this many seconds are not
+    # trusted, as another file could still be created within the granularity
+    # of the filesystem timestamps without changing it.
+    _MTIME_GRACE = 1.0
+
+    def __init__(self, interval: float) -> None:
+        """
+        Initialize a new instance of :class:`FileWatcher`.
+
+        :param interval: number of seconds between rounds of checks.
+        """
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._waiters: Dict[str, List[_Waiter]] = defaultdict(list)
+        self._change_waiters: Dict[
+            str, List[Tuple[_Signature, _Waiter]]
+        ] = defaultdict(list)
+        self._dir_mtimes: Dict[str, Optional[int]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def wait_for_file(self, path: str, timeout: float) -> bool:
+        """
+        Wait until *path* exists, or *timeout* expires.
+
+        :param path: path to the file being awaited.
+        :param timeout: maximum number of seconds to wait.
+        :return: ``True`` if *path* exists, ``False`` otherwise.
+        """
+        if os.path.exists(path):
+            return True
+
+        event = threading.Event()
+        self._add_waiter(path, event)
+
+        try:
+            return event.wait(timeout) or os.path.exists(path)
+        finally:
+            self._remove_waiter(path, event)
+
+    async def async_wait_for_file(self, path: str, timeout: float) -> bool:
+        """
+        Wait until *path* exists, or *timeout* expires, without a thread.
+
+        :param path: path to the file being awaited.
+        :param timeout: maximum number of seconds to wait.
+        :return: ``True`` if *path* exists, ``False`` otherwise.
+        """
+        if os.path.exists(path):
+            return True
+
+        event = asyncio.Event()
+        waiter = _LoopEvent(asyncio.get_running_loop(), event)
+        self._add_waiter(path, waiter)
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return os.path.exists(path)
+        finally:
+            self._remove_waiter(path, waiter)
+
+    async def async_wait_for_change(
+        self, signatures: Dict[str, _Signature], timeout: float
+    ) -> bool:
+        """
+        Wait until any of the given files changes, or *timeout* expires.
+
+        Like :meth:`async_wait_for_file`, this costs no thread while waiting.
+
+        :param signatures: signature of each file being awaited, as returned
+            by :func:`get_file_signature`, keyed by path.
+        :param timeout: maximum number of seconds to wait.
+        :return: ``True`` if any of the files changed, ``False`` otherwise.
+        """
+        if self._changed(signatures):
+            return True
+
+        event = asyncio.Event()
+        waiter = _LoopEvent(asyncio.get_running_loop(), event)
+
+        with self._cond:
+            for path, signature in signatures.items():
+                self._change_waiters[path].append((signature, waiter))
+
+            self._start()
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._changed(signatures)
+        finally:
+            with self._cond:
+                for path, signature in signatures.items():
+                    self._change_waiters[path].remove((signature, waiter))
+
+                    if not self._change_waiters[path]:
+                        del self._change_waiters[path]
+
+    @staticmethod
+    def _changed(signatures: Dict[str, _Signature]) -> bool:
+        """
+        Check if any of the given files changed.
+
+        :param signatures: signature of each file, keyed by path.
+        :return: ``True`` if the signature of any file differs.
+        """
+        return any(
+            get_file_signature(path) != signature
+            for path, signature in signatures.items()
+        )
+
+    def _add_waiter(self, path: str, waiter: _Waiter) -> None:
+        """
+        Register *waiter* to be set once *path* exists.
+
+        :param path: path to the file being awaited.
+        :param waiter: the event to be set.
+        """
+        with self._cond:
+            self._waiters[path].append(waiter)
+            self._start()
+
+    def _start(self) -> None:
+        """
+        Wake up the background thread, which is started on first use.
+
+        .. note::
+            Called with :attr:`_cond` held.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run,
+                name="pg-backup-api-file-watcher",
+                daemon=True,
+            )
+            self._thread.start()
+
+        self._cond.notify()
+
+    def _remove_waiter(self, path: str, waiter: _Waiter) -> None:
+        """
+        Unregister *waiter*, previously given to :meth:`_add_waiter`.
+
+        :param path: path to the file being awaited.
+        :param waiter: the event to be unregistered.
+        """
+        with self._cond:
+            self._waiters[path].remove(waiter)
+
+            if not self._waiters[path]:
+                del self._waiters[path]
+
+    def _run(self) -> None:
+        """Check awaited files on each round, while there are waiters."""
+        while True:
+            with self._cond:
+                while not self._waiters and not self._change_waiters:
+                    self._dir_mtimes.clear()
+                    self._cond.wait()
+
+                waiters = {p: list(evs) for p, evs in self._waiters.items()}
+                change_waiters = {
+                    p: list(evs) for p, evs in self._change_waiters.items()
+                }
+
+            self._check(waiters)
+            self._check_changes(change_waiters)
+            time.sleep(self.interval)
+
+    def _check(self, waiters: Dict[str, List[_Waiter]]) -> None:
+        """
+        Wake up waiters of files which have been created.
+
+        :param waiters: events of the waiters, keyed by awaited path.
+        """
+        by_dir: Dict[str, List[str]] = defaultdict(list)
+
+        for path in waiters:
+            by_dir[os.path.dirname(path)].append(path)
+
+        for dir_path in list(self._dir_mtimes):
+            if dir_path not in by_dir:
+                del self._dir_mtimes[dir_path]
+
+        now = time.time()
+
+        for dir_path, paths in by_dir.items():
+            try:
+                mtime: Optional[int] = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                # The directory may be created later on, e.g. a new shard
+                mtime = None
+
+            if mtime is not None and self._dir_mtimes.get(dir_path) == mtime:
+                continue
+
+            if mtime is None or now - mtime / 1e9 > self._MTIME_GRACE:
+                self._dir_mtimes[dir_path] = mtime
+
+            for path in paths:
+                if os.path.exists(path):
+                    for event in waiters[path]:
+                        event.set()
+
+    @staticmethod
+    def _check_changes(
+        waiters: Dict[str, List[Tuple[_Signature, _Waiter]]],
+    ) -> None:
+        """
+        Wake up waiters of files which have changed.
+
+        :param waiters: signature each waiter last saw and its event, keyed by
+            awaited path.
+        """
+        for path, entries in waiters.items():
+            signature = get_file_signature(path)
+
+            for last_signature, event in entries:
+                if signature != last_signature:
+                    event.set()
+
+
+_watcher: Optional[FileWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_watcher() -> FileWatcher:
+    """
+    Get the watcher shared by the REST API endpoints.
+
+    The watcher is created on first use, checking files every
+    ``WAIT_POLL_INTERVAL`` seconds, or :data:`DEFAULT_INTERVAL`.
+
+    :return: the shared :class:`FileWatcher` instance.
+    """
+    global _watcher
+
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = FileWatcher(
+                get_setting("WAIT_POLL_INTERVAL", DEFAULT_INTERVAL, float)
+            )
+
+        return _watcher
@@ -33,6 +33,7 @@ with open("./version.txt", "r") as f:
 REQUIRES = [
     "barman>=2.19,<4.0.0",
     "Flask>=0.10.1,<3.0.0",
+    "python-dateutil>=2.0.0,<3.0.0",
     "requests>=2.0.0,<3.0.0",
 ]
 
@@ -46,6 +47,7 @@ setup(
     keywords=["Postgres Backup REST API"],
     python_requires=">=3.6",
     install_requires=REQUIRES,
+    extras_require={"orjson": ["orjson"]},
     packages=find_packages(exclude=["tests"]),
     include_package_data=True,
     entry_points={